@@ -12,13 +12,42 @@ WORK_DIR = "/golem/work"
 OUTPUT_DIR = "/golem/output"
 
 
+def get_cpu_count():
+    # nproc respects the container's cpuset, while cpu_count()
+    # returns the number of all host cores
+    try:
+        return int(subprocess.check_output(["nproc"]).strip())
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        return cpu_count()
+
+
 def exec_cmd(cmd):
     pc = subprocess.Popen(cmd)
     return pc.wait()
 
 
+def split_frames(frames):
+    """ Split frames into runs of evenly spaced, increasing frames, so that
+    each run can be rendered as a single animation
+    :return list: (start, end, step) tuples
+    """
+    runs = []
+    for frame in frames:
+        if runs:
+            start, end, step = runs[-1]
+            if start == end and frame > end:
+                runs[-1] = (start, frame, frame - start)
+                continue
+            if start != end and frame - end == step:
+                runs[-1] = (start, frame, step)
+                continue
+        runs.append((frame, frame, 1))
+    return runs
+
+
 def format_blender_render_cmd(outfilebasename, scene_file, script_file,
-                              start_task, frame, output_format):
+                              start_task, frames, output_format):
+    start, end, step = frames
     cmd = [
         "{}".format(BLENDER_COMMAND),
         "-b", "{}".format(scene_file),
@@ -27,9 +56,18 @@ def format_blender_render_cmd(outfilebasename, scene_file, script_file,
         "-o", "{}/{}_{}".format(OUTPUT_DIR, outfilebasename, start_task),
         "-noaudio",
         "-F", "{}".format(output_format.upper()),
-        "-t", "{}".format(cpu_count()),
-        "-f", "{}".format(frame)
+        "-t", "{}".format(get_cpu_count()),
     ]
+    if start == end:
+        cmd += ["-f", "{}".format(start)]
+    else:
+        # Render the whole run in one process, so the scene is loaded once
+        cmd += [
+            "-s", "{}".format(start),
+            "-e", "{}".format(end),
+            "-j", "{}".format(step),
+            "-a"
+        ]
     return cmd
 
 
@@ -45,15 +83,18 @@ def run_blender_task(outfilebasename, scene_file, script_src, start_task,
     with open(blender_script_path, "w") as script_file:
         script_file.write(script_src)
 
-    for frame in frames:
+    for frame_run in split_frames(frames):
         cmd = format_blender_render_cmd(outfilebasename, scene_file,
-                                        script_file.name, start_task, frame, output_format)
+                                        script_file.name, start_task,
+                                        frame_run, output_format)
         print(cmd, file=sys.stderr)
         exit_code = exec_cmd(cmd)
-        if exit_code is not 0:
+        if exit_code != 0:
             sys.exit(exit_code)
 
 
-run_blender_task(params.outfilebasename, params.scene_file, params.script_src, params.start_task, params.frames,
-                 params.output_format)
+if __name__ == "__main__":
+    run_blender_task(params.outfilebasename, params.scene_file,
+                     params.script_src, params.start_task, params.frames,
+                     params.output_format)
 
@@ -7,7 +7,7 @@ from collections import OrderedDict
 
 
 import time
-from PIL import Image, ImageChops
+from PIL import Image
 
 from golem.core.common import to_unicode
 from golem.core.fileshelper import has_ext
@@ -20,6 +20,7 @@ from apps.blender.resources.scenefileeditor import generate_blender_crop_file
 from apps.blender.task.verificator import BlenderVerificator
 from apps.core.task.coretask import TaskTypeInfo, AcceptClientVerdict
 from apps.rendering.resources.imgrepr import load_as_pil
+from apps.rendering.resources.previewcanvas import PreviewCanvas
 from apps.rendering.resources.renderingtaskcollector import RenderingTaskCollector
 from apps.rendering.task.framerenderingtask import FrameRenderingTask, FrameRenderingTaskBuilder, FrameRendererOptions
 from apps.rendering.task.renderingtask import PREVIEW_EXT, PREVIEW_X, PREVIEW_Y
@@ -50,6 +51,9 @@ class PreviewUpdater(object):
         self.preview_res_y = preview_res_y
         self.preview_file_path = preview_file_path
         self.expected_offsets = expected_offsets
+        self.canvas = PreviewCanvas(preview_file_path,
+                                    (preview_res_x, preview_res_y),
+                                    file_format=PREVIEW_EXT)
 
         # where the match ends - since the chunks have unexpectable sizes, we 
         # don't know where to paste new chunk unless all of the above are in 
@@ -86,18 +90,10 @@ class PreviewUpdater(object):
             img = img.resize((self.preview_res_x, height),
                              resample=Image.BILINEAR)
 
-            if not os.path.exists(self.preview_file_path) \
-               or len(self.chunks) == 1:
-                img_offset = Image.new("RGB", (self.preview_res_x,
-                                               self.preview_res_y))
-                img_offset.paste(img, (0, offset))
-                img_offset.save(self.preview_file_path, PREVIEW_EXT)
-                img_offset.close()
-            else:
-                img_current = Image.open(self.preview_file_path)
-                img_current.paste(img, (0, offset))
-                img_current.save(self.preview_file_path, PREVIEW_EXT)
-                img_current.close()
+            if len(self.chunks) == 1:
+                self.canvas.clear()
+            self.canvas.paste(img, (0, offset))
+            self.canvas.flush()
             img.close()
         except Exception:
             logger.exception("Error in Blender update preview:")
@@ -113,9 +109,8 @@ class PreviewUpdater(object):
         self.perfect_match_area_y = 0
         self.perfectly_placed_subtasks = 0
         if os.path.exists(self.preview_file_path):
-            img = Image.new("RGB", (self.preview_res_x, self.preview_res_y))
-            img.save(self.preview_file_path, PREVIEW_EXT)
-            img.close()
+            self.canvas.clear()
+            self.canvas.flush(force=True)
 
 
 class BlenderTaskTypeInfo(TaskTypeInfo):
@@ -317,9 +312,15 @@ class BlenderRendererOptions(FrameRendererOptions):
         self.compositing = False
 
 
+class CustomCollector(RenderingTaskCollector):
+    def __init__(self, paste=False, width=1, height=1):
+        RenderingTaskCollector.__init__(self, paste, width, height)
+
+
 class BlenderRenderTask(FrameRenderingTask):
     ENVIRONMENT_CLASS = BlenderEnvironment
     VERIFICATOR_CLASS = BlenderVerificator
+    COLLECTOR_CLASS = CustomCollector
 
     BLENDER_MIN_BOX = [8, 8]
 
@@ -366,6 +367,8 @@ class BlenderRenderTask(FrameRenderingTask):
                                                             preview_x,
                                                             preview_y, 
                                                             expected_offsets))
+                self.preview_canvases[preview_path] = \
+                    self.preview_updaters[-1].canvas
         else:
             preview_name = "current_preview.{}".format(PREVIEW_EXT)
             self.preview_file_path = "{}".format(os.path.join(self.tmp_dir,
@@ -374,6 +377,8 @@ class BlenderRenderTask(FrameRenderingTask):
                                                   preview_x,
                                                   preview_y, 
                                                   expected_offsets)
+            self.preview_canvases[self.preview_file_path] = \
+                self.preview_updater.canvas
 
     def query_extra_data(self, perf_index, num_cores=0, node_id=None, node_name=None):
 
@@ -536,8 +541,11 @@ class BlenderRenderTask(FrameRenderingTask):
             preview_task_file_path = self._get_preview_task_file_path(num)
             self.last_preview_path = preview_task_file_path
 
-            scaled.save(preview_task_file_path, PREVIEW_EXT)
-            scaled.save(self._get_preview_file_path(num), PREVIEW_EXT)
+            for path in {preview_task_file_path,
+                         self._get_preview_file_path(num)}:
+                canvas = self._get_canvas(path)
+                canvas.paste(scaled)
+                canvas.flush(force=True)
 
             scaled.close()
             img.close()
@@ -550,10 +558,8 @@ class BlenderRenderTask(FrameRenderingTask):
         logger.debug('_put_image_together() out: %r', output_file_name)
         self.collected_file_names = OrderedDict(sorted(self.collected_file_names.items()))
         if not self._use_outer_task_collector():
-            collector = CustomCollector(paste=True, width=self.res_x, height=self.res_y)
-            for file in self.collected_file_names.values():
-                collector.add_img_file(file)
-            collector.finalize().save(output_file_name, self.output_format)
+            final_img = self._finalize_collector(None, self.collected_file_names)
+            final_img.save(output_file_name, self.output_format)
         else:
             self._put_collected_files_together(os.path.join(self.tmp_dir, output_file_name),
                                                list(self.collected_file_names.values()), "paste")
@@ -562,17 +568,16 @@ class BlenderRenderTask(FrameRenderingTask):
         lower = preview_updater.get_offset(part)
         upper = preview_updater.get_offset(part + 1)
         res_x = preview_updater.preview_res_x
-        for i in range(0, res_x):
-                for j in range(lower, upper):
-                    img_task.putpixel((i, j), color)
+        if upper > lower:
+            img_task.paste(color, (0, lower, res_x, upper))
 
     def _mark_task_area(self, subtask, img_task, color, frame_index=0):
         if not self.use_frames:
             self.mark_part_on_preview(subtask['start_task'], img_task, color, self.preview_updater)
         elif self.total_tasks <= len(self.frames):
-            for i in range(0, int(math.floor(self.res_x * self.scale_factor))):
-                for j in range(0, int(math.floor(self.res_y * self.scale_factor))):
-                    img_task.putpixel((i, j), color)
+            img_task.paste(color, (0, 0,
+                                   int(math.floor(self.res_x * self.scale_factor)),
+                                   int(math.floor(self.res_y * self.scale_factor))))
         else:
             parts = int(self.total_tasks / len(self.frames))
             pu = self.preview_updaters[frame_index]
@@ -586,10 +591,8 @@ class BlenderRenderTask(FrameRenderingTask):
         collected = self.frames_given[frame_key]
         collected = OrderedDict(sorted(collected.items()))
         if not self._use_outer_task_collector():
-            collector = CustomCollector(paste=True, width=self.res_x, height=self.res_y)
-            for file in collected.values():
-                collector.add_img_file(file)
-            collector.finalize().save(output_file_name, self.output_format)
+            final_img = self._finalize_collector(frame_key, collected)
+            final_img.save(output_file_name, self.output_format)
         else:
             self._put_collected_files_together(output_file_name, list(collected.values()), "paste")
         self.collected_file_names[frame_num] = output_file_name
@@ -622,22 +625,6 @@ class BlenderRenderTaskBuilder(FrameRenderingTaskBuilder):
         return definition
 
 
-class CustomCollector(RenderingTaskCollector):
-    def __init__(self, paste=False, width=1, height=1):
-        RenderingTaskCollector.__init__(self, paste, width, height)
-        self.current_offset = 0
-    
-    def _paste_image(self, final_img, new_part, num):
-        img_offset = Image.new("RGB", (self.width, self.height))
-        offset = self.current_offset
-        _, new_img_res_y = new_part.size
-        self.current_offset += new_img_res_y
-        img_offset.paste(new_part, (0, offset))
-        result = ImageChops.add(final_img, img_offset)
-        img_offset.close()
-        return result
-
-
 def generate_expected_offsets(parts, res_x, res_y):
     logger.debug('generate_expected_offsets(%r, %r, %r)', parts, res_x, res_y)
     # returns expected offsets for preview; the highest value is preview's height
@@ -4,6 +4,7 @@ import random
 
 from golem.core.common import timeout_to_deadline
 
+from apps.core.task.verificator import verification_executor
 from apps.rendering.task.verificator import FrameRenderingVerificator
 from apps.blender.resources.scenefileeditor import generate_blender_crop_file
 from apps.blender.resources.imgcompare import check_size
@@ -87,4 +88,4 @@ class BlenderVerificator(FrameRenderingVerificator):
         return res_y
 
     def _check_size(self, file_, res_x, res_y):
-        return check_size(file_, res_x, res_y)
\ No newline at end of file
+        return verification_executor.run(check_size, file_, res_x, res_y)
\ No newline at end of file
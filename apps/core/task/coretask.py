@@ -8,7 +8,9 @@ import uuid
 from enum import Enum
 from ethereum.utils import denoms
 
-from apps.core.task.verificator import CoreVerificator, SubtaskVerificationState
+from apps.core.task.verificator import CoreVerificator, \
+    SubtaskVerificationState, get_verification_thread_pool
+from golem.core.async import AsyncRequest, async_run
 from golem.core.common import HandleKeyError, timeout_to_deadline, to_unicode, \
     timeout_to_string, string_to_timeout
 from golem.core.compress import decompress
@@ -156,20 +158,60 @@ class CoreTask(Task):
     def computation_failed(self, subtask_id):
         self._mark_subtask_failed(subtask_id)
 
-    def computation_finished(self, subtask_id, task_result, result_type=0):
+    def computation_finished(self, subtask_id, task_result, result_type=0,
+                             verification_finished=None):
         if not self.should_accept(subtask_id):
             logger.info("Not accepting results for {}".format(subtask_id))
+            if verification_finished:
+                verification_finished()
             return
         self.interpret_task_results(subtask_id, task_result, result_type)
         result_files = self.results.get(subtask_id)
-        ver_state = self.verificator.verify(subtask_id, self.subtasks_given.get(subtask_id),
-                                            result_files, self)
+        subtask_info = self.subtasks_given.get(subtask_id)
+
+        if verification_finished is None:
+            ver_state = self.verificator.verify(subtask_id, subtask_info,
+                                                result_files, self)
+            self._verification_finished(subtask_id, ver_state, result_files)
+            return
+
+        # Verification may take long, so it's run in a separate thread. It
+        # works on copies, and the task is only updated in the callbacks.
+        verificator = self.verificator.snapshot()
+
+        def verified(ver_state):
+            self.verificator.apply_snapshot(verificator, subtask_id)
+            self._result_verified(subtask_id, ver_state, result_files,
+                                  verification_finished)
+
+        def verification_error(failure):
+            logger.error("Cannot verify subtask %r: %s", subtask_id,
+                         failure.getErrorMessage())
+            self.computation_failed(subtask_id)
+            verification_finished()
+
+        async_run(AsyncRequest(verificator.verify, subtask_id,
+                               copy.deepcopy(subtask_info),
+                               copy.copy(result_files), self),
+                  verified, verification_error,
+                  pool=get_verification_thread_pool())
+
+    def _verification_finished(self, subtask_id, ver_state, result_files):
         if ver_state == SubtaskVerificationState.VERIFIED:
             self.accept_results(subtask_id, result_files)
         # TODO Add support for different verification states
         else:
             self.computation_failed(subtask_id)
 
+    def _result_verified(self, subtask_id, ver_state, result_files,
+                         verification_finished):
+        """ Accept or reject a result verified asynchronously. Tasks may
+        delay the verdict, verification_finished has to be called once the
+        result is accepted or rejected.
+        """
+        self._verification_finished(subtask_id, ver_state, result_files)
+        verification_finished()
+
     def accept_results(self, subtask_id, result_files):
         self.subtasks_given[subtask_id]['status'] = SubtaskStatus.finished
 
@@ -356,6 +398,13 @@ class CoreTask(Task):
         for l in self.listeners:
             l.notify_update_task(self.header.task_id)
 
+    def notify_restart_subtask(self, subtask_id):
+        """ Ask listeners (i.e. the task manager) to restart a subtask that
+        has already been accepted. Must be called in the reactor thread.
+        """
+        for l in self.listeners:
+            l.notify_restart_subtask(self.header.task_id, subtask_id)
+
     @handle_key_error
     def should_accept(self, subtask_id):
         status = self.subtasks_given[subtask_id]['status']
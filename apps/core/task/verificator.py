@@ -1,5 +1,9 @@
 import logging
 import os
+import multiprocessing
+from copy import copy
+from multiprocessing import cpu_count
+from threading import Lock
 
 from enum import Enum
 
@@ -21,6 +25,114 @@ class SubtaskVerificationState(Enum):
     WRONG_ANSWER = 4
 
 
+class VerificationTimeout(Exception):
+    pass
+
+
+class VerificationExecutor(object):
+    """ Bounded pool of worker processes for CPU-bound verification steps,
+    like image loading and comparison. Verifications of many results can
+    then run in parallel instead of serialising on the GIL. Functions run
+    in the pool, and their arguments, have to be picklable.
+
+    Workers are spawned, not forked: a forked child of this multi-threaded
+    process could inherit a lock held by another thread and hang.
+    """
+
+    TIMEOUT = 10 * 60
+
+    def __init__(self, max_workers=None, timeout=TIMEOUT):
+        """
+        :param int max_workers: number of worker processes, defaults to the
+                                number of cores; functions are run in the
+                                calling thread if it's 0
+        :param float timeout: seconds to wait for a result; the pool is
+                              restarted and VerificationTimeout is raised
+                              once it passes
+        """
+        if max_workers is None:
+            max_workers = max(cpu_count(), 1)
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._pool = None
+        self._lock = Lock()
+
+    def run(self, fn, *args):
+        """ Run function in a worker process and wait for its result """
+        pool = self._get_pool()
+        if pool is None:
+            return fn(*args)
+        try:
+            return pool.apply_async(fn, args).get(self.timeout)
+        except multiprocessing.TimeoutError:
+            logger.warning("Verification step %r timed out, restarting "
+                           "the worker pool", fn)
+            self._discard(pool)
+            raise VerificationTimeout("{!r} didn't finish in {}s"
+                                      .format(fn, self.timeout))
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool:
+            self._close(pool, wait)
+
+    def _discard(self, pool):
+        """ Terminate a pool with a hung worker, unless it's been replaced
+        already """
+        with self._lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+        self._close(pool, wait=False)
+
+    @staticmethod
+    def _close(pool, wait):
+        if wait:
+            pool.close()
+            pool.join()
+        else:
+            pool.terminate()
+
+    def _get_pool(self):
+        if self.max_workers <= 0:
+            return None
+        with self._lock:
+            if self._pool is None:
+                try:
+                    context = multiprocessing.get_context('spawn')
+                    self._pool = context.Pool(self.max_workers)
+                except (OSError, ValueError):
+                    logger.warning("Cannot start verification worker pool",
+                                   exc_info=True)
+                    return None
+            return self._pool
+
+
+verification_executor = VerificationExecutor()
+
+_thread_pool = None
+_thread_pool_lock = Lock()
+
+
+def get_verification_thread_pool():
+    """ Bounded pool of threads that verifications are run in. It's separate
+    from the reactor's pool, so a burst of results waiting for reference
+    renders doesn't starve other threaded calls.
+    """
+    global _thread_pool
+    with _thread_pool_lock:
+        if _thread_pool is None:
+            from twisted.internet import reactor
+            from twisted.python.threadpool import ThreadPool
+            _thread_pool = ThreadPool(maxthreads=max(cpu_count(), 1),
+                                      name='verification')
+            _thread_pool.start()
+            reactor.addSystemEventTrigger('during', 'shutdown',
+                                          _thread_pool.stop)
+        return _thread_pool
+
+
 class CoreVerificator(object):
     handle_key_error_for_state = HandleKeyError(state_check_log_key_error)
 
@@ -43,6 +155,19 @@ class CoreVerificator(object):
     def get_verification_state(self, subtask_id):
         return self.ver_states[subtask_id]
 
+    def snapshot(self):
+        """ Copy of this verificator, that can verify a result in another
+        thread without touching state used by the reactor thread. Its
+        outcome is merged back with apply_snapshot.
+        """
+        snapshot = copy(self)
+        snapshot.ver_states = {}
+        return snapshot
+
+    def apply_snapshot(self, snapshot, subtask_id):
+        if subtask_id in snapshot.ver_states:
+            self.ver_states[subtask_id] = snapshot.ver_states[subtask_id]
+
     @handle_key_error_for_state
     def verify(self, subtask_id, subtask_info, tr_files, task):
         self._check_files(subtask_id, subtask_info, tr_files, task)
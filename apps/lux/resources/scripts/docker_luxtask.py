@@ -43,9 +43,18 @@ def find_flm(directory):
         return None
 
 
+def get_cpu_count():
+    # nproc respects the container's cpuset, while cpu_count()
+    # returns the number of all host cores
+    try:
+        return int(subprocess.check_output(["nproc"]).strip())
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        return cpu_count()
+
+
 def format_lux_renderer_cmd(start_task, output_basename, output_format,
                             scene_file):
-    num_cores = cpu_count()
+    num_cores = get_cpu_count()
     flm_file = find_flm(WORK_DIR)
     if flm_file is not None:
         cmd = [
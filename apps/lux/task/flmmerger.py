@@ -0,0 +1,203 @@
+import logging
+import os
+import shutil
+from threading import Lock
+
+from golem.core.fileshelper import common_dir, find_file_with_ext
+from golem.task.localcomputer import LocalComputer
+
+logger = logging.getLogger("apps.lux")
+
+
+def is_flm_result_valid(flm, result_files):
+    """ Cheap check of a flm file produced by a Lux run. Whether the file
+    can really be merged is only known once it's merged.
+    :param flm: path of the flm file
+    :param result_files: all files produced by the run
+    :return bool: False if there's no flm file, it's empty or Lux reported
+                  an error
+    """
+    stderr = [f for f in result_files if os.path.basename(f) == "stderr.log"]
+    if flm is None or not stderr:
+        return False
+    try:
+        if os.path.getsize(flm) == 0:
+            return False
+        with open(stderr[0]) as f:
+            return "ERROR" not in f.read()
+    except (IOError, OSError):
+        return False
+
+
+class FlmMerger(object):
+    """ Folds FLM files into a running accumulator as they arrive.
+
+    Only one merge runs at a time. Files added while it runs are merged
+    together with the accumulator in the next run, so there is never more
+    than one merge left to do when the last file arrives, however many
+    subtasks the task has. If a merge of several files fails, they are
+    retried one by one to find the file that can't be merged. Until such a
+    file is forgotten, nobody is told that all files are merged.
+
+    A file may be added with its own callback, e.g. when its result is
+    accepted only once it's merged. The callback is told whether the file
+    has been merged, and a file that can't be merged is not kept as failed.
+    """
+
+    def __init__(self, task, root_path, accumulator_path, get_merge_ctd,
+                 failure_callback):
+        """
+        :param task: task the files belong to
+        :param root_path: root path for merge computations
+        :param accumulator_path: path of the file with merged results
+        :param get_merge_ctd: function returning ComputeTaskDef of a merge
+                              of files with given basenames
+        :param failure_callback: function called with path of a file that
+                                 can't be merged
+        """
+        self.task = task
+        self.root_path = root_path
+        self.accumulator_path = accumulator_path
+        self.get_merge_ctd = get_merge_ctd
+        self.failure_callback = failure_callback
+
+        self.merged = []
+        self._pending = []
+        self._isolated = []
+        self._merging = []
+        self._failed = []
+        self._callbacks = []
+        self._file_callbacks = {}
+        self._lock = Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        # Files waiting for their callbacks haven't been accepted and won't
+        # be once the task is restored, so they're not merged then
+        waiting = set(self._file_callbacks)
+        for name in ('_pending', '_isolated', '_merging', '_failed'):
+            state[name] = [f for f in state[name] if f not in waiting]
+        state['_file_callbacks'] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__ = state
+        self._lock = Lock()
+        # A merge that was running is lost, its files have to be merged again.
+        # So are the failed files, their subtasks may not have been restarted.
+        self._pending = self._failed + self._merging + self._pending
+        self._merging = []
+        self._failed = []
+
+    def add(self, flm_file, callback=None):
+        """ Merge given file into the accumulator
+        :param callback: function called with True once the file is merged
+                         or with False if it can't be; failure_callback is
+                         called for files added without it
+        """
+        with self._lock:
+            self._pending.append(flm_file)
+            if callback:
+                self._file_callbacks[flm_file] = callback
+        self._merge_next()
+
+    def when_merged(self, callback):
+        """ Call callback with accumulator path (or None if nothing has been
+        merged) once all added files are merged """
+        with self._lock:
+            self._callbacks.append(callback)
+        self._merge_next()
+
+    def forget_failed(self, flm_file):
+        """ Forget a file that couldn't be merged, once its subtask has
+        been restarted. Callbacks registered so far are dropped, as not all
+        results are there anymore.
+        """
+        with self._lock:
+            if flm_file in self._failed:
+                self._failed.remove(flm_file)
+            self._callbacks = []
+
+    def _merge_next(self):
+        with self._lock:
+            if self._merging:
+                return
+            if self._isolated:
+                self._merging = [self._isolated.pop(0)]
+            else:
+                self._merging, self._pending = self._pending, []
+            files = list(self._merging)
+            if files and self.merged:
+                files.append(self.accumulator_path)
+            callbacks = []
+            if not files and not self._failed:
+                callbacks, self._callbacks = self._callbacks, []
+
+        if not files:
+            accumulator = self.accumulator_path if self.merged else None
+            for callback in callbacks:
+                callback(accumulator)
+            return
+
+        logger.debug("Merging %r", files)
+        computer = LocalComputer(
+            self.task,
+            self.root_path,
+            self._merge_ready,
+            self._merge_failure,
+            lambda: self.get_merge_ctd([os.path.basename(f) for f in files]),
+            use_task_resources=False,
+            additional_resources=files
+        )
+        computer.run()
+
+    def _merge_ready(self, results, time_spent):
+        flm = self._find_merged_flm(results['data'])
+        if flm is None:
+            self._merge_failure("No merged flm file created")
+            return
+
+        tmp_path = self.accumulator_path + ".tmp"
+        try:
+            shutil.copy(flm, tmp_path)
+            os.replace(tmp_path, self.accumulator_path)
+        except (IOError, OSError) as err:
+            self._merge_failure(err)
+            return
+
+        with self._lock:
+            merged, self._merging = self._merging, []
+            self.merged += merged
+            callbacks = [self._file_callbacks.pop(f) for f in merged
+                         if f in self._file_callbacks]
+        for callback in callbacks:
+            callback(True)
+        self._merge_next()
+
+    def _merge_failure(self, error):
+        callback = None
+        with self._lock:
+            files, self._merging = self._merging, []
+            if len(files) > 1:
+                self._isolated += files
+                files = []
+            elif files:
+                callback = self._file_callbacks.pop(files[0], None)
+                if callback is None:
+                    self._failed += files
+        if files:
+            logger.error("Cannot merge flm file %r: %s", files[0], error)
+            if callback:
+                callback(False)
+            else:
+                self.failure_callback(files[0])
+        else:
+            logger.warning("Merging flm files failed, merging them one by "
+                           "one: %s", error)
+        self._merge_next()
+
+    @staticmethod
+    def _find_merged_flm(result_files):
+        flm = find_file_with_ext(common_dir(result_files), [".flm"])
+        return flm if is_flm_result_valid(flm, result_files) else None
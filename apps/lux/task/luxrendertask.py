@@ -5,9 +5,6 @@ import os
 import random
 import shutil
 
-from collections import OrderedDict
-from PIL import Image, ImageChops, ImageOps
-
 from golem.core.common import timeout_to_deadline, get_golem_path, to_unicode
 from golem.core.fileshelper import common_dir, find_file_with_ext, has_ext
 
@@ -19,16 +16,18 @@ from golem.task.taskbase import ComputeTaskDef
 from golem.task.taskstate import SubtaskStatus
 
 from apps.core.task.coretask import TaskTypeInfo, AcceptClientVerdict
+from apps.core.task.verificator import SubtaskVerificationState
 from apps.core.task.coretaskstate import Options
 from apps.lux.luxenvironment import LuxRenderEnvironment
 from apps.lux.resources.scenefileeditor import regenerate_lux_file
 from apps.lux.resources.scenefilereader import make_scene_analysis
 import apps.lux.resources.scenefilereader as sfr
 
+from apps.lux.task.flmmerger import FlmMerger
 from apps.lux.task.verificator import LuxRenderVerificator
-from apps.rendering.resources.imgrepr import load_img, blend
+from apps.rendering.resources.previewcanvas import MeanPreviewCanvas
 from apps.rendering.task import renderingtask
-from apps.rendering.task.renderingtask import PREVIEW_EXT, PREVIEW_Y, PREVIEW_X
+from apps.rendering.task.renderingtask import PREVIEW_Y, PREVIEW_X
 from apps.rendering.task import renderingtaskstate
 
 logger = logging.getLogger("apps.lux")
@@ -131,6 +130,7 @@ class LuxRenderOptions(Options):
 class LuxTask(renderingtask.RenderingTask):
     ENVIRONMENT_CLASS = LuxRenderEnvironment
     VERIFICATOR_CLASS = LuxRenderVerificator
+    PREVIEW_CANVAS_CLASS = MeanPreviewCanvas
 
     ################
     # Task methods #
@@ -162,20 +162,16 @@ class LuxTask(renderingtask.RenderingTask):
 
         self.output_file, _ = os.path.splitext(self.output_file)
         self.output_format = self.output_format.lower()
-        self.num_add = 0
 
-        self.preview_exr = None
         self.reference_runs = 2
 
-    def __getstate__(self):
-        state = super(LuxTask, self).__getstate__()
-        state['preview_exr'] = None
-        return state
-
-    def initialize(self, dir_manager):
-        super(LuxTask, self).initialize(dir_manager)
-        self.verificator.test_flm = self.__get_test_flm()
-        self.verificator.merge_ctd = self.__get_merge_ctd([])
+        self.flm_merger = FlmMerger(
+            self,
+            self.root_path,
+            os.path.join(self.tmp_dir, "accumulated.flm"),
+            self._get_merge_ctd,
+            self._flm_merge_failed
+        )
 
     def _write_interval_wrapper(self, halttime):
         if halttime > 0:
@@ -244,38 +240,6 @@ class LuxTask(renderingtask.RenderingTask):
         ctd = self._new_compute_task_def(hash, extra_data, None, perf_index)
         return self.ExtraData(ctd=ctd)
 
-    # GG propably same as query_extra_data_for_merge
-    def query_extra_data_for_flm_merging_test(self):
-        scene_src = regenerate_lux_file(
-            scene_file_src=self.scene_file_src,
-            xres=self.res_x,
-            yres=self.res_y,
-            halttime=4,
-            haltspp=1,
-            writeinterval=0.5,
-            crop=[0, 1, 0, 1],
-            output_format=self.output_format)
-
-        scene_dir = os.path.dirname(self._get_scene_file_rel_path())
-
-        extra_data = {
-            "path_root": self.main_scene_dir,
-            "start_task": 1,
-            "end_task": 1,
-            "total_tasks": 1,
-            "outfilebasename": "reference_merging_task",
-            "output_format": self.output_format,
-            "scene_file_src": scene_src,
-            "scene_dir": scene_dir,
-        }
-
-        ctd = self._new_compute_task_def(
-            "ReferenceMergingTask",
-            extra_data,
-            scene_dir,
-            0)
-        return ctd
-
     def query_extra_data_for_reference_task(self, counter):
         write_interval = \
             self._write_interval_wrapper(self.halttime)
@@ -390,18 +354,14 @@ class LuxTask(renderingtask.RenderingTask):
             0
         )
 
-    def query_extra_data_for_final_flm(self):
-        files = [
-            os.path.basename(x) for x in self.collected_file_names.values()
-        ]
-        return self.__get_merge_ctd(files)
-
     def accept_results(self, subtask_id, result_files):
         super(LuxTask, self).accept_results(subtask_id, result_files)
         num_start = self.subtasks_given[subtask_id]['start_task']
         for tr_file in result_files:
             if has_ext(tr_file, ".flm"):
                 self.collected_file_names[num_start] = tr_file
+                if tr_file not in self.flm_merger.merged:
+                    self.flm_merger.add(tr_file)
                 self.counting_nodes[
                     self.subtasks_given[subtask_id]['node_id']
                 ].accept()
@@ -411,13 +371,35 @@ class LuxTask(renderingtask.RenderingTask):
                 self._update_preview(tr_file, num_start)
 
         if self.num_tasks_received == self.total_tasks:
-            if self.verificator.advanced_verification \
-                    and os.path.isfile(self.__get_test_flm()):
-                self.__generate_final_flm_advanced_verification()
+            self.flm_merger.when_merged(self._merged_flm_ready)
+
+    def _result_verified(self, subtask_id, ver_state, result_files,
+                         verification_finished):
+        flm_files = [f for f in result_files if has_ext(f, ".flm")]
+        if ver_state != SubtaskVerificationState.VERIFIED or not flm_files:
+            super(LuxTask, self)._result_verified(
+                subtask_id, ver_state, result_files, verification_finished)
+            return
+
+        # Whether a flm file is valid is only known once it's merged, so
+        # the provider is credited or rejected after the merge
+        def merged(success):
+            # Called in a merge thread
+            from twisted.internet import reactor
+            reactor.callFromThread(merge_finished, success)
+
+        def merge_finished(success):
+            if success:
+                self.accept_results(subtask_id, result_files)
             else:
-                self.__generate_final_flm()
+                logger.warning("Rejecting subtask %r, its flm file cannot "
+                               "be merged", subtask_id)
+                self.computation_failed(subtask_id)
+            verification_finished()
+
+        self.flm_merger.add(flm_files[0], merged)
 
-    def __get_merge_ctd(self, files):
+    def _get_merge_ctd(self, files):
         script_file = dirmanager.find_task_script(
             APP_DIR,
             "docker_luxmerge.py"
@@ -446,71 +428,19 @@ class LuxTask(renderingtask.RenderingTask):
                "scene_file_src: {scene_file_src}".format(**extra_data)
 
     def _update_preview(self, new_chunk_file_path, num_start):
-        self.num_add += 1
-        if has_ext(new_chunk_file_path, ".exr"):
-            self._update_preview_from_exr(new_chunk_file_path)
-        else:
-            self.__update_preview_from_pil_file(new_chunk_file_path)
+        preview = self._get_preview_canvas()
+        if preview.add_file(new_chunk_file_path):
+            preview.flush()
 
     def _update_task_preview(self):
         pass
 
     @renderingtask.RenderingTask.handle_key_error
     def _remove_from_preview(self, subtask_id):
-        preview_files = []
-        for sub_id, task in list(self.subtasks_given.items()):
-            if sub_id != subtask_id\
-                    and task['status'] == 'Finished'\
-                    and 'preview_file' in task:
-                preview_files.append(task['preview_file'])
-
-        self.preview_file_path = None
-        self.num_add = 0
-
-        for f in preview_files:
-            self._update_preview(f, None)
-        if len(preview_files) == 0:
-            img = self._open_preview()
-            img.close()
-
-    def __update_preview_from_pil_file(self, new_chunk_file_path):
-        img = Image.open(new_chunk_file_path)
-        scaled = img.resize((int(round(self.scale_factor * self.res_x)),
-                             int(round(self.scale_factor * self.res_y))),
-                            resample=Image.BILINEAR)
-        img.close()
-
-        img_current = self._open_preview()
-        img_current = ImageChops.blend(img_current, scaled, 1.0 / self.num_add)
-        img_current.save(self.preview_file_path, PREVIEW_EXT)
-        img.close()
-        scaled.close()
-        img_current.close()
-
-    def _update_preview_from_exr(self, new_chunk_file):
-        if self.preview_exr is None:
-            self.preview_exr = load_img(new_chunk_file)
-        else:
-            self.preview_exr = blend(
-                self.preview_exr,
-                load_img(new_chunk_file),
-                1.0 / self.num_add
-            )
-
-        img_current = self._open_preview()
-        img = self.preview_exr.to_pil()
-        scaled = ImageOps.fit(
-            img,
-            (
-                int(round(self.scale_factor * self.res_x)),
-                int(round(self.scale_factor * self.res_y))
-            ),
-            method=Image.BILINEAR
-        )
-        scaled.save(self.preview_file_path, PREVIEW_EXT)
-        img.close()
-        scaled.close()
-        img_current.close()
+        preview = self._get_preview_canvas()
+        preview_file = self.subtasks_given[subtask_id].get('preview_file')
+        preview.remove_file(preview_file)
+        preview.flush()
 
     def create_reference_data_for_task_validation(self):
         for i in range(0, self.reference_runs):
@@ -527,20 +457,6 @@ class LuxTask(renderingtask.RenderingTask):
             computer.run()
             computer.tt.join()
 
-        path = \
-            self.dirManager.get_ref_data_dir(
-                self.header.task_id, counter='flmMergingTest')
-
-        computer = LocalComputer(
-            self,
-            path,
-            self.__final_img_ready,
-            self.__final_img_error,
-            self.query_extra_data_for_flm_merging_test
-        )
-        computer.run()
-        computer.tt.join()
-
     def __generate_final_file(self, flm):
         computer = LocalComputer(
             self,
@@ -571,51 +487,37 @@ class LuxTask(renderingtask.RenderingTask):
         logger.error("Cannot generate final image: {}".format(error))
         # TODO What should we do in this situation?
 
-    def __generate_final_flm(self):
-        self.collected_file_names = OrderedDict(
-            sorted(self.collected_file_names.items())
-        )
-        computer = LocalComputer(
-            self,
-            self.root_path,
-            self.__final_flm_ready,
-            self.__final_flm_failure,
-            self.query_extra_data_for_final_flm,
-            use_task_resources=False,
-            additional_resources=list(self.collected_file_names.values())
-        )
-        computer.run()
-        computer.tt.join()
-
-    def __final_flm_ready(self, results, time_spent):
-        commonprefix = common_dir(results['data'])
-        flm = find_file_with_ext(commonprefix, [".flm"])
+    def _merged_flm_ready(self, flm):
+        if self.num_tasks_received != self.total_tasks:
+            # A file couldn't be merged and its subtask has been restarted
+            return
         if flm is None:
-            self.__final_flm_failure("No flm file created")
+            self.__final_flm_failure("No flm file merged")
             return
-        shutil.copy(flm, os.path.dirname(self.output_file))
-        new_flm = os.path.join(
-            os.path.dirname(self.output_file),
-            os.path.basename(flm)
-        )
+        new_flm = self.output_file + ".flm"
+        shutil.copy(flm, new_flm)
         self.__generate_final_file(new_flm)
 
+    def _flm_merge_failed(self, flm):
+        # Called in a merge thread, the subtask is restarted by the task
+        # manager in the reactor thread
+        from twisted.internet import reactor
+        reactor.callFromThread(self._restart_unmerged_subtask, flm)
+
+    def _restart_unmerged_subtask(self, flm):
+        for subtask_id, subtask in list(self.subtasks_given.items()):
+            num_start = subtask['start_task']
+            if self.collected_file_names.get(num_start) == flm:
+                logger.warning("Restarting subtask %r, its flm file "
+                               "cannot be merged", subtask_id)
+                del self.collected_file_names[num_start]
+                self.notify_restart_subtask(subtask_id)
+        self.flm_merger.forget_failed(flm)
+
     def __final_flm_failure(self, error):
         logger.error("Cannot generate final flm: {}".format(error))
         # TODO What should we do in this sitution?
 
-    def __generate_final_flm_advanced_verification(self):
-        # the file containing result of task test
-        test_result_flm = self.__get_test_flm()
-
-        new_flm = self.output_file + ".flm"
-        shutil.copy(test_result_flm, new_flm)
-        logger.debug("Copying " + test_result_flm + " to " + new_flm)
-        self.__generate_final_file(new_flm)
-
-    def __get_test_flm(self):
-        return os.path.join(self.tmp_dir, "test_result.flm")
-
 
 class LuxRenderTaskBuilder(renderingtask.RenderingTaskBuilder):
     TASK_CLASS = LuxTask
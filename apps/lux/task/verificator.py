@@ -1,13 +1,12 @@
-from copy import deepcopy
 import logging
 import os
-import shutil
 import glob
 
-from golem.core.fileshelper import common_dir, find_file_with_ext, has_ext
-from golem.task.localcomputer import LocalComputer
+from golem.core.fileshelper import has_ext
 
-from apps.core.task.verificator import SubtaskVerificationState
+from apps.core.task.verificator import SubtaskVerificationState, \
+    verification_executor
+from apps.lux.task.flmmerger import is_flm_result_valid
 from apps.rendering.task.verificator import RenderingVerificator
 
 from apps.rendering.resources.ImgVerificator import \
@@ -18,28 +17,44 @@ from apps.rendering.resources.imgrepr import load_as_PILImgRepr
 logger = logging.getLogger("apps.lux")
 
 
-class LuxRenderVerificator(RenderingVerificator):
-    def __init__(self, *args, **kwargs):
-        super(LuxRenderVerificator, self).__init__(*args, **kwargs)
-        self.test_flm = None
-        self.merge_ctd = None
-        self.verification_error = False
+def verify_against_reference(ref_img_paths, img_paths, crop_window,
+                             output_format):
+    """ Compare result previews with reference renders of the crop window.
+    Run in a verification worker process.
+    :return list: SubtaskVerificationState of each preview
+    """
+    img_verificator = ImgVerificator()
+
+    cropped_ref_imgs = []
+    for ref_img_path in ref_img_paths:
+        ref_img = load_as_PILImgRepr(ref_img_path)
+        if output_format == "exr":
+            # exr comes already cropped
+            cropped_ref_img = ref_img
+        elif output_format == "png":
+            # crop manually
+            cropped_ref_img = \
+                img_verificator.crop_img_relative(ref_img, crop_window)
+        else:
+            raise TypeError("Unsupported output format: " + output_format)
+        cropped_ref_imgs.append(cropped_ref_img)
 
-    def _get_test_flm(self, task):
-        dm = task.dirManager
-        dir = os.path.join(
-                dm.get_ref_data_dir(
-                    task.header.task_id,
-                    counter='flmMergingTest'),
-                dm.tmp,
-                dm.output
-                )
+    # reference_stats are imgs rendered by requestor
+    reference_stats = ImgStatistics(cropped_ref_imgs[0], cropped_ref_imgs[1])
 
-        test_flm = glob.glob(os.path.join(dir, '*.flm'))
-        return test_flm.pop()
+    results = []
+    for img_path in img_paths:
+        cropped_img = img_verificator.crop_img_relative(
+            load_as_PILImgRepr(img_path), crop_window)
+        imgstat = ImgStatistics(cropped_ref_imgs[0], cropped_img)
+        results.append(img_verificator.is_valid_against_reference(
+            imgstat, reference_stats))
+    return results
 
-    def _get_reference_imgs(self, task):
-        ref_imgs = []
+
+class LuxRenderVerificator(RenderingVerificator):
+    def _get_reference_img_paths(self, task):
+        ref_img_paths = []
         dm = task.dirManager
 
         for i in range(0, task.reference_runs):
@@ -49,86 +64,52 @@ class LuxRenderVerificator(RenderingVerificator):
                 dm.output)
 
             f = glob.glob(os.path.join(dir, '*.' + task.output_format))
+            ref_img_paths.append(f.pop())
 
-            ref_img_pil = load_as_PILImgRepr(f.pop())
-            ref_imgs.append(ref_img_pil)
-
-        return ref_imgs
+        return ref_img_paths
 
     def _extract_tr_files(self, tr_files, task):
-        tr_preview_files = []
         tr_preview_paths = [os.path.normpath(f)
                             for f in tr_files
                             if has_ext(f, '.' + task.output_format)]
 
-        for f in tr_preview_paths:
-            ref_img_pil = load_as_PILImgRepr(f)
-            tr_preview_files.append(ref_img_pil)
-
         tr_flm_files = [os.path.normpath(f)
                         for f in tr_files if has_ext(f, '.flm')]
 
-        return tr_flm_files, tr_preview_files
+        return tr_flm_files, tr_preview_paths
 
     def _check_files(self, subtask_id, subtask_info, tr_files, task):
         # First, assume it is wrong ;p
         self.ver_states[subtask_id] = SubtaskVerificationState.WRONG_ANSWER
 
         try:
-            tr_flm_files, tr_preview_files = \
+            tr_flm_files, tr_preview_paths = \
                 self._extract_tr_files(tr_files, task)
 
+            # flm files are fully checked only when they are merged, the
+            # task delays the verdict until then; reject obviously broken
+            # ones here
+            if not tr_flm_files or not all(is_flm_result_valid(f, tr_files)
+                                           for f in tr_flm_files):
+                logger.info("Subtask %r has no valid flm file", subtask_id)
+                return
+
             # hack, advanced verification is enabled by default
             self.advanced_verification = True
             if self.advanced_verification:
-                self.test_flm = self._get_test_flm(task)
-
-                img_verificator = ImgVerificator()
-                ref_imgs = self._get_reference_imgs(task)
-
-                cropped_ref_imgs = []
-                for ref_img in ref_imgs:
-                    if task.output_format == "exr":
-                        # exr comes already cropped
-                        cropped_ref_img = ref_img
-                    elif task.output_format == "png":
-                        # crop manually
-                        cropped_ref_img = \
-                            img_verificator.crop_img_relative(
-                                ref_img,
-                                task.random_crop_window_for_verification)
-                    else:
-                        raise TypeError("Unsupported output format: "
-                                        + task.output_format)
-
-                    cropped_ref_imgs.append(cropped_ref_img)
-                    # cropped_ref_img.img.save('aaa'
-                    # + cropped_ref_img.get_name())
-
-                # reference_stats are imgs rendered by requestor
-                reference_stats = \
-                    ImgStatistics(cropped_ref_imgs[0], cropped_ref_imgs[1])
-
                 # GG todo render png from flm
-                for img, flm_file in zip(tr_preview_files, tr_flm_files):
-                    cropped_img = img_verificator.crop_img_relative(
-                        img, task.random_crop_window_for_verification)
-                    # cropped_img.img.save('aaa'
-                    # + cropped_img.get_name())
-                    imgstat = ImgStatistics(cropped_ref_imgs[0], cropped_img)
-
-                    is_valid_against_reference = \
-                        img_verificator.is_valid_against_reference(
-                            imgstat, reference_stats)
-
-                    is_flm_merging_validation_passed \
-                        = self.merge_flm_files(flm_file, task, self.test_flm)
-
+                results = verification_executor.run(
+                    verify_against_reference,
+                    self._get_reference_img_paths(task),
+                    tr_preview_paths[:len(tr_flm_files)],
+                    task.random_crop_window_for_verification,
+                    task.output_format)
+
+                for is_valid_against_reference in results:
                     if is_valid_against_reference == \
-                            SubtaskVerificationState.VERIFIED \
-                            and is_flm_merging_validation_passed:
-                                self.ver_states[subtask_id] = \
-                                    SubtaskVerificationState.VERIFIED
+                            SubtaskVerificationState.VERIFIED:
+                        self.ver_states[subtask_id] = \
+                            SubtaskVerificationState.VERIFIED
 
                     logger.info("Subtask "
                                 + str(subtask_id)
@@ -139,51 +120,3 @@ class LuxRenderVerificator(RenderingVerificator):
         except TypeError as e:
             logger.info("Exception during verification of subtask: "
                         + str(subtask_id) + " " + str(e))
-
-    def query_extra_data_for_advanced_verification(self, new_flm):
-        files = [os.path.basename(new_flm), os.path.basename(self.test_flm)]
-        merge_ctd = deepcopy(self.merge_ctd)
-        merge_ctd.extra_data['flm_files'] = files
-        return merge_ctd
-
-    def merge_flm_files(self, new_flm, task, output):
-        computer = LocalComputer(task, self.root_path, self.__verify_flm_ready,
-                                 self.__verify_flm_failure,
-                                 lambda:
-                                 self.query_extra_data_for_advanced_verification
-                                     (new_flm),
-                                 use_task_resources=False,
-                                 additional_resources=[self.test_flm, new_flm])
-        computer.run()
-        if computer.tt is not None:
-            computer.tt.join()
-        else:
-            return False
-        if self.verification_error:
-            return False
-        commonprefix = common_dir(computer.tt.result['data'])
-        flm = find_file_with_ext(commonprefix, [".flm"])
-        stderr = [x for x in computer.tt.result['data']
-                  if os.path.basename(x) == "stderr.log"]
-
-        if flm is None or len(stderr) == 0:
-            return False
-        else:
-            try:
-                with open(stderr[0]) as f:
-                    stderr_in = f.read()
-                if "ERROR" in stderr_in:
-                    return False
-            except (IOError, OSError):
-                return False
-
-            shutil.copy(flm, os.path.join(self.tmp_dir, "test_result.flm"))
-            return True
-
-    def __verify_flm_ready(self, results, time_spent):
-        logger.info("Advance verification finished")
-        self.verification_error = False
-
-    def __verify_flm_failure(self, error):
-        logger.info("Advance verification failure {}".format(error))
-        self.verification_error = True
@@ -2,12 +2,14 @@ from __future__ import division
 import logging
 import math
 
+from apps.rendering.resources.imgcompare import (calculate_arrays_mse,
+                                                 calculate_psnr,
+                                                 calculate_ssim,
+                                                 to_greyscale_array)
 from apps.rendering.resources.imgrepr import (ImgRepr, PILImgRepr)
 from apps.core.task.verificator \
     import SubtaskVerificationState as VerificationState
 
-from ssim import compute_ssim
-
 logger = logging.getLogger("apps.rendering")
 
 
@@ -20,11 +22,15 @@ class ImgStatistics(object):
             raise ValueError('base_img and img are of different sizes.')
 
         self.img = img
-        self.ssim = compute_ssim(base_img.to_pil(), self.img.to_pil())
+
+        base_grey = to_greyscale_array(base_img)
+        img_grey = to_greyscale_array(self.img)
+
+        self.ssim = calculate_ssim(base_grey, img_grey)
         self.mse, self.norm_mse = \
             self._calculate_color_normalized_mse(base_img, self.img)
         self.mse_bw, norm_mse_bw = \
-            self._calculate_greyscale_normalized_mse(base_img, self.img)
+            self._calculate_greyscale_normalized_mse(base_grey, img_grey)
         self.psnr = self._calculate_psnr(self.mse)
 
     @property
@@ -35,26 +41,10 @@ class ImgStatistics(object):
 
         return name
 
-    def _calculate_greyscale_normalized_mse(self, img1: ImgRepr, img2: ImgRepr):
-        (res_x, res_y) = img1.get_size()
-
-        img1_bw = img1.to_pil().convert('L')  # makes it greyscale
-        img2_bw = img2.to_pil().convert('L')  # makes it greyscale
+    def _calculate_greyscale_normalized_mse(self, grey1, grey2):
+        (res_y, res_x) = grey1.shape
 
-        import numpy
-        npimg1 = numpy.array(img1_bw)
-        npimg2 = numpy.array(img2_bw)
-
-        npimg1 = npimg1.astype(numpy.float32, copy=False)
-        npimg2 = npimg2.astype(numpy.float32, copy=False)
-
-        mse_bw = 0
-        for i in range(len(npimg1)):
-            for j in range(len(npimg1[0])):
-                mse_bw += (npimg1[i][j] - npimg2[i][j]) \
-                          * (npimg1[i][j] - npimg2[i][j])
-
-        mse_bw /= res_x * res_y
+        mse_bw = calculate_arrays_mse(grey1, grey2)
 
         # max value of pixel is 255
         max_possible_mse = res_x * res_y * 255
@@ -63,18 +53,9 @@ class ImgStatistics(object):
         return mse_bw, norm_mse
 
     def _calculate_color_normalized_mse(self, img1, img2):
-        mse = 0
         (res_x, res_y) = img1.get_size()
 
-        for i in range(0, res_x):
-            for j in range(0, res_y):
-                [r1, g1, b1] = img1.get_pixel((i, j))
-                [r2, g2, b2] = img2.get_pixel((i, j))
-                mse += (r1 - r2) * (r1 - r2) + \
-                       (g1 - g2) * (g1 - g2) + \
-                       (b1 - b2) * (b1 - b2)
-
-        mse /= res_x * res_y * 3
+        mse = calculate_arrays_mse(img1.to_array(), img2.to_array())
 
         # max value of pixel is 255
         max_possible_mse = res_x * res_y * 3 * 255
@@ -83,9 +64,7 @@ class ImgStatistics(object):
         return mse, norm_mse
 
     def _calculate_psnr(self, mse, max_=255):
-        if mse <= 0 or max_ <= 0:
-            raise ValueError("MSE & MAX_ must be higher than 0")
-        return 20 * math.log10(max_) - 10 * math.log10(mse)
+        return calculate_psnr(mse, max_)
 
     def get_stats(self):
         return self.ssim, self.mse, self.norm_mse, self.mse_bw, self.psnr
@@ -2,11 +2,17 @@ from __future__ import division
 import logging
 import math
 
+import numpy
+import scipy.ndimage
+
 from apps.rendering.resources.imgrepr import (EXRImgRepr, ImgRepr, load_img,
                                               PILImgRepr)
 logger = logging.getLogger("apps.rendering")
 
 PSNR_ACCEPTABLE_MIN = 30
+MSE_BAND_ROWS = 256
+SSIM_KERNEL_WIDTH = 11
+SSIM_KERNEL_SIGMA = 1.5
 
 
 def check_size(file_, res_x, res_y):
@@ -31,7 +37,6 @@ def calculate_mse(img1, img2, start1=(0, 0), start2=(0, 0), box=None):
     :param box: describes side lengths of the box
     :return:
     """
-    mse = 0
     if not isinstance(img1, ImgRepr) or not isinstance(img2, ImgRepr):
         raise TypeError("img1 and img2 must be ImgRepr")
 
@@ -45,19 +50,118 @@ def calculate_mse(img1, img2, start1=(0, 0), start2=(0, 0), box=None):
                  'img1 and img2 are of different sizes '
                  'and there is no cropping box provided.')
 
-    for i in range(0, res_x):
-        for j in range(0, res_y):
-            [r1, g1, b1] = img1.get_pixel((start1[0] + i, start1[1] + j))
-            [r2, g2, b2] = img2.get_pixel((start2[0] + i, start2[1] + j))
-            mse += (r1 - r2) * (r1 - r2) + \
-                   (g1 - g2) * (g1 - g2) + \
-                   (b1 - b2) * (b1 - b2)
-
     if res_x <= 0 or res_y <= 0:
         raise ValueError("Image or box resolution must be greater than 0")
 
-    mse /= res_x * res_y * 3
-    return mse
+    arr1 = crop_array(img1.to_array(), start1, (res_x, res_y))
+    arr2 = crop_array(img2.to_array(), start2, (res_x, res_y))
+    return calculate_arrays_mse(arr1, arr2)
+
+
+def crop_array(arr, start, box):
+    """ Return a view of the image array limited to the given box
+    :param numpy.ndarray arr: image data of shape (height, width[, channels])
+    :param start: (x, y) coordinates of the upper left corner of the box
+    :param box: (width, height) of the box
+    :return numpy.ndarray:
+    """
+    (x, y) = start
+    (res_x, res_y) = box
+    height, width = arr.shape[:2]
+    if x < 0 or y < 0 or x + res_x > width or y + res_y > height:
+        raise ValueError("Box {} starting at {} exceeds image of size {}"
+                         .format(box, start, (width, height)))
+    return arr[y:y + res_y, x:x + res_x]
+
+
+def calculate_arrays_mse(arr1, arr2):
+    """ Calculate mean squared error between two image arrays. Integer
+    arrays are compared exactly, floating point arrays in double precision.
+    Arrays are processed in bands of MSE_BAND_ROWS rows so the temporary
+    memory does not depend on the image height.
+    :param numpy.ndarray arr1:
+    :param numpy.ndarray arr2:
+    :return float:
+    """
+    if arr1.shape != arr2.shape:
+        raise ValueError("Arrays are of different shapes: {} and {}"
+                         .format(arr1.shape, arr2.shape))
+    if arr1.size == 0:
+        raise ValueError("Image or box resolution must be greater than 0")
+
+    if numpy.issubdtype(arr1.dtype, numpy.integer) \
+            and numpy.issubdtype(arr2.dtype, numpy.integer):
+        dtype = numpy.int64
+    else:
+        dtype = numpy.float64
+
+    total = dtype(0)
+    for row in range(0, arr1.shape[0], MSE_BAND_ROWS):
+        band = slice(row, row + MSE_BAND_ROWS)
+        diff = arr1[band].astype(dtype) - arr2[band].astype(dtype)
+        total += numpy.vdot(diff, diff)
+
+    return total.item() / arr1.size
+
+
+def to_greyscale_array(img):
+    """ Convert ImgRepr to 8-bit greyscale array with the same luma
+    transform that PIL uses for 'L' mode
+    :param ImgRepr img:
+    :return numpy.ndarray:
+    """
+    return numpy.asarray(img.to_pil().convert('L'))
+
+
+def get_gaussian_kernel(width=SSIM_KERNEL_WIDTH, sigma=SSIM_KERNEL_SIGMA):
+    kernel = numpy.arange(0, width, 1.)
+    kernel -= width / 2
+    kernel = numpy.exp(-0.5 * kernel ** 2 / sigma ** 2)
+    return kernel / numpy.sum(kernel)
+
+
+_GAUSSIAN_KERNEL = get_gaussian_kernel()
+
+
+def _convolve_gaussian_2d(arr, kernel):
+    result = scipy.ndimage.correlate1d(arr, kernel, axis=0)
+    return scipy.ndimage.correlate1d(result, kernel, axis=1)
+
+
+def calculate_ssim(grey1, grey2, max_=255, k_1=0.01, k_2=0.03,
+                   kernel=None):
+    """ Calculate structural similarity index of two greyscale arrays
+    with a gaussian window (same definition as pyssim's compute_ssim)
+    :param numpy.ndarray grey1:
+    :param numpy.ndarray grey2:
+    :param max_: maximum pixel value
+    :return float:
+    """
+    if grey1.shape != grey2.shape:
+        raise ValueError("Arrays are of different shapes: {} and {}"
+                         .format(grey1.shape, grey2.shape))
+    if kernel is None:
+        kernel = _GAUSSIAN_KERNEL
+
+    c_1 = (k_1 * max_) ** 2
+    c_2 = (k_2 * max_) ** 2
+
+    grey1 = grey1.astype(float)
+    grey2 = grey2.astype(float)
+
+    mu1 = _convolve_gaussian_2d(grey1, kernel)
+    mu2 = _convolve_gaussian_2d(grey2, kernel)
+    mu1_sq = mu1 ** 2
+    mu2_sq = mu2 ** 2
+    mu12 = mu1 * mu2
+
+    sigma1_sq = _convolve_gaussian_2d(grey1 ** 2, kernel) - mu1_sq
+    sigma2_sq = _convolve_gaussian_2d(grey2 ** 2, kernel) - mu2_sq
+    sigma12 = _convolve_gaussian_2d(grey1 * grey2, kernel) - mu12
+
+    num = (2 * mu12 + c_1) * (2 * sigma12 + c_2)
+    den = (mu1_sq + mu2_sq + c_1) * (sigma1_sq + sigma2_sq + c_2)
+    return numpy.average(num / den)
 
 
 def compare_imgs(img1, img2, max_col=255, start1=(0, 0),
@@ -4,6 +4,7 @@ import logging
 from copy import deepcopy
 import OpenEXR
 import Imath
+import numpy
 from PIL import Image
 
 logger = logging.getLogger("apps.rendering")
@@ -34,6 +35,11 @@ class ImgRepr(object, metaclass=abc.ABCMeta):
     def to_pil(self):
         return
 
+    @abc.abstractmethod
+    def to_array(self):
+        """ Return image data as numpy array of shape (height, width, 3) """
+        return
+
 
 class PILImgRepr(ImgRepr):
     def __init__(self):
@@ -77,6 +83,9 @@ class PILImgRepr(ImgRepr):
     def to_pil(self):
         return self.img
 
+    def to_array(self):
+        return numpy.asarray(self.img)
+
 
 class EXRImgRepr(ImgRepr):
     def __init__(self):
@@ -132,6 +141,9 @@ class EXRImgRepr(ImgRepr):
         rgb8 = [im.point(normalize_0_255).convert("L") for im in self.rgb]
         return Image.merge("RGB", rgb8)
 
+    def to_array(self):
+        return numpy.stack([numpy.asarray(c) for c in self.rgb], axis=-1)
+
     def to_l_image(self):
         img = self.to_pil()
         return img.convert('L')
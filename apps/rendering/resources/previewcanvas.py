@@ -0,0 +1,220 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+from threading import Lock, Timer
+
+import numpy
+from PIL import Image, ImageChops
+
+from apps.rendering.resources.imgrepr import EXRImgRepr, load_img
+
+logger = logging.getLogger("apps.rendering")
+
+FLUSH_INTERVAL = 2.0  # seconds
+
+
+class PreviewCanvas(object):
+    """ Preview image kept in memory. Chunks are pasted into the canvas in
+    place and the canvas is written to its file at most once per
+    flush_interval seconds. A flush requested earlier is delayed, so the
+    file always catches up with the last change.
+    """
+
+    def __init__(self, file_path, size, mode="RGB", file_format="PNG",
+                 flush_interval=FLUSH_INTERVAL):
+        """
+        :param str file_path: path of the preview file
+        :param tuple size: (width, height) of the preview
+        :param str mode: PIL mode of a new preview
+        :param str file_format: PIL format of the preview file
+        :param float flush_interval: minimal number of seconds between
+                                     writes of the file
+        """
+        self.file_path = file_path
+        self.size = size
+        self.mode = mode
+        self.file_format = file_format
+        self.flush_interval = flush_interval
+
+        self._img = None
+        self._dirty = False
+        self._last_flush = 0.0
+        self._timer = None
+        self._lock = Lock()
+
+    def __getstate__(self):
+        # Pickling doesn't write the file, the image is restored from what
+        # has been flushed to it
+        state = self.__dict__.copy()
+        state['_img'] = None
+        state['_dirty'] = False
+        state['_timer'] = None
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__ = state
+        self._lock = Lock()
+
+    @contextmanager
+    def edit(self):
+        """ Context manager giving the canvas image to modify in place """
+        with self._lock:
+            yield self._get_img()
+            self._dirty = True
+
+    def paste(self, img, box=None):
+        """ Paste image (or fill box with a color) like Image.paste does """
+        with self.edit() as canvas:
+            canvas.paste(img, box)
+
+    def add(self, img):
+        """ Add image of the same size to the canvas """
+        with self._lock:
+            self._img = ImageChops.add(self._get_img(), img)
+            self._dirty = True
+
+    def clear(self):
+        with self._lock:
+            self._img = Image.new(self.mode, self.size)
+            self._dirty = True
+
+    def copy(self):
+        with self._lock:
+            return self._get_img().copy()
+
+    def flush(self, force=False):
+        """ Write the canvas to its file if it has changed. Unless forced,
+        a write that comes too early is scheduled for later.
+        """
+        with self._lock:
+            self._get_img()
+            if not self._dirty:
+                return
+            delay = self._last_flush + self.flush_interval - time.time()
+            if delay > 0 and not force:
+                if self._timer is None:
+                    self._timer = Timer(delay, self._scheduled_flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            img = self._img.copy()
+            self._dirty = False
+            self._last_flush = time.time()
+
+        self._save(img)
+
+    def _scheduled_flush(self):
+        with self._lock:
+            self._timer = None
+        self.flush(force=True)
+
+    def _save(self, img):
+        tmp_path = self.file_path + ".tmp"
+        try:
+            img.save(tmp_path, self.file_format)
+            os.replace(tmp_path, self.file_path)
+        except (IOError, OSError) as err:
+            logger.error("Can't save preview %r: %s", self.file_path, err)
+        finally:
+            img.close()
+
+    def _get_img(self):
+        if self._img is None:
+            self._img = self._load()
+        return self._img
+
+    def _load(self):
+        if self.file_path and os.path.exists(self.file_path):
+            try:
+                with Image.open(self.file_path) as img:
+                    if img.size == self.size:
+                        return img.convert(self.mode)
+            except (IOError, OSError) as err:
+                logger.warning("Can't load preview %r: %s",
+                               self.file_path, err)
+        self._dirty = True
+        return Image.new(self.mode, self.size)
+
+
+class MeanPreviewCanvas(PreviewCanvas):
+    """ Preview showing the mean of the image files added to it. The sum of
+    the scaled images is kept, so a file can be added or removed without
+    reading the others again.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(MeanPreviewCanvas, self).__init__(*args, **kwargs)
+        self.files = []
+        self._sum = None
+
+    def __getstate__(self):
+        state = super(MeanPreviewCanvas, self).__getstate__()
+        # The sum is recomputed from the files when it is needed again
+        state['_sum'] = None
+        return state
+
+    def add_file(self, file_path):
+        """ Add image file to the mean, return False if it can't be read """
+        data = self._load_scaled(file_path)
+        if data is None:
+            return False
+        with self._lock:
+            self._restore_sum()
+            self._sum += data
+            self.files.append(file_path)
+            self._update_img()
+        return True
+
+    def remove_file(self, file_path):
+        """ Remove image file added before from the mean """
+        with self._lock:
+            if file_path not in self.files:
+                return
+            self._restore_sum()
+            self.files.remove(file_path)
+        data = self._load_scaled(file_path)
+        with self._lock:
+            if data is None:
+                self._sum = None
+                self._restore_sum()
+            else:
+                self._sum -= data
+            self._update_img()
+
+    def _restore_sum(self):
+        if self._sum is not None:
+            return
+        self._sum = numpy.zeros((self.size[1], self.size[0], 3))
+        for file_path in self.files:
+            data = self._load_scaled(file_path)
+            if data is not None:
+                self._sum += data
+
+    def _update_img(self):
+        if not self.files:
+            # Don't keep rounding errors of the removed images
+            self._sum[:] = 0.0
+            mean = self._sum
+        else:
+            mean = self._sum / len(self.files)
+        data = numpy.clip(mean, 0, 255).astype(numpy.uint8)
+        self._img = Image.fromarray(data, "RGB").convert(self.mode)
+        self._dirty = True
+
+    def _load_scaled(self, file_path):
+        img = load_img(file_path)
+        if img is None:
+            return None
+        if isinstance(img, EXRImgRepr):
+            scale = 255.0 / (img.max - img.min)
+            channels = [c.resize(self.size, resample=Image.BILINEAR)
+                        for c in img.rgb]
+            return numpy.stack([numpy.asarray(c) for c in channels],
+                               axis=-1) * scale
+        scaled = img.to_pil().resize(self.size, resample=Image.BILINEAR)
+        return numpy.asarray(scaled, dtype=numpy.float64)
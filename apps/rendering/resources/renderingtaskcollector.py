@@ -1,6 +1,5 @@
 
 import logging
-import math
 import os
 
 from PIL import Image, ImageChops
@@ -11,6 +10,14 @@ logger = logging.getLogger("apps.rendering")
 
 
 class RenderingTaskCollector(object):
+    """ Composites subtask results into the final image. Results are pasted
+    (or added) into a single canvas as they are added, so only the canvas
+    and one result are kept in memory and the image is ready as soon as the
+    last result comes. Parts added with add_part may come in any order, each
+    one is pasted when all parts above it are known. If the height of the
+    image isn't given, pasting waits for finalize(), which sizes the canvas
+    for all results at once.
+    """
     def __init__(self, paste=False, width=None, height=None):
 
         self.accepted_img_files = []
@@ -18,6 +25,28 @@ class RenderingTaskCollector(object):
         self.paste = paste
         self.width = width
         self.height = height
+        # part number -> image file of a part added before the ones above it
+        self.waiting_parts = {}
+
+        self._canvas = None
+        self._alpha = None
+        self._is_exr = None
+        self._offset = 0
+        self._offsets = []
+        self._composited_imgs = 0
+        self._composited_alphas = 0
+
+    def __getstate__(self):
+        # The canvas is composited again from the files when it's needed
+        state = self.__dict__.copy()
+        state['_canvas'] = None
+        state['_alpha'] = None
+        state['_is_exr'] = None
+        state['_offset'] = 0
+        state['_offsets'] = []
+        state['_composited_imgs'] = 0
+        state['_composited_alphas'] = 0
+        return state
 
     def add_img_file(self, img_file):
         """
@@ -26,6 +55,26 @@ class RenderingTaskCollector(object):
         """
         self.accepted_img_files.append(img_file)
 
+    def add_part(self, part, img_file):
+        """
+        Add result of a part of the image and composite it if it's possible.
+        Result of a part that has been added before replaces it.
+        :param int part: number of the part, counted from 1 from the top
+        :param str img_file: path to the file
+        """
+        index = part - 1
+        if index < len(self.accepted_img_files):
+            self.accepted_img_files[index] = img_file
+            if index < self._composited_imgs:
+                self._replace_img(index)
+        else:
+            self.waiting_parts[part] = img_file
+            next_part = len(self.accepted_img_files) + 1
+            while next_part in self.waiting_parts:
+                self.add_img_file(self.waiting_parts.pop(next_part))
+                next_part += 1
+        self.composite()
+
     def add_alpha_file(self, img_file):
         """
         Add file path to the image with alpha channel
@@ -33,6 +82,21 @@ class RenderingTaskCollector(object):
         """
         self.accepted_alpha_files.append(img_file)
 
+    def composite(self):
+        """
+        Composite files added since the last call into the final image
+        """
+        if self.paste and self.height is None:
+            return
+
+        pending = self.accepted_img_files[self._composited_imgs:]
+        for img_path in pending:
+            self._composite_img(img_path)
+            self._composited_imgs += 1
+
+        if self._is_exr:
+            self._composite_alpha()
+
     def finalize(self):
         """
         Connect all collected files and return final image
@@ -41,93 +105,107 @@ class RenderingTaskCollector(object):
         if len(self.accepted_img_files) == 0:
             return None
 
-        img_repr = load_img(self.accepted_img_files[0])
-        if isinstance(img_repr, EXRImgRepr):
-            final_img = self.finalize_exr(img_repr)
+        if self.paste:
+            self._fit_canvas()
+        self.composite()
+        final_img = self._canvas
+        if self._is_exr:
             self.finalize_alpha(final_img)
-        else:
-            final_img = self.finalize_pil()
         return final_img
 
     def finalize_alpha(self, final_img):
         """
-        Load collected alpha files, add them as chops and put to final image as an alpha channel
+        Add collected alpha files as chops and put them to final image as an alpha channel
         :param Image.Image final_img: image hat should have alpha channel added
         :return:
         """
-        if len(self.accepted_alpha_files) == 0:
-            return
+        self._composite_alpha()
+        if self._alpha is not None:
+            final_img.putalpha(self._alpha)
 
-        e = EXRImgRepr()
-        e.load_from_file(self.accepted_alpha_files[0])
-        final_alpha = e.to_l_image()
-
-        for img in self.accepted_alpha_files[1:]:
-            e = EXRImgRepr()
-            e.load_from_file(img)
-            l_im = e.to_l_image()
-            final_alpha = ImageChops.add(final_alpha, l_im)
-            l_im.close()
+    def _composite_img(self, img_path):
+        img = self._open_img(img_path)
+        try:
+            if not self.paste:
+                self._add_image(img)
+            else:
+                self._paste_image(img)
+        finally:
+            img.close()
 
-        final_img.putalpha(final_alpha)
-        final_alpha.close()
+    def _replace_img(self, index):
+        if not self.paste:
+            # A sum can't be undone, so everything is added again
+            self._canvas = None
+            self._composited_imgs = 0
+            return
+        img = self._open_img(self.accepted_img_files[index])
+        try:
+            self._canvas.paste(img, (0, self._offsets[index]))
+        finally:
+            img.close()
 
-    def finalize_exr(self, exr_repr):
+    def _open_img(self, img_path):
+        if self._is_exr is None:
+            _, ext = os.path.splitext(img_path)
+            self._is_exr = ext.upper() == ".EXR"
 
-        final_img = exr_repr.to_pil()
+        if self._is_exr:
+            return load_img(img_path).to_pil()
+        return Image.open(img_path)
 
-        if self.paste:
-            if not self.width or not self.height:
-                self.width, self.height = final_img.size
-                self.height *= len(self.accepted_img_files)
-            img = Image.new('RGB', (self.width, self.height))
-            final_img = self._paste_image(img, final_img, 0)
+    def _add_image(self, img):
+        if self._canvas is None:
+            self._canvas = img.copy()
+            self.width, self.height = img.size
+        else:
+            canvas = self._canvas
+            self._canvas = ImageChops.add(canvas, img)
+            canvas.close()
+
+    def _paste_image(self, img):
+        if self._canvas is None:
+            mode = 'RGB' if self._is_exr else "".join(img.getbands())
+            self.width = self.width or img.size[0]
+            self._canvas = Image.new(mode, (self.width, self.height))
+
+        self._canvas.paste(img, (0, self._offset))
+        self._offsets.append(self._offset)
+        self._offset += img.size[1]
+
+    def _fit_canvas(self):
+        """ Make the canvas high enough for all the files that haven't been
+        pasted yet, growing it at most once
+        """
+        sizes = []
+        for img_path in self.accepted_img_files[self._composited_imgs:]:
+            img = self._open_img(img_path)
+            sizes.append(img.size)
             img.close()
 
-        for i, img_path in enumerate(self.accepted_img_files[1:], start=1):
-            img = load_img(img_path)
-            rgb8_im = img.to_pil()
-            if not self.paste:
-                final_img = ImageChops.add(final_img, rgb8_im)
-            else:
-                final_img = self._paste_image(final_img, rgb8_im, i)
-                
-            rgb8_im.close()
+        height = self._offset + sum(size[1] for size in sizes)
+        if self.height is not None and height <= self.height:
+            return
 
-        return final_img
-        
-    def finalize_pil(self):
-        res_x, res_y = 0, 0
-
-        for name in self.accepted_img_files:
-            img = Image.open(name)
-            res_x, img_y = img.size
-            res_y += img_y
-            img.close()
-        
-        self.width = res_x
-        self.height = res_y
-        img = Image.open(self.accepted_img_files[0])
-        bands = img.getbands()
-        img.close()
-        band = ""
-        for b in bands:
-            band += b
-        final_img = Image.new(band, (res_x, res_y))
-        offset = 0
-        for img_path in self.accepted_img_files:
-            img = Image.open(img_path)
-            if not self.paste:
-                final_img = ImageChops.add(final_img, img)
+        self.width = self.width or max(size[0] for size in sizes)
+        self.height = height
+        if self._canvas is not None:
+            canvas = Image.new(self._canvas.mode, (self.width, self.height))
+            canvas.paste(self._canvas, (0, 0))
+            self._canvas.close()
+            self._canvas = canvas
+
+    def _composite_alpha(self):
+        pending = self.accepted_alpha_files[self._composited_alphas:]
+        for img_path in pending:
+            e = EXRImgRepr()
+            e.load_from_file(img_path)
+            l_im = e.to_l_image()
+            if self._alpha is None:
+                self._alpha = l_im
             else:
-                final_img.paste(img, (0, offset))
-                _, img_y = img.size
-                offset += img_y
-                img.close()
-        return final_img
-
-    def _paste_image(self, final_img, new_part, num):
-        img_offset = Image.new("RGB", (self.width, self.height))
-        offset = int(math.floor(num * float(self.height) / float(len(self.accepted_img_files))))
-        img_offset.paste(new_part, (0, offset))
-        return ImageChops.add(final_img, img_offset)
+                alpha = self._alpha
+                self._alpha = ImageChops.add(alpha, l_im)
+                alpha.close()
+                l_im.close()
+            self._composited_alphas += 1
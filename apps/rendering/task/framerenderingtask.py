@@ -6,7 +6,7 @@ import os
 from bisect import insort
 from collections import OrderedDict, defaultdict
 
-from PIL import Image, ImageChops
+from PIL import Image
 from copy import deepcopy
 
 from apps.core.task.coretask import CoreTask
@@ -48,6 +48,7 @@ class FrameState(object):
 class FrameRenderingTask(RenderingTask):
 
     VERIFICATOR_CLASS = FrameRenderingVerificator
+    COLLECTOR_CLASS = RenderingTaskCollector
 
     ################
     # Task methods #
@@ -72,6 +73,10 @@ class FrameRenderingTask(RenderingTask):
             self.frames_state[frame_key] = FrameState()
             self.frames_subtasks[frame_key] = [None] * parts
 
+        # None (the whole image) or frame key -> collector compositing
+        # results as they are accepted
+        self.collectors = {}
+
         if self.use_frames:
             self.preview_file_path = [None] * len(self.frames)
             self.preview_task_file_path = [None] * len(self.frames)
@@ -90,13 +95,22 @@ class FrameRenderingTask(RenderingTask):
             self._update_task_preview()
 
     @CoreTask.handle_key_error
-    def computation_finished(self, subtask_id, task_result, result_type=0):
-        super(FrameRenderingTask, self).computation_finished(subtask_id,
-                                                             task_result,
-                                                             result_type)
+    def computation_finished(self, subtask_id, task_result, result_type=0,
+                             verification_finished=None):
+        super(FrameRenderingTask, self).computation_finished(
+            subtask_id, task_result, result_type, verification_finished)
+
+    @CoreTask.handle_key_error
+    def _verification_finished(self, subtask_id, ver_state, result_files):
+        super(FrameRenderingTask, self)._verification_finished(
+            subtask_id, ver_state, result_files)
         if self.use_frames:
             self._update_subtask_frame_status(subtask_id)
 
+    def restart(self):
+        super(FrameRenderingTask, self).restart()
+        self.collectors = {}
+
     def restart_subtask(self, subtask_id):
         super(FrameRenderingTask, self).restart_subtask(subtask_id)
         self._update_subtask_frame_status(subtask_id)
@@ -178,18 +192,28 @@ class FrameRenderingTask(RenderingTask):
         num = self.frames.index(frame_num)
         preview_task_file_path = self._get_preview_task_file_path(num)
         img = load_as_pil(new_chunk_file_path)
+        if img is None:
+            logger.error("Can't add new chunk to preview %r",
+                         new_chunk_file_path)
+            return
 
-        if not final:
-            img = self._paste_new_chunk(img, self._get_preview_file_path(num), part,
-                                        int(self.total_tasks / len(self.frames)))
+        if final:
+            offset = 0
+        else:
+            parts = int(self.total_tasks / len(self.frames))
+            offset = int(math.floor((part - 1) * self.res_y *
+                                    self.scale_factor / parts))
 
         img_x, img_y = img.size
-        img = img.resize((int(round(self.scale_factor * img_x)),
-                          int(round(self.scale_factor * img_y))),
-                         resample=Image.BILINEAR)
-        img.save(self._get_preview_file_path(num), PREVIEW_EXT)
-        img.save(preview_task_file_path, PREVIEW_EXT)
-
+        scaled = img.resize((int(round(self.scale_factor * img_x)),
+                             int(round(self.scale_factor * img_y))),
+                            resample=Image.BILINEAR)
+        for path in [self._get_preview_file_path(num), preview_task_file_path]:
+            canvas = self._get_canvas(path)
+            canvas.paste(scaled, (0, offset))
+            canvas.flush(force=final)
+
+        scaled.close()
         img.close()
         self.last_preview_path = preview_task_file_path
 
@@ -228,50 +252,22 @@ class FrameRenderingTask(RenderingTask):
             state.status = TaskStatus.aborted
         # Otherwise, do not change frame's status.
 
-    def _paste_new_chunk(self, img_chunk, preview_file_path, chunk_num, all_chunks_num):
-        try:
-            img_offset = Image.new("RGB", (int(round(self.res_x * self.scale_factor)),
-                                           int(round(self.res_y * self.scale_factor))))
-            offset = math.floor((chunk_num - 1) * self.res_y * self.scale_factor / all_chunks_num)
-            offset = int(offset)
-            img_offset.paste(img_chunk, (0, offset))
-        except Exception as err:
-            logger.error("Can't generate preview {}".format(err))
-            img_offset = None
-
-        if not os.path.exists(preview_file_path):
-            return img_offset
-
-        try:
-            img = Image.open(preview_file_path)
-            if img_offset:
-                img = ImageChops.add(img, img_offset)
-            return img
-        except Exception as err:
-            logger.error("Can't add new chunk to preview{}".format(err))
-            return img_offset
-
     def _update_frame_task_preview(self):
         sent_color = (0, 255, 0)
         failed_color = (255, 0, 0)
+        marked = set()
 
         for sub in self.subtasks_given.values():
             if SubtaskStatus.is_computed(sub['status']):
                 for frame in sub['frames']:
-                    self.__mark_sub_frame(sub, frame, sent_color)
+                    marked.add(self.__mark_sub_frame(sub, frame, sent_color))
 
             if sub['status'] in [SubtaskStatus.failure, SubtaskStatus.restarted]:
                 for frame in sub['frames']:
-                    self.__mark_sub_frame(sub, frame, failed_color)
+                    marked.add(self.__mark_sub_frame(sub, frame, failed_color))
 
-    def _open_frame_preview(self, preview_file_path):
-
-        if not os.path.exists(preview_file_path):
-            img = Image.new("RGB", (int(round(self.res_x * self.scale_factor)), 
-                                    int(round(self.res_y * self.scale_factor))))
-            img.save(preview_file_path, PREVIEW_EXT)
-
-        return Image.open(preview_file_path)
+        for canvas in marked:
+            canvas.flush()
 
     def _mark_task_area(self, subtask, img_task, color, frame_index=0):
         if not self.use_frames:
@@ -289,9 +285,8 @@ class FrameRenderingTask(RenderingTask):
             upper_y = int(math.ceil(part_height) * ((subtask['start_task'] - 1) % parts))
             lower_y = int(math.floor(part_height) * ((subtask['start_task'] - 1) % parts + 1))
 
-        for i in range(lower_x, upper_x):
-            for j in range(upper_y, lower_y):
-                img_task.putpixel((i, j), color)
+        if lower_y > upper_y:
+            img_task.paste(color, (lower_x, upper_y, upper_x, lower_y))
 
     def _choose_frames(self, frames, start_task, total_tasks):
         if total_tasks <= len(frames):
@@ -307,10 +302,8 @@ class FrameRenderingTask(RenderingTask):
         output_file_name = self.output_file
         self.collected_file_names = OrderedDict(sorted(self.collected_file_names.items()))
         if not self._use_outer_task_collector():
-            collector = RenderingTaskCollector(paste=True, width=self.res_x, height=self.res_y)
-            for file in self.collected_file_names.values():
-                collector.add_img_file(file)
-            collector.finalize().save(output_file_name, self.output_format)
+            final_img = self._finalize_collector(None, self.collected_file_names)
+            final_img.save(output_file_name, self.output_format)
         else:
             self._put_collected_files_together(os.path.join(self.tmp_dir, output_file_name),
                                                list(self.collected_file_names.values()), "paste")
@@ -322,10 +315,8 @@ class FrameRenderingTask(RenderingTask):
         collected = self.frames_given[frame_key]
         collected = OrderedDict(sorted(collected.items()))
         if not self._use_outer_task_collector():
-            collector = RenderingTaskCollector(paste=True, width=self.res_x, height=self.res_y)
-            for file in collected.values():
-                collector.add_img_file(file)
-            collector.finalize().save(output_file_name, self.output_format)
+            final_img = self._finalize_collector(frame_key, collected)
+            final_img.save(output_file_name, self.output_format)
         else:
             self._put_collected_files_together(output_file_name, list(collected.values()), "paste")
 
@@ -333,8 +324,32 @@ class FrameRenderingTask(RenderingTask):
         self._update_frame_preview(output_file_name, frame_num, final=True)
         self._update_frame_task_preview()
 
+    def _get_collector(self, key):
+        collector = self.collectors.get(key)
+        if collector is None:
+            collector = self.COLLECTOR_CLASS(paste=True, width=self.res_x,
+                                             height=self.res_y)
+            self.collectors[key] = collector
+        return collector
+
+    def _finalize_collector(self, key, collected):
+        """ Return the image composited by the collector of the given key.
+        Results that weren't collected one by one, e.g. whole frames, are
+        composited now.
+        :param dict collected: result files ordered by part number
+        """
+        collector = self.collectors.pop(key, None)
+        if collector is None:
+            collector = self.COLLECTOR_CLASS(paste=True, width=self.res_x,
+                                             height=self.res_y)
+            for file in collected.values():
+                collector.add_img_file(file)
+        return collector.finalize()
+
     def _collect_image_part(self, num_start, tr_file):
         self.collected_file_names[num_start] = tr_file
+        if not self._use_outer_task_collector():
+            self._get_collector(None).add_part(num_start, tr_file)
         self._update_preview(tr_file, num_start)
         self._update_task_preview()
 
@@ -350,6 +365,8 @@ class FrameRenderingTask(RenderingTask):
         frame_key = str(frame_num)
         part = self._count_part(num_start, parts)
         self.frames_given[frame_key][part] = tr_file
+        if not self._use_outer_task_collector():
+            self._get_collector(frame_key).add_part(part, tr_file)
 
         self._update_frame_preview(tr_file, frame_num, part)
 
@@ -364,10 +381,10 @@ class FrameRenderingTask(RenderingTask):
 
     def __mark_sub_frame(self, sub, frame, color):
         idx = self.frames.index(frame)
-        preview_task_file_path = self._get_preview_task_file_path(idx)
-        img_task = self._open_frame_preview(preview_task_file_path)
-        self._mark_task_area(sub, img_task, color, idx)
-        img_task.save(preview_task_file_path, PREVIEW_EXT)
+        canvas = self._get_canvas(self._get_preview_task_file_path(idx))
+        with canvas.edit() as img_task:
+            self._mark_task_area(sub, img_task, color, idx)
+        return canvas
 
     def _get_subtask_file_path(self, subtask_dir_list, name_dir, num):
         if subtask_dir_list[num] is None:
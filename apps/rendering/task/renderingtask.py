@@ -5,11 +5,11 @@ import math
 import os
 from copy import deepcopy
 
-from PIL import Image, ImageChops
 from pathlib import Path
 
 from apps.core.task.coretask import CoreTask, CoreTaskBuilder
 from apps.rendering.resources.imgrepr import load_as_pil
+from apps.rendering.resources.previewcanvas import PreviewCanvas
 from apps.rendering.task.renderingtaskstate import RendererDefaults
 from apps.rendering.task.verificator import RenderingVerificator
 from golem.core.common import get_golem_path, timeout_to_deadline
@@ -31,6 +31,7 @@ logger = logging.getLogger("apps.rendering")
 class RenderingTask(CoreTask):
 
     VERIFICATOR_CLASS = RenderingVerificator
+    PREVIEW_CANVAS_CLASS = PreviewCanvas
 
     @classmethod
     def _get_task_collector_path(cls):
@@ -91,6 +92,8 @@ class RenderingTask(CoreTask):
         self.root_path = root_path
         self.preview_file_path = None
         self.preview_task_file_path = None
+        # preview file path -> PreviewCanvas kept in memory
+        self.preview_canvases = {}
 
         self.task_resources = deepcopy(list(task_resources))
 
@@ -156,9 +159,9 @@ class RenderingTask(CoreTask):
     def _update_preview(self, new_chunk_file_path, num_start):
         img = load_as_pil(new_chunk_file_path)
 
-        img_current = self._open_preview()
-        img_current = ImageChops.add(img_current, img)
-        img_current.save(self.preview_file_path, PREVIEW_EXT)
+        preview = self._get_preview_canvas()
+        preview.add(img)
+        preview.flush()
         img.close()
 
     @CoreTask.handle_key_error
@@ -166,9 +169,11 @@ class RenderingTask(CoreTask):
         empty_color = (0, 0, 0)
         if isinstance(self.preview_file_path, list):  # FIXME Add possibility to remove subtask from frame
             return
-        img = self._open_preview()
-        self._mark_task_area(self.subtasks_given[subtask_id], img, empty_color)
-        img.save(self.preview_file_path, PREVIEW_EXT)
+        preview = self._get_preview_canvas()
+        with preview.edit() as img:
+            self._mark_task_area(self.subtasks_given[subtask_id], img,
+                                 empty_color)
+        preview.flush()
 
     def _update_task_preview(self):
         sent_color = (0, 255, 0)
@@ -178,7 +183,7 @@ class RenderingTask(CoreTask):
         preview_task_file_path = "{}".format(os.path.join(self.tmp_dir,
                                                           preview_name))
 
-        img_task = self._open_preview()
+        img_task = self._get_preview_canvas().copy()
 
         for sub in self.subtasks_given.values():
             if SubtaskStatus.is_computed(sub['status']):
@@ -187,7 +192,10 @@ class RenderingTask(CoreTask):
                                  SubtaskStatus.restarted]:
                 self._mark_task_area(sub, img_task, failed_color)
 
-        img_task.save(preview_task_file_path, PREVIEW_EXT)
+        task_preview = self._get_canvas(preview_task_file_path)
+        task_preview.paste(img_task)
+        task_preview.flush()
+        img_task.close()
         self._update_preview_task_file_path(preview_task_file_path)
 
     def _update_preview_task_file_path(self, preview_task_file_path):
@@ -198,9 +206,8 @@ class RenderingTask(CoreTask):
         y = int(round(self.res_y * self.scale_factor))
         upper = max(0, int(math.floor(y / self.total_tasks * (subtask['start_task'] - 1))))
         lower = min(int(math.floor(y / self.total_tasks * (subtask['end_task']))), y)
-        for i in range(0, x):
-            for j in range(upper, lower):
-                img_task.putpixel((i, j), color)
+        if lower > upper:
+            img_task.paste(color, (0, upper, x, lower))
 
     def _put_collected_files_together(self, output_file_name, files, arg):
         task_collector_path = self._get_task_collector_path()
@@ -270,21 +277,38 @@ class RenderingTask(CoreTask):
         return "path_root: {path_root}, start_task: {start_task}, end_task: {end_task}, total_tasks: {total_tasks}, " \
                "outfilebasename: {outfilebasename}, scene_file: {scene_file}".format(**l)
 
-    def _open_preview(self, mode="RGB", ext=PREVIEW_EXT):
-        """ If preview file doesn't exist create a new empty one with given mode and extension.
+    def _get_preview_canvas(self, mode="RGB", ext=PREVIEW_EXT):
+        """ Return canvas of the task preview. If there is no preview yet
+        a new empty one with given mode and extension is created.
         Extension should be compatibile with selected mode. """
-        if self.preview_file_path is None or not os.path.exists(
-                self.preview_file_path):
+        if self.preview_file_path is None:
             preview_name = "current_preview.{}".format(ext)
             self.preview_file_path = "{}".format(os.path.join(self.tmp_dir,
                                                               preview_name))
-            img = Image.new(mode, (int(round(self.res_x * self.scale_factor)),
-                                   int(round(self.res_y * self.scale_factor))))
-            logger.debug('Saving new preview: %r', self.preview_file_path)
-            img.save(self.preview_file_path, ext)
-            img.close()
-
-        return Image.open(self.preview_file_path)
+        canvas = self.preview_canvases.get(self.preview_file_path)
+        if canvas is None:
+            canvas = self.PREVIEW_CANVAS_CLASS(self.preview_file_path,
+                                               self._get_preview_size(),
+                                               mode, ext)
+            self.preview_canvases[self.preview_file_path] = canvas
+        return canvas
+
+    def flush(self):
+        for canvas in self.preview_canvases.values():
+            canvas.flush(force=True)
+
+    def _get_canvas(self, file_path):
+        """ Return canvas of other preview file, e.g. task preview """
+        canvas = self.preview_canvases.get(file_path)
+        if canvas is None:
+            canvas = PreviewCanvas(file_path, self._get_preview_size(),
+                                   file_format=PREVIEW_EXT)
+            self.preview_canvases[file_path] = canvas
+        return canvas
+
+    def _get_preview_size(self):
+        return (int(round(self.res_x * self.scale_factor)),
+                int(round(self.res_y * self.scale_factor)))
 
     def _use_outer_task_collector(self):
         unsupported_formats = ['EXR', 'EPS']
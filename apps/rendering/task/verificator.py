@@ -5,18 +5,24 @@ import math
 import os
 import random
 import uuid
+from threading import Lock
 
 from golem.core.keysauth import get_random, get_random_float
 from golem.core.fileshelper import ensure_dir_exists, find_file_with_ext
 from golem.task.taskbase import ComputeTaskDef
 from golem.task.localcomputer import LocalComputer
 
-from apps.core.task.verificator import CoreVerificator, SubtaskVerificationState
+from apps.core.task.verificator import CoreVerificator, \
+    SubtaskVerificationState, verification_executor
 from apps.rendering.resources.imgcompare import advance_verify_img, check_size
 
 
 logger = logging.getLogger("apps.rendering")
 
+# LocalComputer reuses the same directories, so reference renders of results
+# verified in parallel can't run at the same time
+_local_computer_lock = Lock()
+
 
 class RenderingVerificator(CoreVerificator):
     def __init__(self, verification_options=None, advanced_verification=False):
@@ -29,6 +35,17 @@ class RenderingVerificator(CoreVerificator):
         self.root_path = ""
         self.verified_clients = list()
 
+    def snapshot(self):
+        snapshot = super(RenderingVerificator, self).snapshot()
+        snapshot.verified_clients = list(self.verified_clients)
+        return snapshot
+
+    def apply_snapshot(self, snapshot, subtask_id):
+        super(RenderingVerificator, self).apply_snapshot(snapshot, subtask_id)
+        self.verified_clients.extend(
+            node_id for node_id in snapshot.verified_clients
+            if node_id not in self.verified_clients)
+
     def _check_files(self, subtask_id, subtask_info, tr_files, task):
         if self._verify_imgs(subtask_id, subtask_info, tr_files, task):
             self.ver_states[subtask_id] = SubtaskVerificationState.VERIFIED
@@ -68,12 +85,12 @@ class RenderingVerificator(CoreVerificator):
         logger.debug('cmp_start_box {}'.format(cmp_start_box))
         res_x, res_y = self._get_part_size(subtask_info)
 
-        return advance_verify_img(img_file, res_x, res_y, start_box,
-                                  self.verification_options.box_size, cmp_file,
-                                  cmp_start_box)
+        return verification_executor.run(
+            advance_verify_img, img_file, res_x, res_y, start_box,
+            self.verification_options.box_size, cmp_file, cmp_start_box)
 
     def _check_size(self, file_, res_x, res_y):
-        return check_size(file_, res_x, res_y)
+        return verification_executor.run(check_size, file_, res_x, res_y)
 
     def _get_part_size(self, subtask_info):
         return self.res_x, self.res_y
@@ -129,11 +146,12 @@ class RenderingVerificator(CoreVerificator):
                                  self.query_extra_data_for_advanced_verification
                                      (extra_data),
                                  additional_resources=[])
-        computer.run()
         results = None
-        if computer.tt:
-            computer.tt.join()
-            results = computer.tt.result.get("data")
+        with _local_computer_lock:
+            computer.run()
+            if computer.tt:
+                computer.tt.join()
+                results = computer.tt.result.get("data")
         if results:
             commonprefix = os.path.commonprefix(results)
             img = find_file_with_ext(
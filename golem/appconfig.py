@@ -14,6 +14,9 @@ logger = logging.getLogger(__name__)
 MIN_DISK_SPACE = 1000 * 1024
 MIN_MEMORY_SIZE = 1000 * 1024
 MIN_CPU_CORES = 1
+# Minimal number of CPU cores per subtask when subtasks are computed
+# simultaneously
+MIN_SUBTASK_CPU_CORES = 4
 
 DEFAULT_HARDWARE_PRESET_NAME = "default"
 CUSTOM_HARDWARE_PRESET_NAME = "custom"
@@ -31,6 +34,7 @@ ESTIMATED_DEFAULT = 2220.0
 
 USE_IP6 = 0
 ACCEPT_TASKS = 1
+MAX_CONCURRENT_SUBTASKS = 0  # auto
 SEND_PINGS = 1
 
 PINGS_INTERVALS = 120
@@ -150,6 +154,7 @@ class AppConfig:
             send_pings=SEND_PINGS,
             # hardware
             hardware_preset_name=CUSTOM_HARDWARE_PRESET_NAME,
+            max_concurrent_subtasks=MAX_CONCURRENT_SUBTASKS,
             # price and trust
             min_price=MIN_PRICE,
             max_price=MAX_PRICE,
@@ -21,6 +21,7 @@ from golem.core.async import AsyncRequest, async_run
 from golem.core.common import to_unicode
 from golem.core.fileshelper import du
 from golem.core.hardware import HardwarePresets
+from golem.core.hashcache import file_hash_cache
 from golem.core.keysauth import EllipticalKeysAuth
 from golem.core.simpleenv import get_local_datadir
 from golem.core.simpleserializer import DictSerializer
@@ -113,6 +114,10 @@ class Client(HardwarePresetsMixin):
         # Initialize database
         self.db = Database(datadir)
 
+        # Digests of resource files are kept between runs
+        file_hash_cache.set_journal_path(
+            path.join(self.datadir, 'file_hashes.journal'))
+
         # Hardware configuration
         HardwarePresets.initialize(self.datadir)
         HardwarePresets.update_config(self.config_desc.hardware_preset_name,
@@ -384,6 +389,11 @@ class Client(HardwarePresetsMixin):
 
         dispatcher.send(signal='golem.monitor', event='shutdown')
 
+        if self.ranking:
+            self.ranking.flush()
+        if self.task_server:
+            self.task_server.task_manager.flush_tasks()
+            self.task_server.task_manager.flush_task_dumps(force=True)
         if self.db:
             self.db.close()
         self._unlock_datadir()
@@ -619,13 +629,15 @@ class Client(HardwarePresetsMixin):
     def get_task(self, task_id):
         return self.task_server.task_manager.get_task_dict(task_id)
 
-    def get_tasks(self, task_id=None):
+    def get_tasks(self, task_id=None, cursor=None, limit=None, status=None):
         if task_id:
             return self.task_server.task_manager.get_task_dict(task_id)
-        return self.task_server.task_manager.get_tasks_dict()
+        return self.task_server.task_manager.get_tasks_dict(
+            cursor=cursor, limit=limit, status=status)
 
-    def get_subtasks(self, task_id):
-        return self.task_server.task_manager.get_subtasks_dict(task_id)
+    def get_subtasks(self, task_id, cursor=None, limit=None, status=None):
+        return self.task_server.task_manager.get_subtasks_dict(
+            task_id, cursor=cursor, limit=limit, status=status)
 
     def get_subtasks_borders(self, task_id, part=1):
         return self.task_server.task_manager.get_subtasks_borders(task_id,
@@ -677,14 +689,17 @@ class Client(HardwarePresetsMixin):
                 returnValue((str(b), str(ab), str(d)))
         returnValue((None, None, None))
 
-    def get_payments_list(self):
+    def get_payments_list(self, cursor=None, limit=30, status=None):
         if self.use_transaction_system():
-            return self.transaction_system.get_payments_list()
+            return self.transaction_system.get_payments_list(
+                cursor=cursor, limit=limit, status=status)
         return ()
 
-    def get_incomes_list(self):
+    def get_incomes_list(self, cursor=None, limit=None, task=None,
+                         status=None):
         if self.use_transaction_system():
-            return self.transaction_system.get_incoming_payments()
+            return self.transaction_system.get_incoming_payments(
+                cursor=cursor, limit=limit, task=task, status=status)
         return []
 
     def get_task_cost(self, task_id):
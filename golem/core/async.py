@@ -1,5 +1,5 @@
 import logging
-from twisted.internet import threads
+from twisted.internet import reactor, threads
 
 log = logging.getLogger(__name__)
 
@@ -14,11 +14,19 @@ class AsyncRequest(object):
         self.kwargs = kwargs or {}
 
 
-def async_run(deferred_call, success=None, error=None):
-    """Execute a deferred job in a separate thread (Twisted)"""
-    deferred = threads.deferToThread(deferred_call.method,
-                                     *deferred_call.args,
-                                     **deferred_call.kwargs)
+def async_run(deferred_call, success=None, error=None, pool=None):
+    """Execute a deferred job in a separate thread (Twisted)
+    :param pool: thread pool to run the job in, instead of the reactor's one
+    """
+    if pool is None:
+        deferred = threads.deferToThread(deferred_call.method,
+                                         *deferred_call.args,
+                                         **deferred_call.kwargs)
+    else:
+        deferred = threads.deferToThreadPool(reactor, pool,
+                                             deferred_call.method,
+                                             *deferred_call.args,
+                                             **deferred_call.kwargs)
     if error is None:
         error = default_errback
     if success:
@@ -0,0 +1,138 @@
+import struct
+from threading import Lock
+
+from Crypto.Cipher import AES
+from Crypto.Hash import SHA256
+from Crypto.Protocol.KDF import HKDF
+from devp2p.crypto import ECCx
+
+CHANNEL_MARKER = b'\xc7\x02'
+NONCE_STRUCT = struct.Struct("!4xQ")
+TAG_SIZE = 16
+HEADER_SIZE = len(CHANNEL_MARKER) + NONCE_STRUCT.size
+KEY_INFO = b'golem-channel-v2'
+
+
+class ChannelDecryptionError(Exception):
+    pass
+
+
+def is_channel_frame(data):
+    """ Check whether given data looks like a frame produced by ChannelCipher
+    :param bytes data: data received from the peer
+    :return bool:
+    """
+    return len(data) >= HEADER_SIZE + TAG_SIZE and \
+        data[:len(CHANNEL_MARKER)] == CHANNEL_MARKER
+
+
+class ChannelHandshake(object):
+    """ Ephemeral key exchange that precedes a channel.
+
+    Each side generates a fresh key pair for the connection and announces
+    its public part in the (signed) Hello message. Once the local key was
+    sent and the peer's key was received, both sides can create the same
+    ChannelCipher. Keys never outlive the connection, so recorded traffic
+    can't be decrypted later and frames from other sessions don't verify.
+    """
+
+    def __init__(self):
+        self._ecc = ECCx()
+        self.public_key = self._ecc.raw_pubkey
+        self.remote_key = None
+        self.sent = False
+
+    @property
+    def completed(self):
+        return self.sent and self.remote_key is not None
+
+    def create_cipher(self, static_secret):
+        """ Create a cipher for the connection
+        :param bytes static_secret: secret derived from the node keys (ECDH),
+                                    binds the channel to the peer's identity
+        :return ChannelCipher:
+        """
+        ephemeral_secret = self._ecc.get_ecdh_key(self.remote_key)
+        return ChannelCipher(ephemeral_secret + static_secret,
+                             self.public_key, self.remote_key)
+
+
+class ChannelCipher(object):
+    """ Symmetric AES-GCM cipher for a single connection.
+
+    Direction keys are derived with HKDF from the secret shared with the
+    peer, salted with both ephemeral public keys, so they are unique for
+    every connection. Nonces are plain message counters.
+
+    Frame layout: marker | nonce (counter) | ciphertext | tag
+    """
+
+    def __init__(self, shared_secret, local_key, remote_key):
+        """
+        :param bytes shared_secret: secret shared with the peer
+        :param bytes local_key: ephemeral public key sent to the peer
+        :param bytes remote_key: ephemeral public key received from the peer
+        """
+        salt = SHA256.new(b''.join(sorted([local_key, remote_key]))).digest()
+        self._send_key = HKDF(shared_secret, 32, salt, SHA256,
+                              context=KEY_INFO + local_key)
+        self._send_counter = 0
+        self._send_lock = Lock()
+
+        self._recv_key = HKDF(shared_secret, 32, salt, SHA256,
+                              context=KEY_INFO + remote_key)
+        self._recv_counter = -1
+        self._recv_lock = Lock()
+
+    @property
+    def active(self):
+        """ True if the peer has already sent an authentic frame. From that
+        point on the peer encrypts everything with the channel.
+        """
+        return self._recv_counter >= 0
+
+    def encrypt(self, data):
+        """ Encrypt and authenticate given data
+        :param bytes data: data to encrypt
+        :return bytes: channel frame
+        """
+        with self._send_lock:
+            nonce = NONCE_STRUCT.pack(self._send_counter)
+            self._send_counter += 1
+
+        header = CHANNEL_MARKER + nonce
+        cipher = AES.new(self._send_key, AES.MODE_GCM, nonce=nonce,
+                         mac_len=TAG_SIZE)
+        cipher.update(header)
+        ciphertext, tag = cipher.encrypt_and_digest(data)
+        return header + ciphertext + tag
+
+    def decrypt(self, data):
+        """ Verify and decrypt a frame produced by the peer's ChannelCipher
+        :param bytes data: channel frame
+        :return bytes: decrypted data
+        :raise ChannelDecryptionError: if the frame is malformed, forged
+                                       or replayed
+        """
+        if not is_channel_frame(data):
+            raise ChannelDecryptionError("Not a channel frame")
+
+        nonce = data[len(CHANNEL_MARKER):HEADER_SIZE]
+        (counter,) = NONCE_STRUCT.unpack(nonce)
+
+        with self._recv_lock:
+            if counter <= self._recv_counter:
+                raise ChannelDecryptionError("Replayed channel frame")
+
+            cipher = AES.new(self._recv_key, AES.MODE_GCM, nonce=nonce,
+                             mac_len=TAG_SIZE)
+            cipher.update(data[:HEADER_SIZE])
+            try:
+                plaintext = cipher.decrypt_and_verify(
+                    data[HEADER_SIZE:-TAG_SIZE], data[-TAG_SIZE:])
+            except ValueError as err:
+                raise ChannelDecryptionError(str(err))
+
+            self._recv_counter = counter
+
+        return plaintext
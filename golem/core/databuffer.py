@@ -1,16 +1,34 @@
 import struct
-from golem.core.common import to_unicode
 
-from .variables import LONG_STANDARD_SIZE
+from .variables import LONG_STANDARD_SIZE
 
 MAX_BUFFER_SIZE = 2 * 1024 * 1024
+# Consumed bytes are dropped from the front of the buffer once they take
+# more than this many bytes and more than half of the allocated space
+COMPACT_THRESHOLD = 64 * 1024
+
+LONG_STRUCT = struct.Struct("!L")
 
 
 class DataBuffer:
-    """ Data buffer that helps with network communication. """
+    """ Data buffer that helps with network communication.
+
+    Data is kept in a single growable bytearray. Reads only move the read
+    offset forward and consumed space is reclaimed in bulk, so feeding the
+    buffer with many small chunks and reading many frames from it does not
+    copy the whole remaining content on every call.
+    """
     def __init__(self):
         """ Create new data buffer """
-        self.buffered_data = b""
+        self._buffer = bytearray()
+        self._offset = 0
+
+    @property
+    def buffered_data(self):
+        """ Unread data kept in the buffer
+        :return bytes:
+        """
+        return bytes(self._buffer[self._offset:])
 
     def append_ulong(self, num):
         """
@@ -19,8 +37,8 @@ class DataBuffer:
         """
         if num < 0:
             raise AttributeError("num must be grater than 0")
-        str_num_rep = struct.pack("!L", num)
-        self.buffered_data = b"".join([self.buffered_data, str_num_rep])
+        str_num_rep = LONG_STRUCT.pack(num)
+        self._buffer += str_num_rep
         return str_num_rep
 
     def append_string(self, data, check_size=True, overflow_prefix=None):
@@ -31,24 +49,24 @@ class DataBuffer:
         """
         new_size = self.data_size() + len(data)
         if check_size and new_size > MAX_BUFFER_SIZE:
-            self.buffered_data = b"".join([overflow_prefix or '', data])
-        else:
-            self.buffered_data = b"".join([self.buffered_data, data])
+            self._buffer = bytearray(overflow_prefix or b'')
+            self._offset = 0
+        self._buffer += data
 
     def data_size(self):
         """ Return size of data in buffer
         :return int: size of data in buffer
         """
-        return len(self.buffered_data)
+        return len(self._buffer) - self._offset
 
     def peek_ulong(self):
         """ Check long number that is located at the beginning of this data buffer
         :return long: number at the beginning of the buffer
         """
-        if len(self.buffered_data) < LONG_STANDARD_SIZE:
+        if self.data_size() < LONG_STANDARD_SIZE:
             raise ValueError("buffer_data is shorter than {}".format(LONG_STANDARD_SIZE))
 
-        (ret_val,) = struct.unpack("!L", self.buffered_data[0:LONG_STANDARD_SIZE])
+        (ret_val,) = LONG_STRUCT.unpack_from(self._buffer, self._offset)
         return ret_val
 
     def read_ulong(self):
@@ -56,7 +74,7 @@ class DataBuffer:
         :return long: long number removed from the beginning of buffer
         """
         val_ = self.peek_ulong()
-        self.buffered_data = self.buffered_data[4:]
+        self._consume(LONG_STANDARD_SIZE)
 
         return val_
 
@@ -65,11 +83,11 @@ class DataBuffer:
         :param long num_chars: how many chars should be read from buffer
         :return str: first <num_chars> chars from buffer
         """
-        if num_chars > len(self.buffered_data):
+        if num_chars > self.data_size():
             raise AttributeError("num_chars is grater than buffer length")
 
-        ret_str = self.buffered_data[:num_chars]
-        return ret_str
+        with memoryview(self._buffer) as view:
+            return view[self._offset:self._offset + num_chars].tobytes()
 
     def read_string(self, num_chars):
         """ Remove first <num_chars> chars from buffer and return them.
@@ -77,7 +95,7 @@ class DataBuffer:
         :return str: string removed form buffer
         """
         val_ = self.peek_string(num_chars)
-        self.buffered_data = self.buffered_data[num_chars:]
+        self._consume(num_chars)
 
         return val_
 
@@ -86,7 +104,7 @@ class DataBuffer:
         :return str: all data that was in the buffer.
         """
         ret_data = self.buffered_data
-        self.buffered_data = b""
+        self.clear_buffer()
 
         return ret_data
 
@@ -94,19 +112,15 @@ class DataBuffer:
         """ Read long number from the buffer and then read string with that length from the buffer
         :return str: first string from the buffer (after long)
         """
-        ret_str = None
-
-        if (self.data_size() > LONG_STANDARD_SIZE and
-                self.data_size() >= (self.peek_ulong() + LONG_STANDARD_SIZE)):
+        if self._has_len_prefixed_string():
             num_chars = self.read_ulong()
-            ret_str = self.read_string(num_chars)
+            return self.read_string(num_chars)
 
-        return ret_str
+        return None
 
     def get_len_prefixed_string(self):
         """Generator function that return from buffer strings preceded with their length (long) """
-        while (self.data_size() > LONG_STANDARD_SIZE and
-               self.data_size() >= (self.peek_ulong() + LONG_STANDARD_SIZE)):
+        while self._has_len_prefixed_string():
             num_chars = self.read_ulong()
             yield self.read_string(num_chars)
 
@@ -119,4 +133,20 @@ class DataBuffer:
 
     def clear_buffer(self):
         """ Remove all data from the buffer """
-        self.buffered_data = b""
+        self._buffer = bytearray()
+        self._offset = 0
+
+    def _has_len_prefixed_string(self):
+        size = self.data_size()
+        return (size > LONG_STANDARD_SIZE and
+                size >= self.peek_ulong() + LONG_STANDARD_SIZE)
+
+    def _consume(self, num_bytes):
+        self._offset += num_bytes
+
+        if self._offset == len(self._buffer):
+            self.clear_buffer()
+        elif self._offset > COMPACT_THRESHOLD and \
+                self._offset * 2 > len(self._buffer):
+            del self._buffer[:self._offset]
+            self._offset = 0
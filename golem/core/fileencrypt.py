@@ -1,5 +1,10 @@
 import abc
+import shutil
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from hashlib import sha256
+from multiprocessing import cpu_count
 from Crypto.Cipher import AES
 from Crypto import Random
 from Crypto.Random.random import StrongRandom
@@ -7,6 +12,27 @@ from threading import Lock
 
 from io import IOBase
 
+# Chunk header: flags, length of chunk data
+CHUNK_HEADER = struct.Struct("!BL")
+CHUNK_LAST = 1
+CHUNK_COMPRESSED = 2
+CHUNK_NONCE = struct.Struct("!Q")
+TAG_SIZE = 16
+NONCE_PREFIX_SIZE = 4
+COMPRESSION_SAMPLE_SIZE = 64 * 1024
+COMPRESSION_MIN_RATIO = 0.9
+
+_executor = None
+_executor_lock = Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(cpu_count(), 1))
+        return _executor
+
 
 class abstractclassmethod(classmethod):
 
@@ -56,10 +82,21 @@ class FileEncryptor(object, metaclass=abc.ABCMeta):
 
 
 class AESFileEncryptor(FileEncryptor):
+    """ Encrypts files with AES-GCM in independently authenticated chunks.
+
+    File layout: salt | chunk | chunk | ...
+    Chunk layout: flags | data length | data | tag
+
+    Each chunk is optionally compressed before encryption and uses its
+    index as the nonce, so chunks can be processed on several cores while
+    the file is streamed. The last chunk is flagged, which lets the reader
+    detect truncated files.
+    """
 
-    aes_mode = AES.MODE_CBC
+    aes_mode = AES.MODE_GCM
     block_size = AES.block_size
-    chunk_size = 1024
+    chunk_size = 1024 * 1024
+    compress_level = 1
     salt_prefix = b'salt_'
     salt_prefix_len = len(salt_prefix)
 
@@ -80,54 +117,240 @@ class AESFileEncryptor(FileEncryptor):
         return digest[:key_len], digest[key_len:total_len]
 
     @classmethod
-    def encrypt(cls, file_in, file_out, secret, key_len=32):
-
-        block_size = cls.block_size
-        salt = cls.gen_salt(block_size)
-        key, iv = cls.get_key_and_iv(secret, salt, key_len, block_size)
-        cipher = AES.new(key, cls.aes_mode, iv)
-
-        with FileHelper(file_in, 'rb') as src, FileHelper(file_out, 'wb') as dst:
-
-            dst.write(cls.salt_prefix + salt)
-
-            working = True
-            while working:
+    def writer(cls, dst, secret, key_len=32):
+        """ Return file-like object which encrypts data written to it
+        :param dst: file object to write the encrypted data to
+        :param bytes secret: secret to derive the key from
+        :param int key_len: AES key length
+        :return AESEncryptingWriter:
+        """
+        return AESEncryptingWriter(cls, dst, secret, key_len)
 
-                chunk = src.read(cls.chunk_size * block_size)
-                chunk_len = len(chunk)
-                chunk_len_mod = chunk_len % block_size
+    @classmethod
+    def reader(cls, src, secret, key_len=32):
+        """ Return file-like object which reads decrypted data
+        :param src: file object to read the encrypted data from
+        :param bytes secret: secret to derive the key from
+        :param int key_len: AES key length
+        :return AESDecryptingReader:
+        """
+        return AESDecryptingReader(cls, src, secret, key_len)
 
-                if chunk_len == 0 or chunk_len_mod != 0:
-                    pad_len = (block_size - chunk_len_mod) or block_size
-                    chunk += chr(pad_len).encode() * pad_len
-                    working = False
+    @classmethod
+    def encrypt(cls, file_in, file_out, secret, key_len=32):
 
-                dst.write(cipher.encrypt(chunk))
+        with FileHelper(file_in, 'rb') as src, \
+                FileHelper(file_out, 'wb') as dst, \
+                cls.writer(dst, secret, key_len) as writer:
+            shutil.copyfileobj(src, writer, cls.chunk_size)
 
     @classmethod
     def decrypt(cls, file_in, file_out, secret, key_len=32):
 
-        block_size = cls.block_size
-
-        with FileHelper(file_in, 'rb') as src, FileHelper(file_out, 'wb') as dst:
+        with FileHelper(file_in, 'rb') as src, \
+                FileHelper(file_out, 'wb') as dst, \
+                cls.reader(src, secret, key_len) as reader:
+            shutil.copyfileobj(reader, dst, cls.chunk_size)
+
+
+class _AESChunkCipher(object):
+
+    def __init__(self, encryptor_class, secret, salt, key_len):
+        self.chunk_size = encryptor_class.chunk_size
+        self.compress_level = encryptor_class.compress_level
+        self.aes_mode = encryptor_class.aes_mode
+        self.key, self.nonce_prefix = encryptor_class.get_key_and_iv(
+            secret, salt, key_len, NONCE_PREFIX_SIZE)
+
+    def seal(self, index, data, last):
+        flags = CHUNK_LAST if last else 0
+        if self.compress_level and self._compressible(data):
+            compressed = zlib.compress(data, self.compress_level)
+            if len(compressed) < len(data):
+                data = compressed
+                flags |= CHUNK_COMPRESSED
+
+        header = CHUNK_HEADER.pack(flags, len(data))
+        cipher = self._cipher(index)
+        cipher.update(header)
+        ciphertext, tag = cipher.encrypt_and_digest(data)
+        return header + ciphertext + tag
+
+    def open(self, index, header, data):
+        flags, _ = CHUNK_HEADER.unpack(header)
+        cipher = self._cipher(index)
+        cipher.update(header)
+        data = cipher.decrypt_and_verify(data[:-TAG_SIZE], data[-TAG_SIZE:])
+
+        if flags & CHUNK_COMPRESSED:
+            decompressor = zlib.decompressobj()
+            data = decompressor.decompress(data, self.chunk_size)
+            if decompressor.unconsumed_tail or not decompressor.eof:
+                raise ValueError("Invalid compressed chunk")
+        return data
+
+    def _compressible(self, data):
+        # Already compressed data (eg. PNG, EXR) is detected on a sample
+        sample = data[:COMPRESSION_SAMPLE_SIZE]
+        if not sample:
+            return False
+        compressed = zlib.compress(sample, self.compress_level)
+        return len(compressed) < COMPRESSION_MIN_RATIO * len(sample)
+
+    def _cipher(self, index):
+        nonce = self.nonce_prefix + CHUNK_NONCE.pack(index)
+        return AES.new(self.key, self.aes_mode, nonce=nonce,
+                       mac_len=TAG_SIZE)
+
+
+class AESEncryptingWriter(object):
+    """ Write-only file-like object; data written to it is encrypted with
+    AESFileEncryptor format and passed to the destination file """
+
+    def __init__(self, encryptor_class, dst, secret, key_len=32,
+                 workers=None):
+        self._dst = dst
+        salt = encryptor_class.gen_salt(encryptor_class.block_size)
+        self._cipher = _AESChunkCipher(encryptor_class, secret, salt,
+                                       key_len)
+        self._workers = workers or cpu_count()
+        self._buffer = bytearray()
+        self._pending = []
+        self._index = 0
+        self._written = 0
+        self.closed = False
+
+        dst.write(encryptor_class.salt_prefix + salt)
+
+    def write(self, data):
+        chunk_size = self._cipher.chunk_size
+        self._buffer += data
+        self._written += len(data)
+
+        while len(self._buffer) > chunk_size:
+            self._pending.append(bytes(self._buffer[:chunk_size]))
+            del self._buffer[:chunk_size]
+            if len(self._pending) >= self._workers:
+                self._seal_pending()
+        return len(data)
+
+    def tell(self):
+        return self._written
+
+    def writable(self):
+        return True
+
+    def flush(self):
+        self._dst.flush()
+
+    def close(self):
+        if self.closed:
+            return
+        self._pending.append(bytes(self._buffer))
+        self._buffer = bytearray()
+        self._seal_pending(last=True)
+        self._dst.flush()
+        self.closed = True
+
+    def _seal_pending(self, last=False):
+        chunks = self._pending
+        first_index = self._index
+        self._pending = []
+        self._index += len(chunks)
+
+        def seal(i):
+            return self._cipher.seal(first_index + i, chunks[i],
+                                     last and i == len(chunks) - 1)
+
+        if len(chunks) > 1:
+            sealed = _get_executor().map(seal, range(len(chunks)))
+        else:
+            sealed = map(seal, range(len(chunks)))
+        for data in sealed:
+            self._dst.write(data)
 
-            block = src.read(block_size)
-            salt = block[cls.salt_prefix_len:]
+    def __enter__(self):
+        return self
 
-            key, iv = cls.get_key_and_iv(secret, salt, key_len, block_size)
-            cipher = AES.new(key, cls.aes_mode, iv)
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+
+
+class AESDecryptingReader(object):
+    """ Read-only file-like object returning data decrypted from
+    the source file in AESFileEncryptor format. Raises ValueError when
+    the source is corrupted, truncated or the secret doesn't match """
+
+    def __init__(self, encryptor_class, src, secret, key_len=32,
+                 workers=None):
+        self._src = src
+        block = src.read(encryptor_class.block_size)
+        if len(block) != encryptor_class.block_size or \
+                not block.startswith(encryptor_class.salt_prefix):
+            raise ValueError("Invalid encrypted file header")
+        salt = block[encryptor_class.salt_prefix_len:]
+
+        self._cipher = _AESChunkCipher(encryptor_class, secret, salt,
+                                       key_len)
+        self._workers = workers or cpu_count()
+        self._buffer = bytearray()
+        self._index = 0
+        self._eof = False
+        self.closed = False
+
+    def read(self, size=-1):
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            self._read_chunks()
+
+        if size < 0 or size >= len(self._buffer):
+            data, self._buffer = bytes(self._buffer), bytearray()
+        else:
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+        return data
+
+    def readable(self):
+        return True
+
+    def close(self):
+        self.closed = True
+
+    def _read_chunks(self):
+        chunks = []
+        while len(chunks) < self._workers:
+            header = self._src.read(CHUNK_HEADER.size)
+            if len(header) != CHUNK_HEADER.size:
+                raise ValueError("Encrypted file is truncated")
+            flags, length = CHUNK_HEADER.unpack(header)
+            if length > self._cipher.chunk_size:
+                raise ValueError("Invalid encrypted chunk length")
+            data = self._src.read(length + TAG_SIZE)
+            if len(data) != length + TAG_SIZE:
+                raise ValueError("Encrypted file is truncated")
+            chunks.append((header, data))
+            if flags & CHUNK_LAST:
+                self._eof = True
+                break
+
+        first_index = self._index
+        self._index += len(chunks)
+
+        def open_chunk(i):
+            return self._cipher.open(first_index + i, *chunks[i])
+
+        if len(chunks) > 1:
+            opened = _get_executor().map(open_chunk, range(len(chunks)))
+        else:
+            opened = map(open_chunk, range(len(chunks)))
+        for data in opened:
+            self._buffer += data
 
-            working = True
-            next_chunk = bytes()
-            while working:
+        if self._eof and self._src.read(1):
+            raise ValueError("Unexpected data after the last chunk")
 
-                chunk = next_chunk
-                next_chunk = cipher.decrypt(src.read(cls.chunk_size *
-                                                     block_size))
-                if len(next_chunk) == 0:
-                    pad_len = chunk[-1]
-                    chunk = chunk[:-pad_len]
-                    working = False
+    def __enter__(self):
+        return self
 
-                dst.write(chunk)
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
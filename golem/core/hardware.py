@@ -7,6 +7,7 @@ from golem.appconfig import logger,\
     MIN_MEMORY_SIZE,\
     MIN_DISK_SPACE,\
     MIN_CPU_CORES,\
+    MIN_SUBTASK_CPU_CORES,\
     DEFAULT_HARDWARE_PRESET_NAME,\
     CUSTOM_HARDWARE_PRESET_NAME
 from golem.core.fileshelper import free_partition_space
@@ -34,6 +35,46 @@ def memory_available():
     return max(int(virtual_memory().total * 0.75) / 1024, MIN_MEMORY_SIZE)
 
 
+def partition_cpu_cores(cpu_cores, num_partitions):
+    """Splits CPU cores into disjoint sets of (nearly) equal size.
+    :param list cpu_cores: CPU cores to split
+    :param int num_partitions: number of sets to create
+    :return list: list of CPU core lists
+    """
+    num_partitions = max(min(num_partitions, len(cpu_cores)), 1)
+    size, remainder = divmod(len(cpu_cores), num_partitions)
+    partitions = []
+    start = 0
+    for i in range(num_partitions):
+        end = start + size + (1 if i < remainder else 0)
+        partitions.append(cpu_cores[start:end])
+        start = end
+    return partitions
+
+
+def compute_slots(num_cores, memory, max_slots=0):
+    """Partitions CPU cores and memory assigned for computations into slots,
+       each of which can run a single subtask. Slots get disjoint core sets
+       and an equal share of memory.
+    :param int num_cores: number of CPU cores assigned for computations
+    :param int memory: memory assigned for computations [kB]
+    :param int max_slots: maximum number of slots; 0 means one slot per
+                          MIN_SUBTASK_CPU_CORES cores
+    :return list: list of (CPU core list, memory [kB]) tuples
+    """
+    cpu_cores = cpu_cores_available()
+    cpu_cores = cpu_cores[:max(min(num_cores, len(cpu_cores)), MIN_CPU_CORES)]
+    memory = max(memory, MIN_MEMORY_SIZE)
+
+    if max_slots <= 0:
+        max_slots = len(cpu_cores) // MIN_SUBTASK_CPU_CORES
+    num_slots = max(min(max_slots, memory // MIN_MEMORY_SIZE), 1)
+
+    partitions = partition_cpu_cores(cpu_cores, num_slots)
+    slot_memory = memory // len(partitions)
+    return [(cores, slot_memory) for cores in partitions]
+
+
 class HardwarePresets(object):
 
     DEFAULT_NAME = DEFAULT_HARDWARE_PRESET_NAME
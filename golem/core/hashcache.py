@@ -0,0 +1,119 @@
+import hashlib
+import logging
+import os
+import time
+from threading import Lock
+
+from golem.core.journal import Journal
+
+logger = logging.getLogger(__name__)
+
+HASH_BLOCK_SIZE = 4 * 1024 * 1024
+
+# Digests of files modified that recently are not cached: a change made
+# within the same mtime tick would not be noticed otherwise
+MIN_FILE_AGE = 2.0
+
+
+def _file_stat(file_path):
+    st = os.stat(file_path)
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class FileHashCache(object):
+    """ Cache of file digests.
+
+    An entry is valid as long as the file's inode, size and modification
+    time are the same as when the digest was computed. Entries may be kept
+    in a journal, so they survive restarts.
+    """
+
+    def __init__(self, journal_path=None):
+        """
+        :param journal_path: path of the journal in which entries are kept;
+                             entries are kept in memory only if it's None
+        """
+        self._lock = Lock()
+        self._entries = {}  # (path, algorithm) -> (stat, digest)
+        self._journal = None
+        if journal_path:
+            self.set_journal_path(journal_path)
+
+    def set_journal_path(self, journal_path):
+        """ Keep entries in given journal and load those already saved
+        :param journal_path: path of the journal file
+        """
+        journal = Journal(journal_path)
+        try:
+            entries = journal.load()
+        except OSError:
+            logger.exception("Cannot load file hash cache %s", journal_path)
+            return
+
+        with self._lock:
+            self._journal = journal
+            self._entries.update(entries)
+            for key, value in list(self._entries.items()):
+                # Forget files that don't exist anymore
+                if not os.path.exists(key[0]):
+                    del self._entries[key]
+                    self._journal.delete(key)
+                else:
+                    self._journal.put(key, value)
+
+    def clear(self):
+        with self._lock:
+            if self._journal:
+                for key in self._entries:
+                    self._journal.delete(key)
+            self._entries.clear()
+
+    def digest(self, file_path, algorithm='sha1',
+               block_size=HASH_BLOCK_SIZE):
+        """ Return digest of given file's content, computing it only if the
+        file has changed since it was last hashed
+        :param str file_path: path of the file
+        :param str algorithm: name of hashlib algorithm
+        :param int block_size: size of blocks in which file is read
+        :return bytes: digest
+        """
+        file_path = os.path.abspath(file_path)
+        key = (file_path, algorithm)
+        stat = _file_stat(file_path)
+
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry and entry[0] == stat:
+            return entry[1]
+
+        digest = self._compute(file_path, algorithm, block_size)
+
+        # Don't cache if the file has changed in the meantime
+        if _file_stat(file_path) == stat and \
+                time.time() - stat[2] / 10 ** 9 >= MIN_FILE_AGE:
+            self._set(key, (stat, digest))
+        return digest
+
+    def _set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            if self._journal:
+                try:
+                    self._journal.put(key, entry)
+                except OSError:
+                    logger.warning("Cannot save file hash cache entry",
+                                   exc_info=True)
+
+    @staticmethod
+    def _compute(file_path, algorithm, block_size):
+        hsh = hashlib.new(algorithm)
+        with open(file_path, 'rb') as f:
+            while True:
+                data = f.read(block_size)
+                if not data:
+                    break
+                hsh.update(data)
+        return hsh.digest()
+
+
+file_hash_cache = FileHashCache()
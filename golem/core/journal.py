@@ -0,0 +1,190 @@
+import hashlib
+import logging
+import os
+import pickle
+import struct
+
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+RECORD_HEADER = struct.Struct("!L")
+PICKLE_PROTOCOL = 2
+
+# Journal is compacted when it's COMPACT_RATIO times bigger than its
+# live content and bigger than MIN_COMPACT_SIZE
+COMPACT_RATIO = 4
+MIN_COMPACT_SIZE = 1024 * 1024
+
+
+class Journal(object):
+    """ Append-only persistent key-value store.
+
+    Every change is appended to the file as a single pickled (key, value)
+    record, so the cost of saving a change is proportional to the size of
+    the changed value, not the whole store. A record with None value
+    removes the key. Values equal to the ones already saved are not
+    written again. When the file grows well beyond its live content it's
+    compacted, i.e. rewritten with the latest record of each key only.
+    """
+
+    def __init__(self, path, compact_ratio=COMPACT_RATIO,
+                 min_compact_size=MIN_COMPACT_SIZE):
+        """
+        :param path: path of the journal file
+        :param int compact_ratio: compact the file when it's that many times
+                                  bigger than its live content
+        :param int min_compact_size: don't compact files smaller than this
+        """
+        self.path = Path(path)
+        self.compact_ratio = compact_ratio
+        self.min_compact_size = min_compact_size
+
+        self._records = {}  # key -> (offset, size) of the latest record
+        self._digests = {}  # key -> digest of the latest record
+        self._unreadable = []  # (offset, size) of records that can't be loaded
+        self._live_size = 0
+        self._file_size = 0
+        self._loaded = False
+
+    def load(self):
+        """ Read the journal and return current values. A truncated tail of
+        the file (eg. a record that was being written when the process was
+        killed) is discarded. Records that can't be unpickled (eg. after a
+        class was renamed) are skipped, but kept in the file.
+        :return dict: key -> value
+        """
+        values = {}
+        self._records.clear()
+        self._digests.clear()
+        self._unreadable = []
+        self._live_size = 0
+        self._file_size = 0
+        self._loaded = True
+
+        if not self.path.exists():
+            return values
+
+        with self.path.open('rb') as f:
+            data = f.read()
+
+        offset = 0
+        while offset < len(data):
+            start = end = offset + RECORD_HEADER.size
+            if start <= len(data):
+                (length,) = RECORD_HEADER.unpack_from(data, offset)
+                end = start + length
+            if start > len(data) or end > len(data):
+                logger.warning("Discarding truncated journal %s tail at %r",
+                               self.path, offset)
+                with self.path.open('r+b') as f:
+                    f.truncate(offset)
+                break
+
+            record = data[start:end]
+            try:
+                key, value = pickle.loads(record)
+            except Exception as exc:
+                logger.warning("Skipping unreadable journal %s record at %r: "
+                               "%r", self.path, offset, exc)
+                self._unreadable.append((offset, end - offset))
+                self._live_size += end - offset
+                offset = end
+                continue
+
+            if value is None:
+                values.pop(key, None)
+            else:
+                values[key] = value
+            self._update_index(key, value is None, offset, end - offset,
+                               hashlib.sha1(record).digest())
+            offset = end
+
+        self._file_size = offset
+        self.compact_if_needed()
+        return values
+
+    def put(self, key, value):
+        """ Save value for given key
+        :param key: picklable key
+        :param value: picklable value; None removes the key
+        :return bool: True if a record was written, False if value hasn't
+                      changed since it was last saved
+        """
+        if not self._loaded:
+            # Index records that are already in the file
+            self.load()
+
+        record = pickle.dumps((key, value), PICKLE_PROTOCOL)
+        digest = hashlib.sha1(record).digest()
+        if value is None and key not in self._records:
+            return False
+        if self._digests.get(key) == digest:
+            return False
+
+        size = RECORD_HEADER.size + len(record)
+        with self.path.open('ab') as f:
+            f.write(RECORD_HEADER.pack(len(record)))
+            f.write(record)
+
+        self._update_index(key, value is None, self._file_size, size, digest)
+        self._file_size += size
+        self.compact_if_needed()
+        return True
+
+    def delete(self, key):
+        """ Remove given key from the store
+        :param key: key to remove
+        """
+        self.put(key, None)
+
+    def keys(self):
+        if not self._loaded:
+            self.load()
+        return list(self._records.keys())
+
+    def compact_if_needed(self):
+        if self._file_size > self.min_compact_size and \
+                self._file_size > self.compact_ratio * self._live_size:
+            self.compact()
+
+    def compact(self):
+        """ Rewrite the journal keeping only the latest record of each key """
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        records = {}
+        unreadable = []
+        offset = 0
+
+        with self.path.open('rb') as src, tmp_path.open('wb') as dst:
+            # Unreadable records are kept before the live ones, so they can't
+            # shadow newer values of their keys
+            for src_offset, size in self._unreadable:
+                src.seek(src_offset)
+                dst.write(src.read(size))
+                unreadable.append((offset, size))
+                offset += size
+            for key, (src_offset, size) in self._records.items():
+                src.seek(src_offset)
+                dst.write(src.read(size))
+                records[key] = (offset, size)
+                offset += size
+            dst.flush()
+            os.fsync(dst.fileno())
+
+        os.replace(str(tmp_path), str(self.path))
+        logger.debug("Journal %s compacted: %r -> %r bytes", self.path,
+                     self._file_size, offset)
+        self._records = records
+        self._unreadable = unreadable
+        self._file_size = offset
+
+    def _update_index(self, key, removed, offset, size, digest):
+        if key in self._records:
+            self._live_size -= self._records[key][1]
+        if removed:
+            self._records.pop(key, None)
+            self._digests.pop(key, None)
+        else:
+            self._records[key] = (offset, size)
+            self._digests[key] = digest
+            self._live_size += size
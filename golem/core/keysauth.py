@@ -3,7 +3,9 @@ import logging
 import os
 from _pysha3 import sha3_256 as _sha3_256
 from abc import abstractmethod
+from collections import OrderedDict
 from hashlib import sha256
+from threading import Lock
 
 import bitcoin
 from Crypto.Cipher import PKCS1_OAEP
@@ -43,6 +45,76 @@ def privtopub(raw_privkey):
     return raw_pubkey
 
 
+class SignatureVerifier(object):
+    """ Verifies ECDSA signatures. Parsed public keys of recently seen peers
+    are kept, so they don't have to be decoded on every call, and signatures
+    that have already been verified successfully may be remembered.
+    """
+
+    def __init__(self, max_keys=1024, max_signatures=8192):
+        """
+        :param int max_keys: how many parsed public keys should be kept
+        :param int max_signatures: how many verified signatures should be
+                                   remembered
+        """
+        self.max_keys = max_keys
+        self.max_signatures = max_signatures
+        self._lock = Lock()
+        self._keys = OrderedDict()  # raw public key -> ECCx
+        self._verified = OrderedDict()  # (public key, digest, sig) -> None
+
+    def get_ecc(self, public_key):
+        """ Return ECCx object for given public key
+        :param bytes public_key: raw public key (len == 64)
+        :return ECCx:
+        """
+        with self._lock:
+            ecc = self._keys.get(public_key)
+            if ecc is not None:
+                self._keys.move_to_end(public_key)
+                return ecc
+
+        ecc = ECCx(public_key)
+        with self._lock:
+            self._keys[public_key] = ecc
+            if len(self._keys) > self.max_keys:
+                self._keys.popitem(last=False)
+        return ecc
+
+    def verify(self, sig, digest, public_key, memoize=False):
+        """ Verify ECDSA signature of given digest
+        :param bytes sig: ECDSA signature
+        :param bytes digest: digest of signed data
+        :param bytes public_key: raw public key (len == 64)
+        :param bool memoize: *Default: False* if True, a successful result is
+        remembered and given signature won't be checked again
+        :return bool: verification result
+        """
+        entry = (public_key, digest, sig)
+        if memoize:
+            with self._lock:
+                if entry in self._verified:
+                    self._verified.move_to_end(entry)
+                    return True
+
+        result = self.get_ecc(public_key).verify(sig, digest)
+
+        if result and memoize:
+            with self._lock:
+                self._verified[entry] = None
+                if len(self._verified) > self.max_signatures:
+                    self._verified.popitem(last=False)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+            self._verified.clear()
+
+
+signature_verifier = SignatureVerifier()
+
+
 def get_random(min_value=0, max_value=None):
     """
     Get cryptographically secure random integer in range
@@ -135,6 +207,14 @@ class KeysAuth(object):
         :return str: decrypted data
         """
 
+    def get_ecdh_key(self, public_key):
+        """ Compute secret shared with the owner of given public key
+        :param public_key: public key of the other party
+        :return None|bytes: shared secret or None if key agreement is not
+                            supported by this keys authorization manager
+        """
+        return None
+
     @abstractmethod
     def sign(self, data):
         """ Sign given data with default private key
@@ -142,13 +222,15 @@ class KeysAuth(object):
         :return: signed data
         """
 
-    def verify(self, sig, data, public_key=None):
+    def verify(self, sig, data, public_key=None, memoize=False):
         """
         Verify signature
         :param str sig: signed data
         :param str data: data before signing
         :param public_key: *Default: None* public key that should be used to verify signed data. If public key is None
         then default public key will be used
+        :param bool memoize: *Default: False* remember successful verification, so the same signature won't be checked
+        again. Useful for data that is received repeatedly.
         :return bool: verification result
         """
         return sig == data
@@ -258,13 +340,14 @@ class RSAKeysAuth(KeysAuth):
             return scheme.sign(SHA256.new(data))
         raise RuntimeError("Cannot sign data")
 
-    def verify(self, sig, data, public_key=None):
+    def verify(self, sig, data, public_key=None, memoize=False):
         """
         Verify the validity of an RSA signature
         :param str sig: RSA signature
         :param str data: expected data
         :param None|_RSAobj public_key: *Default: None* public key that should be used to verify signed data.
             If public key is None then default public key will be used
+        :param bool memoize: ignored, RSA signatures are always checked
         :return bool: verification result
         """
         if public_key is None:
@@ -439,6 +522,17 @@ class EllipticalKeysAuth(KeysAuth):
         """
         return self.ecc.ecies_decrypt(data)
 
+    def get_ecdh_key(self, public_key):
+        """ Compute 256 bit secret shared with the owner of given public key
+        (ECDH). Public key may be in digest (len == 64) or hexdigest
+        (len == 128).
+        :param str public_key: public key of the other party
+        :return bytes: shared secret
+        """
+        if len(public_key) == 128:
+            public_key = decode_hex(public_key)
+        return self.ecc.get_ecdh_key(public_key)
+
     def sign(self, data):
         """ Sign given data with ECDSA
         sha3 is used to shorten the data and speedup calculations
@@ -447,7 +541,7 @@ class EllipticalKeysAuth(KeysAuth):
         """
         return self.ecc.sign(sha3(data))
 
-    def verify(self, sig, data, public_key=None):
+    def verify(self, sig, data, public_key=None, memoize=False):
         """
         Verify the validity of an ECDSA signature
         sha3 is used to shorten the data and speedup calculations
@@ -456,6 +550,8 @@ class EllipticalKeysAuth(KeysAuth):
         :param None|str public_key: *Default: None* public key that should be used to verify signed data.
         Public key may be in digest (len == 64) or hexdigest (len == 128).
         If public key is None then default public key will be used.
+        :param bool memoize: *Default: False* remember successful verification, so the same signature won't be checked
+        again
         :return bool: verification result
         """
 
@@ -464,8 +560,8 @@ class EllipticalKeysAuth(KeysAuth):
                 public_key = self.public_key
             if len(public_key) == 128:
                 public_key = decode_hex(public_key)
-            ecc = ECCx(public_key)
-            return ecc.verify(sig, sha3(data))
+            return signature_verifier.verify(sig, sha3(data), public_key,
+                                             memoize=memoize)
         except AssertionError:
             logger.info("Wrong key format")
         except Exception as exc:
@@ -2,7 +2,10 @@ import atexit
 import logging
 import os
 import posixpath
+import shutil
+import tempfile
 import threading
+import time
 from os import path
 
 import docker.errors
@@ -10,7 +13,7 @@ import docker.errors
 from golem.core.common import is_windows, nt_path_to_posix_path, is_osx
 from .client import local_client
 
-__all__ = ['DockerJob']
+__all__ = ['DockerJob', 'ContainerPool', 'container_pool']
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +23,126 @@ The logger used for logging std streams of the process running in container.
 container_logger = logging.getLogger(__name__ + ".container")
 
 
+class PooledContainer(object):
+
+    def __init__(self, key, work_dir, output_dir):
+        """
+        :param key: key of the job configuration the container was created
+                    for
+        :param str work_dir: host directory mounted as container's work dir
+        :param str output_dir: host directory mounted as container's output
+                               dir
+        """
+        self.key = key
+        self.work_dir = work_dir
+        self.output_dir = output_dir
+        self.container_id = None
+        self.last_used = time.time()
+
+    def dirs_exist(self):
+        return path.isdir(self.work_dir) and path.isdir(self.output_dir)
+
+
+class ContainerPool(object):
+    """ Keeps containers of finished jobs, so a job with the same image,
+    resources and host config can start one of them again instead of
+    creating and removing a new container. Pooled containers have their own
+    work and output directories; the job's files are moved in and out of
+    them. """
+
+    MAX_IDLE_CONTAINERS = 4
+    IDLE_TIMEOUT = 300  # s
+
+    def __init__(self, max_idle=MAX_IDLE_CONTAINERS,
+                 idle_timeout=IDLE_TIMEOUT):
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self._idle = []  # least recently used first
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        """ Take an idle container created for given key from the pool
+        :param key: job configuration key
+        :return PooledContainer|None:
+        """
+        found = None
+        with self._lock:
+            expired = self._pop_expired()
+            # Directories of a task are removed with the task
+            expired += [p for p in self._idle if not p.dirs_exist()]
+            self._idle = [p for p in self._idle if p not in expired]
+            for pooled in reversed(self._idle):
+                if pooled.key == key:
+                    found = pooled
+                    self._idle.remove(pooled)
+                    break
+        self._remove(expired)
+        return found
+
+    @staticmethod
+    def new_container(key, parent_dir):
+        """ Prepare directories for a new pooled container
+        :param key: job configuration key
+        :param str parent_dir: directory in which container's work and output
+                               directories should be created
+        :return PooledContainer:
+        """
+        slot_dir = tempfile.mkdtemp(prefix="container-", dir=parent_dir)
+        work_dir = path.join(slot_dir, "work")
+        output_dir = path.join(slot_dir, "output")
+        os.mkdir(work_dir)
+        os.mkdir(output_dir)
+        return PooledContainer(key, work_dir, output_dir)
+
+    def release(self, pooled):
+        """ Return a container of a finished job to the pool
+        :param PooledContainer pooled: container to return
+        """
+        pooled.last_used = time.time()
+        with self._lock:
+            self._idle.append(pooled)
+            expired = self._pop_expired()
+            excess = len(self._idle) - self.max_idle
+            if excess > 0:
+                expired += self._idle[:excess]
+                del self._idle[:excess]
+        self._remove(expired)
+
+    def discard(self, pooled):
+        """ Remove a container which shouldn't be used again """
+        self._remove([pooled])
+
+    def clear(self):
+        """ Remove all idle containers """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        self._remove(idle)
+
+    def _pop_expired(self):
+        deadline = time.time() - self.idle_timeout
+        expired = [p for p in self._idle if p.last_used < deadline]
+        self._idle = [p for p in self._idle if p.last_used >= deadline]
+        return expired
+
+    @staticmethod
+    def _remove(containers):
+        for pooled in containers:
+            if pooled.container_id:
+                try:
+                    local_client().remove_container(pooled.container_id,
+                                                    force=True)
+                    logger.debug("Container {} removed"
+                                 .format(pooled.container_id))
+                except Exception as exc:
+                    logger.debug("Cannot remove container {}: {}"
+                                 .format(pooled.container_id, exc))
+            shutil.rmtree(path.dirname(pooled.work_dir), ignore_errors=True)
+
+
+container_pool = ContainerPool()
+atexit.register(container_pool.clear)
+
+
 class DockerJob(object):
 
     STATE_NEW = "new"
@@ -52,7 +175,7 @@ class DockerJob(object):
 
     def __init__(self, image, script_src, parameters,
                  resources_dir, work_dir, output_dir,
-                 host_config=None, container_log_level=None):
+                 host_config=None, container_log_level=None, pool=None):
         """
         :param DockerImage image: Docker image to use
         :param str script_src: source of the task script file
@@ -60,6 +183,8 @@ class DockerJob(object):
         :param str resources_dir: directory with task resources
         :param str work_dir: directory for temporary work files
         :param str output_dir: directory for output files
+        :param ContainerPool pool: pool to take the container from and return
+                                   it to when the job is finished
         """
         from golem.docker.image import DockerImage
         if not isinstance(image, DockerImage):
@@ -82,6 +207,11 @@ class DockerJob(object):
         self.container_log = None
         self.state = self.STATE_NEW
 
+        self.pool = pool
+        self.pooled = None
+        self.start_time = None
+        self.killed = False
+
         if container_log_level is None:
             container_log_level = container_logger.getEffectiveLevel()
         self.log_std_streams = 0 < container_log_level <= logging.DEBUG
@@ -92,6 +222,20 @@ class DockerJob(object):
         self.resources_dir_mod = self._host_dir_chmod(self.resources_dir, "rw")
         self.output_dir_mod = self._host_dir_chmod(self.output_dir, "rw")
 
+        if self.pool:
+            pool_key = self._get_pool_key()
+            self.pooled = self.pool.acquire(pool_key)
+            if self.pooled:
+                self.container = {"Id": self.pooled.container_id}
+                self.container_id = self.pooled.container_id
+            else:
+                # Create container's dirs next to the job's directory
+                parent_dir = path.dirname(path.dirname(
+                    path.abspath(self.work_dir)))
+                self.pooled = self.pool.new_container(pool_key, parent_dir)
+            self._host_dir_chmod(self.pooled.work_dir, "rw")
+            self._host_dir_chmod(self.pooled.output_dir, "rw")
+
         # Save parameters in work_dir/PARAMS_FILE
         params_file_path = self._get_host_params_path()
         with open(params_file_path, "wb") as params_file:
@@ -104,6 +248,12 @@ class DockerJob(object):
         with open(task_script_path, "wb") as script_file:
             script_file.write(bytearray(self.script_src, "utf-8"))
 
+        if self.container:
+            self.running_jobs.append(self)
+            logger.debug("Container {} taken from the pool, image: {}"
+                         .format(self.container_id, self.image.name))
+            return
+
         # Setup volumes for the container
         client = local_client()
 
@@ -126,7 +276,7 @@ class DockerJob(object):
 
         host_cfg = client.create_host_config(
             binds={
-                posix_path(self.work_dir): {
+                posix_path(self._get_bound_work_dir()): {
                     "bind": self.WORK_DIR,
                     "mode": "rw"
                 },
@@ -134,7 +284,7 @@ class DockerJob(object):
                     "bind": self.RESOURCES_DIR,
                     "mode": "ro"
                 },
-                posix_path(self.output_dir): {
+                posix_path(self._get_bound_output_dir()): {
                     "bind": self.OUTPUT_DIR,
                     "mode": "rw"
                 }
@@ -156,6 +306,8 @@ class DockerJob(object):
         self.container_id = self.container["Id"]
         if self.container_id is None:
             raise KeyError("container does not have key: Id")
+        if self.pooled:
+            self.pooled.container_id = self.container_id
 
         self.running_jobs.append(self)
         logger.debug("Container {} prepared, image: {}, dirs: {}; {}; {}"
@@ -164,7 +316,25 @@ class DockerJob(object):
                      )
 
     def _cleanup(self):
-        if self.container:
+        if self.pooled:
+            self._collect_pooled_files()
+            if self.container and self._can_reuse_container():
+                self.pool.release(self.pooled)
+                logger.debug("Container {} returned to the pool"
+                             .format(self.container_id))
+            else:
+                self.pool.discard(self.pooled)
+            self.pooled = None
+            if self.container:
+                self.running_jobs.remove(self)
+                self._host_dir_chmod(self.work_dir, self.work_dir_mod)
+                self._host_dir_chmod(self.resources_dir,
+                                     self.resources_dir_mod)
+                self._host_dir_chmod(self.output_dir, self.output_dir_mod)
+                self.container = None
+                self.container_id = None
+                self.state = self.STATE_REMOVED
+        elif self.container:
             self.running_jobs.remove(self)
             client = local_client()
             self._host_dir_chmod(self.work_dir, self.work_dir_mod)
@@ -190,10 +360,48 @@ class DockerJob(object):
         self._cleanup()
 
     def _get_host_script_path(self):
-        return path.join(self.work_dir, self.TASK_SCRIPT)
+        return path.join(self._get_bound_work_dir(), self.TASK_SCRIPT)
 
     def _get_host_params_path(self):
-        return path.join(self.work_dir, self.PARAMS_FILE)
+        return path.join(self._get_bound_work_dir(), self.PARAMS_FILE)
+
+    def _get_bound_work_dir(self):
+        """ Host directory mounted as the container's work dir """
+        if self.pooled:
+            return self.pooled.work_dir
+        return self.work_dir
+
+    def _get_bound_output_dir(self):
+        """ Host directory mounted as the container's output dir """
+        if self.pooled:
+            return self.pooled.output_dir
+        return self.output_dir
+
+    def _get_pool_key(self):
+        return (self.image.name, path.abspath(self.resources_dir),
+                repr(sorted(self.host_config.items())))
+
+    def _can_reuse_container(self):
+        if self.killed:
+            return False
+        try:
+            return self.get_status() == self.STATE_EXITED
+        except Exception as exc:
+            logger.debug("Cannot get container {} status: {}"
+                         .format(self.container_id, exc))
+            return False
+
+    def _collect_pooled_files(self):
+        """ Move files from the pooled container's dirs to the job's dirs """
+        for src_dir, dst_dir in [(self.pooled.work_dir, self.work_dir),
+                                 (self.pooled.output_dir, self.output_dir)]:
+            for name in os.listdir(src_dir):
+                dst = path.join(dst_dir, name)
+                if path.isdir(dst) and not path.islink(dst):
+                    shutil.rmtree(dst)
+                elif path.lexists(dst):
+                    os.remove(dst)
+                shutil.move(path.join(src_dir, name), dst)
 
     @staticmethod
     def _host_dir_chmod(dst_dir, mod):
@@ -238,8 +446,11 @@ class DockerJob(object):
         self.logging_thread.start()
 
     def start(self):
-        if self.get_status() == self.STATE_CREATED:
+        status = self.get_status()
+        if status == self.STATE_CREATED or \
+                self.pooled and status == self.STATE_EXITED:
             client = local_client()
+            self.start_time = int(time.time())
             client.start(self.container_id)
             result = client.inspect_container(self.container_id)
             self.state = result["State"]["Status"]
@@ -258,7 +469,10 @@ class DockerJob(object):
         """
         if self.get_status() in [self.STATE_RUNNING, self.STATE_EXITED]:
             client = local_client()
-            return client.wait(self.container_id, timeout)
+            exit_code = client.wait(self.container_id, timeout)
+            if self.pooled:
+                self._collect_pooled_files()
+            return exit_code
         logger.debug("Cannot wait for container {}, status = {}"
                      .format(self.container_id, self.get_status()))
         return -1
@@ -274,6 +488,7 @@ class DockerJob(object):
         if status != self.STATE_RUNNING:
             return
 
+        self.killed = True
         try:
             client = local_client()
             client.kill(self.container_id)
@@ -293,13 +508,18 @@ class DockerJob(object):
                     f.write(line)
                 f.flush()
 
+        # Pooled containers keep logs of the previous jobs
+        kwargs = dict(since=self.start_time) if self.pooled else dict()
+
         if stdout_file:
             stdout = client.logs(self.container_id,
-                                 stream=True, stdout=True, stderr=False)
+                                 stream=True, stdout=True, stderr=False,
+                                 **kwargs)
             dump_stream(stdout, stdout_file)
         if stderr_file:
             stderr = client.logs(self.container_id,
-                                 stream=True, stdout=False, stderr=True)
+                                 stream=True, stdout=False, stderr=True,
+                                 **kwargs)
             dump_stream(stderr, stderr_file)
 
     def get_status(self):
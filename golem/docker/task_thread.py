@@ -2,7 +2,7 @@ import logging
 import os
 
 import requests
-from golem.docker.job import DockerJob
+from golem.docker.job import DockerJob, container_pool
 from golem.task.taskthread import TaskThread
 from golem.vm.memorychecker import MemoryChecker
 
@@ -21,10 +21,13 @@ class DockerTaskThread(TaskThread):
     STDERR_FILE = "stderr.log"
 
     docker_manager = None
+    # Containers of finished subtasks are reused by the following ones
+    container_pool = container_pool
 
     def __init__(self, task_computer, subtask_id, docker_images,
                  orig_script_dir, src_code, extra_data, short_desc,
-                 res_path, tmp_path, timeout, check_mem=False):
+                 res_path, tmp_path, timeout, check_mem=False,
+                 host_config=None):
 
         if not docker_images:
             raise AttributeError("docker images is None")
@@ -43,6 +46,9 @@ class DockerTaskThread(TaskThread):
         self.job = None
         self.mc = None
         self.check_mem = check_mem
+        # Container constraints (eg. cpuset, mem_limit) overriding the ones
+        # set by the docker manager
+        self.host_config = host_config or {}
 
     def run(self):
         if not self.image:
@@ -61,13 +67,15 @@ class DockerTaskThread(TaskThread):
                 os.mkdir(output_dir)
 
             if self.docker_manager:
-                host_config = self.docker_manager.container_host_config
+                host_config = dict(self.docker_manager.container_host_config)
             else:
-                host_config = None
+                host_config = dict()
+            host_config.update(self.host_config)
 
             with DockerJob(self.image, self.src_code, self.extra_data,
                            self.res_path, work_dir, output_dir,
-                           host_config=host_config) as job:
+                           host_config=host_config,
+                           pool=self.container_pool) as job:
                 self.job = job
                 if self.check_mem:
                     self.mc = MemoryChecker()
@@ -126,6 +126,23 @@ class Client(object):
         """
         return self.web3.eth.getTransactionReceipt(tx_hash)
 
+    def get_transaction_receipts(self, tx_hashes):
+        """
+        Returns receipts of many transactions
+        :param tx_hashes: The transaction hashes
+        :return: Dictionary of receipts (None if the transaction is not mined
+        yet) by transaction hash
+        """
+        # The web3 providers in use don't support JSON-RPC batches yet,
+        # the receipts are requested one after another
+        return {h: self.get_transaction_receipt(h) for h in tx_hashes}
+
+    def get_block_number(self):
+        """
+        :return: Number of the most recent block
+        """
+        return self.web3.eth.blockNumber
+
     def new_filter(self, from_block="latest", to_block="latest", address=None, topics=None):
         """
         Creates a filter object, based on filter options, to notify when the state changes (logs)
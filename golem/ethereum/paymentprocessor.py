@@ -70,6 +70,7 @@ class PaymentProcessor(Service):
         self.__gnt_reserved = 0
         self._awaiting = []  # Awaiting individual payments
         self._inprogress = {}  # Sent transactions.
+        self._last_block = None  # Block of the last progress check.
         self.__last_sync_check = time.time()
         self.__sync = False
         self.__temp_sync = False
@@ -271,48 +272,70 @@ class PaymentProcessor(Service):
         return True
 
     def monitor_progress(self):
-        confirmed = []
-        for h, payments in self._inprogress.items():
-            hstr = '0x' + encode_hex(h)
-            log.info("Checking {:.6} tx [{}]".format(hstr, len(payments)))
-            receipt = self.__client.get_transaction_receipt(hstr)
-            if receipt:
-                block_hash = receipt['blockHash'][2:]
-                if len(block_hash) != 64:
-                    raise ValueError("block hash length should be 64, but is: {}".format(len(block_hash)))
-                block_number = receipt['blockNumber']
-                gas_used = receipt['gasUsed']
-                total_fee = gas_used * self.GAS_PRICE
-                fee = total_fee // len(payments)
-                log.info("Confirmed {:.6}: block {} ({}), gas {}, fee {}"
-                         .format(hstr, block_hash, block_number, gas_used, fee))
-                with Payment._meta.database.transaction():
-                    for p in payments:
-                        p.status = PaymentStatus.confirmed
-                        p.details['block_number'] = block_number
-                        p.details['block_hash'] = block_hash
-                        p.details['fee'] = fee
-                        p.save()
-                        dispatcher.send(
-                            signal='golem.monitor',
-                            event='payment',
-                            addr=encode_hex(p.payee),
-                            value=p.value
-                        )
-                        dispatcher.send(
-                            signal='golem.paymentprocessor',
-                            event='payment.confirmed',
-                            payment=p
-                        )
-                        log.debug(
-                            "- %.6f confirmed fee %.6f",
-                            p.subtask,
-                            fee / denoms.ether
-                        )
-                confirmed.append(h)
-        for h in confirmed:
+        """ Check receipts of all sent transactions once per block and
+        confirm the payments of the mined ones in a single transaction """
+        if not self._inprogress:
+            return
+
+        block_number = self.__client.get_block_number()
+        if block_number == self._last_block:
+            return
+
+        pending = {'0x' + encode_hex(h): h for h in self._inprogress}
+        log.info("Checking {} tx in block {}"
+                 .format(len(pending), block_number))
+        receipts = self.__client.get_transaction_receipts(list(pending))
+        self._last_block = block_number
+
+        confirmed = {}
+        for hstr, receipt in receipts.items():
+            if not receipt:
+                continue
+            block_hash = receipt['blockHash'][2:]
+            if len(block_hash) != 64:
+                raise ValueError("block hash length should be 64, but is: {}".format(len(block_hash)))
+            h = pending[hstr]
+            payments = self._inprogress[h]
+            gas_used = receipt['gasUsed']
+            total_fee = gas_used * self.GAS_PRICE
+            fee = total_fee // len(payments)
+            log.info("Confirmed {:.6}: block {} ({}), gas {}, fee {}"
+                     .format(hstr, block_hash, receipt['blockNumber'],
+                             gas_used, fee))
+            for p in payments:
+                p.status = PaymentStatus.confirmed
+                p.details['block_number'] = receipt['blockNumber']
+                p.details['block_hash'] = block_hash
+                p.details['fee'] = fee
+            confirmed[h] = fee
+
+        if not confirmed:
+            return
+
+        with Payment._meta.database.transaction():
+            for h in confirmed:
+                for p in self._inprogress[h]:
+                    p.save(only=[Payment.status, Payment.details])
+
+        for h, fee in confirmed.items():
             # Delete in progress entry.
-            del self._inprogress[h]
+            for p in self._inprogress.pop(h):
+                dispatcher.send(
+                    signal='golem.monitor',
+                    event='payment',
+                    addr=encode_hex(p.payee),
+                    value=p.value
+                )
+                dispatcher.send(
+                    signal='golem.paymentprocessor',
+                    event='payment.confirmed',
+                    payment=p
+                )
+                log.debug(
+                    "- %.6s confirmed fee %.6f",
+                    p.subtask,
+                    fee / denoms.ether
+                )
 
     def get_ether_from_faucet(self):
         if self.__faucet and self.eth_balance(True) < 10**15:
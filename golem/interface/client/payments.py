@@ -23,14 +23,33 @@ sort_payments = Argument(
     help="Sort payments"
 )
 
+limit = Argument(
+    '--limit',
+    type=int,
+    optional=True,
+    boolean=False,
+    default=None,
+    help="Show at most this many entries"
+)
+
+payments_limit = Argument.extend(limit, default=30)
+
+after = Argument(
+    '--after',
+    optional=True,
+    boolean=False,
+    default=None,
+    help="Show payments following the one of this subtask"
+)
+
 
 def __value(value):
     return "{:.6f} GNT".format(float(value) / denoms.ether)
 
 
-@command(argument=sort_incomes, help="Display incomes", root=True)
-def incomes(sort):
-    deferred = incomes.client.get_incomes_list()
+@command(arguments=(sort_incomes, limit), help="Display incomes", root=True)
+def incomes(sort, limit=None):
+    deferred = incomes.client.get_incomes_list(limit=limit)
     result = sync_wait(deferred) or []
 
     values = []
@@ -47,10 +66,11 @@ def incomes(sort):
     return CommandResult.to_tabular(payments_table_headers, values, sort=sort)
 
 
-@command(argument=sort_payments, help="Display payments", root=True)
-def payments(sort):
+@command(arguments=(sort_payments, payments_limit, after),
+         help="Display payments", root=True)
+def payments(sort, limit=30, after=None):
 
-    deferred = payments.client.get_payments_list()
+    deferred = payments.client.get_payments_list(cursor=after, limit=limit)
     result = sync_wait(deferred) or []
 
     values = []
@@ -159,6 +159,12 @@ class Settings(object):
             '{} >= int >= 1'.format(_cpu_count),
             _int,
             lambda x: _cpu_count >= x >= 1
+        ),
+        'max_concurrent_subtasks': Setting(
+            'Max number of subtasks computed at once (0 - auto)',
+            '{} >= int >= 0'.format(_cpu_count),
+            _int,
+            lambda x: _cpu_count >= x >= 0
         )
     }
 
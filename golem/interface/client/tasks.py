@@ -60,6 +60,21 @@ class Tasks(object):
         optional=True,
         help="Sort subtasks"
     )
+    limit = Argument(
+        '--limit',
+        type=int,
+        optional=True,
+        boolean=False,
+        default=None,
+        help="Show at most this many entries"
+    )
+    after = Argument(
+        '--after',
+        optional=True,
+        boolean=False,
+        default=None,
+        help="Show entries following the one with this id"
+    )
     file_name = Argument(
         'file_name',
         help="Task file"
@@ -72,10 +87,11 @@ class Tasks(object):
 
     application_logic = None
 
-    @command(arguments=(id_opt, sort_task), help="Show task details")
-    def show(self, id, sort):
+    @command(arguments=(id_opt, sort_task, limit, after),
+             help="Show task details")
+    def show(self, id, sort, limit=None, after=None):
 
-        deferred = Tasks.client.get_tasks(id)
+        deferred = Tasks.client.get_tasks(id, cursor=after, limit=limit)
         result = sync_wait(deferred)
 
         if not id:
@@ -98,11 +114,12 @@ class Tasks(object):
 
         return result
 
-    @command(arguments=(id_req, sort_subtask), help="Show sub-tasks")
-    def subtasks(self, id, sort):
+    @command(arguments=(id_req, sort_subtask, limit, after),
+             help="Show sub-tasks")
+    def subtasks(self, id, sort, limit=None, after=None):
         values = []
 
-        deferred = Tasks.client.get_subtasks(id)
+        deferred = Tasks.client.get_subtasks(id, cursor=after, limit=limit)
         result = sync_wait(deferred)
 
         if isinstance(result, list):
@@ -65,6 +65,27 @@ class Database:
             db.drop_tables(tables, safe=True)
             Database._set_user_version(Database.SCHEMA_VERSION)
         db.create_tables(tables, safe=True)
+        Database._create_missing_indexes(tables)
+
+    @staticmethod
+    def _create_missing_indexes(tables):
+        """ Create indexes that were added to the models after their tables
+        had been created. Unlike a schema version bump, this keeps the data.
+        """
+        for model in tables:
+            existing = {tuple(index.columns)
+                        for index in db.get_indexes(model._meta.db_table)}
+            indexes = [([field], field.unique)
+                       for field in model._fields_to_index()]
+            indexes.extend(model._meta.indexes or ())
+            for names, unique in indexes:
+                fields = [model._meta.fields[f] if isinstance(f, str) else f
+                          for f in names]
+                columns = tuple(field.db_column for field in fields)
+                if columns not in existing:
+                    log.info("Creating index of {} on {}".format(
+                        model._meta.db_table, columns))
+                    db.create_index(model, fields, unique)
 
     def close(self):
         if not self.db.is_closed():
@@ -149,6 +170,13 @@ class Payment(BaseModel):
     value = BigIntegerField()
     details = JsonField()
 
+    class Meta:
+        database = db
+        indexes = (
+            # order of the payments list
+            (('modified_date', 'subtask'), False),
+        )
+
     def __init__(self, *args, **kwargs):
         super(Payment, self).__init__(*args, **kwargs)
         # For convenience always have .details as a dictionary
@@ -174,10 +202,17 @@ class Payment(BaseModel):
 class ExpectedIncome(BaseModel):
     sender_node = CharField()
     sender_node_details = JsonField()  # golem.network.p2p.node.Node()
-    task = CharField()
+    task = CharField(index=True)
     subtask = CharField()
     value = BigIntegerField()
 
+    class Meta:
+        database = db
+        indexes = (
+            # order of the incomes list
+            (('created_date', 'id'), False),
+        )
+
     def __repr__(self):
         return "<ExpectedIncome: {!r} v:{:.3f}>"\
             .format(self.subtask, self.value)
@@ -525,6 +525,16 @@ class P2PService(tcpserver.PendingConnectionsServer, DiagnosticsProvider):
         """
         return self.keys_auth.decrypt(data)
 
+    def get_ecdh_key(self, public_key):
+        """ Compute secret shared with the owner of given public key.
+        If no public_key is given, or it's equal to zero return None
+        :param public_key: public key of the other party
+        :return None|bytes: shared secret
+        """
+        if public_key == 0 or public_key is None:
+            return None
+        return self.keys_auth.get_ecdh_key(public_key)
+
     def sign(self, data):
         """ Sign given data with private key
         :param str data: data to be signed
@@ -699,11 +709,13 @@ class P2PService(tcpserver.PendingConnectionsServer, DiagnosticsProvider):
 
     # TASK FUNCTIONS
     ############################
-    def get_tasks_headers(self):
+    def get_tasks_headers(self, known_tasks=None):
         """ Return a list of a known tasks headers
+        :param list known_tasks: digests of task headers that should be
+                                 skipped
         :return list: list of task header
         """
-        return self.task_server.get_tasks_headers()
+        return self.task_server.get_tasks_headers(known_tasks)
 
     def add_task_header(self, th_dict_repr):
         """ Add new task header to a list of known task headers
@@ -948,8 +960,9 @@ class P2PService(tcpserver.PendingConnectionsServer, DiagnosticsProvider):
     def __send_message_get_tasks(self):
         if time.time() - self.last_tasks_request > TASK_INTERVAL:
             self.last_tasks_request = time.time()
+            known_tasks = self.task_server.get_tasks_digests()
             for p in list(self.peers.values()):
-                p.send_get_tasks()
+                p.send_get_tasks(known_tasks)
 
     def __connection_established(self, session, conn_id=None):
         peer_conn = session.conn.transport.getPeer()
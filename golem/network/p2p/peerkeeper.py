@@ -1,9 +1,8 @@
+import heapq
 import time
 import logging
 import random
-import operator
-from collections import deque
-import math
+from collections import OrderedDict
 
 logger = logging.getLogger("golem.network.p2p.peerkeeper")
 
@@ -15,8 +14,21 @@ REQUEST_TIMEOUT = 10  # find node requests timeout after this time
 IDLE_REFRESH = 3  # refresh idle buckets after this time
 
 
+def key_to_num(key):
+    """ Return long representation of a public key
+    :param str|bytes key: public key in hexadecimal format or raw public key
+    :return long: public key in long format
+    """
+    if isinstance(key, bytes):
+        return int.from_bytes(key, 'big')
+    return int(key, 16)
+
+
 class PeerKeeper(object):
-    """ Keeps information about peers in a network"""
+    """ Keeps information about peers in a network. Buckets are indexed by length of a common prefix of peer's and
+    this node's keys, i.e. by bit length of a XOR distance between them. buckets[i] keeps peers which keys differ from
+    this node's key starting from the i-th bit; the last bucket keeps all the closer peers and is split when it
+    becomes full. """
     def __init__(self, key, k_size=K_SIZE):
         """
         Create new peer keeper instance
@@ -64,17 +76,20 @@ class PeerKeeper(object):
         key_num = int(peer_info.key, 16)
 
         bucket = self.bucket_for_peer(key_num)
-        peer_to_remove = bucket.add_peer(peer_info)
+        if bucket is None:
+            logger.warning("Peer key {} out of range".format(peer_info.key))
+            return None
+
+        peer_to_remove = bucket.add_peer(peer_info, key_num)
         if peer_to_remove:
-            if bucket.start <= self.key_num <= bucket.end:
+            if bucket is self.buckets[-1] and len(self.buckets) < self.k_size:
                 self.split_bucket(bucket)
                 return self.add_peer(peer_info)
             else:
                 self.expected_pongs[peer_to_remove.key] = (peer_info, time.time())
                 return peer_to_remove
 
-        for bucket in self.buckets:
-            logger.debug(str(bucket))
+        logger.debug("Peer {} added to {}".format(peer_info.key, bucket))
         return None
 
     def set_last_message_time(self, key):
@@ -83,13 +98,10 @@ class PeerKeeper(object):
         """
         if not key:
             return
-        if isinstance(key, str):
-            key = key.encode()
 
-        for i, bucket in enumerate(self.buckets):
-            if bucket.start <= int(key.hex(), 16) < bucket.end:
-                self.buckets[i].last_updated = time.time()
-                break
+        bucket = self.bucket_for_peer(key_to_num(key))
+        if bucket is not None:
+            bucket.last_updated = time.time()
 
     def get_random_known_peer(self):
         """ Return random peer from any bucket
@@ -97,7 +109,7 @@ class PeerKeeper(object):
         """
         bucket = self.buckets[random.randint(0, len(self.buckets) - 1)]
         if len(bucket.peers) > 0:
-            return bucket.peers[random.randint(0, len(bucket.peers) - 1)]
+            return random.choice(list(bucket.peers.values()))
         else:
             return None
 
@@ -108,24 +120,38 @@ class PeerKeeper(object):
         if key in self.expected_pongs:
             del self.expected_pongs[key]
 
+    def bucket_index(self, key_num):
+        """ Return index of a bucket which contains given num in it's range
+        :param long key_num: key long representation for which a bucket should be found
+        :return int|None: index of the bucket or None if key is out of range
+        """
+        prefix_len = self.k_size - (self.key_num ^ key_num).bit_length()
+        if prefix_len < 0:
+            return None
+        return min(prefix_len, len(self.buckets) - 1)
+
     def bucket_for_peer(self, key_num):
         """ Find a bucket which contains given num in it's range
         :param long key_num: key long representation for which a bucket should be found
-        :return KBucket: bucket containing key in it's range
+        :return KBucket|None: bucket containing key in it's range
         """
-        for bucket in self.buckets:
-            if bucket.start <= key_num < bucket.end:
-                return bucket
+        idx = self.bucket_index(key_num)
+        if idx is None:
+            return None
+        return self.buckets[idx]
 
     def split_bucket(self, bucket):
-        """ Split given bucket into two buckets
+        """ Split given bucket into two buckets. Only the last bucket, which contains this peer's key, may be split.
         :param KBucket bucket: bucket to be split
         """
         logger.debug("Splitting bucket")
-        buck1, buck2 = bucket.split()
-        idx = self.buckets.index(bucket)
-        self.buckets[idx] = buck1
-        self.buckets.insert(idx + 1, buck2)
+        if bucket is not self.buckets[-1]:
+            raise ValueError("Only the closest bucket may be split")
+        lower, upper = bucket.split()
+        if lower.start <= self.key_num <= lower.end:
+            self.buckets[-1:] = [upper, lower]
+        else:
+            self.buckets[-1:] = [lower, upper]
 
     def cnt_distance(self, key):
         """ Return distance between this peer and peer with a given key. Distance is a xor between keys.
@@ -154,14 +180,23 @@ class PeerKeeper(object):
         if not alpha:
             alpha = self.concurrency
 
-        neigh = []
-        for bucket in self.buckets_by_id_distance(key_num):
-            for peer in bucket.peers_by_id_distance(key_num):
-                if int(peer.key, 16) != key_num:
-                    neigh.append(peer)
-                    if len(neigh) == alpha * 2:
-                        break
-        return sorted(neigh, key=lambda p: node_id_distance(p, key_num))[:alpha]
+        idx = self.bucket_index(key_num)
+        if idx is None:
+            return self.__nearest(self.buckets, key_num, alpha)
+
+        # Peers from the key's bucket are the closest ones. Peers from
+        # further buckets differ from the key at the same bit, so they have to
+        # be compared. Peers from closer buckets are further from the key the
+        # lower bucket index is.
+        neigh = self.__nearest(self.buckets[idx:idx + 1], key_num, alpha)
+        if len(neigh) < alpha:
+            neigh += self.__nearest(self.buckets[idx + 1:], key_num,
+                                    alpha - len(neigh))
+        for bucket in reversed(self.buckets[:idx]):
+            if len(neigh) >= alpha:
+                break
+            neigh += self.__nearest([bucket], key_num, alpha - len(neigh))
+        return neigh
 
     def buckets_by_id_distance(self, key_num):
         """
@@ -170,7 +205,16 @@ class PeerKeeper(object):
         :param long key_num: given key in long format
         :return list: sorted buckets list
         """
-        return sorted(self.buckets, key=operator.methodcaller('id_distance', key_num))
+        return sorted(self.buckets, key=lambda bucket: bucket.id_distance(key_num))
+
+    @staticmethod
+    def __nearest(buckets, key_num, alpha):
+        candidates = ((peer_num ^ key_num, peer)
+                      for bucket in buckets
+                      for peer_num, peer in bucket.peers.items()
+                      if peer_num != key_num)
+        nearest = heapq.nsmallest(alpha, candidates, key=lambda c: c[0])
+        return [peer for _, peer in nearest]
 
     def __remove_old_expected_pongs(self):
         cur_time = time.time()
@@ -199,7 +243,7 @@ class PeerKeeper(object):
     def __remove_old_requests(self):
         cur_time = time.time()
         for key_num, time_ in list(self.find_requests.items()):
-            if cur_time - time.time() > self.request_timeout:
+            if cur_time - time_ > self.request_timeout:
                 del self.find_requests[key_num]
 
 
@@ -216,7 +260,7 @@ def node_id_distance(node_info, key_num):
 class KBucket(object):
     """ K-bucket for keeping information about peers from a given distance range """
     def __init__(self, start, end, k):
-        """ Create new bucket with range [start, end)
+        """ Create new bucket with range [start, end]
         :param long start: bucket range start
         :param long end: bucket range end
         :param int k: bucket size
@@ -224,29 +268,25 @@ class KBucket(object):
         self.start = start
         self.end = end
         self.k = k
-        self.peers = deque()
+        self.peers = OrderedDict()  # key: key_num, value: Node; least recently seen first
         self.last_updated = time.time()
 
-    def add_peer(self, peer):
+    def add_peer(self, peer, key_num=None):
         """ Try to append peer to a bucket. If it's already in a bucket remove it and append it at the end.
         If a bucket is full then return oldest peer in a bucket as a candidate for replacement
         :param Node peer: peer to add
+        :param long key_num: *Default: None* peer's public key in long format
         :return Node|None: oldest peer in a bucket, if a new peer hasn't been added or None otherwise
         """
         logger.debug("KBucket adding peer {}".format(peer))
         self.last_updated = time.time()
-        old_peer = None
-        for p in self.peers:
-            if p.key == peer.key:
-                old_peer = p
-                break
-        if old_peer:
-            self.peers.remove(old_peer)
-            self.peers.append(peer)
-        elif len(self.peers) < self.k:
-            self.peers.append(peer)
-        else:
-            return self.peers[0]
+        if key_num is None:
+            key_num = int(peer.key, 16)
+        if key_num in self.peers:
+            self.peers.move_to_end(key_num)
+        elif len(self.peers) >= self.k:
+            return next(iter(self.peers.values()))
+        self.peers[key_num] = peer
         return None
 
     def remove_peer(self, key_num):
@@ -254,42 +294,32 @@ class KBucket(object):
         :param long key_num: public key of a node that should be removed from this bucket in long format
         :return Node|None: information about peer if it was in this bucket, None otherwise
         """
-        for peer in self.peers:
-            if int(peer.key, 16) == key_num:
-                self.peers.remove(peer)
-                return peer
-        return None
+        return self.peers.pop(key_num, None)
 
     def id_distance(self, key_num):
         """ Return distance from a middle of a bucket range to a given key
         :param long key_num:  other node public key in long format
         :return long: distance from a middle of this bucket to a given key
         """
-        return math.floor((self.start + self.end) / 2) ^ key_num
+        return ((self.start + self.end) // 2) ^ key_num
 
     def peers_by_id_distance(self, key_num):
-        return sorted(self.peers, key=lambda p: node_id_distance(p, key_num))
+        return [peer for _, peer in sorted(self.peers.items(), key=lambda p: p[0] ^ key_num)]
 
     def split(self):
-        """ Split bucket into two buckets
+        """ Split bucket into two halves
         :return (KBucket, KBucket): two buckets that were created from this bucket
         """
-        midpoint = (self.start + self.end) / 2
-        lower = KBucket(self.start, midpoint, self.k)
-        upper = KBucket(midpoint + 1, self.end, self.k)
-        for peer in self.peers:
-            if int(peer.key, 16) < midpoint:
-                lower.add_peer(peer)
+        midpoint = self.start + (self.end - self.start + 1) // 2
+        lower = KBucket(self.start, midpoint - 1, self.k)
+        upper = KBucket(midpoint, self.end, self.k)
+        for key_num, peer in self.peers.items():
+            if key_num < midpoint:
+                lower.add_peer(peer, key_num)
             else:
-                upper.add_peer(peer)
+                upper.add_peer(peer, key_num)
+        lower.last_updated = upper.last_updated = self.last_updated
         return lower, upper
 
     def __str__(self):
         return "Bucket: {} - {} peers {}".format(self.start, self.end, len(self.peers))
-
-    @staticmethod
-    def __num_to_pow(num):
-        pow_ = 512
-        while 2 ** pow_ - 1 > num:
-            pow_ -= 1
-        return pow_
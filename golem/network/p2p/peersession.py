@@ -2,13 +2,14 @@ import logging
 import time
 
 from devp2p.crypto import ECIESDecryptionError
+from golem.core.channelcipher import ChannelDecryptionError
 from golem.network.transport import message
 from golem.network.transport.session import BasicSafeSession
 from golem.network.transport.tcpnetwork import SafeProtocol
 
 logger = logging.getLogger(__name__)
 
-P2P_PROTOCOL_ID = 14
+P2P_PROTOCOL_ID = 16
 
 
 class PeerSessionInfo(object):
@@ -150,6 +151,9 @@ class PeerSession(BasicSafeSession):
         :param str data: serialized message to be encrypted
         :return str: encrypted message
         """
+        encrypted = self._channel_encrypt(data)
+        if encrypted is not None:
+            return encrypted
         return self.p2p_service.encrypt(data, self.key_id)
 
     def decrypt(self, data):
@@ -162,6 +166,20 @@ class PeerSession(BasicSafeSession):
         if not self.p2p_service:
             return data
 
+        try:
+            msg = self._channel_decrypt(data)
+        except ChannelDecryptionError as err:
+            logger.info(
+                "Failed to decrypt message from %r:%r: %r",
+                self.address,
+                self.port,
+                err
+            )
+            self.dropped()
+            return None
+        if msg is not None:
+            return msg
+
         try:
             msg = self.p2p_service.decrypt(data)
         except ECIESDecryptionError as err:
@@ -176,6 +194,11 @@ class PeerSession(BasicSafeSession):
 
         return msg
 
+    def _channel_secret(self):
+        if not self.p2p_service:
+            return None
+        return self.p2p_service.get_ecdh_key(self.key_id)
+
     def start(self):
         """
         Send first hello message
@@ -203,9 +226,12 @@ class PeerSession(BasicSafeSession):
         """  Send get peers message """
         self.send(message.MessageGetPeers())
 
-    def send_get_tasks(self):
-        """  Send get tasks message """
-        self.send(message.MessageGetTasks())
+    def send_get_tasks(self, known_tasks=None):
+        """  Send get tasks message
+        :param list known_tasks: digests of task headers that this node
+                                 already knows
+        """
+        self.send(message.MessageGetTasks(known_tasks=known_tasks))
 
     def send_remove_task(self, task_id):
         """  Send remove task  message
@@ -367,6 +393,8 @@ class PeerSession(BasicSafeSession):
             self.disconnect(PeerSession.DCRProtocolVersion)
             return
 
+        self._channel_key_received(msg.channel_key)
+
         self.p2p_service.add_to_peer_keeper(self.node_info)
         self.p2p_service.interpret_metadata(metadata,
                                             self.address,
@@ -438,8 +466,9 @@ class PeerSession(BasicSafeSession):
             self.p2p_service.try_to_add_peer(pi)
 
     def _react_to_get_tasks(self, msg):
-        tasks = self.p2p_service.get_tasks_headers()
-        self.send(message.MessageTasks(tasks))
+        tasks = self.p2p_service.get_tasks_headers(msg.known_tasks)
+        if tasks:
+            self.send(message.MessageTasks(tasks))
 
     def _react_to_tasks(self, msg):
         for t in msg.tasks_array:
@@ -554,9 +583,11 @@ class PeerSession(BasicSafeSession):
             rand_val=self.rand_val,
             metadata=self.p2p_service.metadata_manager.get_metadata(),
             solve_challenge=self.solve_challenge,
+            channel_key=self._channel_key(),
             **challenge_kwargs
         )
         self.send(msg, send_unverified=True)
+        self._channel_key_sent()
 
     def __send_ping(self):
         self.send(message.MessagePing())
@@ -228,6 +228,7 @@ class MessageHello(Message):
         'challenge': "CHALLENGE",
         'difficulty': "DIFFICULTY",
         'metadata': "METADATA",
+        'channel_key': "CHANNEL_KEY",
     }
 
     def __init__(
@@ -243,6 +244,7 @@ class MessageHello(Message):
             difficulty=0,
             proto_id=0,
             client_ver=0,
+            channel_key=None,
             **kwargs):
         """
         Create new introduction message
@@ -258,6 +260,7 @@ class MessageHello(Message):
         :param int difficulty: difficulty of a challenge
         :param int proto_id: protocol id
         :param str client_ver: application version
+        :param bytes channel_key: ephemeral public key for the channel cipher
         """
 
         self.proto_id = proto_id
@@ -271,6 +274,7 @@ class MessageHello(Message):
         self.challenge = challenge
         self.difficulty = difficulty
         self.metadata = metadata
+        self.channel_key = channel_key
         super(MessageHello, self).__init__(**kwargs)
 
 
@@ -365,7 +369,21 @@ class MessagePeers(Message):
 
 class MessageGetTasks(Message):
     TYPE = P2P_MESSAGE_BASE + 5
-    MAPPING = {}
+
+    MAPPING = {
+        'known_tasks': "KNOWN_TASKS",
+    }
+
+    def __init__(self, known_tasks=None, **kwargs):
+        """
+        Create request for task headers
+        :param list known_tasks: digests of task headers known by the sender;
+                                 only unknown or changed headers are sent back
+        """
+        if known_tasks is None:
+            known_tasks = []
+        self.known_tasks = known_tasks
+        super(MessageGetTasks, self).__init__(**kwargs)
 
 
 class MessageTasks(Message):
@@ -1181,6 +1199,22 @@ class MessageWantsResource(AbstractResource):
     """Send information that node wants to receive given resource"""
     TYPE = RESOURCE_MSG_BASE + 3
 
+    MAPPING = {
+        'resource': "resource",
+        'offset': "offset",
+        'digest': "digest",
+    }
+
+    def __init__(self, offset=0, digest=None, **kwargs):
+        """
+        :param int offset: offset from which resource should be sent; it's
+                           non-zero if it was partially received before
+        :param bytes digest: SHA-1 digest of the partially received data
+        """
+        self.offset = offset
+        self.digest = digest
+        super(MessageWantsResource, self).__init__(**kwargs)
+
 
 class MessagePullResource(AbstractResource):
     """Create message with information that given resource is needed"""
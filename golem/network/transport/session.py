@@ -3,6 +3,8 @@ import logging
 import random
 import time
 
+from golem.core.channelcipher import ChannelDecryptionError, \
+    ChannelHandshake, is_channel_frame
 from golem.core.keysauth import get_random_float
 from golem.core.variables import MSG_TTL, FUTURE_TIME_TOLERANCE, UNVERIFIED_CNT
 from golem.network.transport import message
@@ -180,6 +182,9 @@ class BasicSafeSession(BasicSession, SafeSession):
         self.can_be_unverified = [message.MessageDisconnect.TYPE]  # React to message even if it's self.verified is set to False
         self.can_be_unsigned = [message.MessageDisconnect.TYPE]  # React to message even if it's not signed.
         self.can_be_not_encrypted = [message.MessageDisconnect.TYPE]  # React to message even if it's not encrypted.
+        self._channel_handshake = None  # ephemeral key exchange carried by Hello messages
+        self._channel = None  # symmetric cipher shared with the peer identified by key_id
+        self._channel_key_id = None
 
     # Simple session with no encryption and no signing
     def sign(self, msg):
@@ -194,6 +199,93 @@ class BasicSafeSession(BasicSession, SafeSession):
     def decrypt(self, data):
         return data
 
+    def _channel_secret(self):
+        """ Return secret shared with the peer identified by key_id. Should be implemented in descendant
+        class if session supports symmetric channel encryption.
+        :return None|bytes: shared secret or None if it can't be established
+        """
+        return None
+
+    def _channel_key(self):
+        """ Return ephemeral public key that should be announced to the peer in the Hello message.
+        :return bytes: ephemeral public key
+        """
+        if self._channel_handshake is None:
+            self._channel_handshake = ChannelHandshake()
+        return self._channel_handshake.public_key
+
+    def _channel_key_sent(self):
+        """ Should be called after the Hello message carrying _channel_key() has been sent. Everything sent
+        before that is encrypted with ECIES, because the peer can't derive the channel keys yet.
+        """
+        if self._channel_handshake is None:
+            return
+        self._channel_handshake.sent = True
+        self._open_channel()
+
+    def _channel_key_received(self, channel_key):
+        """ Should be called with the ephemeral key from the peer's Hello message, after its signature
+        has been verified.
+        :param None|bytes channel_key: peer's ephemeral public key or None if it wasn't announced
+        """
+        if not channel_key:
+            return
+        if self._channel_handshake is None:
+            self._channel_handshake = ChannelHandshake()
+        if self._channel_handshake.remote_key is None:
+            self._channel_handshake.remote_key = channel_key
+            self._open_channel()
+
+    def _open_channel(self):
+        """ Create symmetric cipher once both ephemeral keys have been exchanged """
+        handshake = self._channel_handshake
+        if self._channel is not None or not handshake.completed or not self.key_id:
+            return
+        secret = self._channel_secret()
+        if not secret:
+            return
+        self._channel = handshake.create_cipher(secret)
+        self._channel_key_id = self.key_id
+
+    def _get_channel(self):
+        """ Return symmetric cipher for the current peer. If the peer's key_id has changed, the channel
+        and the key exchange are discarded; a new one requires another Hello exchange.
+        :return None|ChannelCipher: channel cipher or None if channel hasn't been established
+        """
+        if self._channel is not None and self._channel_key_id != self.key_id:
+            self._channel = None
+            self._channel_key_id = None
+            self._channel_handshake = None
+        return self._channel
+
+    def _channel_encrypt(self, data):
+        """ Encrypt given data with the channel cipher
+        :param bytes data: data to be encrypted
+        :return None|bytes: encrypted data or None if channel hasn't been established
+        """
+        channel = self._get_channel()
+        if channel is None:
+            return None
+        return channel.encrypt(data)
+
+    def _channel_decrypt(self, data):
+        """ Decrypt given data with the channel cipher. Once the peer has sent the first channel frame,
+        any data that isn't a channel frame is refused.
+        :param bytes data: data to be decrypted
+        :return None|bytes: decrypted data or None if data wasn't encrypted with the channel cipher
+        :raise ChannelDecryptionError: if channel frame can't be decrypted or if data isn't a channel frame
+                                       although the channel is already in use
+        """
+        channel = self._get_channel()
+        if not is_channel_frame(data):
+            if channel is not None and channel.active:
+                raise ChannelDecryptionError("Data from {}:{} is not encrypted with the channel cipher"
+                                             .format(self.address, self.port))
+            return None
+        if channel is None:
+            raise ChannelDecryptionError("Channel with {}:{} is not established".format(self.address, self.port))
+        return channel.decrypt(data)
+
     def send(self, message, send_unverified=False):
         """ Send given message if connection was verified or send_unverified option is set to True.
         :param Message message: message to be sent.
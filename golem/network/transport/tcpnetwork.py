@@ -1,3 +1,4 @@
+import hashlib
 import logging
 import os
 import re
@@ -12,6 +13,7 @@ from twisted.internet.endpoints import TCP4ServerEndpoint, TCP4ClientEndpoint, T
     TCP6ClientEndpoint
 from twisted.internet.interfaces import IPullProducer
 from twisted.internet.protocol import connectionDone
+from twisted.internet.threads import deferToThread
 from zope.interface import implements, implementer
 
 from ipaddress import IPv6Address, IPv4Address, ip_address, AddressValueError
@@ -665,21 +667,101 @@ class MidAndFilesProtocol(FilesProtocol):
 # Producers #
 #############
 
+# Stream transfer framing. A file starts with a header holding its size and
+# the offset from which it is sent (non-zero when a transfer is resumed),
+# a data stream starts with its size. Content follows in chunks, each
+# prefixed with its offset, length and SHA-1 digest of its plain content.
+FILE_HEADER = struct.Struct("!QQ")
+DATA_HEADER = struct.Struct("!Q")
+CHUNK_HEADER = struct.Struct("!QL20s")
+
+# Extension of files that are being received. Partially received files may
+# be kept after a dropped connection, so their transfer can be resumed.
+PARTIAL_FILE_EXT = ".part"
+
+
+def file_prefix_digest(file_path, size, buff_size=BUFF_SIZE):
+    """ Return SHA-1 digest of the beginning of the file. Sender and receiver
+    compare digests of a partially received file before its transfer is
+    resumed.
+    :param str file_path: path to the file
+    :param int size: length of the beginning of the file
+    :param int buff_size: size of the buffer used to read the file
+    :return bytes:
+    """
+    sha = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        while size > 0:
+            data = f.read(min(buff_size, size))
+            if not data:
+                break
+            sha.update(data)
+            size -= len(data)
+    return sha.digest()
+
+
+def pack_chunk(offset, data, payload):
+    """ Prepare chunk of data to be sent
+    :param int offset: offset of the chunk in transferred file or data
+    :param bytes data: plain content of the chunk
+    :param bytes payload: content of the chunk that is sent (eg. encrypted)
+    :return bytes: chunk with header
+    """
+    digest = hashlib.sha1(data).digest()
+    return CHUNK_HEADER.pack(offset, len(payload), digest) + payload
+
+
+def unpack_chunk(buff):
+    """ Remove first chunk from given buffer if it has been received whole
+    :param bytearray buff: received data
+    :return tuple|None: (offset, payload, digest) or None if chunk is not
+    complete yet
+    """
+    if len(buff) < CHUNK_HEADER.size:
+        return None
+    offset, length, digest = CHUNK_HEADER.unpack_from(buff)
+    end = CHUNK_HEADER.size + length
+    if len(buff) < end:
+        return None
+    payload = bytes(buff[CHUNK_HEADER.size:end])
+    del buff[:end]
+    return offset, payload, digest
+
+
+def check_chunk(offset, expected_offset, data, digest):
+    """ Check whether received chunk is the expected one and is not corrupted
+    :raise ValueError: if chunk is not valid
+    """
+    if offset != expected_offset:
+        raise ValueError("Unexpected chunk offset {} (expected {})"
+                         .format(offset, expected_offset))
+    if hashlib.sha1(data).digest() != digest:
+        raise ValueError("Wrong digest of chunk at offset {}".format(offset))
+
+
 @implementer(IPullProducer)
 class FileProducer(object):
     """ Files producer that helps to send list of files to consumer in chunks"""
 
 
-    def __init__(self, file_list, session, buff_size=BUFF_SIZE, extra_data=None):
+    def __init__(self, file_list, session, buff_size=BUFF_SIZE, extra_data=None, offsets=None,
+                 digests=None):
         """ Create file producer
         :param list file_list: list of files that should be sent
         :param FileSession session:  session that uses this file producer
         :param int buff_size: size of the buffer
         :param dict extra_data: additional information that should be return to the session
+        :param list offsets: *Default: None* offsets from which files should be sent (in order of file_list),
+        eg. those returned by consumer's get_resume_offsets. Files are sent whole if it's None.
+        :param list digests: *Default: None* digests of the data that consumer already has (in order of
+        file_list), returned by consumer's get_resume_digests. File is sent whole if its digest doesn't match.
+        Digests are checked in a thread, producer is registered once they are.
         """
         self.file_list = copy(file_list)
         self.session = session
         self.buff_size = buff_size
+        self.offsets = list(offsets) if offsets else [0] * len(file_list)
+        self.digests = list(digests) if digests else [None] * len(file_list)
 
         if extra_data:
             self.extra_data = extra_data
@@ -692,9 +774,15 @@ class FileProducer(object):
         self.fh = None  # Current file descriptor
         self.data = None  # Current chunk of data
         self.size = 0  # Size of current file
+        self.closed = False
 
-        self.init_data()
-        self.register()
+        if any(self.offsets):
+            # Beginnings of files may be large, don't read them in the reactor thread
+            deferred = deferToThread(self._check_offsets)
+            deferred.addErrback(self._check_offsets_failed)
+            deferred.addCallback(lambda _: self._start())
+        else:
+            self._start()
 
     # IPullProducer methods
     def resumeProducing(self):
@@ -703,7 +791,6 @@ class FileProducer(object):
 
         if self.data:
             self.session.conn.transport.write(self.data)
-            self._print_progress()
             self._prepare_data()
         elif len(self.file_list) > 1:
             if self.fh is not None:
@@ -735,8 +822,15 @@ class FileProducer(object):
         self.fh = open(self.file_list[-1], 'rb')
         self.size = os.path.getsize(self.file_list[-1])
         self.extra_data['file_sizes'].append(self.size)
-        logger.info("Sending file {}, size:{}".format(self.file_list[-1], self.size))
-        self._prepare_init_data()
+
+        offset = self.offsets[len(self.file_list) - 1]
+        if not 0 <= offset <= self.size:
+            logger.warning("Cannot resume sending file {} from {}, sending whole file"
+                           .format(self.file_list[-1], offset))
+            offset = 0
+        self.fh.seek(offset)
+        logger.info("Sending file {}, size:{}, offset:{}".format(self.file_list[-1], self.size, offset))
+        self._prepare_init_data(offset)
 
     def register(self):
         """ Register producer """
@@ -744,52 +838,73 @@ class FileProducer(object):
 
     def close(self):
         """ Close file descriptor"""
+        self.closed = True
         if self.fh is not None:
             self.fh.close()
             self.fh = None
 
-    def _prepare_init_data(self):
-        self.data = struct.pack("!L", self.size) + self.fh.read(self.buff_size)
+    def _start(self):
+        if self.closed:
+            return
+        self.init_data()
+        self.register()
+
+    def _check_offsets(self):
+        """ Send whole files whose beginning that consumer has differs from ours. Called in a thread. """
+        for i, file_path in enumerate(self.file_list):
+            offset = self.offsets[i]
+            if not 0 < offset <= os.path.getsize(file_path):
+                continue
+            if self.digests[i] != file_prefix_digest(file_path, offset, self.buff_size):
+                logger.warning("Partially received file {} differs, sending whole file".format(file_path))
+                self.offsets[i] = 0
+
+    def _check_offsets_failed(self, failure):
+        logger.warning("Cannot check partially received files, sending whole files: {}"
+                       .format(failure.getErrorMessage()))
+        self.offsets = [0] * len(self.offsets)
+
+    def _prepare_init_data(self, offset):
+        self.data = FILE_HEADER.pack(self.size, offset) + self._read_chunk()
 
     def _prepare_data(self):
-        self.data = self.fh.read(self.buff_size)
+        self.data = self._read_chunk()
 
-    def _print_progress(self):
-        if self.size != 0:
-            print("\rSending progress {} %                       ".format(int(100 * float(self.fh.tell()) / self.size)), end=' ')
-        else:
-            print("\rSending progress 100 %                       ", end=' ')
+    def _read_chunk(self):
+        offset = self.fh.tell()
+        data = self.fh.read(self.buff_size)
+        if not data:
+            return b""
+        return pack_chunk(offset, data, self._encode_chunk(data))
+
+    def _encode_chunk(self, data):
+        return data
 
 
 class EncryptFileProducer(FileProducer):
     """ Files producer that encrypt data chunks """
 
-    def _prepare_init_data(self):
-        data = self.session.encrypt(self.fh.read(self.buff_size))
-        self.data = struct.pack("!L", self.size) + struct.pack("!L", len(data)) + data
-
-    def _prepare_data(self):
-        data = self.fh.read(self.buff_size)
-        if data:
-            data = self.session.encrypt(data)
-            self.data = struct.pack("!L", len(data)) + data
-        else:
-            self.data = ""
+    def _encode_chunk(self, data):
+        return self.session.encrypt(data)
 
 
 class FileConsumer(object):
-    """ File consumer that receives list of files in chunks"""
+    """ File consumer that receives list of files in chunks. Files are written to PARTIAL_FILE_EXT files that are
+    renamed once they are received whole."""
 
-    def __init__(self, file_list, output_dir, session, extra_data=None):
+    def __init__(self, file_list, output_dir, session, extra_data=None, keep_partial=False):
         """
         Create file consumer
         :param list file_list: names of files to received
         :param str output_dir: name of the directory where received files should be saved
         :param FileSession session: session that uses this file consumer
         :param dict extra_data: additional information that should be return to the session
+        :param bool keep_partial: *Default: False* keep partially received file when the consumer is closed,
+        so its transfer can be resumed
         :return:
         """
         self.file_list = copy(file_list)
+        self.keep_partial = keep_partial
 
         self.final_file_list = [os.path.normpath(os.path.join(output_dir, f)) for f in file_list]
         self.fh = None  # Current file descriptor
@@ -807,68 +922,119 @@ class FileConsumer(object):
         self.extra_data["file_sizes"] = []
         self.extra_data["result"] = self.final_file_list
 
-        self.last_percent = 0
-        self.last_data = bytes()
+        self.buff = bytearray()  # Received data that hasn't been processed yet
 
-    def dataReceived(self, data):
-        """ Receive new chunk of data
-        :param data: data received with transport layer
+    def get_resume_offsets(self):
+        """ Return offsets from which files should be sent (in order of file_list). Transfer of files that were
+        partially received before may be resumed.
+        :return list: offsets that should be passed to the producer
+        """
+        offsets = []
+        for file_name in self.file_list:
+            partial_path = self._get_partial_path(file_name)
+            if os.path.isfile(partial_path):
+                offsets.append(os.path.getsize(partial_path))
+            else:
+                offsets.append(0)
+        return offsets
+
+    def get_resume_digests(self):
+        """ Return digests of partially received data of files (in order of file_list). Producer checks them
+        before it resumes a transfer, so a stale or corrupted beginning of a file is not kept. Partially received
+        files may be large, digests are computed in a thread.
+        :return Deferred: fires with digests that should be passed to the producer with get_resume_offsets
         """
-        loc_data = data
-        if self.file_size == -1:
-            loc_data = self._get_first_chunk(self.last_data + data)
+        partial_paths = [self._get_partial_path(file_name) for file_name in self.file_list]
 
-        if not self.fh:
-            raise ValueError("File descriptor is not set")
+        def compute_digests():
+            digests = []
+            for partial_path in partial_paths:
+                if os.path.isfile(partial_path):
+                    digests.append(file_prefix_digest(partial_path, os.path.getsize(partial_path)))
+                else:
+                    digests.append(None)
+            return digests
 
-        self.recv_size += len(loc_data)
-        if self.recv_size <= self.file_size:
-            self.fh.write(loc_data)
-            self.last_data = bytes()
-        else:
-            last_data = len(loc_data) - (self.recv_size - self.file_size)
-            self.fh.write(loc_data[:last_data])
-            self.last_data = loc_data[last_data:]
+        return deferToThread(compute_digests)
 
-        self._print_progress()
+    def dataReceived(self, data):
+        """ Receive new chunk of data
+        :param data: data received with transport layer
+        """
+        self.buff += data
+        while self.file_list:
+            if self.file_size == -1:
+                if len(self.buff) < FILE_HEADER.size:
+                    break
+                file_size, offset = FILE_HEADER.unpack_from(self.buff)
+                del self.buff[:FILE_HEADER.size]
+                self._start_receiving_file(file_size, offset)
+            else:
+                chunk = unpack_chunk(self.buff)
+                if chunk is None:
+                    break
+                self._write_chunk(*chunk)
 
-        if self.recv_size >= self.file_size:
-            self._end_receiving_file()
+            if self.recv_size >= self.file_size:
+                self._end_receiving_file()
 
     def close(self):
-        """ Close file descriptor and remove file if not all data were received
+        """ Close file descriptor. Data of partially received file is removed, unless it's kept so its transfer
+        can be resumed.
         """
         if self.fh is not None:
             self.fh.close()
             self.fh = None
             if self.recv_size < self.file_size and len(self.file_list) > 0:
-                os.remove(self.file_list[-1])
+                logger.info("File {} received partially ({}/{})"
+                            .format(self.file_list[-1], self.recv_size, self.file_size))
+                if not self.keep_partial:
+                    self._remove_partial_file(self.file_list[-1])
 
-    def _get_first_chunk(self, data):
-        self.last_percent = 0
-        (self.file_size,) = struct.unpack("!L", data[:LONG_STANDARD_SIZE])
-        logger.info("Receiving file {}, size {}".format(self.file_list[-1], self.file_size))
+    def _remove_partial_file(self, file_name):
+        try:
+            os.remove(self._get_partial_path(file_name))
+        except OSError as err:
+            logger.warning("Cannot remove partially received file {}: {}".format(file_name, err))
+
+    def _get_partial_path(self, file_name):
+        return os.path.join(self.output_dir, file_name) + PARTIAL_FILE_EXT
+
+    def _start_receiving_file(self, file_size, offset):
+        logger.info("Receiving file {}, size {}, offset {}".format(self.file_list[-1], file_size, offset))
         if self.fh:
             raise ValueError("File descriptor is set")
 
-        self.extra_data["file_sizes"].append(self.file_size)
-        self.fh = open(os.path.join(self.output_dir, self.file_list[-1]), "wb")
-        return data[LONG_STANDARD_SIZE:]
-
-    def _print_progress(self):
-        if self.file_size != 0:
-            percent = int(100 * self.recv_size / float(self.file_size))
+        partial_path = self._get_partial_path(self.file_list[-1])
+        if offset:
+            if not os.path.isfile(partial_path) or os.path.getsize(partial_path) < offset:
+                raise ValueError("Cannot resume receiving file {} from {}".format(self.file_list[-1], offset))
+            self.fh = open(partial_path, "r+b")
+            self.fh.truncate(offset)
+            self.fh.seek(offset)
         else:
-            percent = 100
-        if percent > 100:
-            percent = 100
-        if percent > self.last_percent:
-            print("\rFile data receiving {} %                       ".format(percent), end=' ')
-            self.last_percent = percent
+            self.fh = open(partial_path, "wb")
+
+        self.file_size = file_size
+        self.recv_size = offset
+        self.extra_data["file_sizes"].append(file_size)
+
+    def _write_chunk(self, offset, payload, digest):
+        data = self._decode_chunk(payload)
+        check_chunk(offset, self.recv_size, data, digest)
+        if self.recv_size + len(data) > self.file_size:
+            raise ValueError("Received more data than expected ({})".format(self.file_size))
+        self.fh.write(data)
+        self.recv_size += len(data)
+
+    def _decode_chunk(self, payload):
+        return payload
 
     def _end_receiving_file(self):
         self.fh.close()
         self.fh = None
+        file_path = os.path.join(self.output_dir, self.file_list[-1])
+        os.replace(self._get_partial_path(self.file_list[-1]), file_path)
         self.extra_data["file_received"].append(self.file_list[-1])
         self.file_list.pop()
         self.recv_size = 0
@@ -881,63 +1047,9 @@ class FileConsumer(object):
 class DecryptFileConsumer(FileConsumer):
     """ File consumer that receives list of files in encrypted chunks """
 
-    def __init__(self, file_list, output_dir, session, extra_data=None):
-        """
-        Create file consumer
-        :param list file_list: names of files to received
-        :param str output_dir: name of the directory where received files should be saved
-        :param FileSession session: session that uses this file consumer
-        :param dict extra_data: additional information that should be return to the session
-        :return:
-        """
-        FileConsumer.__init__(self, file_list, output_dir, session, extra_data)
-        self.chunk_size = 0
-        self.recv_chunk_size = 0
-
-    def dataReceived(self, data):
-        """ Receive new chunk of data
-        :param data: data received with transport layer
-        """
-        loc_data = self.last_data + data
-        if self.file_size == -1:
-            loc_data = self._get_first_chunk(loc_data)
-
-        if not self.fh:
-            raise ValueError("File descriptor is not set")
-
-        receive_next = False
-        while not receive_next:
-            if self.chunk_size == 0:
-                (self.chunk_size,) = struct.unpack("!L", loc_data[:LONG_STANDARD_SIZE])
-                loc_data = loc_data[LONG_STANDARD_SIZE:]
-
-            self.recv_chunk_size = len(loc_data)
-            if self.recv_chunk_size >= self.chunk_size:
-                data = self.session.decrypt(loc_data[:self.chunk_size])
-                self.fh.write(data)
-                self.recv_size += len(data)
-                self.last_data = loc_data[self.chunk_size:]
-                self.recv_chunk_size = 0
-                self.chunk_size = 0
-                loc_data = self.last_data
-                if len(self.last_data) <= LONG_STANDARD_SIZE:
-                    receive_next = True
-            else:
-                self.last_data = loc_data
-                receive_next = True
-
-            self._print_progress()
+    def _decode_chunk(self, payload):
+        return self.session.decrypt(payload)
 
-            if self.recv_size >= self.file_size:
-                self._end_receiving_file()
-                receive_next = True
-        if len(self.file_list) > 0 and len(self.last_data) >= 2 * LONG_STANDARD_SIZE and self.chunk_size == 0:
-            self.dataReceived("")
-
-    def _end_receiving_file(self):
-        self.chunk_size = 0
-        self.recv_chunk_size = 0
-        FileConsumer._end_receiving_file(self)
 
 @implementer(IPullProducer)
 class DataProducer(object):
@@ -956,10 +1068,8 @@ class DataProducer(object):
         self.data = None  # current chunk of data
         self.size = 0  # size of data that will be send
         self.it = 0  # data to send iterator
-        self.num_send = 0  # size of sent data
         self.extra_data = extra_data
         self.buff_size = buff_size
-        self.last_percent = 0
         self.load_data()
         self.register()
 
@@ -968,7 +1078,6 @@ class DataProducer(object):
         self.size = len(self.data_to_send)
         logger.info("Sending file size:{}".format(self.size))
         self._prepare_init_data()
-        self.it = self.buff_size
 
     def register(self):
         """ Register producer """
@@ -988,15 +1097,7 @@ class DataProducer(object):
         """ Produce data for the consumer a single time. Send a chunk of data or finish productions. """
         if self.data:
             self.session.conn.transport.write(self.data)
-            self.num_send += len(self.data)
-            self._print_progress()
-
-            if self.it < len(self.data_to_send):
-                self._prepare_data()
-                self.it += self.buff_size
-            else:
-                self.data = None
-                self.end_producing()
+            self._prepare_data()
         else:
             self.end_producing()
 
@@ -1006,21 +1107,22 @@ class DataProducer(object):
         self.close()
         self.session.production_failed(self.extra_data)
 
-    def _print_progress(self):
-        if self.size != 0:
-            percent = int(100 * float(self.num_send) / self.size)
-        else:
-            percent = 100
-        if percent > self.last_percent:
-            print("\rSending progress {} %                       ".format(percent), end=' ')
-        self.last_percent = percent
-
     def _prepare_init_data(self):
-        self.data = struct.pack("!L", self.size) + self.data_to_send[:self.buff_size]
-        self.num_send -= LONG_STANDARD_SIZE
+        self.data = DATA_HEADER.pack(self.size) + self._read_chunk()
 
     def _prepare_data(self):
-        self.data = self.data_to_send[self.it:self.it + self.buff_size]
+        self.data = self._read_chunk()
+
+    def _read_chunk(self):
+        data = self.data_to_send[self.it:self.it + self.buff_size]
+        if not data:
+            return b""
+        chunk = pack_chunk(self.it, data, self._encode_chunk(data))
+        self.it += len(data)
+        return chunk
+
+    def _encode_chunk(self, data):
+        return data
 
 
 class DataConsumer(object):
@@ -1039,47 +1141,48 @@ class DataConsumer(object):
         self.session = session
         self.extra_data = extra_data
 
-        self.last_percent = 0
+        self.buff = bytearray()  # Received data that hasn't been processed yet
 
     def dataReceived(self, data):
         """ Receive new chunk of data
         :param data: data received with transport layer
         """
+        self.buff += data
         if self.data_size == -1:
-            self.loc_data.append(self._get_first_chunk(data))
-            self.recv_size = len(self.loc_data[-1])
-        else:
-            self.loc_data.append(data)
-            self.recv_size += len(data)
+            if len(self.buff) < DATA_HEADER.size:
+                return
+            (self.data_size,) = DATA_HEADER.unpack_from(self.buff)
+            del self.buff[:DATA_HEADER.size]
+            logger.debug("Receiving data size {}".format(self.data_size))
 
-        self._print_progress()
+        while self.recv_size < self.data_size:
+            chunk = unpack_chunk(self.buff)
+            if chunk is None:
+                return
+            self._add_chunk(*chunk)
 
-        if self.recv_size == self.data_size:
-            self._end_receiving()
+        self._end_receiving()
 
     def close(self):
         """ Clean data if it's needed """
         pass
 
-    def _get_first_chunk(self, data):
-        self.last_percent = 0
-        (self.data_size,) = struct.unpack("!L", data[:LONG_STANDARD_SIZE])
-        logger.debug("Receiving data size {}".format(self.data_size))
-        return data[LONG_STANDARD_SIZE:]
+    def _add_chunk(self, offset, payload, digest):
+        data = self._decode_chunk(payload)
+        check_chunk(offset, self.recv_size, data, digest)
+        if self.recv_size + len(data) > self.data_size:
+            raise ValueError("Received more data than expected ({})".format(self.data_size))
+        self.loc_data.append(data)
+        self.recv_size += len(data)
 
-    def _print_progress(self):
-        if self.data_size != 0:
-            percent = int(100 * self.recv_size / float(self.data_size))
-        else:
-            percent = 100
-        if percent > self.last_percent:
-            print("\rFile data receiving {} %                       ".format(percent), end=' ')
-            self.last_percent = percent
+    def _decode_chunk(self, payload):
+        return payload
 
     def _end_receiving(self):
         self.session.conn.data_mode = False
         self.data_size = -1
         self.recv_size = 0
+        self.buff = bytearray()
         self.extra_data["result"] = b"".join(self.loc_data)
         self.loc_data = []
         self.session.full_data_received(extra_data=self.extra_data)
@@ -1088,77 +1191,12 @@ class DataConsumer(object):
 class EncryptDataProducer(DataProducer):
     """ Data producer that encrypt data chunks """
 
-    # IPullProducer methods
-    def resumeProducing(self):
-        if self.data:
-            self.session.conn.transport.write(self.data)
-            self._print_progress()
-
-            if self.it < len(self.data_to_send):
-                self._prepare_data()
-                self.it += self.buff_size
-            else:
-                self.data = None
-                self.end_producing()
-        else:
-            self.end_producing()
-
-    def _prepare_init_data(self):
-        data = self.session.encrypt(self.data_to_send[:self.buff_size])
-        self.data = struct.pack("!L", self.size) + struct.pack("!L", len(data)) + data
-        self.num_send += len(self.data_to_send[:self.buff_size])
-
-    def _prepare_data(self):
-        data = self.session.encrypt(self.data_to_send[self.it:self.it + self.buff_size])
-        self.data = struct.pack("!L", len(data)) + data
-        self.num_send += len(self.data_to_send[self.it:self.it + self.buff_size])
+    def _encode_chunk(self, data):
+        return self.session.encrypt(data)
 
 
 class DecryptDataConsumer(DataConsumer):
     """ Data consumer that receives data in encrypted chunks """
-    def __init__(self, session, extra_data):
-        self.chunk_size = 0
-        self.recv_chunk_size = 0
-        self.last_data = bytes()
-        DataConsumer.__init__(self, session, extra_data)
 
-    def dataReceived(self, data):
-        """ Receive new chunk of encrypted data
-        :param data: data received with transport layer
-        """
-
-        loc_data = self.last_data + data
-        if self.data_size == -1:
-            loc_data = self._get_first_chunk(data)
-
-        receive_next = False
-        while not receive_next:
-            if self.chunk_size == 0:
-                (self.chunk_size,) = struct.unpack("!L", loc_data[:LONG_STANDARD_SIZE])
-                loc_data = loc_data[LONG_STANDARD_SIZE:]
-
-            self.recv_chunk_size = len(loc_data)
-            if self.recv_chunk_size >= self.chunk_size:
-                data = self.session.decrypt(loc_data[:self.chunk_size])
-                self.loc_data.append(data)
-                self.recv_size += len(data)
-                self.last_data = loc_data[self.chunk_size:]
-                self.recv_chunk_size = 0
-                self.chunk_size = 0
-                loc_data = self.last_data
-                if len(self.last_data) <= LONG_STANDARD_SIZE:
-                    receive_next = True
-            else:
-                self.last_data = loc_data
-                receive_next = True
-
-            self._print_progress()
-
-            if self.recv_size >= self.data_size:
-                self._end_receiving()
-                break
-
-    def _end_receiving(self):
-        self.chunk_size = 0
-        self.recv_chunk_size = 0
-        DataConsumer._end_receiving(self)
+    def _decode_chunk(self, payload):
+        return self.session.decrypt(payload)
@@ -1,5 +1,7 @@
 import logging
 
+import numpy
+
 from golem.ranking.helper.trust_const import MAX_TRUST, MIN_TRUST
 
 POS_WEIGHT = 1.0
@@ -22,3 +24,14 @@ def vec_to_trust(val):
         logger.warning("Wrong trust vector element {}".format(err))
         return None
     return min(MAX_TRUST, max(MIN_TRUST, float(a) / float(b))) if a != 0.0 and b != 0.0 else 0.0
+
+
+def vecs_to_trust(vecs):
+    """ Vectorised vec_to_trust of an array whose last axis holds
+    (trust, weight) pairs """
+    vecs = numpy.asarray(vecs, dtype=float)
+    trust, weight = vecs[..., 0], vecs[..., 1]
+    valid = (trust != 0.0) & (weight != 0.0)
+    result = numpy.zeros(trust.shape)
+    result[valid] = trust[valid] / weight[valid]
+    return numpy.clip(result, MIN_TRUST, MAX_TRUST)
@@ -0,0 +1,72 @@
+from collections.abc import Mapping
+
+import numpy
+
+
+class NodeVector(Mapping):
+    """ Values of the same shape kept for each node in a single numpy array,
+    so that they can be updated for all nodes at once. Reading a node's
+    value with [] returns it as nested lists.
+    """
+
+    def __init__(self, shape=(), node_ids=(), values=None):
+        """
+        :param tuple shape: shape of a single node's value
+        :param node_ids: ids of the initial nodes
+        :param values: initial values of the nodes, zeros by default
+        """
+        self.shape = tuple(shape)
+        self.node_ids = list(node_ids)
+        self.index = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        if values is None:
+            self.array = numpy.zeros((len(self.node_ids),) + self.shape)
+        else:
+            self.array = numpy.array(values, dtype=float).reshape(
+                (len(self.node_ids),) + self.shape)
+
+    def __getitem__(self, node_id):
+        return self.array[self.index[node_id]].tolist()
+
+    def __setitem__(self, node_id, value):
+        self.update([node_id], [value])
+
+    def __iter__(self):
+        return iter(self.node_ids)
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def rows(self, node_ids):
+        """ Return array of rows of the nodes, new nodes get zero values """
+        new_ids = [node_id for node_id in dict.fromkeys(node_ids)
+                   if node_id not in self.index]
+        if new_ids:
+            for node_id in new_ids:
+                self.index[node_id] = len(self.node_ids)
+                self.node_ids.append(node_id)
+            self.array = numpy.concatenate(
+                [self.array, numpy.zeros((len(new_ids),) + self.shape)])
+        return numpy.array([self.index[node_id] for node_id in node_ids],
+                           dtype=int)
+
+    def add(self, node_ids, values):
+        """ Add values to the nodes' values, a node may repeat """
+        # Rows are found first, new nodes replace the array
+        rows = self.rows(node_ids)
+        numpy.add.at(self.array, rows, values)
+
+    def update(self, node_ids, values):
+        """ Replace the nodes' values """
+        rows = self.rows(node_ids)
+        self.array[rows] = values
+
+    def get_values(self, node_ids, default=0.0):
+        """ Return array of the nodes' values, default for unknown nodes """
+        result = numpy.full((len(node_ids),) + self.shape, default)
+        known = [(i, self.index[node_id])
+                 for i, node_id in enumerate(node_ids)
+                 if node_id in self.index]
+        if known:
+            positions, rows = zip(*known)
+            result[list(positions)] = self.array[list(rows)]
+        return result
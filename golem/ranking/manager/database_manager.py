@@ -1,5 +1,7 @@
 import datetime
 import logging
+import time
+from threading import Lock, RLock
 
 from peewee import IntegrityError
 
@@ -7,95 +9,186 @@ from golem.model import LocalRank, GlobalRank, NeighbourLocRank, db
 
 logger = logging.getLogger(__name__)
 
+FLUSH_INTERVAL = 10.0  # seconds
+# Node ids bound in a single query, below SQLite's default limit of 999
+# variables
+QUERY_CHUNK_SIZE = 500
+
+
+class RankCache(object):
+    """ Local and neighbour ranks kept in memory. Ranks are read from the
+    database once and changes are written back in a single transaction at
+    most once per flush_interval seconds, so trust lookups and updates
+    don't touch the database.
+    """
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._database = None
+        self._lock = RLock()
+        self._flush_lock = Lock()
+        self._reset()
+
+    def _reset(self):
+        self._local_ranks = dict()
+        self._all_local_loaded = False
+        self._neighbour_ranks = dict()
+        self._ranks = {LocalRank: self._local_ranks,
+                       NeighbourLocRank: self._neighbour_ranks}
+        self._stored = set()
+        self._dirty = set()
+        self._last_flush = time.time()
+
+    def get_local_rank(self, node_id):
+        with self._lock:
+            self._check_database()
+            if node_id not in self._local_ranks:
+                rank = LocalRank.select() \
+                    .where(LocalRank.node_id == node_id).first()
+                self._loaded(LocalRank, node_id, rank)
+            return self._local_ranks[node_id]
+
+    def get_local_rank_for_all(self):
+        with self._lock:
+            self._check_database()
+            if not self._all_local_loaded:
+                for rank in LocalRank.select():
+                    if self._local_ranks.get(rank.node_id) is None:
+                        self._loaded(LocalRank, rank.node_id, rank)
+                self._all_local_loaded = True
+            return [rank for rank in self._local_ranks.values()
+                    if rank is not None]
+
+    def increase(self, node_id, field, trust_mod):
+        with self._lock:
+            rank = self.get_local_rank(node_id)
+            if rank is None:
+                rank = LocalRank(node_id=node_id)
+                self._local_ranks[node_id] = rank
+            setattr(rank, field, getattr(rank, field) + trust_mod)
+            rank.modified_date = datetime.datetime.now()
+            self._dirty.add((LocalRank, node_id))
+
+    def get_neighbour_loc_rank(self, neighbour_id, about_id):
+        key = (neighbour_id, about_id)
+        with self._lock:
+            self._check_database()
+            if key not in self._neighbour_ranks:
+                rank = NeighbourLocRank.select().where(
+                    (NeighbourLocRank.node_id == neighbour_id) &
+                    (NeighbourLocRank.about_node_id == about_id)).first()
+                self._loaded(NeighbourLocRank, key, rank)
+            return self._neighbour_ranks[key]
+
+    def get_neighbour_loc_ranks(self, neighbour_ids, about_id):
+        with self._lock:
+            self._check_database()
+            missing = [n for n in neighbour_ids
+                       if (n, about_id) not in self._neighbour_ranks]
+            # Unknown ranks are read with a query per chunk of node ids
+            found = dict()
+            for i in range(0, len(missing), QUERY_CHUNK_SIZE):
+                chunk = missing[i:i + QUERY_CHUNK_SIZE]
+                query = NeighbourLocRank.select().where(
+                    (NeighbourLocRank.about_node_id == about_id) &
+                    (NeighbourLocRank.node_id << chunk))
+                found.update((rank.node_id, rank) for rank in query)
+            for neighbour_id in missing:
+                self._loaded(NeighbourLocRank, (neighbour_id, about_id),
+                             found.get(neighbour_id))
+            return [self._neighbour_ranks[(n, about_id)]
+                    for n in neighbour_ids]
+
+    def set_neighbour_loc_rank(self, neighbour_id, about_id, loc_rank):
+        key = (neighbour_id, about_id)
+        with self._lock:
+            rank = self.get_neighbour_loc_rank(neighbour_id, about_id)
+            if rank is None:
+                rank = NeighbourLocRank(node_id=neighbour_id,
+                                        about_node_id=about_id)
+                self._neighbour_ranks[key] = rank
+            rank.computing_trust_value = loc_rank[0]
+            rank.requesting_trust_value = loc_rank[1]
+            rank.modified_date = datetime.datetime.now()
+            self._dirty.add((NeighbourLocRank, key))
+
+    def flush(self, force=False):
+        with self._flush_lock:
+            with self._lock:
+                self._check_database()
+                if not self._dirty:
+                    return
+                if not force and \
+                        time.time() - self._last_flush < self.flush_interval:
+                    return
+                dirty, self._dirty = self._dirty, set()
+                self._last_flush = time.time()
+                ranks = [(self._ranks[model][key],
+                          (model, key) in self._stored)
+                         for model, key in dirty]
+
+            # Ranks may change while they're saved, they're saved again then
+            try:
+                with db.atomic():
+                    for rank, stored in ranks:
+                        rank.save(force_insert=not stored)
+            except Exception:
+                logger.exception("Cannot save ranks")
+                with self._lock:
+                    self._dirty |= dirty
+            else:
+                with self._lock:
+                    self._stored |= dirty
+
+    def _loaded(self, model, key, rank):
+        self._ranks[model][key] = rank
+        if rank is not None:
+            self._stored.add((model, key))
+
+    def _check_database(self):
+        # Cached ranks belong to the database they were read from
+        if self._database != db.database:
+            self._database = db.database
+            self._reset()
+
+
+cache = RankCache()
+
 
 def increase_positive_computed(node_id, trust_mod):
-    try:
-        with db.transaction():
-            LocalRank.create(node_id=node_id, positive_computed=trust_mod)
-    except IntegrityError:
-        LocalRank.update(positive_computed=LocalRank.positive_computed + trust_mod,
-                         modified_date=str(datetime.datetime.now())) \
-            .where(LocalRank.node_id == node_id).execute()
+    cache.increase(node_id, 'positive_computed', trust_mod)
 
 
 def increase_negative_computed(node_id, trust_mod):
-    try:
-        with db.transaction():
-            LocalRank.create(node_id=node_id, negative_computed=trust_mod)
-    except IntegrityError:
-        LocalRank.update(negative_computed=LocalRank.negative_computed + trust_mod,
-                         modified_date=str(datetime.datetime.now())) \
-            .where(LocalRank.node_id == node_id).execute()
+    cache.increase(node_id, 'negative_computed', trust_mod)
 
 
 def increase_wrong_computed(node_id, trust_mod):
-    try:
-        with db.transaction():
-            LocalRank.create(node_id=node_id, wrong_computed=trust_mod)
-    except IntegrityError:
-        LocalRank.update(wrong_computed=LocalRank.wrong_computed + trust_mod,
-                         modified_date=str(datetime.datetime.now())) \
-            .where(LocalRank.node_id == node_id).execute()
+    cache.increase(node_id, 'wrong_computed', trust_mod)
 
 
 def increase_positive_requested(node_id, trust_mod):
-    try:
-        with db.transaction():
-            LocalRank.create(node_id=node_id, positive_requested=trust_mod)
-    except IntegrityError:
-        LocalRank.update(positive_requested=LocalRank.positive_requested + trust_mod,
-                         modified_date=str(datetime.datetime.now())) \
-            .where(LocalRank.node_id == node_id).execute()
+    cache.increase(node_id, 'positive_requested', trust_mod)
 
 
 def increase_negative_requested(node_id, trust_mod):
-    try:
-        with db.transaction():
-            LocalRank.create(node_id=node_id, negative_requested=trust_mod)
-    except IntegrityError:
-        LocalRank.update(negative_requested=LocalRank.negative_requested + trust_mod,
-                         modified_date=str(datetime.datetime.now())) \
-            .where(LocalRank.node_id == node_id).execute()
+    cache.increase(node_id, 'negative_requested', trust_mod)
 
 
 def increase_positive_payment(node_id, trust_mod):
-    try:
-        with db.transaction():
-            LocalRank.create(node_id=node_id, positive_payment=trust_mod)
-    except IntegrityError:
-        LocalRank.update(positive_payment=LocalRank.positive_payment + trust_mod,
-                         modified_date=str(datetime.datetime.now())) \
-            .where(LocalRank.node_id == node_id).execute()
+    cache.increase(node_id, 'positive_payment', trust_mod)
 
 
 def increase_negative_payment(node_id, trust_mod):
-    try:
-        with db.transaction():
-            LocalRank.create(node_id=node_id, negative_payment=trust_mod)
-    except IntegrityError:
-        LocalRank.update(negative_payment=LocalRank.negative_payment + trust_mod,
-                         modified_date=str(datetime.datetime.now())) \
-            .where(LocalRank.node_id == node_id).execute()
+    cache.increase(node_id, 'negative_payment', trust_mod)
 
 
 def increase_positive_resource(node_id, trust_mod):
-    try:
-        with db.transaction():
-            LocalRank.create(node_id=node_id, positive_resource=trust_mod)
-    except IntegrityError:
-        LocalRank.update(positive_resource=LocalRank.positive_resource + trust_mod,
-                         modified_date=str(datetime.datetime.now())) \
-            .where(LocalRank.node_id == node_id).execute()
+    cache.increase(node_id, 'positive_resource', trust_mod)
 
 
 def increase_negative_resource(node_id, trust_mod):
-    try:
-        with db.transaction():
-            LocalRank.create(node_id=node_id, negative_resource=trust_mod)
-    except IntegrityError:
-        LocalRank.update(negative_resource=LocalRank.negative_resource + trust_mod,
-                         modified_date=str(datetime.datetime.now())) \
-            .where(LocalRank.node_id == node_id).execute()
+    cache.increase(node_id, 'negative_resource', trust_mod)
 
 
 def get_global_rank(node_id):
@@ -115,27 +208,30 @@ def upsert_global_rank(node_id, comp_trust, req_trust, comp_weight, req_weight):
 
 
 def get_local_rank(node_id):
-    return LocalRank.select().where(LocalRank.node_id == node_id).first()
+    return cache.get_local_rank(node_id)
 
 
 def get_local_rank_for_all():
-    return LocalRank.select()
+    return cache.get_local_rank_for_all()
 
 
 def get_neighbour_loc_rank(neighbour_id, about_id):
-    return NeighbourLocRank.select().where(
-        (NeighbourLocRank.node_id == neighbour_id) & (NeighbourLocRank.about_node_id == about_id)).first()
+    return cache.get_neighbour_loc_rank(neighbour_id, about_id)
+
+
+def get_neighbour_loc_ranks(neighbour_ids, about_id):
+    """ Return ranks of the node given by its neighbours, None for the
+    neighbours that haven't sent one """
+    return cache.get_neighbour_loc_ranks(neighbour_ids, about_id)
 
 
 def upsert_neighbour_loc_rank(neighbour_id, about_id, loc_rank):
-    try:
-        if neighbour_id == about_id:
-            logger.warning("Removing {} self trust".format(about_id))
-            return
-        with db.transaction():
-            NeighbourLocRank.create(node_id=neighbour_id, about_node_id=about_id,
-                                    requesting_trust_value=loc_rank[1], computing_trust_value=loc_rank[0])
-    except IntegrityError:
-        NeighbourLocRank.update(requesting_trust_value=loc_rank[1], computing_trust_value=loc_rank[0]) \
-            .where(
-            (NeighbourLocRank.about_node_id == about_id) & (NeighbourLocRank.node_id == neighbour_id)).execute()
+    if neighbour_id == about_id:
+        logger.warning("Removing {} self trust".format(about_id))
+        return
+    cache.set_neighbour_loc_rank(neighbour_id, about_id, loc_rank)
+
+
+def flush(force=False):
+    """ Write changed local and neighbour ranks to the database """
+    cache.flush(force=force)
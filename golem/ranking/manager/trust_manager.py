@@ -1,6 +1,8 @@
+import numpy
+
 from golem.ranking.helper.min_max_utility import count_trust
 from golem.ranking.helper.trust_const import UNKNOWN_TRUST, NEIGHBOUR_WEIGHT_BASE, NEIGHBOUR_WEIGHT_POWER
-from golem.ranking.manager.database_manager import get_neighbour_loc_rank, get_local_rank
+from golem.ranking.manager.database_manager import get_neighbour_loc_ranks, get_local_rank
 
 
 ############
@@ -23,26 +25,12 @@ def computed_node_trust_local(node_id):
     return computed_trust_local(get_local_rank(node_id))
 
 
-def __computed_neighbour_trust_local(neighbour, about):
-    rank = get_neighbour_loc_rank(neighbour, about)
-    return rank.computing_trust_value if rank is not None else UNKNOWN_TRUST
-
-
-def __computed_neighbour_weight(node_id):
-    local_trust = computed_node_trust_local(node_id)
-    return NEIGHBOUR_WEIGHT_BASE ** (NEIGHBOUR_WEIGHT_POWER * local_trust) \
-        if local_trust is not None else NEIGHBOUR_WEIGHT_BASE ** (NEIGHBOUR_WEIGHT_POWER * UNKNOWN_TRUST)
-
-
 def computed_neighbours_rank(node_id, neighbours):
-    sum_weight = 0.0
-    sum_trust = 0.0
-    for neighbour in [x for x in neighbours if x != node_id]:
-        trust = __computed_neighbour_trust_local(neighbour, node_id)
-        weight = __requested_neighbour_weight(neighbour)
-        sum_trust += (weight - 1) * trust
-        sum_weight += weight
-    return sum_trust, sum_weight
+    neighbours = [x for x in neighbours if x != node_id]
+    trust = [rank.computing_trust_value if rank is not None else UNKNOWN_TRUST
+             for rank in get_neighbour_loc_ranks(neighbours, node_id)]
+    weight = __neighbour_weights([requested_node_trust_local(n) for n in neighbours])
+    return __weighted_sums(trust, weight)
 
 
 #############
@@ -65,23 +53,22 @@ def requested_node_trust_local(node_id):
     return requested_trust_local(get_local_rank(node_id))
 
 
-def __requested_neighbour_trust_local(neighbour, about):
-    rank = get_neighbour_loc_rank(neighbour, about)
-    return rank.requesting_trust_value if rank is not None else UNKNOWN_TRUST
+def requested_neighbours_rank(node_id, neighbours):
+    neighbours = [x for x in neighbours if x != node_id]
+    trust = [rank.requesting_trust_value if rank is not None else UNKNOWN_TRUST
+             for rank in get_neighbour_loc_ranks(neighbours, node_id)]
+    weight = __neighbour_weights([computed_node_trust_local(n) for n in neighbours])
+    return __weighted_sums(trust, weight)
 
 
-def __requested_neighbour_weight(node_id):
-    local_trust = requested_node_trust_local(node_id)
-    return NEIGHBOUR_WEIGHT_BASE ** (NEIGHBOUR_WEIGHT_POWER * local_trust) \
-        if local_trust is not None else NEIGHBOUR_WEIGHT_BASE ** (NEIGHBOUR_WEIGHT_POWER * UNKNOWN_TRUST)
+##########
+# common #
+##########
+def __neighbour_weights(local_trust):
+    local_trust = numpy.array([t if t is not None else UNKNOWN_TRUST for t in local_trust], dtype=float)
+    return NEIGHBOUR_WEIGHT_BASE ** (NEIGHBOUR_WEIGHT_POWER * local_trust)
 
 
-def requested_neighbours_rank(node_id, neighbours):
-    sum_weight = 0.0
-    sum_trust = 0.0
-    for neighbour in [x for x in neighbours if x != node_id]:
-        trust = __requested_neighbour_trust_local(neighbour, node_id)
-        weight = __computed_neighbour_weight(neighbour)
-        sum_trust += (weight - 1) * trust
-        sum_weight += weight
-    return sum_trust, sum_weight
+def __weighted_sums(trust, weight):
+    trust = numpy.array(trust, dtype=float)
+    return float(numpy.dot(weight - 1, trust)), float(weight.sum())
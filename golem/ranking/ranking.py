@@ -4,9 +4,11 @@ import random
 
 from threading import Lock
 
+import numpy
 from twisted.internet.task import deferLater
 
 from golem.ranking.helper import min_max_utility as util
+from golem.ranking.helper.node_vector import NodeVector
 from golem.ranking.helper.trust_const import UNKNOWN_TRUST
 from golem.ranking.manager import database_manager as dm
 from golem.ranking.manager import trust_manager as tm
@@ -30,8 +32,10 @@ class Ranking(object):
         self.neighbours = []
         self.step = 0
         self.max_steps = max_steps
-        self.working_vec = {}
-        self.prevRank = {}
+        # [[computing trust, weight], [requesting trust, weight]] of nodes
+        self.working_vec = NodeVector((2, 2))
+        # [computing trust, requesting trust] of nodes
+        self.prevRank = NodeVector((2,))
         self.globRank = {}
         self.received_gossip = []
         self.finished = False
@@ -61,13 +65,15 @@ class Ranking(object):
 
     def __init_working_vec(self):
         with self.lock:
-            self.working_vec = {}
-            self.prevRank = {}
-            for loc_rank in dm.get_local_rank_for_all():
-                comp_trust = tm.computed_trust_local(loc_rank)
-                req_trust = tm.requested_trust_local(loc_rank)
-                self.working_vec[loc_rank.node_id] = [[comp_trust, 1.0], [req_trust, 1.0]]
-                self.prevRank[loc_rank.node_id] = [comp_trust, req_trust]
+            loc_ranks = dm.get_local_rank_for_all()
+            node_ids = [loc_rank.node_id for loc_rank in loc_ranks]
+            trust = [[tm.computed_trust_local(loc_rank),
+                      tm.requested_trust_local(loc_rank)]
+                     for loc_rank in loc_ranks]
+            self.prevRank = NodeVector((2,), node_ids, trust)
+            working_vec = numpy.ones((len(node_ids), 2, 2))
+            working_vec[:, :, 0] = self.prevRank.array
+            self.working_vec = NodeVector((2, 2), node_ids, working_vec)
 
     def __new_round(self):
         logger.debug("New gossip round")
@@ -87,7 +93,7 @@ class Ranking(object):
         try:
             self.received_gossip = self.client.collect_gossip() + self.received_gossip
             self.__make_prev_rank()
-            self.working_vec = {}
+            self.working_vec = NodeVector((2, 2))
             self.__add_gossip()
             self.__check_finished()
         finally:
@@ -152,6 +158,11 @@ class Ranking(object):
         for [neighbour_id, about_id, loc_rank] in neighbours_loc_ranks:
             with self.lock:
                 dm.upsert_neighbour_loc_rank(neighbour_id, about_id, loc_rank)
+        dm.flush()
+
+    def flush(self):
+        """ Write all rank changes kept in memory to the database """
+        dm.flush(force=True)
 
     def __push_local_ranks(self):
         for loc_rank in dm.get_local_rank_for_all():
@@ -185,22 +196,10 @@ class Ranking(object):
             self.global_finished = set(self.neighbours) <= self.finished_neighbours
 
     def __compare_working_vec_and_prev_rank(self):
-        aggregated_trust = 0.0
-        for node_id, val in list(self.working_vec.items()):
-            try:
-                computing, requesting = val
-            except (TypeError, ValueError):
-                logger.warning("Wrong trust vector element {}".format(val))
-                break
-            comp_trust = util.vec_to_trust(computing)
-            req_trust = util.vec_to_trust(requesting)
-            if node_id in self.prevRank:
-                comp_trust_old = self.prevRank[node_id][0]
-                req_trust_old = self.prevRank[node_id][1]
-            else:
-                comp_trust_old, req_trust_old = 0, 0
-            aggregated_trust += abs(comp_trust - comp_trust_old) + abs(req_trust - req_trust_old)
-        return aggregated_trust
+        node_ids = self.working_vec.node_ids
+        trust = util.vecs_to_trust(self.working_vec.array)
+        prev_trust = self.prevRank.get_values(node_ids)
+        return float(numpy.abs(trust - prev_trust).sum())
 
     def __set_k(self):
         degrees = self.__get_neighbours_degree()
@@ -218,58 +217,44 @@ class Ranking(object):
         return degrees
 
     def __make_prev_rank(self):
-        for node_id, val in list(self.working_vec.items()):
-            try:
-                computing, requesting = val
-            except (TypeError, ValueError):
-                logger.warning("Wrong trust vector element {}".format(val))
-                break
-            comp_trust = util.vec_to_trust(computing)
-            req_trust = util.vec_to_trust(requesting)
-            self.prevRank[node_id] = [comp_trust, req_trust]
+        self.prevRank.update(self.working_vec.node_ids,
+                             util.vecs_to_trust(self.working_vec.array))
 
     def __save_working_vec(self):
-        for node_id, val in list(self.working_vec.items()):
-            try:
-                computing, requesting = val
-            except (TypeError, ValueError):
-                logger.warning("Wrong trust vector element {}".format(val))
-                break
-            comp_trust = util.vec_to_trust(computing)
-            req_trust = util.vec_to_trust(requesting)
-            dm.upsert_global_rank(node_id, comp_trust, req_trust, computing[1], requesting[1])
+        trust = util.vecs_to_trust(self.working_vec.array)
+        weights = self.working_vec.array[:, :, 1]
+        for node_id, (comp_trust, req_trust), (comp_weight, req_weight) \
+                in zip(self.working_vec.node_ids, trust.tolist(),
+                       weights.tolist()):
+            dm.upsert_global_rank(node_id, comp_trust, req_trust,
+                                  comp_weight, req_weight)
 
     def __prepare_gossip(self):
-        gossip_vec = []
-        for node_id, val in list(self.working_vec.items()):
-            comp_trust = list(map(self.__scale_gossip, val[0]))
-            req_trust = list(map(self.__scale_gossip, val[1]))
-            gossip_vec.append([node_id, [comp_trust, req_trust]])
-        return gossip_vec
-
-    def __scale_gossip(self, val):
-        return val / float(self.k + 1)
+        scaled = self.working_vec.array / float(self.k + 1)
+        return [[node_id, val]
+                for node_id, val in zip(self.working_vec.node_ids,
+                                        scaled.tolist())]
 
     def __add_gossip(self):
+        node_ids = []
+        values = []
         for gossip_group in self.received_gossip:
             for gossip in gossip_group:
                 try:
                     node_id, [comp, req] = gossip
-                    if node_id in self.working_vec:
-                        [prev_comp, prev_req] = self.working_vec[node_id]
-                        self.working_vec[node_id] = [self.__sum_gossip(comp, prev_comp),
-                                                     self.__sum_gossip(req, prev_req)]
-                    else:
-                        self.working_vec[node_id] = [comp, req]
+                    value = numpy.array([comp, req], dtype=float)
+                    if value.shape != (2, 2):
+                        raise ValueError("wrong shape {}".format(value.shape))
                 except Exception as err:
                     logger.error("Wrong gossip {}, {}".format(gossip, err))
+                else:
+                    node_ids.append(node_id)
+                    values.append(value)
 
+        if node_ids:
+            self.working_vec.add(node_ids, numpy.array(values))
         self.received_gossip = []
 
-    @staticmethod
-    def __sum_gossip(a, b):
-        return list(map(sum, zip(a, b)))
-
     def __send_finished(self):
         self.client.send_stop_gossip()
 
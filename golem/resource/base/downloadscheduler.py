@@ -0,0 +1,175 @@
+import logging
+import time
+from collections import OrderedDict, deque
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 16
+
+ADAPT_INTERVAL = 10.0  # seconds
+
+RETRY_DELAY = 1.0  # seconds
+MAX_RETRY_DELAY = 60.0  # seconds
+RETRY_TIMEOUT = 600.0  # seconds
+
+
+class DownloadScheduler(object):
+    """ Decides which of the pending downloads are started and when.
+
+    Downloads of the most recently prioritised task (the one whose subtask
+    is being computed) are started first, the others in the order they were
+    submitted. The number of concurrent downloads is tuned to the observed
+    throughput: it keeps changing in one direction while the number of bytes
+    downloaded per interval grows and turns back when it drops. Failed
+    downloads are retried with an exponentially growing delay until
+    retry_timeout seconds have passed since the first failure.
+    """
+
+    def __init__(self, concurrency=3,
+                 min_concurrency=MIN_CONCURRENCY,
+                 max_concurrency=MAX_CONCURRENCY,
+                 adapt_interval=ADAPT_INTERVAL,
+                 retry_delay=RETRY_DELAY,
+                 max_retry_delay=MAX_RETRY_DELAY,
+                 retry_timeout=RETRY_TIMEOUT,
+                 clock=time.time):
+        """
+        :param int concurrency: initial number of concurrent downloads,
+                                no limit if lower than 1
+        :param int min_concurrency: lower bound of the adapted concurrency
+        :param int max_concurrency: upper bound of the adapted concurrency
+        :param float adapt_interval: seconds between concurrency changes
+        :param float retry_delay: delay of the first retry
+        :param float max_retry_delay: maximal delay of a retry
+        :param float retry_timeout: seconds after the first failure of
+                                    a download when it's no longer retried
+        :param clock: function returning current time in seconds
+        """
+        self.limited = concurrency >= 1
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max(max_concurrency, min_concurrency)
+        self.concurrency = min(max(concurrency, self.min_concurrency),
+                               self.max_concurrency)
+        self.adapt_interval = adapt_interval
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.retry_timeout = retry_timeout
+        self.clock = clock
+
+        self.running = 0
+        self._pending = OrderedDict()
+        self._priorities = dict()
+        self._priority = 0
+        self._failures = dict()
+
+        self._step = 1
+        self._throughput = None
+        self._transferred = 0
+        self._interval_start = clock()
+
+        self._lock = Lock()
+
+    def prioritise(self, task_id):
+        """ Start downloads of the task before the ones submitted earlier """
+        with self._lock:
+            self._priority += 1
+            self._priorities[task_id] = self._priority
+
+    def submit(self, task_id, start):
+        """ Call start when there's a free download slot. The scheduler has
+        to be notified with finished() when the download ends. """
+        with self._lock:
+            self._pending.setdefault(task_id, deque()).append(start)
+            ready = self._take_ready()
+        self._start(ready)
+
+    def finished(self, size=0):
+        """ Release a download slot
+        :param int size: number of bytes downloaded
+        """
+        with self._lock:
+            self.running -= 1
+            self._transferred += size
+            self._adapt()
+            ready = self._take_ready()
+        self._start(ready)
+
+    def next_retry_delay(self, resource_hash):
+        """ Return number of seconds to wait before the next attempt to
+        download the resource or None if it shouldn't be retried anymore """
+        now = self.clock()
+
+        with self._lock:
+            first_failure, attempts = self._failures.get(resource_hash,
+                                                         (now, 0))
+            delay = min(self.retry_delay * 2 ** attempts,
+                        self.max_retry_delay)
+            if now + delay - first_failure > self.retry_timeout:
+                self._failures.pop(resource_hash, None)
+                return None
+            self._failures[resource_hash] = (first_failure, attempts + 1)
+            return delay
+
+    def clear_retry(self, resource_hash):
+        with self._lock:
+            self._failures.pop(resource_hash, None)
+
+    def pending(self, task_id=None):
+        with self._lock:
+            if task_id is not None:
+                return len(self._pending.get(task_id, ()))
+            return sum(len(queue) for queue in self._pending.values())
+
+    def _take_ready(self):
+        ready = []
+        while self._pending and (not self.limited
+                                 or self.running < self.concurrency):
+            ready.append(self._pop_next())
+            self.running += 1
+        return ready
+
+    def _pop_next(self):
+        # Most recently prioritised first, then in the order of submission
+        task_id = max(self._pending,
+                      key=lambda t: self._priorities.get(t, 0))
+        queue = self._pending[task_id]
+        start = queue.popleft()
+        if not queue:
+            del self._pending[task_id]
+            if self._priorities.get(task_id) != self._priority:
+                self._priorities.pop(task_id, None)
+        return start
+
+    def _adapt(self):
+        now = self.clock()
+        elapsed = now - self._interval_start
+        if not self.limited or elapsed < self.adapt_interval:
+            return
+
+        throughput = self._transferred / elapsed
+        self._transferred = 0
+        self._interval_start = now
+
+        if not self._pending:
+            # Downloads didn't use all slots, throughput says nothing about
+            # the concurrency
+            return
+
+        if self._throughput is not None and throughput < self._throughput:
+            self._step = -self._step
+        self._throughput = throughput
+
+        concurrency = min(max(self.concurrency + self._step,
+                              self.min_concurrency),
+                          self.max_concurrency)
+        if concurrency != self.concurrency:
+            logger.debug("Download scheduler: %r B/s, concurrency %r -> %r",
+                         throughput, self.concurrency, concurrency)
+            self.concurrency = concurrency
+
+    @staticmethod
+    def _start(ready):
+        for start in ready:
+            start()
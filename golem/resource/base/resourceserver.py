@@ -70,6 +70,9 @@ class BaseResourceServer(object):
         self.resource_manager.remove_task(task_id, client_options=client_options)
 
     def download_resources(self, resources, task_id, client_options=None):
+        # Resources of the subtask assigned to this node are needed first
+        self.resource_manager.scheduler.prioritise(task_id)
+
         with self._lock:
             for resource in resources:
                 self._add_pending_resource(resource, task_id, client_options)
@@ -139,6 +142,11 @@ class BaseResourceServer(object):
     def decrypt(self, message):
         return self.keys_auth.decrypt(message)
 
+    def get_ecdh_key(self, public_key):
+        if public_key == 0:
+            return None
+        return self.keys_auth.get_ecdh_key(public_key)
+
     def sign(self, data):
         return self.keys_auth.sign(data)
 
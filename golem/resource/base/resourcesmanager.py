@@ -1,13 +1,16 @@
 import abc
+import functools
 import logging
 import os
 import re
 import shutil
-from collections import deque
+import time
+import uuid
 from threading import Lock
 
 from golem.core.common import to_unicode
 from golem.core.fileshelper import copy_file_tree, common_dir
+from golem.resource.base.downloadscheduler import DownloadScheduler
 from golem.resource.client import IClientHandler, ClientCommands, \
     ClientHandler, ClientConfig, TestClient
 from golem.core.async import AsyncRequest, async_run
@@ -34,6 +37,15 @@ def norm_path(path):
     return os.path.join(*split) if split else ''
 
 
+def link_file(src_path, dst_path):
+    """ Hard-link a file, copy it if a link can't be created (e.g. the
+    paths are on different file systems) """
+    try:
+        os.link(src_path, dst_path)
+    except OSError:
+        shutil.copyfile(src_path, dst_path)
+
+
 def dir_files(directory):
     result = []
     for src_dir, dirs, files in os.walk(directory):
@@ -72,6 +84,15 @@ class Resource(object):
     def contains_file(self, name):
         raise NotImplementedError()
 
+    def content(self):
+        """ Return (relative name, path) pairs of the resource's files """
+        raise NotImplementedError()
+
+    def size(self):
+        """ Return total size of the resource's existing files """
+        return sum(os.path.getsize(path) for _, path in self.content()
+                   if os.path.isfile(path))
+
 
 class FileResource(Resource):
 
@@ -90,6 +111,9 @@ class FileResource(Resource):
     def contains_file(self, name):
         return os.path.basename(self.file_name) == name
 
+    def content(self):
+        return [(os.path.basename(self.file_name), self.path)]
+
 
 class ResourceBundle(Resource):
 
@@ -129,6 +153,10 @@ class ResourceBundle(Resource):
                         for f in self._files])
         return False
 
+    def content(self):
+        return [(norm_path(f), os.path.join(self.path, norm_path(f)))
+                for f in self._files or []]
+
 
 class ResourceCache(object):
 
@@ -192,15 +220,163 @@ class ResourceCache(object):
         self._task_to_prefix = dict()
 
 
+class ResourceStore(object):
+    """ Content-addressed store of downloaded resources. Files of each
+    resource are kept once, in a directory named after the resource hash,
+    and hard-linked into the directories of tasks that use them. Resources
+    shared by many tasks are downloaded and stored only once.
+
+    Entries are referenced by tasks that put or restored them. An entry is
+    removed when the last task referencing it is released; entries left
+    over from previous runs are pruned once no task directory links their
+    files and they haven't been used for ENTRY_MAX_AGE seconds.
+    """
+
+    ENTRY_MAX_AGE = 24 * 60 * 60
+
+    def __init__(self, store_dir_method):
+        self.store_dir_method = store_dir_method
+        self._task_refs = dict()
+
+    def get_dir(self, resource_hash):
+        if not resource_hash or not resource_hash.isalnum():
+            return None
+        return os.path.join(self.store_dir_method(), resource_hash)
+
+    def put(self, resource):
+        """ Link files of a resource into the store, unless it is there
+        already """
+        entry_dir = self.get_dir(resource.hash)
+        files = self._entry_files(resource, entry_dir)
+        if not files:
+            return
+        if os.path.isdir(entry_dir):
+            self._add_ref(resource)
+            return
+        if not all(os.path.isfile(path) for _, path in files):
+            return
+
+        tmp_dir = '{}.{}'.format(entry_dir, uuid.uuid4().hex)
+        try:
+            for stored_path, path in files:
+                tmp_path = os.path.join(
+                    tmp_dir, os.path.relpath(stored_path, entry_dir))
+                make_path_dirs(tmp_path)
+                link_file(path, tmp_path)
+            os.rename(tmp_dir, entry_dir)
+        except OSError as exc:
+            logger.debug("Resource store: cannot store %s: %s",
+                         resource, exc)
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        else:
+            self._add_ref(resource)
+
+    def restore(self, resource):
+        """ Link stored files of a resource into its location. Return
+        False if the resource is not in the store """
+        files = self._stored_files(resource)
+        if not files:
+            return False
+        try:
+            for stored_path, path in files:
+                make_path_dirs(path)
+                if os.path.isfile(path):
+                    os.remove(path)
+                link_file(stored_path, path)
+            os.utime(self.get_dir(resource.hash))
+        except OSError as exc:
+            logger.warning("Resource store: cannot restore %s: %s",
+                           resource, exc)
+            return False
+        self._add_ref(resource)
+        return True
+
+    def release(self, task_id):
+        """ Drop references of a task and remove entries that no other task
+        references """
+        hashes = self._task_refs.pop(task_id, set())
+        for resource_hash in hashes:
+            if not self._is_referenced(resource_hash):
+                self._remove_entry(resource_hash)
+
+    def prune(self, max_age=None):
+        """ Remove unreferenced entries that are not linked into any task
+        directory and were last used more than max_age seconds ago """
+        if max_age is None:
+            max_age = self.ENTRY_MAX_AGE
+        store_dir = self.store_dir_method()
+        deadline = time.time() - max_age
+
+        for resource_hash in os.listdir(store_dir):
+            entry_dir = self.get_dir(resource_hash)
+            if not entry_dir or self._is_referenced(resource_hash):
+                continue
+            try:
+                if os.path.getmtime(entry_dir) > deadline:
+                    continue
+                if any(os.stat(path).st_nlink > 1
+                       for path in self._walk_files(entry_dir)):
+                    continue
+            except OSError:
+                continue
+            self._remove_entry(resource_hash)
+
+    def _add_ref(self, resource):
+        if resource.task_id:
+            refs = self._task_refs.setdefault(resource.task_id, set())
+            refs.add(resource.hash)
+
+    def _is_referenced(self, resource_hash):
+        return any(resource_hash in refs
+                   for refs in self._task_refs.values())
+
+    def _remove_entry(self, resource_hash):
+        entry_dir = self.get_dir(resource_hash)
+        if entry_dir and os.path.isdir(entry_dir):
+            logger.debug("Resource store: removing %s", resource_hash)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+
+    @staticmethod
+    def _walk_files(entry_dir):
+        for dir_path, _, file_names in os.walk(entry_dir):
+            for file_name in file_names:
+                yield os.path.join(dir_path, file_name)
+
+    def _stored_files(self, resource):
+        entry_dir = self.get_dir(resource.hash)
+        files = self._entry_files(resource, entry_dir)
+        if not files or not os.path.isdir(entry_dir):
+            return None
+        if not all(os.path.isfile(stored) for stored, _ in files):
+            return None
+        return files
+
+    @staticmethod
+    def _entry_files(resource, entry_dir):
+        """ Return (stored path, path) pairs of the resource's files or
+        None if they can't be kept in the store """
+        if entry_dir is None:
+            return None
+        files = []
+        for name, path in resource.content():
+            stored_path = os.path.normpath(os.path.join(entry_dir, name))
+            if not name or not stored_path.startswith(entry_dir + os.sep):
+                return None
+            files.append((stored_path, path))
+        return files
+
+
 class ResourceStorage(object):
 
     def __init__(self, dir_manager, resource_dir_method):
         self.dir_manager = dir_manager
         self.resource_dir_method = resource_dir_method
         self.cache = ResourceCache()
+        self.store = ResourceStore(dir_manager.get_resource_store_dir)
 
     def list_dir(self, dir_name):
-        return self.dir_manager.list_dir_names(dir_name)
+        return [name for name in self.dir_manager.list_dir_names(dir_name)
+                if name != self.dir_manager.store]
 
     def get_dir(self, task_id):
         return norm_path(self.resource_dir_method(task_id))
@@ -269,15 +445,14 @@ class ResourceStorage(object):
 
 
 class AbstractResourceManager(IClientHandler, metaclass=abc.ABCMeta):
-    lock = Lock()
-    queue_lock = Lock()
 
     def __init__(self, dir_manager, resource_dir_method=None):
 
-        self.download_queue = deque()
-        self.current_downloads = 0
+        self.scheduler = DownloadScheduler(
+            self.config.max_concurrent_downloads)
         self.storage = ResourceStorage(dir_manager, resource_dir_method
                                        or dir_manager.get_task_resource_dir)
+        self.storage.store.prune()
         self.index_resources(self.storage.get_root())
 
         if not hasattr(self, 'commands'):
@@ -325,6 +500,9 @@ class AbstractResourceManager(IClientHandler, metaclass=abc.ABCMeta):
     def remove_task(self, task_id,
                     client=None, client_options=None):
 
+        self.storage.store.release(task_id)
+        self.storage.store.prune()
+
         resources = self.storage.cache.remove(task_id)
         if resources:
             for resource in resources:
@@ -407,7 +585,8 @@ class AbstractResourceManager(IClientHandler, metaclass=abc.ABCMeta):
 
     def pull_resource(self, entry, task_id,
                       success, error,
-                      client=None, client_options=None, async=True, pin=True):
+                      client=None, client_options=None, async=True, pin=True,
+                      store=True):
 
         resource = self._wrap_resource(entry, task_id)
 
@@ -415,9 +594,10 @@ class AbstractResourceManager(IClientHandler, metaclass=abc.ABCMeta):
             success(entry, task_id)
             return
 
-        def success_wrapper(response, **_):
-            self.__dec_downloads()
-            self._clear_retry(self.commands.get, resource.hash)
+        def resource_ready():
+            self.scheduler.clear_retry(resource.hash)
+            if store:
+                self.storage.store.put(resource)
 
             if pin:
                 self._cache_resource(resource)
@@ -427,52 +607,70 @@ class AbstractResourceManager(IClientHandler, metaclass=abc.ABCMeta):
                          .format(resource.path, resource.hash))
 
             success(entry, task_id)
-            self.__process_queue()
+
+        def resource_failed(exception):
+            logger.error("Resource manager: error downloading {} ({}): {}"
+                         .format(resource.path, resource.hash, exception))
+
+            self.scheduler.clear_retry(resource.hash)
+            error(exception, entry, task_id)
+
+        def success_wrapper(response, **_):
+            self.scheduler.finished(resource.size())
+            resource_ready()
 
         def error_wrapper(exception, **_):
-            self.__dec_downloads()
-
-            if self._can_retry(exception, self.commands.get, resource.hash):
-                self.pull_resource(entry, task_id,
-                                   client_options=client_options,
-                                   success=success,
-                                   error=error,
-                                   async=async,
-                                   pin=pin)
+            self.scheduler.finished()
+
+            delay = None
+            if self._exception_type(exception) in self.timeout_exceptions:
+                delay = self.scheduler.next_retry_delay(resource.hash)
+
+            if delay is None:
+                resource_failed(exception)
+                return
+
+            retry = functools.partial(self.pull_resource, entry, task_id,
+                                      client_options=client_options,
+                                      success=success,
+                                      error=error,
+                                      async=async,
+                                      pin=pin,
+                                      store=store)
+            if async:
+                self._call_later(delay, retry)
             else:
-                logger.error("Resource manager: error downloading {} ({}): {}"
-                             .format(resource.path, resource.hash, exception))
-
-                error(exception, entry, task_id)
-                self.__process_queue()
+                time.sleep(delay)
+                retry()
 
         make_path_dirs(self.storage.get_path(resource.path, task_id))
         local = self.storage.cache.get_by_hash(resource.hash)
 
-        if local:
+        if store and self.storage.store.restore(resource):
+
+            logger.debug("Resource manager: {} ({}) linked from the store"
+                         .format(resource.path, resource.hash))
+            resource_ready()
+
+        elif local:
 
-            self.__inc_downloads()
             try:
                 self.storage.copy(local.path, resource.path, task_id)
             except Exception as exc:
-                error_wrapper(exc)
+                resource_failed(exc)
             else:
-                success_wrapper(entry)
+                resource_ready()
 
         else:
 
-            if self.__can_download():
-                self.__inc_downloads()
-                self.__pull(resource, task_id,
-                            success=success_wrapper,
-                            error=error_wrapper,
-                            client=client,
-                            client_options=client_options,
-                            async=async)
-            else:
-                self.__push_to_queue(entry, task_id,
-                                     success, error,
-                                     client, client_options, async, pin)
+            self.scheduler.submit(task_id, functools.partial(
+                self.__pull, resource, task_id,
+                success=success_wrapper,
+                error=error_wrapper,
+                client=client,
+                client_options=client_options,
+                async=async
+            ))
 
     def command_failed(self, exc, cmd, obj_id, **kwargs):
         logger.error("Resource manager: Error executing command '{}': {}"
@@ -542,39 +740,17 @@ class AbstractResourceManager(IClientHandler, metaclass=abc.ABCMeta):
             except Exception as e:
                 error(e)
 
-    def __can_download(self):
-        max_dl = self.config.max_concurrent_downloads
-        with self.lock:
-            return max_dl < 1 or self.current_downloads < max_dl
-
-    def __inc_downloads(self):
-        with self.lock:
-            self.current_downloads += 1
-
-    def __dec_downloads(self):
-        with self.lock:
-            self.current_downloads -= 1
-
-    def __push_to_queue(self, *params):
-        with self.queue_lock:
-            self.download_queue.append(params)
-
-    def __process_queue(self):
-        params = None
-
-        with self.queue_lock:
-            if self.download_queue:
-                params = self.download_queue.popleft()
-
-        if params:
-            self.pull_resource(*params)
+    @staticmethod
+    def _call_later(delay, method):
+        from twisted.internet import reactor
+        reactor.callFromThread(reactor.callLater, delay, method)
 
 
 class TestResourceManager(AbstractResourceManager, ClientHandler):
 
     def __init__(self, dir_manager, resource_dir_method=None):
-        AbstractResourceManager.__init__(self, dir_manager, resource_dir_method)
         ClientHandler.__init__(self, ClientCommands, ClientConfig())
+        AbstractResourceManager.__init__(self, dir_manager, resource_dir_method)
 
     def build_client_options(self, node_id, **kwargs):
         return TestClient.build_options(node_id, **kwargs)
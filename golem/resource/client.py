@@ -1,5 +1,4 @@
 import abc
-import hashlib
 import inspect
 import logging
 import os
@@ -18,24 +17,13 @@ from requests.packages.urllib3.exceptions import MaxRetryError, TimeoutError, \
 from twisted.internet import threads
 
 from golem.core.async import AsyncRequest, async_run
+from golem.core.hashcache import file_hash_cache
 
 log = logging.getLogger(__name__)
 
 
-SHA1_BLOCK_SIZE = 64
-
-
 def file_sha_256(file_path):
-    sha = hashlib.sha256()
-
-    with open(file_path, 'rb') as f:
-        buf = f.read(SHA1_BLOCK_SIZE)
-
-        while len(buf) > 0:
-            sha.update(buf)
-            buf = f.read(SHA1_BLOCK_SIZE)
-
-    return sha.hexdigest()
+    return file_hash_cache.digest(file_path, 'sha256').hex()
 
 
 def file_multihash(file_path):
@@ -29,13 +29,14 @@ def find_task_script(task_dir, script_name):
 
 class DirManager(object):
     """ Manage working directories for application. Return paths, create them if it's needed """
-    def __init__(self, root_path, tmp="tmp", res="resources", output="output", global_resource="golemres", reference_data_dir="reference_data", test="test"):
+    def __init__(self, root_path, tmp="tmp", res="resources", output="output", global_resource="golemres", reference_data_dir="reference_data", test="test", store="resource_store"):
         """ Creates new dir manager instance
         :param str root_path: path to the main directory where all other working directories are placed
         :param str tmp: temporary directory name
         :param res: resource directory name
         :param output: output directory name
         :param global_resource: global resources directory name
+        :param store: content-addressed resource store directory name
         """
         self.root_path = root_path
         self.tmp = tmp
@@ -44,6 +45,7 @@ class DirManager(object):
         self.global_resource = global_resource
         self.ref = reference_data_dir
         self.test = test
+        self.store = store
 
     def get_file_extension(self, fullpath):
         filename, file_extension = os.path.splitext(fullpath)
@@ -108,6 +110,14 @@ class DirManager(object):
         full_path = self.__get_global_resource_path()
         return self.get_dir(full_path, create, "resource dir does not exist")
 
+    def get_resource_store_dir(self, create=True):
+        """ Get directory of the content-addressed resource store, shared by all tasks
+        :param bool create: *Default: True* should directory be created if it doesn't exist
+        :return str: path to directory
+        """
+        full_path = self.__get_store_path()
+        return self.get_dir(full_path, create, "resource store dir does not exist")
+
     def get_task_temporary_dir(self, task_id, create=True):
         """ Get temporary directory
         :param task_id:
@@ -196,6 +206,9 @@ class DirManager(object):
     def __get_global_resource_path(self):
         return os.path.join(self.root_path, self.global_resource)
 
+    def __get_store_path(self):
+        return os.path.join(self.root_path, self.store)
+
     def __get_ref_path(self, task_id, counter):
         return os.path.join(self.root_path, task_id, self.ref, "".join(["runNumber", str(counter)]))
 
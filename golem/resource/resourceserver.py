@@ -248,6 +248,11 @@ class ResourceServer(PendingConnectionsServer):
     def decrypt(self, message):
         return self.keys_auth.decrypt(message)
 
+    def get_ecdh_key(self, public_key):
+        if public_key == 0:
+            return None
+        return self.keys_auth.get_ecdh_key(public_key)
+
     def sign(self, data):
         return self.keys_auth.sign(data)
 
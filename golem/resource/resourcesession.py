@@ -74,6 +74,9 @@ class ResourceSession(BasicSafeSession):
                      (if resource server doesn't exist)
         """
         if self.resource_server:
+            encrypted = self._channel_encrypt(data)
+            if encrypted is not None:
+                return encrypted
             return self.resource_server.encrypt(data, self.key_id)
         logger.warning("Can't encrypt message - no resource_server")
         return data
@@ -88,7 +91,10 @@ class ResourceSession(BasicSafeSession):
         if self.resource_server is None:
             return data
         try:
-            data = self.resource_server.decrypt(data)
+            decrypted = self._channel_decrypt(data)
+            if decrypted is None:
+                decrypted = self.resource_server.decrypt(data)
+            data = decrypted
         except AssertionError:
             logger.info(
                 "Failed to decrypt message from %r:%r, "
@@ -107,6 +113,11 @@ class ResourceSession(BasicSafeSession):
 
         return data
 
+    def _channel_secret(self):
+        if self.resource_server is None:
+            return None
+        return self.resource_server.get_ecdh_key(self.key_id)
+
     def sign(self, msg):
         """ Sign given message
         :param Message msg: message to be signed
@@ -183,10 +194,12 @@ class ResourceSession(BasicSafeSession):
         self.send(
             message.MessageHello(
                 client_key_id=self.resource_server.get_key_id(),
-                rand_val=self.rand_val
+                rand_val=self.rand_val,
+                channel_key=self._channel_key()
             ),
             send_unverified=True
         )
+        self._channel_key_sent()
 
     #########################
     # Reactions to messages #
@@ -200,18 +213,29 @@ class ResourceSession(BasicSafeSession):
                 self.resource_server.get_peers()
                 self.resource_server.add_resource_to_send(msg.resource, copies)
         else:
-            self.send(message.MessageWantsResource(msg.resource))
             self.file_name = msg.resource
             self.conn.stream_mode = True
             self.conn.consumer = tcpnetwork.DecryptFileConsumer(
                 [self.resource_server.prepare_resource(self.file_name)],
                 "",
                 self,
-                {}
+                {},
+                keep_partial=True
             )
             self.confirmation = True
             self.copies = copies
 
+            # Resume transfer of a partially received resource
+            offset, = self.conn.consumer.get_resume_offsets()
+
+            def send_wants_resource(digests):
+                self.send(message.MessageWantsResource(resource=msg.resource,
+                                                       offset=offset,
+                                                       digest=digests[0]))
+
+            deferred = self.conn.consumer.get_resume_digests()
+            deferred.addCallback(send_wants_resource)
+
     def _react_to_has_resource(self, msg):
         self.resource_server.has_resource(msg.resource, self.address, self.port)
         self.dropped()
@@ -219,7 +243,9 @@ class ResourceSession(BasicSafeSession):
     def _react_to_wants_resource(self, msg):
         self.conn.producer = tcpnetwork.EncryptFileProducer(
             [self.resource_server.prepare_resource(msg.resource)],
-            self
+            self,
+            offsets=[msg.offset],
+            digests=[msg.digest]
         )
 
     def _react_to_pull_resource(self, msg):
@@ -248,6 +274,8 @@ class ResourceSession(BasicSafeSession):
             self.disconnect(ResourceSession.DCRUnverified)
             return
 
+        self._channel_key_received(msg.channel_key)
+
         self.send(
             message.MessageRandVal(rand_val=msg.rand_val),
             send_unverified=True
@@ -62,7 +62,8 @@ class EncryptedResultPackageManager(TaskResultPackageManager):
                                             success=package_downloaded,
                                             error=error,
                                             async=async,
-                                            pin=False)
+                                            pin=False,
+                                            store=False)
 
     def create(self, node, task_result, client_options=None, key_or_secret=None):
         if not key_or_secret:
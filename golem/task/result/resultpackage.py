@@ -1,6 +1,8 @@
 import abc
+import io
 import os
-import uuid
+import shutil
+import tarfile
 import zipfile
 
 from golem.core.fileencrypt import AESFileEncryptor
@@ -72,9 +74,61 @@ class ZipPackager(Packager):
         obj.writestr(file_name, cbord_data)
 
 
+class TarPackager(Packager):
+    """ Creates tar archives; both packing and extraction are done in a
+    single pass over a stream, so archives can be piped through
+    an encryptor without intermediate files """
+
+    def extract(self, input_path, output_dir=None, **kwargs):
+
+        if not output_dir:
+            output_dir = os.path.dirname(input_path)
+
+        with open(input_path, 'rb') as src:
+            return self.extract_stream(src, output_dir)
+
+    def extract_stream(self, src, output_dir):
+
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+
+        extracted = []
+
+        with tarfile.open(fileobj=src, mode='r|') as tf:
+            for member in tf:
+                name = member.name
+                if not member.isfile() or os.path.isabs(name) or \
+                        os.path.basename(name) != name or \
+                        name in ('', '.', '..'):
+                    raise ValueError("Invalid package member: {}"
+                                     .format(name))
+                with tf.extractfile(member) as member_src, \
+                        open(os.path.join(output_dir, name), 'wb') as dst:
+                    shutil.copyfileobj(member_src, dst)
+                extracted.append(name)
+
+        return extracted, output_dir
+
+    def generator(self, output_path):
+        if isinstance(output_path, str):
+            return tarfile.open(output_path, mode='w')
+        return tarfile.open(fileobj=output_path, mode='w|')
+
+    def write_disk_file(self, obj, file_path, file_name):
+        info = obj.gettarinfo(file_path, arcname=file_name)
+        with open(file_path, 'rb') as src:
+            obj.addfile(info, src)
+
+    def write_cbor_file(self, obj, file_name, cbord_data):
+        info = tarfile.TarInfo(file_name)
+        info.size = len(cbord_data)
+        obj.addfile(info, io.BytesIO(cbord_data))
+
+
 class EncryptingPackager(Packager):
+    """ Packs files and encrypts the package in a single pass """
 
-    creator_class = ZipPackager
+    creator_class = TarPackager
     encryptor_class = AESFileEncryptor
 
     def __init__(self, key_or_secret):
@@ -84,30 +138,21 @@ class EncryptingPackager(Packager):
 
     def create(self, output_path, disk_files=None, cbor_files=None, **kwargs):
 
-        output_dir = os.path.dirname(output_path)
-        pkg_file_path = os.path.join(output_dir, str(uuid.uuid4()) + ".pkg")
-        out_file_path = super(EncryptingPackager, self).create(pkg_file_path,
-                                                               disk_files=disk_files,
-                                                               cbor_files=cbor_files)
-
-        self.encryptor_class.encrypt(out_file_path,
-                                     output_path,
-                                     self.key_or_secret)
+        with open(output_path, 'wb') as dst, \
+                self.encryptor_class.writer(dst, self.key_or_secret) as writer:
+            super(EncryptingPackager, self).create(writer,
+                                                   disk_files=disk_files,
+                                                   cbor_files=cbor_files)
         return output_path
 
     def extract(self, input_path, output_dir=None, **kwargs):
 
-        input_dir = os.path.dirname(input_path)
-        tmp_file_path = os.path.join(input_dir, str(uuid.uuid4()) + ".dec")
-
-        self.encryptor_class.decrypt(input_path,
-                                     tmp_file_path,
-                                     self.key_or_secret)
-
-        os.remove(input_path)
-        os.rename(tmp_file_path, input_path)
+        if not output_dir:
+            output_dir = os.path.dirname(input_path)
 
-        return self._creator.extract(input_path, output_dir=output_dir)
+        with open(input_path, 'rb') as src, \
+                self.encryptor_class.reader(src, self.key_or_secret) as reader:
+            return self._creator.extract_stream(reader, output_dir)
 
     def generator(self, output_path):
         return self._creator.generator(output_path)
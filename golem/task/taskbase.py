@@ -1,4 +1,5 @@
 import abc
+import hashlib
 import logging
 import time
 
@@ -9,6 +10,8 @@ from golem.network.p2p.node import Node
 
 logger = logging.getLogger("golem.task")
 
+TASK_HEADER_DIGEST_LEN = 8
+
 
 class TaskHeader(object):
     """ Task header describe general information about task as an request and is propagated in the
@@ -47,6 +50,16 @@ class TaskHeader(object):
     def to_binary(self):
         return self.dict_to_binary(self.to_dict())
 
+    def digest(self):
+        """ Return short digest of the header used to tell which headers are already known by peers. Header update
+        changes its signature, so the digest is computed from the signature.
+        :return bytes:
+        """
+        data = self.signature or self.to_binary()
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        return hashlib.sha1(data).digest()[:TASK_HEADER_DIGEST_LEN]
+
     def to_dict(self):
         return DictSerializer.dump(self, typed=False)
 
@@ -124,6 +137,9 @@ class TaskEventListener(object):
     def notify_update_task(self, task_id):
         pass
 
+    def notify_restart_subtask(self, task_id, subtask_id):
+        pass
+
 
 class Task(object):
 
@@ -220,11 +236,15 @@ class Task(object):
         return False
 
     @abc.abstractmethod
-    def computation_finished(self, subtask_id, task_result, result_type=0):
+    def computation_finished(self, subtask_id, task_result, result_type=0,
+                             verification_finished=None):
         """ Inform about finished subtask
         :param subtask_id: finished subtask id
         :param task_result: task result, can be binary data or list of files
         :param result_type: result_types representation
+        :param verification_finished: if given, result may be verified
+                                      asynchronously and this function is
+                                      called once it's done
         """
         return  # Implement in derived class
 
@@ -350,6 +370,12 @@ class Task(object):
         """
         return []
 
+    def flush(self):
+        """ Write state kept in memory, e.g. previews, to files. Called
+        before the node shuts down.
+        """
+        pass
+
     def result_incoming(self, subtask_id):
         """ Informs that a computed task result is being retrieved
         :param subtask_id:
@@ -13,6 +13,7 @@ from apps.core.task.coretaskstate import TaskDesc
 from apps.lux.benchmark.benchmark import LuxBenchmark
 from apps.lux.task.luxrendertask import LuxRenderTaskBuilder
 from golem.core.common import deadline_to_timeout, to_unicode
+from golem.core.hardware import compute_slots
 from golem.core.statskeeper import IntStatsKeeper
 from golem.docker.manager import DockerManager
 from golem.docker.task_thread import DockerTaskThread
@@ -37,7 +38,8 @@ class CompStats(object):
 
 class TaskComputer(object):
     """ TaskComputer is responsible for task computations that take place in Golem application. Tasks are started
-    in separate threads.
+    in separate threads. CPU cores and memory assigned for computations are partitioned into slots, so several
+    subtasks may be computed at the same time, each one on a disjoint set of cores.
     """
 
     lock = Lock()
@@ -68,6 +70,9 @@ class TaskComputer(object):
         self.use_waiting_ttl = None
         self.waiting_for_task_timeout = None
         self.waiting_for_task_session_timeout = None
+        self.compute_slots = [([], 0)]  # (cpu cores, memory [kB]) pairs
+        self.max_assigned_tasks = 1
+        self.subtask_slots = {}  # subtask id -> index of occupied slot
 
         self.docker_manager = DockerManager.install()
         if use_docker_machine_manager:
@@ -93,69 +98,73 @@ class TaskComputer(object):
         self.stats = IntStatsKeeper(CompStats)
 
         self.assigned_subtasks = {}
-        self.task_to_subtask_mapping = {}
-        self.max_assigned_tasks = 1
+        self.subtask_deltas = {}  # subtask id -> resources delta of a subtask that waits for resources
 
-        self.delta = None
         self.last_task_timeout_checking = None
         self.support_direct_computation = False
         self.compute_tasks = task_server.config_desc.accept_tasks
 
     def task_given(self, ctd):
-        if ctd.subtask_id not in self.assigned_subtasks:
-            self.wait(ttl=self.waiting_for_task_timeout)
-            self.assigned_subtasks[ctd.subtask_id] = ctd
-            self.task_to_subtask_mapping[ctd.task_id] = ctd.subtask_id
-            self.__request_resource(ctd.task_id, self.resource_manager.get_resource_header(ctd.task_id),
-                                    ctd.return_address, ctd.return_port, ctd.key_id, ctd.task_owner)
-            return True
-        else:
+        if ctd.subtask_id in self.assigned_subtasks:
+            return False
+
+        # Reserve a slot up front, so subtasks waiting for resources are never started on shared cores
+        with self.lock:
+            slot = self._get_free_slot()
+            if slot is not None:
+                self.subtask_slots[ctd.subtask_id] = slot
+
+        if slot is None:
+            logger.warning("No free computing slot for subtask %r", ctd.subtask_id)
+            self.task_server.send_task_failed(ctd.subtask_id, ctd.task_id, "No free computing slot",
+                                              ctd.return_address, ctd.return_port, ctd.key_id,
+                                              ctd.task_owner, self.node_name)
+            self.session_closed()
             return False
 
+        self.wait(ttl=self.waiting_for_task_timeout)
+        self.assigned_subtasks[ctd.subtask_id] = ctd
+        self.subtask_deltas[ctd.subtask_id] = None
+        self.__request_resource(ctd.task_id, self.resource_manager.get_resource_header(ctd.task_id),
+                                ctd.return_address, ctd.return_port, ctd.key_id, ctd.task_owner)
+        return True
+
     def resource_given(self, task_id):
-        if task_id in self.task_to_subtask_mapping:
-            subtask_id = self.task_to_subtask_mapping[task_id]
-            if subtask_id in self.assigned_subtasks:
-                subtask = self.assigned_subtasks[subtask_id]
-                timeout = deadline_to_timeout(subtask.deadline)
-                self.__compute_task(subtask_id, subtask.docker_images,
-                                    subtask.src_code, subtask.extra_data,
-                                    subtask.short_description, timeout)
-                self.waiting_for_task = None
-                return True
-            else:
-                return False
+        subtask_ids = self._get_subtasks_waiting_for(task_id)
+        for subtask_id in subtask_ids:
+            self.subtask_deltas.pop(subtask_id)
+            subtask = self.assigned_subtasks[subtask_id]
+            timeout = deadline_to_timeout(subtask.deadline)
+            self.__compute_task(subtask_id, subtask.docker_images,
+                                subtask.src_code, subtask.extra_data,
+                                subtask.short_description, timeout)
+        if subtask_ids:
+            self.waiting_for_task = None
+        return bool(subtask_ids)
 
     def task_resource_collected(self, task_id, unpack_delta=True):
-        if task_id in self.task_to_subtask_mapping:
-            subtask_id = self.task_to_subtask_mapping[task_id]
-            if subtask_id in self.assigned_subtasks:
-                subtask = self.assigned_subtasks[subtask_id]
-                if unpack_delta:
-                    self.task_server.unpack_delta(self.dir_manager.get_task_resource_dir(task_id), self.delta, task_id)
-                self.delta = None
-                self.last_task_timeout_checking = time.time()
-                self.__compute_task(subtask_id, subtask.docker_images, subtask.src_code, subtask.extra_data,
-                                    subtask.short_description, deadline_to_timeout(subtask.deadline))
-                return True
-            return False
+        """ Start every subtask of the given task that waits for its resources """
+        subtask_ids = self._get_subtasks_waiting_for(task_id)
+        for subtask_id in subtask_ids:
+            delta = self.subtask_deltas.pop(subtask_id)
+            subtask = self.assigned_subtasks[subtask_id]
+            if unpack_delta:
+                self.task_server.unpack_delta(self.dir_manager.get_task_resource_dir(task_id), delta, task_id)
+            self.last_task_timeout_checking = time.time()
+            self.__compute_task(subtask_id, subtask.docker_images, subtask.src_code, subtask.extra_data,
+                                subtask.short_description, deadline_to_timeout(subtask.deadline))
+        return bool(subtask_ids)
 
     def task_resource_failure(self, task_id, reason):
-        if task_id in self.task_to_subtask_mapping:
-            subtask_id = self.task_to_subtask_mapping.pop(task_id)
-            if subtask_id in self.assigned_subtasks:
-                subtask = self.assigned_subtasks.pop(subtask_id)
-                self.task_server.send_task_failed(subtask_id, subtask.task_id,
-                                                  'Error downloading resources: {}'.format(reason),
-                                                  subtask.return_address, subtask.return_port, subtask.key_id,
-                                                  subtask.task_owner, self.node_name)
+        subtask_ids = self._get_subtasks_waiting_for(task_id)
+        for subtask_id in subtask_ids:
+            self.__drop_subtask(subtask_id, 'Error downloading resources: {}'.format(reason))
+        if subtask_ids:
             self.session_closed()
 
-    def wait_for_resources(self, task_id, delta):
-        if task_id in self.task_to_subtask_mapping:
-            subtask_id = self.task_to_subtask_mapping[task_id]
-            if subtask_id in self.assigned_subtasks:
-                self.delta = delta
+    def wait_for_resources(self, subtask_id, delta):
+        if subtask_id in self.subtask_deltas:
+            self.subtask_deltas[subtask_id] = delta
 
     def task_request_rejected(self, task_id, reason):
         logger.info("Task {} request rejected: {}".format(task_id, reason))
@@ -164,6 +173,9 @@ class TaskComputer(object):
         logger.info("Task {} resource request rejected: {}".format(subtask_id,
                                                                    reason))
         self.assigned_subtasks.pop(subtask_id, None)
+        self.subtask_deltas.pop(subtask_id, None)
+        with self.lock:
+            self.subtask_slots.pop(subtask_id, None)
         self.reset()
 
     def task_computed(self, task_thread):
@@ -175,6 +187,7 @@ class TaskComputer(object):
                 self.current_computations.remove(task_thread)
             except ValueError: # not in list
                 pass
+            self.subtask_slots.pop(task_thread.subtask_id, None)
 
         time_ = task_thread.end_time - task_thread.start_time
         subtask_id = task_thread.subtask_id
@@ -206,16 +219,17 @@ class TaskComputer(object):
                                               subtask.return_address, subtask.return_port, subtask.key_id,
                                               subtask.task_owner, self.node_name)
             dispatcher.send(signal='golem.monitor', event='computation_time_spent', success=False, value=time_)
-        self.counting_task = None
+        self.counting_task = self._get_counting_task()
 
     def run(self):
         if self.counting_task:
-            for task_thread in self.current_computations:
+            for task_thread in list(self.current_computations):
                 task_thread.check_timeout()
-        elif self.compute_tasks and self.runnable:
+        self._drop_expired_subtasks()
+        if self.compute_tasks and self.runnable:
             if not self.waiting_for_task:
                 if time.time() - self.last_task_request > self.task_request_frequency:
-                    if len(self.current_computations) == 0:
+                    if self._has_free_slot():
                         self.__request_task()
             elif self.use_waiting_ttl:
                 time_ = time.time()
@@ -240,7 +254,21 @@ class TaskComputer(object):
         self.waiting_for_task_timeout = config_desc.waiting_for_task_timeout
         self.waiting_for_task_session_timeout = config_desc.waiting_for_task_session_timeout
         self.compute_tasks = config_desc.accept_tasks
+        self.change_compute_slots(config_desc)
         self.change_docker_config(config_desc, run_benchmarks, in_background)
+
+    def change_compute_slots(self, config_desc):
+        try:
+            num_cores = int(config_desc.num_cores)
+            memory = int(config_desc.max_memory_size)
+            max_slots = int(config_desc.max_concurrent_subtasks)
+        except (AttributeError, TypeError, ValueError) as err:
+            logger.warning("Cannot read computation resources config: %r", err)
+            num_cores, memory, max_slots = 0, 0, 1
+
+        self.compute_slots = compute_slots(num_cores, memory, max_slots)
+        self.max_assigned_tasks = len(self.compute_slots)
+        logger.info("Computing up to %r subtasks at once", self.max_assigned_tasks)
     
     def _validate_task_state(self, task_state):
         td = task_state.definition
@@ -352,7 +380,7 @@ class TaskComputer(object):
         self.session_closed()
 
     def session_closed(self):
-        if not self.counting_task:
+        if self.waiting_for_task or not self.counting_task:
             self.reset()
 
     def wait(self, wait=True, ttl=None):
@@ -363,24 +391,60 @@ class TaskComputer(object):
             self.waiting_ttl = ttl
 
     def reset(self, computing_task=False):
-        self.counting_task = computing_task
+        self.counting_task = computing_task or self._get_counting_task()
         self.use_waiting_ttl = False
         self.task_requested = False
         self.waiting_for_task = None
         self.waiting_ttl = 0
 
+    def _has_free_slot(self):
+        return self._get_free_slot() is not None
+
+    def _get_free_slot(self):
+        """ Return index of a slot that isn't reserved for any assigned subtask or None if all slots are occupied """
+        occupied = set(self.subtask_slots.values())
+        for index in range(len(self.compute_slots)):
+            if index not in occupied:
+                return index
+        return None
+
+    def _get_subtasks_waiting_for(self, task_id):
+        """ Return ids of assigned subtasks of the given task that wait for resources """
+        return [subtask_id for subtask_id in list(self.subtask_deltas)
+                if self.assigned_subtasks[subtask_id].task_id == task_id]
+
+    def _drop_expired_subtasks(self):
+        """ Release slots of subtasks whose resources haven't arrived before the deadline """
+        for subtask_id in list(self.subtask_deltas):
+            subtask = self.assigned_subtasks[subtask_id]
+            if deadline_to_timeout(subtask.deadline) <= 0:
+                self.__drop_subtask(subtask_id, "Resources were not received before the deadline")
+
+    def _get_counting_task(self):
+        """ Return id of one of the tasks that are being computed or None if nothing is computed """
+        with self.lock:
+            for task_thread in self.current_computations:
+                subtask = self.assigned_subtasks.get(task_thread.subtask_id)
+                if subtask is not None:
+                    return subtask.task_id
+        return None
+
     def __request_task(self):
         with self.lock:
-            perform_request = not self.waiting_for_task and not self.counting_task
+            perform_request = not self.waiting_for_task and self._has_free_slot()
+            slot = self._get_free_slot()
 
-        if not perform_request:
+        if not perform_request or slot is None:
             return
 
+        # Offer resources of a single slot
+        cpu_cores, memory = self.compute_slots[slot]
         now = time.time()
         self.wait()
         self.last_checking = now
         self.last_task_request = now
-        self.waiting_for_task = self.task_server.request_task()
+        self.waiting_for_task = self.task_server.request_task(num_cores=len(cpu_cores),
+                                                              max_memory_size=memory)
         if self.waiting_for_task is not None:
             self.stats.increase_stat('tasks_requested')
 
@@ -408,26 +472,40 @@ class TaskComputer(object):
             if not os.path.exists(temp_dir):
                 os.makedirs(temp_dir)
 
+        slot = self.subtask_slots[subtask_id]
+
         if docker_images:
+            cpu_cores, memory = self.compute_slots[slot]
+            host_config = dict(cpuset=','.join(str(c) for c in cpu_cores),
+                               mem_limit=memory * 1000)
             tt = DockerTaskThread(self, subtask_id, docker_images, working_dir,
                                   src_code, extra_data, short_desc,
-                                  resource_dir, temp_dir, task_timeout)
+                                  resource_dir, temp_dir, task_timeout,
+                                  host_config=host_config)
         elif self.support_direct_computation:
             tt = PyTaskThread(self, subtask_id, working_dir, src_code,
                               extra_data, short_desc, resource_dir, temp_dir,
                               task_timeout)
         else:
             logger.error("Cannot run PyTaskThread in this version")
-            subtask = self.assigned_subtasks.pop(subtask_id)
-            self.task_server.send_task_failed(subtask_id, subtask.task_id, "Host direct task not supported",
-                                              subtask.return_address, subtask.return_port, subtask.key_id,
-                                              subtask.task_owner, self.node_name)
-            self.counting_task = None
+            self.__drop_subtask(subtask_id, "Host direct task not supported")
+            self.counting_task = self._get_counting_task()
             return
 
-        self.current_computations.append(tt)
+        with self.lock:
+            self.current_computations.append(tt)
         tt.start()
 
+    def __drop_subtask(self, subtask_id, reason):
+        """ Forget assigned subtask that won't be computed, release its slot and inform the task owner """
+        self.subtask_deltas.pop(subtask_id, None)
+        with self.lock:
+            self.subtask_slots.pop(subtask_id, None)
+        subtask = self.assigned_subtasks.pop(subtask_id)
+        self.task_server.send_task_failed(subtask_id, subtask.task_id, reason,
+                                          subtask.return_address, subtask.return_port, subtask.key_id,
+                                          subtask.task_owner, self.node_name)
+
     def quit(self):
         for t in self.current_computations:
             t.end_comp()
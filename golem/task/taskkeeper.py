@@ -1,18 +1,27 @@
+import bisect
+import heapq
 import logging
 import math
 import pickle
 import random
 import time
+from collections import OrderedDict
 
 from semantic_version import Version
 
 from golem.core.common import HandleKeyError, get_timestamp_utc
+from golem.core.journal import Journal
 from golem.core.variables import APP_VERSION
 
 from .taskbase import TaskHeader, ComputeTaskDef
 
 logger = logging.getLogger('golem.task.taskkeeper')
 
+# How many best paid tasks of each environment are scored in get_task
+SCORED_TASKS_PER_ENVIRONMENT = 16
+# Resources of that size [B] halve task's score
+SCORE_RESOURCE_SIZE = 256 * 1024 * 1024
+
 
 def compute_subtask_value(price, computation_time):
     return int(math.ceil(price * computation_time / 3600))
@@ -53,6 +62,9 @@ class CompTaskKeeper(object):
 
     handle_key_error = HandleKeyError(log_key_error)
 
+    # Name of the file with the whole keeper pickled by older versions
+    LEGACY_DUMP_NAME = "comp_task_keeper.pickle"
+
     def __init__(self, tasks_path, persist=True):
         """ Create new instance of compuatational task's definition's keeper
 
@@ -61,39 +73,56 @@ class CompTaskKeeper(object):
         # information about tasks that this node wants to compute
         self.active_tasks = {}
         self.subtask_to_task = {}  # maps subtasks id to tasks id
-        self.dump_path = tasks_path / "comp_task_keeper.pickle"
+        self.dump_path = tasks_path / "comp_task_keeper.journal"
+        self.legacy_dump_path = tasks_path / self.LEGACY_DUMP_NAME
+        self.journal = Journal(self.dump_path)
         self.persist = persist
         self.restore()
 
-    def dump(self):
+    def dump(self, task_id):
+        """ Save information about given task and its subtasks. Only records
+            that have changed are written to the journal.
+        :param str task_id: id of the task to save
+        """
         if not self.persist:
             return
-        logger.debug('COMPTASK DUMP: %s', self.dump_path)
-        with self.dump_path.open('wb') as f:
-            dump_data = self.active_tasks, self.subtask_to_task
-            from pprint import pformat
-            for task in list(self.active_tasks.values()):
-                logger.debug('dump_data: %s', pformat(task))
-            pickle.dump(dump_data, f)
+        logger.debug('COMPTASK DUMP: %s %r', self.dump_path, task_id)
+        task = self.active_tasks[task_id]
+        self.journal.put(('task', task_id), task)
+        for subtask_id in task.subtasks:
+            self.journal.put(('subtask', subtask_id), task_id)
 
     def restore(self):
         if not self.persist:
             return
         logger.debug('COMPTASK RESTORE: %s', self.dump_path)
-        if not self.dump_path.exists():
-            logger.debug('No previous comptask dump found.')
+        for key, value in self.journal.load().items():
+            if key[0] == 'task':
+                self.active_tasks[key[1]] = value
+            elif key[0] == 'subtask':
+                self.subtask_to_task[key[1]] = value
+        self._import_legacy_dump()
+
+    def _import_legacy_dump(self):
+        if not self.legacy_dump_path.exists():
             return
-        with self.dump_path.open('rb') as f:
+        logger.debug('COMPTASK importing: %s', self.legacy_dump_path)
+        with self.legacy_dump_path.open('rb') as f:
             try:
                 active_tasks, subtask_to_task = pickle.load(f)
             except (pickle.UnpicklingError, EOFError):
                 logger.exception(
                     'Problem restoring dumpfile: %s',
-                    self.dump_path
+                    self.legacy_dump_path
                 )
-                return
+                active_tasks, subtask_to_task = {}, {}
         self.active_tasks.update(active_tasks)
         self.subtask_to_task.update(subtask_to_task)
+        for task_id in active_tasks:
+            self.dump(task_id)
+        for subtask_id, task_id in subtask_to_task.items():
+            self.journal.put(('subtask', subtask_id), task_id)
+        self.legacy_dump_path.unlink()
 
     def add_request(self, theader, price):
         logger.debug('CT.add_request()')
@@ -109,7 +138,7 @@ class CompTaskKeeper(object):
             self.active_tasks[task_id].requests += 1
         else:
             self.active_tasks[task_id] = CompTaskInfo(theader, price)
-        self.dump()
+        self.dump(task_id)
 
     @handle_key_error
     def get_subtask_ttl(self, task_id):
@@ -130,7 +159,7 @@ class CompTaskKeeper(object):
         task.requests -= 1
         task.subtasks[comp_task_def.subtask_id] = comp_task_def
         self.subtask_to_task[comp_task_def.subtask_id] = comp_task_def.task_id
-        self.dump()
+        self.dump(comp_task_def.task_id)
         return True
 
     def get_task_id_for_subtask(self, subtask_id):
@@ -154,13 +183,17 @@ class CompTaskKeeper(object):
     def request_failure(self, task_id):
         logger.debug('CT.request_failure(%r)', task_id)
         self.active_tasks[task_id].requests -= 1
-        self.dump()
+        self.dump(task_id)
 
 
 class TaskHeaderKeeper(object):
     """Keeps information about tasks living in Golem Network. Node may
        choose one of those task to compute or will pass information
        to other nodes.
+
+       Supported tasks are indexed by environment and kept sorted by price
+       within each environment, deadlines of all known tasks are kept
+       in a heap, so expired tasks are found without a full scan.
     """
 
     def __init__(
@@ -169,21 +202,34 @@ class TaskHeaderKeeper(object):
             min_price=0.0,
             app_version=APP_VERSION,
             remove_task_timeout=180,
-            verification_timeout=3600
+            verification_timeout=3600,
+            get_requestor_trust=None
             ):
+        """
+        :param get_requestor_trust: function returning trust [-1, 1] of
+                                    the requestor with given key id; it's
+                                    used to choose task to compute
+        """
         # all computing tasks that this node knows about
         self.task_headers = {}
         # ids of tasks that this node may try to compute
-        self.supported_tasks = []
+        self.supported_tasks = set()
+        # supported tasks by environment; key: environment id, value:
+        # list of (-max_price, task_id), sorted, so best paid tasks are first
+        self._tasks_by_env = {}
+        # heap of (deadline, task_id); entries of removed or updated headers
+        # are dropped when they get to the top
+        self._deadlines = []
         # tasks that were removed from network recently, so they won't
-        # be added again to task_headers
-        self.removed_tasks = {}
+        # be added again to task_headers; ordered by removal time
+        self.removed_tasks = OrderedDict()
 
         self.min_price = min_price
         self.app_version = app_version
         self.verification_timeout = verification_timeout
         self.removed_task_timeout = remove_task_timeout
         self.environments_manager = environments_manager
+        self.get_requestor_trust = get_requestor_trust
 
     def is_supported(self, th_dict_repr):
         """Checks if task described with given task header dict
@@ -287,15 +333,16 @@ class TaskHeaderKeeper(object):
         if config_desc.min_price == self.min_price:
             return
         self.min_price = config_desc.min_price
-        self.supported_tasks = []
-        for id_, th in self.task_headers.items():
+        self.supported_tasks = set()
+        self._tasks_by_env = {}
+        for th in self.task_headers.values():
             if self.is_supported(th.__dict__):
-                self.supported_tasks.append(id_)
+                self._add_supported(th)
 
     def add_task_header(self, th_dict_repr):
         """This function will try to add to or update a task header
            in a list of known headers. The header will be added / updated
-           only if it hasn't been removed recently. If it's new and supported
+           only if it hasn't been removed recently. If it's supported
            its id will be put in supported task list.
         :param dict th_dict_repr: task dictionary representation
         :return bool: True if task header was well formatted and
@@ -303,25 +350,30 @@ class TaskHeaderKeeper(object):
         """
         try:
             id_ = th_dict_repr["task_id"]
-            update = id_ in list(self.task_headers.keys())
             is_correct, err = self.is_correct(th_dict_repr)
             if not is_correct:
                 raise TypeError(err)
 
-            if id_ not in list(self.removed_tasks.keys()):  # not recent
-                self.task_headers[id_] = TaskHeader.from_dict(th_dict_repr)
+            if id_ not in self.removed_tasks:  # not recent
+                old_header = self.task_headers.get(id_)
+                header = TaskHeader.from_dict(th_dict_repr)
                 is_supported = self.is_supported(th_dict_repr)
 
-                if update:
-                    if not is_supported and id_ in self.supported_tasks:
-                        self.supported_tasks.remove(id_)
+                if id_ in self.supported_tasks:
+                    self._remove_supported(old_header)
                 elif is_supported:
                     logger.info(
                         "Adding task %r is_supported=%r",
                         id_,
                         is_supported
                     )
-                    self.supported_tasks.append(id_)
+
+                self.task_headers[id_] = header
+                if old_header is None or \
+                        old_header.deadline != header.deadline:
+                    self._push_deadline(header)
+                if is_supported:
+                    self._add_supported(header)
 
             return True
         except (KeyError, TypeError) as err:
@@ -331,33 +383,91 @@ class TaskHeaderKeeper(object):
     def remove_task_header(self, task_id):
         """ Removes task with given id from a list of known task headers.
         """
-        if task_id in self.task_headers:
-            del self.task_headers[task_id]
+        header = self.task_headers.pop(task_id, None)
         if task_id in self.supported_tasks:
-            self.supported_tasks.remove(task_id)
+            self._remove_supported(header)
+        self.removed_tasks.pop(task_id, None)
         self.removed_tasks[task_id] = time.time()
 
     def get_task(self):
-        """ Returns random task from supported tasks that may be computed
+        """ Returns one of supported tasks that may be computed. Best paid
+        tasks of each environment that accepts tasks are scored by price,
+        requestor's trust and size of resources; a task is drawn with
+        probability proportional to its score.
         :return TaskHeader|None: returns either None if there are no tasks
                                  that this node may want to compute
         """
-        if len(self.supported_tasks) > 0:
-            tn = random.randrange(0, len(self.supported_tasks))
-            task_id = self.supported_tasks[tn]
-            return self.task_headers[task_id]
+        candidates = []
+        for env, tasks in self._tasks_by_env.items():
+            if tasks and self.environments_manager.accept_tasks(env):
+                candidates.extend(self.task_headers[task_id] for _, task_id
+                                  in tasks[:SCORED_TASKS_PER_ENVIRONMENT])
+        if not candidates:
+            return None
+
+        best_price = max(th.max_price for th in candidates)
+        scores = [self._score(th, best_price) for th in candidates]
+        total = sum(scores)
+        if total <= 0:
+            return random.choice(candidates)
+
+        point = random.uniform(0, total)
+        for th, score in zip(candidates, scores):
+            point -= score
+            if point <= 0:
+                return th
+        return candidates[-1]
 
     def remove_old_tasks(self):
-        for t in list(self.task_headers.values()):
-            cur_time = get_timestamp_utc()
-            if cur_time > t.deadline:
-                logger.warning("Task {} dies".format(t.task_id))
-                self.remove_task_header(t.task_id)
-
-        for task_id, remove_time in list(self.removed_tasks.items()):
-            cur_time = time.time()
-            if cur_time - remove_time > self.removed_task_timeout:
-                del self.removed_tasks[task_id]
+        cur_time = get_timestamp_utc()
+        while self._deadlines and self._deadlines[0][0] < cur_time:
+            deadline, task_id = heapq.heappop(self._deadlines)
+            th = self.task_headers.get(task_id)
+            if th is not None and th.deadline == deadline:
+                logger.warning("Task {} dies".format(task_id))
+                self.remove_task_header(task_id)
+
+        cur_time = time.time()
+        while self.removed_tasks:
+            task_id, remove_time = next(iter(self.removed_tasks.items()))
+            if cur_time - remove_time <= self.removed_task_timeout:
+                break
+            del self.removed_tasks[task_id]
 
     def request_failure(self, task_id):
         self.remove_task_header(task_id)
+
+    def _score(self, th, best_price):
+        price = th.max_price / best_price if best_price > 0 else 1.0
+        # Headers are loaded from dicts, so they may lack some attributes
+        resource_size = getattr(th, 'resource_size', None) or 0
+        size = 1.0 / (1.0 + resource_size / SCORE_RESOURCE_SIZE)
+        trust = 0.0
+        if self.get_requestor_trust:
+            try:
+                trust = float(
+                    self.get_requestor_trust(th.task_owner_key_id) or 0.0)
+            except Exception as err:
+                logger.debug("Cannot get requestor trust: %r", err)
+        return price * size * (1.0 + max(-1.0, min(trust, 1.0))) / 2.0
+
+    def _add_supported(self, th):
+        tasks = self._tasks_by_env.setdefault(th.environment, [])
+        bisect.insort(tasks, (-th.max_price, th.task_id))
+        self.supported_tasks.add(th.task_id)
+
+    def _remove_supported(self, th):
+        self.supported_tasks.discard(th.task_id)
+        tasks = self._tasks_by_env.get(th.environment, [])
+        entry = (-th.max_price, th.task_id)
+        idx = bisect.bisect_left(tasks, entry)
+        if idx < len(tasks) and tasks[idx] == entry:
+            del tasks[idx]
+
+    def _push_deadline(self, th):
+        heapq.heappush(self._deadlines, (th.deadline, th.task_id))
+        # Drop stale entries if there are too many of them
+        if len(self._deadlines) > 2 * len(self.task_headers) + 64:
+            self._deadlines = [(t.deadline, t.task_id)
+                               for t in self.task_headers.values()]
+            heapq.heapify(self._deadlines)
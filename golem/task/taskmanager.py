@@ -1,6 +1,8 @@
+import copy
 import logging
 import pickle
 import time
+from itertools import islice
 
 from pathlib import Path
 from pydispatch import dispatcher
@@ -8,6 +10,7 @@ from pydispatch import dispatcher
 from apps.appsmanager import AppsManager
 from golem.core.common import HandleKeyError, get_timestamp_utc, \
     timeout_to_deadline, to_unicode, update_dict
+from golem.core.journal import Journal
 from golem.manager.nodestatesnapshot import LocalTaskStateSnapshot
 from golem.network.transport.tcpnetwork import SocketAddress
 from golem.resource.dirmanager import DirManager
@@ -20,6 +23,10 @@ from golem.task.taskstate import TaskState, TaskStatus, SubtaskStatus, \
 
 logger = logging.getLogger(__name__)
 
+# Task records are written at most once per TASK_DUMP_INTERVAL seconds when
+# only subtasks have changed
+TASK_DUMP_INTERVAL = 30
+
 
 def log_subtask_key_error(*args, **kwargs):
     logger.warning("This is not my subtask {}".format(args[1]))
@@ -90,6 +97,12 @@ class TaskManager(TaskEventListener):
                              TaskStatus.waiting, TaskStatus.restarted]
         self.use_distributed_resources = use_distributed_resources
 
+        # Tasks are persisted as separate records of the task, its state and each of the subtask states,
+        # so only the records that have changed are written on update
+        self.tasks_journal = Journal(self.tasks_dir / 'tasks.journal')
+        self._dumped_subtasks = {}  # task_id -> ids of subtasks in the journal
+        self._dirty_tasks = set()  # tasks with a Task record not saved yet
+        self._last_task_dump = time.time()
         self.comp_task_keeper = CompTaskKeeper(self.tasks_dir, persist=self.task_persistence)
         if self.task_persistence:
             self.restore_tasks()
@@ -170,37 +183,130 @@ class TaskManager(TaskEventListener):
             logger.info("Task {} added".format(task.header.task_id))
             self.notice_task_updated(task.header.task_id)
 
-    def dump_task(self, task_id):
-        logger.debug('DUMP TASK')
+    def dump_task(self, task_id, subtask_id=None):
+        """ Save task, its state and subtask states in the tasks journal. Records that haven't changed since
+        the last dump are not written again.
+        :param str task_id: id of the task to save
+        :param str subtask_id: if given, only this subtask has changed, so only its state and the task state
+                               are saved; the task itself is saved later by flush_task_dumps
+        """
+        logger.debug('DUMP TASK %r %r', task_id, subtask_id)
         try:
-            data = self.tasks[task_id], self.tasks_states[task_id]
-            filepath = self.tasks_dir / ('%s.pickle' % (task_id,))
-            logger.debug('DUMP TASK %r', filepath)
-            with filepath.open('wb') as f:
-                pickle.dump(data, f, protocol=2)
+            state = self.tasks_states[task_id]
+            dumped = self._dumped_subtasks.setdefault(task_id, set())
+
+            # Subtask states are saved separately
+            state_copy = copy.copy(state)
+            state_copy.subtask_states = {}
+            self.tasks_journal.put(('state', task_id), state_copy)
+
+            if subtask_id is not None:
+                self._dump_subtask(task_id, subtask_id, dumped)
+                self._dirty_tasks.add(task_id)
+                self.flush_task_dumps()
+                return
+
+            self.tasks_journal.put(('task', task_id), self.tasks[task_id])
+            self._dirty_tasks.discard(task_id)
+            for subtask_id in dumped | set(state.subtask_states):
+                self._dump_subtask(task_id, subtask_id, dumped)
         except:
             logger.exception('DUMP ERROR task_id: %r task: %r state: %r', task_id, self.tasks.get(task_id, '<not found>'), self.tasks_states.get(task_id, '<not found>'))
-            if filepath.exists():
-                filepath.unlink()
+            self.remove_task_dump(task_id)
             raise
 
+    def _dump_subtask(self, task_id, subtask_id, dumped):
+        subtask_state = self.tasks_states[task_id].subtask_states.get(subtask_id)
+        key = ('subtask', task_id, subtask_id)
+        if subtask_state is None:
+            self.tasks_journal.delete(key)
+            dumped.discard(subtask_id)
+        else:
+            self.tasks_journal.put(key, subtask_state)
+            dumped.add(subtask_id)
+
+    def flush_task_dumps(self, force=False):
+        """ Save tasks that have changed since they were last saved
+        :param bool force: save them even if TASK_DUMP_INTERVAL hasn't passed
+        """
+        if not force and time.time() - self._last_task_dump < TASK_DUMP_INTERVAL:
+            return
+        self._last_task_dump = time.time()
+        for task_id in list(self._dirty_tasks):
+            if task_id in self.tasks:
+                self.tasks_journal.put(('task', task_id), self.tasks[task_id])
+        self._dirty_tasks.clear()
+
+    def flush_tasks(self):
+        """ Let tasks write state they keep in memory before shutdown """
+        for task in self.tasks.values():
+            task.flush()
+
+    def remove_task_dump(self, task_id):
+        """ Remove all records of the task from the tasks journal
+        :param str task_id: id of the task to remove
+        """
+        self.tasks_journal.delete(('task', task_id))
+        self.tasks_journal.delete(('state', task_id))
+        for subtask_id in self._dumped_subtasks.pop(task_id, ()):
+            self.tasks_journal.delete(('subtask', task_id, subtask_id))
+        self._dirty_tasks.discard(task_id)
+
     def restore_tasks(self):
         logger.debug('RESTORE TASKS')
+        records = self.tasks_journal.load()
+        if self._import_task_pickles():
+            records = self.tasks_journal.load()
+        self._dumped_subtasks = {}
+        subtask_states = {}
+        for key, value in records.items():
+            if key[0] == 'task':
+                self.tasks[key[1]] = value
+            elif key[0] == 'state':
+                self.tasks_states[key[1]] = value
+            elif key[0] == 'subtask':
+                subtask_states.setdefault(key[1], {})[key[2]] = value
+                self._dumped_subtasks.setdefault(key[1], set()).add(key[2])
+
+        for task_id in list(self.tasks.keys()):
+            if task_id not in self.tasks_states:
+                logger.warning('No state of restored task %r', task_id)
+                del self.tasks[task_id]
+                self.remove_task_dump(task_id)
+                continue
+
+            task, state = self.tasks[task_id], self.tasks_states[task_id]
+            state.subtask_states = subtask_states.get(task_id, {})
+            for subtask_id in state.subtask_states:
+                self.subtask2task_mapping[subtask_id] = task_id
+            logger.debug('RESTORE TASKS really %r', task_id)
+            dispatcher.send(signal='golem.taskmanager', event='task_restored', task=task, state=state)
+
+    def _import_task_pickles(self):
+        """ Move tasks saved as separate pickle files by older versions to the tasks journal
+        :return bool: True if any task has been imported
+        """
+        imported = False
         for path in self.tasks_dir.iterdir():
-            logger.debug('RESTORE TASKS %r', path)
-            if not path.suffix == '.pickle':
+            if not path.suffix == '.pickle' or path.name == CompTaskKeeper.LEGACY_DUMP_NAME:
                 continue
-            logger.debug('RESTORE TASKS really %r', path)
+            logger.debug('RESTORE TASKS importing %r', path)
             with path.open('rb') as f:
                 try:
                     task, state = pickle.load(f)
-                    self.tasks[task.header.task_id] = task
-                    self.tasks_states[task.header.task_id] = state
                 except (pickle.UnpicklingError, EOFError, ImportError):
                     logger.exception('Problem restoring task from: %s', path)
-                    path.unlink()
-                    continue
-            dispatcher.send(signal='golem.taskmanager', event='task_restored', task=task, state=state)
+                    task = None
+            if task is not None:
+                task_id = task.header.task_id
+                self.tasks[task_id] = task
+                self.tasks_states[task_id] = state
+                self.dump_task(task_id)
+                del self.tasks[task_id]
+                del self.tasks_states[task_id]
+                imported = True
+            path.unlink()
+        return imported
 
     @handle_task_key_error
     def resources_send(self, task_id):
@@ -282,7 +388,7 @@ class TaskManager(TaskEventListener):
 
         self.subtask2task_mapping[ctd.subtask_id] = task_id
         self.__add_subtask_to_tasks_states(node_name, node_id, price, ctd, address)
-        self.notice_task_updated(task_id)
+        self.notice_task_updated(task_id, ctd.subtask_id)
         return ctd, False, extra_data.should_wait
 
     def get_tasks_headers(self):
@@ -346,7 +452,14 @@ class TaskManager(TaskEventListener):
         return self.tasks_states[task_id].subtask_states[subtask_id].value
 
     @handle_subtask_key_error
-    def computed_task_received(self, subtask_id, result, result_type):
+    def computed_task_received(self, subtask_id, result, result_type,
+                               verification_finished=None):
+        """ Verify received result
+        :param verification_finished: if given, result is verified
+            asynchronously and this function is called once it's done
+        :return bool: whether result has been accepted; if it's verified
+            asynchronously, whether verification has been started
+        """
         task_id = self.subtask2task_mapping[subtask_id]
 
         subtask_state = self.tasks_states[task_id].subtask_states[subtask_id]
@@ -355,10 +468,23 @@ class TaskManager(TaskEventListener):
         if not SubtaskStatus.is_computed(subtask_status):
             logger.warning("Result for subtask {} when subtask state is {}"
                            .format(subtask_id, subtask_status))
-            self.notice_task_updated(task_id)
+            self.notice_task_updated(task_id, subtask_id)
             return False
 
-        self.tasks[task_id].computation_finished(subtask_id, result, result_type)
+        if verification_finished is None:
+            self.tasks[task_id].computation_finished(subtask_id, result,
+                                                     result_type)
+            return self.__subtask_verified(task_id, subtask_id)
+
+        def verified():
+            self.__subtask_verified(task_id, subtask_id)
+            verification_finished()
+
+        self.tasks[task_id].computation_finished(subtask_id, result,
+                                                 result_type, verified)
+        return True
+
+    def __subtask_verified(self, task_id, subtask_id):
         ss = self.tasks_states[task_id].subtask_states[subtask_id]
         ss.subtask_progress = 1.0
         ss.subtask_rem_time = 0.0
@@ -370,7 +496,7 @@ class TaskManager(TaskEventListener):
         if not self.tasks[task_id].verify_subtask(subtask_id):
             logger.debug("Subtask {} not accepted\n".format(subtask_id))
             ss.subtask_status = SubtaskStatus.failure
-            self.notice_task_updated(task_id)
+            self.notice_task_updated(task_id, subtask_id)
             return False
 
         if self.tasks_states[task_id].status in self.activeStatus:
@@ -382,7 +508,7 @@ class TaskManager(TaskEventListener):
                     self.tasks_states[task_id].status = TaskStatus.finished
                 else:
                     logger.debug("Task {} not accepted".format(task_id))
-        self.notice_task_updated(task_id)
+        self.notice_task_updated(task_id, subtask_id)
         return True
 
     @handle_subtask_key_error
@@ -395,7 +521,7 @@ class TaskManager(TaskEventListener):
         if not SubtaskStatus.is_computed(subtask_status):
             logger.warning("Result for subtask {} when subtask state is {}"
                            .format(subtask_id, subtask_status))
-            self.notice_task_updated(task_id)
+            self.notice_task_updated(task_id, subtask_id)
             return False
 
         self.tasks[task_id].computation_failed(subtask_id)
@@ -405,7 +531,7 @@ class TaskManager(TaskEventListener):
         ss.subtask_status = SubtaskStatus.failure
         ss.stderr = str(err)
 
-        self.notice_task_updated(task_id)
+        self.notice_task_updated(task_id, subtask_id)
         return True
 
     def task_result_incoming(self, subtask_id):
@@ -420,7 +546,7 @@ class TaskManager(TaskEventListener):
                 task.result_incoming(subtask_id)
                 states.subtask_status = SubtaskStatus.downloading
 
-                self.notify_update_task(task_id)
+                self.notice_task_updated(task_id, subtask_id)
             else:
                 logger.error("Unknown task id: {}".format(task_id))
         else:
@@ -449,7 +575,9 @@ class TaskManager(TaskEventListener):
                         nodes_with_timeouts.append(s.computer.node_id)
                         t.computation_failed(s.subtask_id)
                         s.stderr = "[GOLEM] Timeout"
-                        self.notice_task_updated(th.task_id)
+                        self.notice_task_updated(th.task_id, s.subtask_id)
+        if self.task_persistence:
+            self.flush_task_dumps()
         return nodes_with_timeouts
 
     def get_progresses(self):
@@ -497,7 +625,7 @@ class TaskManager(TaskEventListener):
         self.tasks_states[task_id].subtask_states[subtask_id].subtask_status = SubtaskStatus.restarted
         self.tasks_states[task_id].subtask_states[subtask_id].stderr = "[GOLEM] Restarted"
 
-        self.notice_task_updated(task_id)
+        self.notice_task_updated(task_id, subtask_id)
 
     @handle_task_key_error
     def restart_frame_subtasks(self, task_id, frame):
@@ -556,6 +684,8 @@ class TaskManager(TaskEventListener):
         del self.tasks[task_id]
         del self.tasks_states[task_id]
 
+        if self.task_persistence:
+            self.remove_task_dump(task_id)
         self.dir_manager.clear_temporary(task_id)
 
     @handle_task_key_error
@@ -620,9 +750,18 @@ class TaskManager(TaskEventListener):
                            state.to_dictionary(),
                            self.get_task_definition_dict(task))
 
-    def get_tasks_dict(self):
-        return [self.get_task_dict(task_id) for task_id
-                in self.tasks.keys()]
+    def get_tasks_dict(self, cursor=None, limit=None, status=None):
+        """ Return dictionaries of tasks in the order they were added
+        :param cursor: id of the last task of the previous page
+        :param limit: maximal number of tasks, all if None
+        :param status: only tasks with this TaskStatus if given
+        """
+        task_ids = self._after(self.tasks, cursor)
+        if status is not None:
+            task_ids = (task_id for task_id in task_ids
+                        if self.tasks_states[task_id].status == status)
+        return [self.get_task_dict(task_id)
+                for task_id in islice(task_ids, limit)]
 
     def get_subtask_dict(self, subtask_id):
         task_id = self.subtask2task_mapping[subtask_id]
@@ -630,10 +769,32 @@ class TaskManager(TaskEventListener):
         subtask = task_state.subtask_states[subtask_id]
         return subtask.to_dictionary()
 
-    def get_subtasks_dict(self, task_id):
-        task_state = self.tasks_states[task_id]
-        subtasks = task_state.subtask_states
-        return [subtask.to_dictionary() for subtask in subtasks.values()]
+    def get_subtasks_dict(self, task_id, cursor=None, limit=None,
+                          status=None):
+        """ Return dictionaries of subtasks of the task in the order they
+        were started
+        :param cursor: id of the last subtask of the previous page
+        :param limit: maximal number of subtasks, all if None
+        :param status: only subtasks with this SubtaskStatus if given
+        """
+        subtasks = self.tasks_states[task_id].subtask_states
+        subtask_ids = self._after(subtasks, cursor)
+        if status is not None:
+            subtask_ids = (subtask_id for subtask_id in subtask_ids
+                           if subtasks[subtask_id].subtask_status == status)
+        return [subtasks[subtask_id].to_dictionary()
+                for subtask_id in islice(subtask_ids, limit)]
+
+    @staticmethod
+    def _after(keys, cursor):
+        """ Iterate over the keys following the cursor, over all of them if
+        the cursor is None and over none if it isn't one of the keys """
+        keys = iter(list(keys))
+        if cursor is not None:
+            for key in keys:
+                if key == cursor:
+                    break
+        return keys
 
     def get_subtasks_borders(self, task_id, part=1):
         task = self.tasks[task_id]
@@ -714,9 +875,12 @@ class TaskManager(TaskEventListener):
     def notify_update_task(self, task_id):
         self.notice_task_updated(task_id)
 
+    def notify_restart_subtask(self, task_id, subtask_id):
+        self.restart_subtask(subtask_id)
+
     @handle_task_key_error
-    def notice_task_updated(self, task_id):
+    def notice_task_updated(self, task_id, subtask_id=None):
         # self.save_state()
         if self.task_persistence:
-            self.dump_task(task_id)
+            self.dump_task(task_id, subtask_id)
         dispatcher.send(signal='golem.taskmanager', event='task_status_updated', task_id=task_id)
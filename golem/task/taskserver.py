@@ -35,7 +35,8 @@ class TaskServer(PendingConnectionsServer):
         self.config_desc = config_desc
 
         self.node = node
-        self.task_keeper = TaskHeaderKeeper(client.environments_manager, min_price=config_desc.min_price)
+        self.task_keeper = TaskHeaderKeeper(client.environments_manager, min_price=config_desc.min_price,
+                                            get_requestor_trust=client.get_requesting_trust)
         self.task_manager = TaskManager(config_desc.node_name, self.node, self.keys_auth,
                                         root_path=TaskServer.__get_task_manager_root(client.datadir),
                                         use_distributed_resources=config_desc.use_distributed_resource_management,
@@ -57,6 +58,7 @@ class TaskServer(PendingConnectionsServer):
         self.failures_to_send = {}
         self.payments_to_send = set()
         self.payment_requests_to_send = set()
+        self.verdicts_to_send = set()
 
         self.use_ipv6 = use_ipv6
 
@@ -93,6 +95,7 @@ class TaskServer(PendingConnectionsServer):
         self.__send_waiting_results()
         self.send_waiting_payments()
         self.send_waiting_payment_requests()
+        self.send_waiting_verdicts()
         self.task_computer.run()
         self.task_connections_helper.sync()
         self._sync_forwarded_session_requests()
@@ -107,7 +110,18 @@ class TaskServer(PendingConnectionsServer):
         return self.task_keeper.environments_manager.get_environment_by_id(env_id)
 
     # This method chooses random task from the network to compute on our machine
-    def request_task(self):
+    def request_task(self, num_cores=None, max_memory_size=None):
+        """ Request random task from the network
+        :param int num_cores: number of cores offered for the computation,
+                              all cores from the config by default
+        :param int max_memory_size: memory offered for the computation [kB],
+                                    all memory from the config by default
+        :return str|None: id of the requested task
+        """
+        if num_cores is None:
+            num_cores = self.config_desc.num_cores
+        if max_memory_size is None:
+            max_memory_size = self.config_desc.max_memory_size
         theader = self.task_keeper.get_task()
         if theader is None:
             return None
@@ -126,8 +140,8 @@ class TaskServer(PendingConnectionsServer):
                     'estimated_performance': performance,
                     'price': self.config_desc.min_price,
                     'max_resource_size': self.config_desc.max_resource_size,
-                    'max_memory_size': self.config_desc.max_memory_size,
-                    'num_cores': self.config_desc.num_cores
+                    'max_memory_size': max_memory_size,
+                    'num_cores': num_cores
                 }
                 self._add_pending_request(TASK_CONN_TYPES['task_request'], theader.task_owner, theader.task_owner_port, theader.task_owner_key_id, args)
 
@@ -207,26 +221,44 @@ class TaskServer(PendingConnectionsServer):
             except Exception as exc:
                 logger.error("Error closing incoming session: %s", exc)
 
-    def get_tasks_headers(self):
+    def get_tasks_headers(self, known_tasks=None):
+        """ Return known task headers
+        :param list known_tasks: digests of headers that should be skipped
+        :return list: list of task headers dictionary representations
+        """
         ths = self.task_keeper.get_all_tasks() + \
               self.task_manager.get_tasks_headers()
+        if known_tasks:
+            known_tasks = set(known_tasks)
+            ths = [th for th in ths if th.digest() not in known_tasks]
         return [th.to_dict() for th in ths]
 
+    def get_tasks_digests(self):
+        """ Return digests of all known task headers
+        :return list:
+        """
+        ths = self.task_keeper.get_all_tasks() + \
+              self.task_manager.get_tasks_headers()
+        return [th.digest() for th in ths]
+
     def add_task_header(self, th_dict_repr):
         try:
-            if not self.verify_header_sig(th_dict_repr):
-                raise Exception("Invalid signature")
-
             task_id = th_dict_repr["task_id"]
             key_id = th_dict_repr["task_owner_key_id"]
-            task_ids = list(self.task_manager.tasks.keys())
             new_sig = True
 
             if task_id in self.task_keeper.task_headers:
                 header = self.task_keeper.task_headers[task_id]
                 new_sig = th_dict_repr["signature"] != header.signature
 
-            if task_id not in task_ids and key_id != self.node.key and new_sig:
+            # Don't verify headers that we already have
+            if not new_sig or task_id in self.task_manager.tasks:
+                return True
+
+            if not self.verify_header_sig(th_dict_repr):
+                raise Exception("Invalid signature")
+
+            if key_id != self.node.key:
                 self.task_keeper.add_task_header(th_dict_repr)
 
             return True
@@ -238,7 +270,8 @@ class TaskServer(PendingConnectionsServer):
         _bin = TaskHeader.dict_to_binary(th_dict_repr)
         _sig = th_dict_repr["signature"]
         _key = th_dict_repr["task_owner_key_id"]
-        return self.verify_sig(_sig, _bin, _key)
+        # Headers are gossiped repeatedly, remember the ones already checked
+        return self.verify_sig(_sig, _bin, _key, memoize=True)
 
     def remove_task_header(self, task_id):
         self.task_keeper.remove_task_header(task_id)
@@ -280,11 +313,16 @@ class TaskServer(PendingConnectionsServer):
     def decrypt(self, message):
         return self.keys_auth.decrypt(message)
 
+    def get_ecdh_key(self, public_key):
+        if public_key == 0:
+            return None
+        return self.keys_auth.get_ecdh_key(public_key)
+
     def sign(self, data):
         return self.keys_auth.sign(data)
 
-    def verify_sig(self, sig, data, public_key):
-        return self.keys_auth.verify(sig, data, public_key)
+    def verify_sig(self, sig, data, public_key, memoize=False):
+        return self.keys_auth.verify(sig, data, public_key, memoize=memoize)
 
     def get_resource_addr(self):
         return self.client.node.prv_addr
@@ -416,6 +454,23 @@ class TaskServer(PendingConnectionsServer):
         mod = min(max(self.task_manager.get_trust_mod(subtask_id), self.min_trust), self.max_trust)
         Trust.WRONG_COMPUTED.decrease(account_info.key_id, mod)
 
+    def result_verified(self, subtask_id, account_info):
+        """ Accept or reject a verified result and queue the verdict for its
+        provider. The session that delivered the result may be gone by now,
+        so the verdict is sent through any session with the provider, or a
+        new one.
+        :param str subtask_id: subtask which result has been verified
+        :param EthAccountInfo account_info: provider of the result
+        """
+        accepted = bool(self.task_manager.verify_subtask(subtask_id))
+        if accepted:
+            self.accept_result(subtask_id, account_info)
+        else:
+            self.reject_result(subtask_id, account_info)
+        self.verdicts_to_send.add(
+            WaitingVerdict(subtask_id, accepted, account_info))
+        self.send_waiting_verdicts()
+
     def unpack_delta(self, dest_dir, delta, task_id):
         self.client.resource_server.unpack_delta(dest_dir, delta, task_id)
 
@@ -879,6 +934,20 @@ class TaskServer(PendingConnectionsServer):
         session.send_hello()
         session.inform_worker_about_payment(obj)
 
+    def connection_for_verdict_established(self, session, conn_id, obj):
+        # obj - WaitingVerdict
+        logger.debug('connection_for_verdict_established(%r)', obj)
+
+        self.new_session_prepare(
+            session=session,
+            subtask_id=obj.subtask_id,
+            key_id=obj.owner.key_id,
+            conn_id=conn_id
+        )
+        session.send_hello()
+        self._send_verdict(session, obj)
+        self.verdicts_to_send.discard(obj)
+
     def connection_for_payment_request_established(self, session, conn_id, obj):
         # obj - ExpectedIncome
         logger.debug('connection_for_payment_request_established(%r)', obj)
@@ -973,6 +1042,22 @@ class TaskServer(PendingConnectionsServer):
             session_cbk=lambda session, expected_income: session.request_payment(expected_income)
         )
 
+    def send_waiting_verdicts(self):
+        self._send_waiting(
+            elems_set=self.verdicts_to_send,
+            subtask_id_getter=lambda verdict: verdict.subtask_id,
+            p2p_node_getter=lambda verdict: verdict.owner.node_info,
+            req_type=TASK_CONN_TYPES['verdict'],
+            session_cbk=self._send_verdict
+        )
+
+    @staticmethod
+    def _send_verdict(session, verdict):
+        if verdict.accepted:
+            session.send_result_accepted(verdict.subtask_id)
+        else:
+            session.send_result_rejected(verdict.subtask_id)
+
     def send_waiting_payments(self):
         self._send_waiting(
             elems_set=self.payments_to_send,
@@ -1028,6 +1113,12 @@ class TaskServer(PendingConnectionsServer):
         else:
             logger.warning("There is no connection id for handle failure")
 
+    def __connection_for_verdict_failure(self, *args, **kwargs):
+        if 'conn_id' in kwargs:
+            self.final_conn_failure(kwargs['conn_id'])
+        else:
+            logger.warning("There is no connection id for handle failure")
+
     # CONFIGURATION METHODS
     #############################
     @staticmethod
@@ -1044,6 +1135,7 @@ class TaskServer(PendingConnectionsServer):
             TASK_CONN_TYPES['nat_punch']: self.__connection_for_nat_punch_established,
             TASK_CONN_TYPES['payment']: self.connection_for_payment_established,
             TASK_CONN_TYPES['payment_request']: self.connection_for_payment_request_established,
+            TASK_CONN_TYPES['verdict']: self.connection_for_verdict_established,
         })
 
     def _set_conn_failure(self):
@@ -1058,6 +1150,7 @@ class TaskServer(PendingConnectionsServer):
                 self.__connection_for_payment_failure,
             TASK_CONN_TYPES['payment_request']:
                 self.__connection_for_payment_request_failure,
+            TASK_CONN_TYPES['verdict']: self.__connection_for_verdict_failure,
         })
 
     def _set_conn_final_failure(self):
@@ -1070,6 +1163,7 @@ class TaskServer(PendingConnectionsServer):
             TASK_CONN_TYPES['nat_punch']: self.noop,
             TASK_CONN_TYPES['payment']:self.noop,
             TASK_CONN_TYPES['payment_request']: self.noop,
+            TASK_CONN_TYPES['verdict']: self.noop,
         })
 
     def _set_listen_established(self):
@@ -1111,6 +1205,13 @@ class WaitingTaskFailure(object):
         self.err_msg = err_msg
 
 
+class WaitingVerdict(object):
+    def __init__(self, subtask_id, accepted, owner):
+        self.subtask_id = subtask_id
+        self.accepted = accepted
+        self.owner = owner
+
+
 # TODO: Get rid of archaic int labels and use plain strings instead.
 TASK_CONN_TYPES = {
     'task_request': 1,
@@ -1122,6 +1223,7 @@ TASK_CONN_TYPES = {
     'nat_punch': 9,
     'payment': 10,
     'payment_request': 11,
+    'verdict': 12,
 }
 
 
@@ -1,10 +1,9 @@
-
+
 
 from ethereum.utils import denoms
 import logging
 import functools
 import os
-import struct
 import time
 
 from golem.core.common import HandleAttributeError
@@ -23,7 +22,7 @@ from golem.transactions.ethereum.ethereumpaymentskeeper import EthAccountInfo
 
 logger = logging.getLogger(__name__)
 
-TASK_PROTOCOL_ID = 15
+TASK_PROTOCOL_ID = 19
 
 
 def drop_after_attr_error(*args, **kwargs):
@@ -113,12 +112,17 @@ class TaskSession(MiddlemanSafeSession):
     #######################
 
     def encrypt(self, data):
-        """ Encrypt given data using key_id from this connection
+        """ Encrypt given data using key_id from this connection. Symmetric
+            channel cipher is used if secret shared with the peer is
+            available, ECIES otherwise.
         :param str data: data to be encrypted
         :return str: encrypted data or unchanged message
                      (if server doesn't exist)
         """
         if self.task_server:
+            encrypted = self._channel_encrypt(data)
+            if encrypted is not None:
+                return encrypted
             return self.task_server.encrypt(data, self.key_id)
         logger.warning("Can't encrypt message - no task server")
         return data
@@ -134,7 +138,10 @@ class TaskSession(MiddlemanSafeSession):
             logger.warning("Can't decrypt data - no task server")
             return data
         try:
-            data = self.task_server.decrypt(data)
+            decrypted = self._channel_decrypt(data)
+            if decrypted is None:
+                decrypted = self.task_server.decrypt(data)
+            data = decrypted
         except AssertionError:
             logger.info(
                 "Failed to decrypt message from %r:%r, "
@@ -162,6 +169,11 @@ class TaskSession(MiddlemanSafeSession):
         msg.sig = self.task_server.sign(msg.get_short_hash())
         return msg
 
+    def _channel_secret(self):
+        if self.task_server is None:
+            return None
+        return self.task_server.get_ecdh_key(self.key_id)
+
     def verify(self, msg):
         """Verify signature on given message. Check if message was signed
            with key_id from this connection.
@@ -230,7 +242,9 @@ class TaskSession(MiddlemanSafeSession):
 
     @dropped_after()
     def result_received(self, extra_data, decrypt=True):
-        """ Inform server about received result
+        """ Inform server about received result. Verification may take
+        longer than this session lives, so its verdict is sent by the task
+        server.
         :param dict extra_data: dictionary with information about
                                 received result
         :param bool decrypt: tells whether result decryption should
@@ -259,17 +273,17 @@ class TaskSession(MiddlemanSafeSession):
                 self._reject_subtask_result(subtask_id)
                 return
 
-        self.task_manager.computed_task_received(
-            subtask_id,
-            result,
-            result_type
-        )
-        if not self.task_manager.verify_subtask(subtask_id):
-            self._reject_subtask_result(subtask_id)
-            return
+        task_server, result_owner = self.task_server, self.result_owner
 
-        self.task_server.accept_result(subtask_id, self.result_owner)
-        self.send(message.MessageSubtaskResultAccepted(subtask_id=subtask_id))
+        def verified():
+            task_server.result_verified(subtask_id, result_owner)
+
+        if not self.task_manager.computed_task_received(
+                subtask_id,
+                result,
+                result_type,
+                verified):
+            verified()
 
     @log_error()
     def inform_worker_about_payment(self, payment):
@@ -407,16 +421,24 @@ class TaskSession(MiddlemanSafeSession):
         """
         self.send(message.MessageSubtaskResultRejected(subtask_id=subtask_id))
 
+    def send_result_accepted(self, subtask_id):
+        """ Inform that result passed verification
+        :param str subtask_id: subtask that has been accepted
+        """
+        self.send(message.MessageSubtaskResultAccepted(subtask_id=subtask_id))
+
     def send_hello(self):
         """ Send first hello message, that should begin the communication """
         self.send(
             message.MessageHello(
                 client_key_id=self.task_server.get_key_id(),
                 rand_val=self.rand_val,
-                proto_id=TASK_PROTOCOL_ID
+                proto_id=TASK_PROTOCOL_ID,
+                channel_key=self._channel_key()
             ),
             send_unverified=True
         )
+        self._channel_key_sent()
 
     def send_start_session_response(self, conn_id):
         """Inform that this session was started as an answer for a request
@@ -521,6 +543,7 @@ class TaskSession(MiddlemanSafeSession):
             self.task_server.add_task_session(
                 msg.compute_task_def.subtask_id, self
             )
+            self.subtask_id = msg.compute_task_def.subtask_id
             self.task_computer.task_given(msg.compute_task_def)
         else:
             self.send(
@@ -659,7 +682,8 @@ class TaskSession(MiddlemanSafeSession):
         self.dropped()
 
     def _react_to_delta_parts(self, msg):
-        self.task_computer.wait_for_resources(self.task_id, msg.delta_header)
+        self.task_computer.wait_for_resources(self.subtask_id,
+                                              msg.delta_header)
         self.task_server.pull_resources(self.task_id, msg.parts)
         self.task_server.add_resource_peer(
             msg.node_name,
@@ -674,7 +698,7 @@ class TaskSession(MiddlemanSafeSession):
         resources = resource_manager.from_wire(msg.resources)
         client_options = msg.options
 
-        self.task_computer.wait_for_resources(self.task_id, resources)
+        self.task_computer.wait_for_resources(self.subtask_id, resources)
         self.task_server.pull_resources(self.task_id, resources,
                                         client_options=client_options)
 
@@ -699,6 +723,8 @@ class TaskSession(MiddlemanSafeSession):
             self.disconnect(TaskSession.DCRProtocolVersion)
             return
 
+        self._channel_key_received(msg.channel_key)
+
         if send_hello:
             self.send_hello()
         self.send(
@@ -877,7 +903,7 @@ class TaskSession(MiddlemanSafeSession):
 
         if not res_file_path:
             logger.error("Task {} has no resource".format(msg.task_id))
-            self.conn.transport.write(struct.pack("!L", 0))
+            self.conn.transport.write(tcpnetwork.FILE_HEADER.pack(0, 0))
             self.dropped()
             return
 
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 
 import logging
-import peewee
+from collections import OrderedDict
 
 from golem import model
 from golem.transactions.incomeskeeper import IncomesKeeper
@@ -17,41 +17,32 @@ class EthereumIncomesKeeper(IncomesKeeper):
     # http://www.sqlite.org/datatype3.html
     SQLITE3_MAX_INT = 2**31 - 1
 
+    # Number of blocks whose income logs are remembered
+    LOGS_CACHE_SIZE = 32
+
+    def __init__(self):
+        super(EthereumIncomesKeeper, self).__init__()
+        # A batch transfer pays for many subtasks with a single transaction,
+        # its logs are read from the node once for all of them
+        self._logs = OrderedDict()
+
     def received(self, sender_node_id, task_id, subtask_id, transaction_id,
                  block_number, value):
         my_address = self.processor.eth_address()
         logger.debug('MY ADDRESS: %r', my_address)
-        incomes = self.eth_node.get_logs(
-            from_block=block_number,
-            to_block=block_number,
-            topics=[self.LOG_ID, None, my_address]
-        )
+        incomes, cached = self._get_logs(block_number, my_address)
         if not incomes:
             logger.error('Transaction not present: %r', transaction_id)
             return
-        received_tokens = 0
-        # FIXME sum() will overflow if it becomes bigger than 8 bytes
-        # signed int
-        spent_tokens = model.Income.select(peewee.fn.sum(model.Income.value))\
-            .where(model.Income.transaction == transaction_id)\
-            .scalar(convert=True)
-        if spent_tokens is None:
-            spent_tokens = 0
-        received_tokens -= spent_tokens
-        for income_log in incomes:
-            # Should we verify sender address?
-            sender = income_log['topics'][1][-40:]
-            receiver = income_log['topics'][2][-40:]
-            log_value = int(income_log['data'], 16)
-            logger.debug(
-                'INCOME: from %r to %r v:%r',
-                sender,
-                receiver,
-                log_value
-            )
-            # Count tokens only when we're the receiver.
-            if receiver == my_address:
-                received_tokens += log_value
+        received_tokens = self._count_received(
+            incomes, transaction_id, my_address)
+        if cached and received_tokens < value:
+            # The node might have returned the logs before the block was
+            # fully processed
+            incomes, _ = self._get_logs(block_number, my_address,
+                                        refresh=True)
+            received_tokens = self._count_received(
+                incomes, transaction_id, my_address)
         if received_tokens >= self.SQLITE3_MAX_INT:
             logger.error(
                 "Too many tokens received in transaction %r!"
@@ -79,3 +70,46 @@ class EthereumIncomesKeeper(IncomesKeeper):
             block_number=block_number,
             value=value
         )
+
+    def _get_logs(self, block_number, address, refresh=False):
+        """ Return income logs of the block and whether they were cached """
+        key = (block_number, address)
+        if not refresh and key in self._logs:
+            self._logs.move_to_end(key)
+            return self._logs[key], True
+
+        logs = self.eth_node.get_logs(
+            from_block=block_number,
+            to_block=block_number,
+            topics=[self.LOG_ID, None, address]
+        )
+        if logs:
+            self._logs[key] = logs
+            while len(self._logs) > self.LOGS_CACHE_SIZE:
+                self._logs.popitem(last=False)
+        return logs, False
+
+    @staticmethod
+    def _count_received(incomes, transaction_id, my_address):
+        # Values are stored as hex strings, SQL sum() can't add them
+        spent_tokens = sum(
+            income.value for income in
+            model.Income.select(model.Income.value)
+            .where(model.Income.transaction == transaction_id)
+        )
+        received_tokens = -spent_tokens
+        for income_log in incomes:
+            # Should we verify sender address?
+            sender = income_log['topics'][1][-40:]
+            receiver = income_log['topics'][2][-40:]
+            log_value = int(income_log['data'], 16)
+            logger.debug(
+                'INCOME: from %r to %r v:%r',
+                sender,
+                receiver,
+                log_value
+            )
+            # Count tokens only when we're the receiver.
+            if receiver == my_address:
+                received_tokens += log_value
+        return received_tokens
@@ -15,39 +15,46 @@ class IncomesKeeper(object):
     """Keeps information about payments received from other nodes
     """
     def run_once(self):
-        delta = datetime.datetime.now() - datetime.timedelta(minutes=10)
+        now = datetime.datetime.now()
+        delta = now - datetime.timedelta(minutes=10)
         with db.atomic():
-            for expected_income in ExpectedIncome\
-                    .select()\
-                    .where(ExpectedIncome.modified_date < delta)\
-                    .order_by(-ExpectedIncome.id).limit(50):
-                try:
-                    with db.atomic():
-                        Income.get(
-                            sender_node=expected_income.sender_node,
-                            task=expected_income.task,
-                            subtask=expected_income.subtask,
-                        )
-                except Income.DoesNotExist:
-                    # Income is still expected.
-                    with db.atomic():
-                        expected_income.modified_date = datetime.datetime.now()
-                        expected_income.save()
-                    dispatcher.send(
-                        signal="golem.transactions",
-                        event="expected_income",
-                        expected_income=expected_income
-                    )
-                    continue
-                expected_income.delete_instance()
+            expected_incomes = list(
+                ExpectedIncome
+                .select(ExpectedIncome, Income.transaction)
+                .join(Income, peewee.JOIN_LEFT_OUTER, on=(
+                    (ExpectedIncome.sender_node == Income.sender_node) &
+                    (ExpectedIncome.task == Income.task) &
+                    (ExpectedIncome.subtask == Income.subtask)
+                ))
+                .where(ExpectedIncome.modified_date < delta)
+                .order_by(-ExpectedIncome.id)
+                .limit(50)
+            )
+            received = [e.id for e in expected_incomes
+                        if e.income.transaction is not None]
+            # Incomes that are still expected
+            awaiting = [e for e in expected_incomes
+                        if e.income.transaction is None]
+
+            if received:
+                ExpectedIncome.delete() \
+                    .where(ExpectedIncome.id << received) \
+                    .execute()
+            if awaiting:
+                ExpectedIncome.update(modified_date=now) \
+                    .where(ExpectedIncome.id << [e.id for e in awaiting]) \
+                    .execute()
+
+        for expected_income in awaiting:
+            expected_income.modified_date = now
+            dispatcher.send(
+                signal="golem.transactions",
+                event="expected_income",
+                expected_income=expected_income
+            )
 
     def received(self, sender_node_id, task_id, subtask_id, transaction_id,
                  block_number, value):
-        try:
-            with db.transaction():
-                expected_income = ExpectedIncome.get(subtask=subtask_id)
-        except ExpectedIncome.DoesNotExist:
-            expected_income = None
         try:
             with db.transaction():
                 return Income.create(
@@ -70,8 +77,6 @@ class IncomesKeeper(object):
                 transaction_id,
                 db_income.transaction
             )
-        if expected_income:
-            expected_income.delete()
 
     def expect(self, sender_node_id, p2p_node, task_id, subtask_id, value):
         logger.debug(
@@ -89,13 +94,39 @@ class IncomesKeeper(object):
             value=value
         )
 
-    def get_list_of_all_incomes(self):
-        # TODO: pagination
-        return (
+    def get_list_of_all_incomes(self, cursor=None, limit=None, task=None,
+                                confirmed=None):
+        """ Return expected incomes joined with the received ones, newest
+        first
+        :param cursor: id of the last income of the previous page, the list
+                       starts from the newest income if it's None
+        :param limit: maximal number of incomes, no limit if None
+        :param task: only incomes for this task if given
+        :param confirmed: only received (True) or only awaited (False)
+                          incomes if given
+        """
+        query = (
             ExpectedIncome.select(ExpectedIncome, Income)
             .join(Income, peewee.JOIN_LEFT_OUTER, on=(
                 (ExpectedIncome.subtask == Income.subtask) &
                 (ExpectedIncome.sender_node == Income.sender_node)
             ))
-            .order_by(ExpectedIncome.created_date.desc())
+            .order_by(ExpectedIncome.created_date.desc(),
+                      ExpectedIncome.id.desc())
         )
+        if task is not None:
+            query = query.where(ExpectedIncome.task == task)
+        if confirmed is not None:
+            query = query.where(Income.transaction.is_null(not confirmed))
+        if cursor is not None:
+            last = ExpectedIncome.select(ExpectedIncome.created_date) \
+                .where(ExpectedIncome.id == cursor).first()
+            if last is None:
+                return []
+            query = query.where(
+                (ExpectedIncome.created_date < last.created_date) |
+                ((ExpectedIncome.created_date == last.created_date) &
+                 (ExpectedIncome.id < cursor)))
+        if limit is not None:
+            query = query.limit(limit)
+        return query
@@ -2,7 +2,7 @@ import logging
 from datetime import datetime
 
 from golem.core.common import datetime_to_timestamp, to_unicode
-from golem.model import Payment
+from golem.model import Payment, PaymentStatus
 from golem.utils import encode_hex
 
 logger = logging.getLogger(__name__)
@@ -62,12 +62,29 @@ class PaymentsDatabase(object):
             return None
 
     @staticmethod
-    def get_newest_payment(num=30):
+    def get_newest_payment(num=30, cursor=None, status=None):
         """ Return specific number of recently modified payments
-        :param num: number of payments to return
+        :param num: number of payments to return, all if None
+        :param cursor: subtask id of the last payment of the previous page,
+                       the list starts from the newest payment if it's None
+        :param PaymentStatus status: only payments with this status if given
         :return:
         """
-        query = Payment.select().order_by(Payment.modified_date.desc()).limit(num)
+        query = Payment.select().order_by(Payment.modified_date.desc(),
+                                          Payment.subtask.desc())
+        if status is not None:
+            query = query.where(Payment.status == status)
+        if cursor is not None:
+            last = Payment.select(Payment.modified_date) \
+                .where(Payment.subtask == cursor).first()
+            if last is None:
+                return []
+            query = query.where(
+                (Payment.modified_date < last.modified_date) |
+                ((Payment.modified_date == last.modified_date) &
+                 (Payment.subtask < cursor)))
+        if num is not None:
+            query = query.limit(num)
         return query.execute()
 
 
@@ -78,7 +95,16 @@ class PaymentsKeeper(object):
         """ Create new payments keeper instance"""
         self.db = PaymentsDatabase()
 
-    def get_list_of_all_payments(self):
+    def get_list_of_all_payments(self, cursor=None, limit=30, status=None):
+        """ Return recently modified payments, newest first
+        :param cursor: subtask of the last payment of the previous page
+        :param limit: maximal number of payments, all if None
+        :param str status: name of PaymentStatus of the payments if given
+        """
+        if status is not None:
+            status = PaymentStatus[status]
+        payments = self.db.get_newest_payment(limit, cursor=cursor,
+                                              status=status)
         # This data is used by UI.
         return [{
             "subtask": to_unicode(payment.subtask),
@@ -90,7 +116,7 @@ class PaymentsKeeper(object):
             "transaction": to_unicode(payment.details.get('tx')),
             "created": datetime_to_timestamp(payment.created_date),
             "modified": datetime_to_timestamp(payment.modified_date)
-        } for payment in self.db.get_newest_payment()]
+        } for payment in payments]
 
     def finished_subtasks(self, payment_info):
         """ Add new information about finished subtask
@@ -37,29 +37,47 @@ class TransactionSystem(object):
             }
         )
 
-    def get_payments_list(self):
+    def get_payments_list(self, cursor=None, limit=30, status=None):
         """ Return list of all planned and made payments
+        :param cursor: subtask of the last payment of the previous page
+        :param limit: maximal number of payments, all if None
+        :param str status: name of PaymentStatus of the payments if given
         :return list: list of dictionaries describing payments
         """
-        return self.payments_keeper.get_list_of_all_payments()
+        return self.payments_keeper.get_list_of_all_payments(
+            cursor=cursor, limit=limit, status=status)
 
-    def get_incomes_list(self):
+    def get_incomes_list(self, cursor=None, limit=None):
         """ Return list of all expected and received incomes
+        :param cursor: id of the last income of the previous page
+        :param limit: maximal number of incomes, all if None
         :return list: list of dictionaries describing incomes
         """
-        return self.incomes_keeper.get_list_of_all_incomes()
+        return self.incomes_keeper.get_list_of_all_incomes(cursor=cursor,
+                                                           limit=limit)
 
-    def get_incoming_payments(self):
+    def get_incoming_payments(self, cursor=None, limit=None, task=None,
+                              status=None):
         """Returns preprocessed list of pending & confirmed incomes.
         It's optimised for electron GUI.
+        :param cursor: id of the last income of the previous page
+        :param limit: maximal number of incomes, all if None
+        :param task: only incomes for this task if given
+        :param str status: only incomes with this PaymentStatus name
+                           (awaiting or confirmed) if given
         """
-        incomes = self.incomes_keeper.get_list_of_all_incomes()
+        confirmed = None
+        if status is not None:
+            confirmed = PaymentStatus[status] == PaymentStatus.confirmed
+        incomes = self.incomes_keeper.get_list_of_all_incomes(
+            cursor=cursor, limit=limit, task=task, confirmed=confirmed)
 
         def item(o):
             status = PaymentStatus.confirmed if o.income.transaction \
                      else PaymentStatus.awaiting
 
             return {
+                "id": o.id,
                 "task": to_unicode(o.task),
                 "subtask": to_unicode(o.subtask),
                 "payer": to_unicode(o.sender_node),
@@ -614,13 +614,15 @@ class GuiApplicationLogic(QtCore.QObject, AppLogic):
         self.client.key_changed()
 
     @inlineCallbacks
-    def get_payments(self):
-        payments_list = yield self.client.get_payments_list()
+    def get_payments(self, cursor=None, limit=30):
+        payments_list = yield self.client.get_payments_list(cursor=cursor,
+                                                            limit=limit)
         returnValue(payments_list)
 
     @inlineCallbacks
-    def get_incomes(self):
-        incomes_list = yield self.client.get_incomes_list()
+    def get_incomes(self, cursor=None, limit=None):
+        incomes_list = yield self.client.get_incomes_list(cursor=cursor,
+                                                          limit=limit)
         returnValue(incomes_list)
 
     @inlineCallbacks
@@ -63,6 +63,8 @@ True'''
             'resolution_percentage': 100,
             'use_border': True,
             'use_crop_to_border': True,
+            'use_overwrite': True,
+            'use_placeholder': False,
         }
         result = scenefileeditor.generate_blender_crop_file(
                     resolution=resolution,
@@ -1,11 +1,14 @@
 import OpenEXR
 import array
+import importlib.util
 import os
+import sys
 import unittest
 from os import path
 from random import randrange, shuffle
 
 from PIL import Image
+from mock import Mock, patch
 
 from apps.blender.benchmark.benchmark import BlenderBenchmark
 from apps.blender.task.blenderrendertask import (BlenderDefaults,
@@ -21,7 +24,8 @@ from apps.rendering.task.renderingtask import PREVIEW_Y, PREVIEW_X
 from apps.rendering.task.renderingtaskstate import (
     AdvanceRenderingVerificationOptions,
     RenderingTaskDefinition)
-from golem.resource.dirmanager import DirManager
+from golem.core.common import get_golem_path
+from golem.resource.dirmanager import DirManager, find_task_script
 from golem.task.taskbase import ComputeTaskDef
 from golem.task.taskstate import SubtaskStatus, SubtaskState
 from golem.testutils import TempDirFixture
@@ -656,3 +660,32 @@ class TestHelpers(unittest.TestCase):
         assert BlenderTaskTypeInfo.get_task_num_from_pixels(
             5, 1200, task_definition, 30
         ) == 30
+
+
+class TestDockerBlenderTaskScript(unittest.TestCase):
+    def setUp(self):
+        app_dir = os.path.join(get_golem_path(), "apps", "blender")
+        script_path = find_task_script(app_dir, "docker_blendertask.py")
+        spec = importlib.util.spec_from_file_location("docker_blendertask",
+                                                      script_path)
+        self.script = importlib.util.module_from_spec(spec)
+        # params module is generated in the container before the script runs
+        with patch.dict(sys.modules, params=Mock()):
+            spec.loader.exec_module(self.script)
+
+    def test_split_frames_contiguous(self):
+        split_frames = self.script.split_frames
+        assert split_frames([1, 2, 3, 4]) == [(1, 4, 1)]
+        assert split_frames([2, 4, 6, 8]) == [(2, 8, 2)]
+
+    def test_split_frames_non_contiguous(self):
+        split_frames = self.script.split_frames
+        assert split_frames([1, 2, 3, 7, 8, 10]) == \
+            [(1, 3, 1), (7, 8, 1), (10, 10, 1)]
+        assert split_frames([1, 3, 5, 6]) == [(1, 5, 2), (6, 6, 1)]
+        # Runs only go forward
+        assert split_frames([5, 3]) == [(5, 5, 1), (3, 3, 1)]
+
+    def test_split_frames_single_frame(self):
+        assert self.script.split_frames([7]) == [(7, 7, 1)]
+        assert self.script.split_frames([]) == []
@@ -1,9 +1,13 @@
-from mock import Mock
+import os
+import time
+
+from mock import Mock, patch
 
 from golem.testutils import TempDirFixture
 from golem.tools.assertlogs import LogTestCase
 
-from apps.core.task.verificator import CoreVerificator, SubtaskVerificationState, logger
+from apps.core.task.verificator import CoreVerificator, SubtaskVerificationState, logger, \
+    VerificationExecutor, VerificationTimeout
 
 
 class TestCoreVerificator(TempDirFixture, LogTestCase):
@@ -68,3 +72,62 @@ class TestCoreVerificator(TempDirFixture, LogTestCase):
 
         cv._check_files("SUBTASK Z", dict(), ["not a file"], Mock())
         assert cv.get_verification_state("SUBTASK Z") == SubtaskVerificationState.WRONG_ANSWER
+
+    def test_snapshot(self):
+        cv = CoreVerificator()
+        self._fill_with_states(cv)
+        files = self.additional_dir_content([1])
+
+        snapshot = cv.snapshot()
+        assert snapshot.verify("SUBTASK X", dict(), files, Mock()) == \
+            SubtaskVerificationState.VERIFIED
+        assert not cv.is_verified("SUBTASK X")
+        assert not snapshot.is_verified("SUBTASK VERIFIED")
+
+        cv.apply_snapshot(snapshot, "SUBTASK X")
+        assert cv.is_verified("SUBTASK X")
+        assert cv.is_verified("SUBTASK VERIFIED")
+
+        # Nothing to apply if verification didn't get to set a state
+        cv.apply_snapshot(cv.snapshot(), "SUBTASK UNKNOWN")
+        assert cv.ver_states["SUBTASK UNKNOWN"] == \
+            SubtaskVerificationState.UNKNOWN
+
+
+class TestVerificationExecutor(LogTestCase):
+
+    def test_run(self):
+        executor = VerificationExecutor(max_workers=2)
+        try:
+            assert executor.run(pow, 2, 10) == 1024
+            # Function is run in a worker process
+            assert executor.run(os.getpid) != os.getpid()
+        finally:
+            executor.shutdown()
+
+    def test_run_in_calling_thread(self):
+        executor = VerificationExecutor(max_workers=0)
+        assert executor.run(os.getpid) == os.getpid()
+
+    @patch("apps.core.task.verificator.multiprocessing.get_context")
+    def test_pool_unavailable(self, get_context):
+        get_context.return_value.Pool.side_effect = OSError
+        executor = VerificationExecutor(max_workers=2)
+        with self.assertLogs(logger, level="WARNING"):
+            assert executor.run(os.getpid) == os.getpid()
+        # Workers are not forked from this multi-threaded process
+        get_context.assert_called_once_with('spawn')
+
+    def test_timeout(self):
+        executor = VerificationExecutor(max_workers=1, timeout=1)
+        try:
+            pool = executor._get_pool()
+            with self.assertLogs(logger, level="WARNING"):
+                with self.assertRaises(VerificationTimeout):
+                    executor.run(time.sleep, 60)
+            # Pool with the hung worker is replaced
+            assert executor._get_pool() is not pool
+            executor.timeout = 60
+            assert executor.run(pow, 2, 10) == 1024
+        finally:
+            executor.shutdown()
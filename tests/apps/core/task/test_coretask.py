@@ -5,7 +5,7 @@ import zipfile
 import zlib
 from copy import copy
 
-from mock import MagicMock
+from mock import MagicMock, Mock, patch
 
 
 from golem.core.common import is_linux
@@ -106,6 +106,53 @@ class TestCoreTask(LogTestCase, TestDirFixture):
         assert l3.task_id == "xyz"
         assert l2.task_id is None
 
+    @patch("apps.core.task.coretask.get_verification_thread_pool")
+    @patch("apps.core.task.coretask.async_run")
+    def test_computation_finished_async(self, async_run, get_pool):
+        task = self._get_core_task()
+        task.subtasks_given["xxyyzz"] = {"node_id": "node",
+                                         "status": SubtaskStatus.starting}
+        task.counting_nodes["node"] = MagicMock()
+        files = self.additional_dir_content([1])
+        verification_finished = Mock()
+
+        task.computation_finished("xxyyzz", files, result_types["files"],
+                                  verification_finished)
+        assert not verification_finished.called
+        request, verified, _ = async_run.call_args[0]
+        assert async_run.call_args[1]["pool"] == get_pool.return_value
+        assert request.method.__self__ is not task.verificator
+        assert request.args[1] is not task.subtasks_given["xxyyzz"]
+
+        # Verification doesn't touch the task's state...
+        ver_state = request.method(*request.args)
+        assert not task.verificator.is_verified("xxyyzz")
+        assert not task.verify_subtask("xxyyzz")
+
+        # ...which is updated in the reactor thread callback
+        verified(ver_state)
+        assert verification_finished.called
+        assert task.verificator.is_verified("xxyyzz")
+        assert task.verify_subtask("xxyyzz")
+
+    @patch("apps.core.task.coretask.get_verification_thread_pool")
+    @patch("apps.core.task.coretask.async_run")
+    def test_computation_finished_async_error(self, async_run, _):
+        task = self._get_core_task()
+        task.subtasks_given["xxyyzz"] = {"node_id": "node",
+                                         "status": SubtaskStatus.starting}
+        task.counting_nodes["node"] = MagicMock()
+        verification_finished = Mock()
+
+        task.computation_finished("xxyyzz", [], result_types["files"],
+                                  verification_finished)
+        _, _, verification_error = async_run.call_args[0]
+        with self.assertLogs(logger, level="ERROR"):
+            verification_error(Mock())
+        assert verification_finished.called
+        assert task.subtasks_given["xxyyzz"]["status"] == \
+            SubtaskStatus.failure
+
     def test_interpret_task_results_without_sorting(self):
         task = self._get_core_task()
 
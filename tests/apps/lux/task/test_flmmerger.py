@@ -0,0 +1,167 @@
+import os
+import pickle
+
+from mock import Mock, patch
+
+from golem.testutils import PEP8MixIn, TempDirFixture
+
+from apps.lux.task.flmmerger import FlmMerger, is_flm_result_valid
+
+
+class TestFlmMerger(TempDirFixture, PEP8MixIn):
+    PEP8_FILES = [
+        'apps/lux/task/flmmerger.py',
+    ]
+
+    def setUp(self):
+        super(TestFlmMerger, self).setUp()
+        self.accumulator = os.path.join(self.path, "accumulated.flm")
+        self.failure_callback = Mock()
+        self.merger = FlmMerger(Mock(), self.path, self.accumulator,
+                                Mock(), self.failure_callback)
+
+    def _merge_results(self, content="merged", stderr=""):
+        out_dir = os.path.join(self.path, "out")
+        if not os.path.isdir(out_dir):
+            os.makedirs(out_dir)
+        flm = os.path.join(out_dir, "out.flm")
+        log = os.path.join(out_dir, "stderr.log")
+        with open(flm, 'w') as f:
+            f.write(content)
+        with open(log, 'w') as f:
+            f.write(stderr)
+        return {'data': [flm, log]}
+
+    @staticmethod
+    def _merged_files(local_computer):
+        return local_computer.call_args[1]['additional_resources']
+
+    @patch("apps.lux.task.flmmerger.LocalComputer")
+    def test_merge(self, local_computer):
+        callback = Mock()
+        self.merger.when_merged(callback)
+        callback.assert_called_once_with(None)
+
+        self.merger.add("a.flm")
+        assert self._merged_files(local_computer) == ["a.flm"]
+
+        # Files added during a merge are merged together in the next one
+        self.merger.add("b.flm")
+        self.merger.add("c.flm")
+        self.merger.when_merged(callback)
+        assert local_computer.call_count == 1
+
+        self.merger._merge_ready(self._merge_results("a"), 1)
+        assert local_computer.call_count == 2
+        assert self._merged_files(local_computer) == \
+            ["b.flm", "c.flm", self.accumulator]
+        with open(self.accumulator) as f:
+            assert f.read() == "a"
+        assert callback.call_count == 1
+
+        self.merger._merge_ready(self._merge_results("abc"), 1)
+        assert local_computer.call_count == 2
+        callback.assert_called_with(self.accumulator)
+        assert self.merger.merged == ["a.flm", "b.flm", "c.flm"]
+        assert not self.failure_callback.called
+
+    @patch("apps.lux.task.flmmerger.LocalComputer")
+    def test_merge_failure(self, local_computer):
+        self.merger.add("a.flm")
+        self.merger.add("b.flm")
+        self.merger.add("c.flm")
+        self.merger._merge_ready(self._merge_results("a"), 1)
+
+        # Merged flm reported an error, files are merged one by one
+        self.merger._merge_ready(self._merge_results(stderr="ERROR"), 1)
+        assert self._merged_files(local_computer) == \
+            ["b.flm", self.accumulator]
+        assert not self.failure_callback.called
+
+        self.merger._merge_failure("error")
+        self.failure_callback.assert_called_once_with("b.flm")
+        assert self._merged_files(local_computer) == \
+            ["c.flm", self.accumulator]
+
+        self.merger._merge_ready(self._merge_results("ac"), 1)
+        assert self.merger.merged == ["a.flm", "c.flm"]
+
+    @patch("apps.lux.task.flmmerger.LocalComputer")
+    def test_failed_file_blocks_callbacks(self, local_computer):
+        callback = Mock()
+        self.merger.add("a.flm")
+        self.merger.when_merged(callback)
+        self.merger._merge_failure("error")
+        self.failure_callback.assert_called_once_with("a.flm")
+        assert not callback.called
+
+        # The subtask has been restarted, the task registers a new callback
+        # once its result is accepted
+        self.merger.forget_failed("a.flm")
+        self.merger.when_merged(callback)
+        callback.assert_called_once_with(None)
+
+    @patch("apps.lux.task.flmmerger.LocalComputer")
+    def test_no_merged_flm(self, local_computer):
+        self.merger.add("a.flm")
+        self.merger._merge_ready({'data': []}, 1)
+        self.failure_callback.assert_called_once_with("a.flm")
+        assert not os.path.exists(self.accumulator)
+
+    @patch("apps.lux.task.flmmerger.LocalComputer")
+    def test_file_callbacks(self, local_computer):
+        merged, failed = Mock(), Mock()
+        self.merger.add("a.flm", merged)
+        self.merger._merge_ready(self._merge_results("a"), 1)
+        merged.assert_called_once_with(True)
+
+        self.merger.add("b.flm", failed)
+        self.merger._merge_failure("error")
+        failed.assert_called_once_with(False)
+        # File is not kept as failed, its result is rejected instead
+        assert not self.failure_callback.called
+        callback = Mock()
+        self.merger.when_merged(callback)
+        callback.assert_called_once_with(self.accumulator)
+
+    @patch("apps.lux.task.flmmerger.LocalComputer")
+    def test_pickling_waiting_files(self, local_computer):
+        merger = FlmMerger(None, self.path, self.accumulator, None, None)
+        merger.add("a.flm", Mock())
+        merger.add("b.flm")
+        merger.add("c.flm", Mock())
+        merger = pickle.loads(pickle.dumps(merger))
+        # Files waiting for their verdict are not merged after a restore
+        assert merger._pending == ["b.flm"]
+        assert not merger._file_callbacks
+
+    @patch("apps.lux.task.flmmerger.LocalComputer")
+    def test_pickling(self, local_computer):
+        self.merger.add("a.flm")
+        self.merger.add("b.flm")
+        merger = pickle.loads(pickle.dumps(FlmMerger(
+            None, self.path, self.accumulator, None, None)))
+        assert merger.accumulator_path == self.accumulator
+
+        self.merger._failed = ["c.flm"]
+        state = self.merger.__getstate__()
+        assert '_lock' not in state
+        merger.__setstate__(state)
+        # The merge that was running and failed files have to be done again
+        assert merger._pending == ["c.flm", "a.flm", "b.flm"]
+        assert not merger._merging
+        assert not merger._failed
+
+    def test_is_flm_result_valid(self):
+        results = self._merge_results()
+        flm, log = results['data']
+        assert is_flm_result_valid(flm, [flm, log])
+        assert not is_flm_result_valid(flm, [flm])
+        assert not is_flm_result_valid(None, [log])
+        assert not is_flm_result_valid("missing.flm", [log])
+
+        open(flm, 'w').close()
+        assert not is_flm_result_valid(flm, [flm, log])
+
+        flm, log = self._merge_results(stderr="ERROR")['data']
+        assert not is_flm_result_valid(flm, [flm, log])
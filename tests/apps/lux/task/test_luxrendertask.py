@@ -12,9 +12,11 @@ from golem.core.common import is_linux
 from golem.resource.dirmanager import DirManager
 from golem.testutils import PEP8MixIn, TempDirFixture
 from golem.tools.assertlogs import LogTestCase
-from golem.task.taskbase import ComputeTaskDef
+from golem.task.taskbase import ComputeTaskDef, TaskEventListener
+from golem.task.taskstate import SubtaskStatus
 
 from apps.core.task.coretask import AcceptClientVerdict, TaskTypeInfo
+from apps.core.task.verificator import SubtaskVerificationState
 from apps.lux.task.luxrendertask import (
     logger,
     LuxRenderDefaults,
@@ -113,9 +115,7 @@ class TestLuxRenderTask(TempDirFixture, LogTestCase, PEP8MixIn):
         luxtask.after_test({}, self.path)
 
     def __queries(self, luxtask):
-        luxtask.collected_file_names["xxyyzz"] = "xxyyzzfile"
-        luxtask.collected_file_names["abcd"] = "abcdfile"
-        ctd = luxtask.query_extra_data_for_final_flm()
+        ctd = luxtask._get_merge_ctd(["xxyyzzfile", "abcdfile"])
         self.assertIsInstance(ctd, ComputeTaskDef)
         assert ctd.src_code is not None
         assert ctd.extra_data['output_flm'] == luxtask.output_file
@@ -127,7 +127,8 @@ class TestLuxRenderTask(TempDirFixture, LogTestCase, PEP8MixIn):
         luxtask.res_x = 800
         luxtask.res_y = 600
         luxtask.scale_factor = 2
-        luxtask._remove_from_preview("UNKNOWN SUBTASK")
+        luxtask.subtasks_given["SUBTASK0"] = {"status": 'Finished'}
+        luxtask._remove_from_preview("SUBTASK0")
         assert os.path.isfile(luxtask.preview_file_path)
         preview_img = Image.open(luxtask.preview_file_path)
         assert preview_img.getpixel((100, 100)) == (0, 0, 0)
@@ -148,24 +149,35 @@ class TestLuxRenderTask(TempDirFixture, LogTestCase, PEP8MixIn):
             "status": 'Finished',
             'preview_file': image_2
         }
+        luxtask._update_preview(image_1, 1)
+        luxtask._update_preview(image_2, 2)
+        preview = luxtask._get_preview_canvas()
+        assert preview.copy().getpixel((100, 100)) == (127, 127, 0)
+
         luxtask._remove_from_preview("SUBTASK1")
-        preview_img = Image.open(luxtask.preview_file_path)
-        assert preview_img.getpixel((100, 100)) == (0, 255, 0)
+        assert preview.copy().getpixel((100, 100)) == (0, 255, 0)
         luxtask.subtasks_given["SUBTASK3"] = {
             "status": 'Finished',
             'preview_file': image_3,
         }
+        luxtask._update_preview(image_3, 3)
+        # Subtask which was removed already
         luxtask._remove_from_preview("SUBTASK1")
-        preview_img = Image.open(luxtask.preview_file_path)
-        assert preview_img.getpixel((100, 100)) == (0, 127, 127)
+        assert preview.copy().getpixel((100, 100)) == (0, 127, 127)
         luxtask.subtasks_given["SUBTASK4"] = {"status": 'Not inished',
                                               'preview_file': "not a file"}
-        luxtask._remove_from_preview("SUBTASK1")
+        luxtask._remove_from_preview("SUBTASK4")
+        preview.flush(force=True)
         preview_img = Image.open(luxtask.preview_file_path)
         assert preview_img.getpixel((100, 100)) == (0, 127, 127)
 
+        # After unpickling the mean is computed from the files again
+        preview = pickle.loads(pickle.dumps(preview))
+        preview.remove_file(image_2)
+        assert preview.copy().getpixel((100, 100)) == (0, 0, 255)
 
-    def test_accept_results(self):
+    @patch("apps.lux.task.flmmerger.LocalComputer")
+    def test_accept_results(self, local_computer):
         luxtask = self.get_test_lux_task()
         luxtask.total_tasks = 20
         luxtask.res_x = 800
@@ -192,6 +204,113 @@ class TestLuxRenderTask(TempDirFixture, LogTestCase, PEP8MixIn):
         preview_img.close()
         assert luxtask.num_tasks_received == 1
         assert luxtask.collected_file_names[1] == flm_file
+        local_computer.assert_called_once()
+        assert local_computer.call_args[1]['additional_resources'] == \
+            [flm_file]
+
+    def test_result_verified(self):
+        luxtask = self.get_test_lux_task()
+        luxtask.res_x = 800
+        luxtask.res_y = 600
+        for subtask_id, node_id in [("SUBTASK1", "NODE_1"),
+                                    ("SUBTASK2", "NODE_2")]:
+            luxtask.subtasks_given[subtask_id] = {
+                "start_task": int(subtask_id[-1]),
+                "status": SubtaskStatus.starting,
+                "node_id": node_id,
+            }
+            luxtask._accept_client(node_id)
+        flm_file = os.path.join(self.path, "result.flm")
+        log_file = self.temp_file_name("stdout.log")
+        luxtask.flm_merger = Mock(merged=[flm_file])
+        finished = Mock()
+
+        # Verdict waits for the flm file to be merged
+        luxtask._result_verified("SUBTASK1",
+                                 SubtaskVerificationState.VERIFIED,
+                                 [flm_file, log_file], finished)
+        assert not finished.called
+        assert not luxtask.verify_subtask("SUBTASK1")
+        (merged_file, merged), _ = luxtask.flm_merger.add.call_args
+        assert merged_file == flm_file
+
+        with patch("twisted.internet.reactor.callFromThread",
+                   side_effect=lambda f, *args: f(*args)):
+            merged(True)
+        finished.assert_called_once_with()
+        assert luxtask.verify_subtask("SUBTASK1")
+        assert luxtask.num_tasks_received == 1
+        # File is not merged again
+        assert luxtask.flm_merger.add.call_count == 1
+
+        # Result with a file that can't be merged is rejected
+        finished.reset_mock()
+        luxtask._result_verified("SUBTASK2",
+                                 SubtaskVerificationState.VERIFIED,
+                                 [flm_file, log_file], finished)
+        (_, merged), _ = luxtask.flm_merger.add.call_args
+        with patch("twisted.internet.reactor.callFromThread",
+                   side_effect=lambda f, *args: f(*args)):
+            merged(False)
+        finished.assert_called_once_with()
+        assert luxtask.subtasks_given["SUBTASK2"]["status"] == \
+            SubtaskStatus.failure
+        assert luxtask.num_tasks_received == 1
+        assert luxtask.counting_nodes["NODE_2"].rejected()
+
+        # Wrong results are rejected right away
+        finished.reset_mock()
+        luxtask._result_verified("SUBTASK2",
+                                 SubtaskVerificationState.WRONG_ANSWER,
+                                 [flm_file, log_file], finished)
+        finished.assert_called_once_with()
+        assert luxtask.flm_merger.add.call_count == 2
+
+    def test_flm_merge_failed(self):
+        luxtask = self.get_test_lux_task()
+        luxtask.res_x = 800
+        luxtask.res_y = 600
+        luxtask.subtasks_given["SUBTASK1"] = {
+            "start_task": 1,
+            "end_task": 1,
+            "status": SubtaskStatus.finished,
+            "node_id": "NODE_1",
+        }
+        luxtask._accept_client("NODE_1")
+        luxtask.collected_file_names[1] = "result.flm"
+        luxtask.num_tasks_received = 1
+        listener = Mock(spec=TaskEventListener)
+        luxtask.register_listener(listener)
+        luxtask.flm_merger = Mock()
+
+        with patch("twisted.internet.reactor.callFromThread",
+                   side_effect=lambda f, *args: f(*args)) as call:
+            luxtask._flm_merge_failed("other.flm")
+            assert call.called
+            assert not listener.notify_restart_subtask.called
+            luxtask.flm_merger.forget_failed.assert_called_with("other.flm")
+
+            luxtask._flm_merge_failed("result.flm")
+            assert 1 not in luxtask.collected_file_names
+            listener.notify_restart_subtask.assert_called_once_with(
+                luxtask.header.task_id, "SUBTASK1")
+            luxtask.flm_merger.forget_failed.assert_called_with("result.flm")
+
+    def test_merged_flm_ready(self):
+        luxtask = self.get_test_lux_task()
+        luxtask.output_file = os.path.join(self.path, "outputfile")
+        flm_file = os.path.join(self.path, "accumulated.flm")
+        open(flm_file, 'w').close()
+
+        with patch.object(luxtask, "_LuxTask__generate_final_file") as gen:
+            # Not all results have been merged
+            luxtask._merged_flm_ready(flm_file)
+            assert not gen.called
+
+            luxtask.num_tasks_received = luxtask.total_tasks
+            luxtask._merged_flm_ready(flm_file)
+            gen.assert_called_once_with(luxtask.output_file + ".flm")
+            assert os.path.isfile(luxtask.output_file + ".flm")
 
     def test_pickling(self):
         """Test for issue #873
@@ -201,7 +320,7 @@ class TestLuxRenderTask(TempDirFixture, LogTestCase, PEP8MixIn):
         p = Path(__file__).parent / "samples" / "GoldenGate.exr"
         luxtask = self.get_test_lux_task()
         luxtask.res_x, luxtask.res_y = 1262, 860
-        luxtask._update_preview_from_exr(str(p))
+        luxtask._update_preview(str(p), 1)
         pickle.dumps(luxtask)
 
     def test_query_extra_data_for_test_task(self):
@@ -237,8 +356,9 @@ class TestLuxRenderTask(TempDirFixture, LogTestCase, PEP8MixIn):
         # If Lux cannot find merge script, an error log should be returned
         find_task_script_mock.return_value = None
 
+        luxtask = self.get_test_lux_task()
         with self.assertLogs(logger, level="ERROR") as l:
-            assert self.get_test_lux_task()
+            assert luxtask._get_merge_ctd([]) is None
 
         assert any("Cannot find merger script" in log for log in l.output)
 
@@ -271,12 +391,10 @@ class TestLuxRenderTask(TempDirFixture, LogTestCase, PEP8MixIn):
             )
         assert any("No final file generated" in log for log in l.output)
 
+        luxtask.num_tasks_received = luxtask.total_tasks
         with self.assertLogs(logger, level="ERROR") as l:
-            luxtask._LuxTask__final_flm_ready(
-                {"data": self.additional_dir_content([1, [2]])},
-                10
-            )
-        assert any("No flm file created" in log for log in l.output)
+            luxtask._merged_flm_ready(None)
+        assert any("No flm file merged" in log for log in l.output)
 
         if not is_linux():
             return
@@ -1,11 +1,12 @@
 import os
-from mock import patch, Mock
+
+from mock import Mock, patch
 
 from golem.testutils import PEP8MixIn, TempDirFixture
 from golem.tools.assertlogs import LogTestCase
 
 from apps.core.task.verificator import SubtaskVerificationState
-from apps.lux.task.verificator import LuxRenderVerificator, logger
+from apps.lux.task.verificator import LuxRenderVerificator
 from apps.rendering.task.renderingtaskstate import AdvanceRenderingVerificationOptions
 
 
@@ -25,36 +26,28 @@ class TestLuxRenderVerificator(TempDirFixture, LogTestCase, PEP8MixIn):
         lrv._check_files("SUBTASK2", {}, ["not existing"], Mock())
         assert lrv.get_verification_state("SUBTASK2") == SubtaskVerificationState.WRONG_ANSWER
 
-    @patch("apps.lux.task.verificator.LocalComputer")
-    def test_merge_flm_files_failure(self, mock_lc):
-        mock_lc.return_value.tt = None
-        lrv = LuxRenderVerificator(AdvanceRenderingVerificationOptions)
-        lrv.tmp_dir = self.path
-        assert not lrv.merge_flm_files("flm_file", Mock(), "flm_output")
-        mock_lc.return_value.tt = Mock()
-        lrv.verification_error = True
-        assert not lrv.merge_flm_files("flm_file", Mock(), "flm_output")
-        lrv.verification_error = False
-        mock_lc.return_value.tt.result = {'data': self.additional_dir_content([3])}
-        assert not lrv.merge_flm_files("flm_file", Mock(), "flm_output")
-        flm_file = os.path.join(self.path, "bla.flm")
-        open(flm_file, 'w').close()
-        mock_lc.return_value.tt.result = {'data': self.additional_dir_content([1]) + [flm_file]}
-        assert not lrv.merge_flm_files("flm_file", Mock(), "flm_output")
-        stderr_file = os.path.join(self.path, "stderr.log")
-        mock_lc.return_value.tt.result = {'data': [flm_file, stderr_file]}
-        assert not lrv.merge_flm_files("flm_file", Mock(), "flm_output")
-        open(stderr_file, 'w').close()
-        assert lrv.merge_flm_files("flm_file", Mock(), "flm_output")
-        with open(stderr_file, 'w') as f:
-            f.write("ERROR at merging files")
-
-        assert not lrv.merge_flm_files("flm_file", Mock(), "flm_output")
-
-    def test_flm_verify_failure(self):
+    @patch("apps.lux.task.verificator.verification_executor")
+    def test_check_flm_files(self, executor):
+        executor.run.return_value = [SubtaskVerificationState.VERIFIED]
         lrv = LuxRenderVerificator(AdvanceRenderingVerificationOptions)
-        with self.assertLogs(logger, level="INFO"):
-            lrv._LuxRenderVerificator__verify_flm_failure("Error in something")
-        assert lrv.verification_error
-
-
+        lrv._get_reference_img_paths = Mock(return_value=[])
+        task = Mock(output_format="png")
+
+        flm = os.path.join(self.path, "result.flm")
+        log = os.path.join(self.path, "stderr.log")
+        png = os.path.join(self.path, "result.png")
+        for path in (flm, log, png):
+            with open(path, 'w') as f:
+                f.write("data")
+
+        lrv._check_files("SUBTASK1", {}, [flm, log, png], task)
+        assert lrv.get_verification_state("SUBTASK1") == \
+            SubtaskVerificationState.VERIFIED
+
+        # Broken flm files are rejected before the results are compared
+        executor.run.reset_mock()
+        open(flm, 'w').close()
+        lrv._check_files("SUBTASK2", {}, [flm, log, png], task)
+        assert lrv.get_verification_state("SUBTASK2") == \
+            SubtaskVerificationState.WRONG_ANSWER
+        assert not executor.run.called
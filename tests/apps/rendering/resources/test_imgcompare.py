@@ -1,15 +1,19 @@
 import os
 
+import numpy
 from PIL import Image
 
 from apps.rendering.resources.imgcompare import *
 
 from apps.rendering.resources.imgcompare import (advance_verify_img,
+                                                 calculate_arrays_mse,
+                                                 calculate_ssim,
                                                  check_size, compare_exr_imgs,
                                                  compare_imgs,
                                                  compare_pil_imgs,
                                                  calculate_mse,
-                                                 calculate_psnr, logger)
+                                                 calculate_psnr, crop_array,
+                                                 logger)
 from apps.rendering.resources.imgrepr import load_img, PILImgRepr
 
 from golem.testutils import TempDirFixture, PEP8MixIn
@@ -167,6 +171,45 @@ class TestCompareImgFunctions(TempDirFixture, LogTestCase, PEP8MixIn):
 
         assert calculate_mse(img1, img2, start1=(0, 0), start2=(2, 2), box=(7, 7)) == 0
 
+    def test_crop_array(self):
+        arr = numpy.arange(5 * 4 * 3).reshape((4, 5, 3))
+        cropped = crop_array(arr, (1, 2), (3, 2))
+        assert cropped.shape == (2, 3, 3)
+        assert (cropped == arr[2:4, 1:4]).all()
+
+        with self.assertRaises(ValueError):
+            crop_array(arr, (3, 0), (3, 2))
+        with self.assertRaises(ValueError):
+            crop_array(arr, (0, 3), (3, 2))
+        with self.assertRaises(ValueError):
+            crop_array(arr, (-1, 0), (3, 2))
+
+    def test_calculate_arrays_mse(self):
+        arr1 = numpy.zeros((600, 2, 3), dtype=numpy.uint8)
+        arr2 = numpy.full((600, 2, 3), 255, dtype=numpy.uint8)
+        assert calculate_arrays_mse(arr1, arr1) == 0
+        assert calculate_arrays_mse(arr1, arr2) == 255 * 255
+
+        arr2[0, 0, 0] = 0
+        assert calculate_arrays_mse(arr1, arr2) == \
+            (arr2.size - 1) * 255 * 255 / arr2.size
+
+        farr1 = numpy.full((3, 3, 3), 0.5, dtype=numpy.float32)
+        farr2 = numpy.full((3, 3, 3), 0.25, dtype=numpy.float32)
+        assert calculate_arrays_mse(farr1, farr2) == 0.0625
+
+        with self.assertRaises(ValueError):
+            calculate_arrays_mse(arr1, farr1)
+        with self.assertRaises(ValueError):
+            calculate_arrays_mse(arr1[:0], arr2[:0])
+
+    def test_calculate_ssim(self):
+        grey = numpy.arange(40 * 30, dtype=numpy.uint8).reshape((30, 40))
+        assert abs(calculate_ssim(grey, grey) - 1.0) < 1e-9
+        assert calculate_ssim(grey, 255 - grey) < 0
+
+        with self.assertRaises(ValueError):
+            calculate_ssim(grey, grey[1:])
 
     def test_compare_imgs(self):
         img1_path = self.temp_file_name("img1.png")
@@ -31,6 +31,9 @@ class TImgRepr(ImgRepr):
     def to_pil(self):
         super(TImgRepr, self).to_pil()
 
+    def to_array(self):
+        super(TImgRepr, self).to_array()
+
 
 class TestImgRepr(unittest.TestCase, PEP8MixIn):
     PEP8_FILES = [
@@ -44,6 +47,7 @@ class TestImgRepr(unittest.TestCase, PEP8MixIn):
         t.get_size()
         t.copy()
         t.to_pil()
+        t.to_array()
         t.set_pixel((0, 0), (0, 0, 0))
 
 
@@ -89,6 +93,16 @@ class TestPILImgRepr(TempDirFixture, PEP8MixIn):
         assert p_copy.get_pixel((5, 3)) == [200, 210, 220]
         assert p.get_pixel((5, 3)) == [255, 0, 0]
 
+    def test_to_array(self):
+        img_path = self.temp_file_name('img.png')
+        p = get_pil_img_repr(img_path, size=(10, 8))
+        p.set_pixel((3, 5), [10, 11, 12])
+
+        arr = p.to_array()
+        assert arr.shape == (8, 10, 3)
+        assert list(arr[5, 3]) == [10, 11, 12]
+        assert list(arr[0, 0]) == [255, 0, 0]
+
 
 def almost_equal(v1, v2):
     assert abs(v1 - v2) < 0.001
@@ -185,6 +199,15 @@ class TestExrImgRepr(TempDirFixture, PEP8MixIn):
         img3 = img_alt.to_pil(use_extremas=True)
         assert isinstance(img3, Image.Image)
 
+    def test_to_array(self):
+        e = get_exr_img_repr()
+        arr = e.to_array()
+        assert arr.shape == (10, 10, 3)
+        assert list(arr[5, 5]) == e.get_pixel((5, 5))
+
+        e.set_pixel((4, 2), [0.1, 0.2, 0.3])
+        almost_equal_pixels(e.to_array()[2, 4], [0.1, 0.2, 0.3])
+
     def test_to_l_image(self):
         e = get_exr_img_repr()
         img = e.to_l_image()
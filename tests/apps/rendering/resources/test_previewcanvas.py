@@ -0,0 +1,105 @@
+import os
+import pickle
+import time
+
+from PIL import Image
+
+from golem.testutils import PEP8MixIn, TempDirFixture
+
+from apps.rendering.resources.previewcanvas import (MeanPreviewCanvas,
+                                                    PreviewCanvas)
+
+
+class TestPreviewCanvas(TempDirFixture, PEP8MixIn):
+    PEP8_FILES = [
+        'apps/rendering/resources/previewcanvas.py',
+    ]
+
+    def setUp(self):
+        super(TestPreviewCanvas, self).setUp()
+        self.preview_path = os.path.join(self.path, "preview.png")
+
+    def _pixel_in_file(self, xy):
+        with Image.open(self.preview_path) as img:
+            return img.getpixel(xy)
+
+    def test_paste_and_flush(self):
+        canvas = PreviewCanvas(self.preview_path, (10, 20))
+        canvas.paste(Image.new("RGB", (10, 10), (255, 0, 0)), (0, 10))
+        assert not os.path.exists(self.preview_path)
+
+        canvas.flush()
+        assert self._pixel_in_file((5, 5)) == (0, 0, 0)
+        assert self._pixel_in_file((5, 15)) == (255, 0, 0)
+
+        with canvas.edit() as img:
+            img.paste((0, 255, 0), (0, 0, 10, 10))
+        assert canvas.copy().getpixel((5, 5)) == (0, 255, 0)
+
+    def test_flush_is_throttled(self):
+        canvas = PreviewCanvas(self.preview_path, (10, 10),
+                               flush_interval=0.2)
+        canvas.paste((255, 0, 0), (0, 0, 10, 10))
+        canvas.flush()
+        canvas.paste((0, 255, 0), (0, 0, 10, 10))
+        canvas.flush()
+        assert self._pixel_in_file((5, 5)) == (255, 0, 0)
+
+        # Delayed flush catches up with the last change
+        time.sleep(0.5)
+        assert self._pixel_in_file((5, 5)) == (0, 255, 0)
+
+        canvas.paste((0, 0, 255), (0, 0, 10, 10))
+        canvas.flush()
+        canvas.clear()
+        canvas.flush(force=True)
+        assert self._pixel_in_file((5, 5)) == (0, 0, 0)
+
+    def test_load_from_file(self):
+        Image.new("RGB", (10, 10), (0, 0, 255)).save(self.preview_path)
+        canvas = PreviewCanvas(self.preview_path, (10, 10))
+        assert canvas.copy().getpixel((5, 5)) == (0, 0, 255)
+
+        # File of a different size is not used
+        canvas = PreviewCanvas(self.preview_path, (20, 10))
+        assert canvas.copy().getpixel((5, 5)) == (0, 0, 0)
+
+    def test_pickling(self):
+        canvas = PreviewCanvas(self.preview_path, (10, 10))
+        canvas.add(Image.new("RGB", (10, 10), (0, 100, 0)))
+        canvas.add(Image.new("RGB", (10, 10), (0, 100, 0)))
+
+        # Pickling doesn't write the file
+        restored = pickle.loads(pickle.dumps(canvas))
+        assert not os.path.exists(self.preview_path)
+        assert restored.copy().getpixel((5, 5)) == (0, 0, 0)
+
+        canvas.flush(force=True)
+        restored = pickle.loads(pickle.dumps(canvas))
+        assert restored.copy().getpixel((5, 5)) == (0, 200, 0)
+
+
+class TestMeanPreviewCanvas(TempDirFixture):
+
+    def _image_file(self, name, color):
+        file_path = os.path.join(self.path, name)
+        Image.new("RGB", (20, 20), color).save(file_path)
+        return file_path
+
+    def test_add_and_remove(self):
+        red = self._image_file("red.png", (255, 0, 0))
+        blue = self._image_file("blue.png", (0, 0, 255))
+        canvas = MeanPreviewCanvas(os.path.join(self.path, "preview.png"),
+                                   (10, 10))
+
+        assert canvas.add_file(red)
+        assert canvas.add_file(blue)
+        assert not canvas.add_file(os.path.join(self.path, "not_a_file"))
+        assert canvas.copy().getpixel((5, 5)) == (127, 0, 127)
+
+        canvas.remove_file(red)
+        assert canvas.files == [blue]
+        assert canvas.copy().getpixel((5, 5)) == (0, 0, 255)
+
+        canvas.remove_file(blue)
+        assert canvas.copy().getpixel((5, 5)) == (0, 0, 0)
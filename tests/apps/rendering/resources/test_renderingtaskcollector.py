@@ -1,4 +1,5 @@
 import os
+import pickle
 
 from PIL import Image
 
@@ -103,3 +104,69 @@ class TestRenderingTaskCollector(TestDirFixture):
         img = collector.finalize()
         assert isinstance(img, Image.Image)
         assert img.size == (10, 20)
+
+    def test_composite(self):
+        collector = RenderingTaskCollector(paste=True, width=10, height=30)
+        colors = [(255, 0, 0), (0, 255, 0), (0, 0, 255)]
+        for i, color in enumerate(colors):
+            img_path = self.temp_file_name("img{}.png".format(i))
+            make_test_img(img_path, color=color)
+            collector.add_img_file(img_path)
+            collector.composite()
+            assert collector._canvas.size == (10, 30)
+
+        final_img = collector.finalize()
+        assert final_img.size == (10, 30)
+        for i, color in enumerate(colors):
+            assert final_img.getpixel((5, 10 * i + 5)) == color
+
+    def test_composite_without_height(self):
+        collector = RenderingTaskCollector(paste=True)
+        for i in range(3):
+            img_path = self.temp_file_name("img{}.png".format(i))
+            make_test_img(img_path)
+            collector.add_img_file(img_path)
+            collector.composite()
+            # The canvas is sized once all the results are known
+            assert collector._canvas is None
+
+        final_img = collector.finalize()
+        assert final_img.size == (10, 30)
+
+    def test_add_part(self):
+        collector = RenderingTaskCollector(paste=True, width=10, height=30)
+        colors = [(255, 0, 0), (0, 255, 0), (0, 0, 255)]
+        paths = []
+        for i, color in enumerate(colors):
+            paths.append(self.temp_file_name("img{}.png".format(i)))
+            make_test_img(paths[-1], color=color)
+
+        collector.add_part(2, paths[1])
+        collector.add_part(3, paths[2])
+        assert collector._composited_imgs == 0
+        collector.add_part(1, paths[0])
+        assert collector._composited_imgs == 3
+        assert not collector.waiting_parts
+
+        # Part computed again replaces the old one
+        replaced = self.temp_file_name("replaced.png")
+        make_test_img(replaced, color=(255, 255, 255))
+        collector.add_part(2, replaced)
+
+        final_img = collector.finalize()
+        assert final_img.getpixel((5, 5)) == colors[0]
+        assert final_img.getpixel((5, 15)) == (255, 255, 255)
+        assert final_img.getpixel((5, 25)) == colors[2]
+
+    def test_pickling(self):
+        collector = RenderingTaskCollector(paste=True, width=10, height=20)
+        for part, color in [(1, (255, 0, 0)), (2, (0, 255, 0))]:
+            img_path = self.temp_file_name("img{}.png".format(part))
+            make_test_img(img_path, color=color)
+            collector.add_part(part, img_path)
+
+        restored = pickle.loads(pickle.dumps(collector))
+        assert restored._canvas is None
+        final_img = restored.finalize()
+        assert final_img.getpixel((5, 5)) == (255, 0, 0)
+        assert final_img.getpixel((5, 15)) == (0, 255, 0)
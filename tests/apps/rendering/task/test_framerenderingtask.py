@@ -79,6 +79,8 @@ class TestFrameRenderingTask(TestDirFixture, LogTestCase):
         task.accept_results("SUBTASK1", [img_file])
         assert task.num_tasks_received == 1
         assert task.collected_file_names[3] == img_file
+        # Parts above it are missing, so it waits to be composited
+        assert task.collectors[None].waiting_parts == {3: img_file}
         preview_img = Image.open(task.preview_file_path)
         assert preview_img.getpixel((100, 100)) == (0, 0, 255)
         preview_img.close()
@@ -98,6 +100,7 @@ class TestFrameRenderingTask(TestDirFixture, LogTestCase):
         assert task.total_tasks == 3
         output_file = task.output_file
         assert os.path.isfile(output_file)
+        assert None not in task.collectors
 
         task = self._get_frame_task()
         task.tmp_dir = self.path
@@ -136,33 +139,26 @@ class TestFrameRenderingTask(TestDirFixture, LogTestCase):
         img_path = self.temp_file_name("image2.png")
         new_img.save(img_path)
         frame_task._update_frame_preview(img_path, 5, 2)
+        preview = frame_task._get_canvas(frame_task._get_preview_file_path(0))
+        img = preview.copy()
+        assert img.getpixel((5, 5)) == (0, 255, 0)
+        assert img.getpixel((5, 15)) == (255, 0, 0)
+        assert os.path.isfile(frame_task._get_preview_task_file_path(0))
+
         frame_task._update_frame_preview(img_path, 7, 2)
+        new_img = Image.new("RGB", (10, 20), (0, 0, 255))
+        img_path = self.temp_file_name("image3.png")
+        new_img.save(img_path)
         frame_task._update_frame_preview(img_path, 7, 1, True)
+        # Final frame is written at once
+        img = Image.open(frame_task._get_preview_file_path(1))
+        assert img.getpixel((5, 5)) == (0, 0, 255)
+        assert img.getpixel((5, 15)) == (0, 0, 255)
+        img.close()
 
-    def test_paste_new_chunk(self):
-        task = self._get_frame_task()
-        task.res_x = 10
-        task.res_y = 20
-        task.scale_factor = 1
-        preview_path = self.temp_file_name("image1.png")
-        with self.assertLogs(logger, level="ERROR") as l:
-            assert task._paste_new_chunk("not an image", preview_path, 1, 10) is None
-        assert any("Can't generate preview" in log for log in l.output)
-        with open(preview_path, 'w') as f:
-            f.write("not an image, again not an image")
         with self.assertLogs(logger, level="ERROR") as l:
-            assert task._paste_new_chunk("not an image", preview_path, 1, 10) is None
+            frame_task._update_frame_preview("not an image", 5, 1)
         assert any("Can't add new chunk to preview" in log for log in l.output)
-        assert any("Can't generate preview" in log for log in l.output)
-
-        img = Image.new("RGB", (10, 10), (0, 122, 0))
-        img.save(preview_path)
-        with self.assertLogs(logger, level="ERROR"):
-            new_img = task._paste_new_chunk("nota image", preview_path, 1, 10)
-        assert isinstance(new_img, Image.Image)
-        with self.assertNoLogs(logger, level="ERROR"):
-            new_img = task._paste_new_chunk(img, preview_path, 1, 10)
-        assert isinstance(new_img, Image.Image)
 
     def test_mark_task_area(self):
         task = self._get_frame_task()
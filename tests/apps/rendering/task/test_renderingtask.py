@@ -1,8 +1,9 @@
 import ntpath
 import os
-from os import makedirs, path, remove
+from os import makedirs, path
 
 from mock import Mock, patch, ANY
+from PIL import Image
 
 from apps.core.task.coretaskstate import Options, TaskDefinition, TaskState
 from apps.core.task.coretask import logger as core_logger
@@ -10,8 +11,7 @@ from apps.core.task.coretask import TaskTypeInfo
 from apps.rendering.resources.imgrepr import load_img
 from apps.rendering.task.renderingtask import (RenderingTask,
                                                RenderingTaskBuilder, logger,
-                                               PREVIEW_EXT, PREVIEW_Y,
-                                               PREVIEW_X)
+                                               PREVIEW_Y, PREVIEW_X)
 from apps.rendering.task.renderingtaskstate import RenderingTaskDefinition
 
 from golem.resource.dirmanager import DirManager
@@ -111,14 +111,10 @@ class TestRenderingTask(TestDirFixture, LogTestCase):
         tmp_dir = DirManager(rt.root_path).get_task_temporary_dir(rt.header.task_id)
        # tmp_dir = get_tmp_path(rt.header.task_id, rt.root_path)
        # makedirs(tmp_dir)
-        img = rt._open_preview()
-        for i in range(int(round(rt.res_x * rt.scale_factor))):
-            for j in range(int(round(rt.res_y * rt.scale_factor))):
-                img.putpixel((i, j), (1, 255, 255))
-        img.save(rt.preview_file_path, PREVIEW_EXT)
-        img.close()
+        preview = rt._get_preview_canvas()
+        preview.paste((1, 255, 255), (0, 0, 800, 600))
         rt._remove_from_preview("xxyyzz")
-        img = rt._open_preview()
+        img = Image.open(rt.preview_file_path)
 
         max_x, max_y = 800 - 1, 600 - 1
 
@@ -157,23 +153,42 @@ class TestRenderingTask(TestDirFixture, LogTestCase):
         task.update_task_state(state)
         assert state.extra_data["result_preview"] == "preview_file"
 
-    def test_mode_and_ext_in_open_preview(self):
+    def test_mode_and_ext_in_preview_canvas(self):
         task = self.task
-        preview = task._open_preview()
+        preview = task._get_preview_canvas()
+        preview.flush()
         assert path.isfile(task.preview_file_path)
-        assert preview.mode == "RGB"
-        assert preview.size == (800, 600)
-        preview.close()
-
-        preview = task._open_preview("RGBA")
-        assert preview.mode == "RGB"
-        assert preview.size == (800, 600)
-        preview.close()
-        remove(task.preview_file_path)
-        preview = task._open_preview("RGBA", "PNG")
-        assert preview.mode == "RGBA"
-        assert preview.size == (800, 600)
-        preview.close()
+        assert preview.copy().mode == "RGB"
+        assert preview.copy().size == (800, 600)
+
+        assert task._get_preview_canvas("RGBA") is preview
+        task.preview_canvases = {}
+        preview = task._get_preview_canvas("RGBA", "PNG")
+        assert preview.copy().mode == "RGBA"
+        assert preview.copy().size == (800, 600)
+
+    def test_flush(self):
+        task = self.task
+        preview = task._get_preview_canvas()
+        preview.paste((0, 255, 0), (0, 0, 10, 10))
+        preview.flush(force=True)
+        preview.paste((255, 0, 0), (0, 0, 10, 10))
+        preview.flush()
+        task.flush()
+        with Image.open(task.preview_file_path) as img:
+            assert img.getpixel((5, 5)) == (255, 0, 0)
+
+    def test_update_task_preview(self):
+        task = self.task
+        task.subtasks_given["xxyyzz"] = {"start_task": 2, "end_task": 2,
+                                         "status": SubtaskStatus.starting}
+        task._update_task_preview()
+        img = Image.open(task.preview_task_file_path)
+        assert img.getpixel((0, 0)) == (0, 0, 0)
+        assert img.getpixel((0, 8)) == (0, 255, 0)
+        img.close()
+        # The preview itself is not marked
+        assert task._get_preview_canvas().copy().getpixel((0, 8)) == (0, 0, 0)
 
     def test_restart_subtask(self):
         task = self.task
@@ -283,7 +298,7 @@ class TestRenderingTask(TestDirFixture, LogTestCase):
 
     def test_get_preview_file_path(self):
         assert self.task.get_preview_file_path() is None
-        self.task._open_preview()
+        self.task._get_preview_canvas().flush()
         assert path.isfile(self.task.get_preview_file_path())
 
     def test_get_next_task_if_not_tasks(self):
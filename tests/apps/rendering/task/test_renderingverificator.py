@@ -105,6 +105,19 @@ class TestRenderingVerificator(TempDirFixture, LogTestCase, PEP8MixIn):
                              [img_path], Mock()) == \
                    SubtaskVerificationState.UNKNOWN
 
+    def test_snapshot(self):
+        rv = RenderingVerificator()
+        rv.verified_clients = ["node1"]
+
+        snapshot = rv.snapshot()
+        snapshot.verified_clients += ["node1", "node2"]
+        snapshot.ver_states["Subtask1"] = SubtaskVerificationState.VERIFIED
+        assert rv.verified_clients == ["node1"]
+
+        rv.apply_snapshot(snapshot, "Subtask1")
+        assert rv.verified_clients == ["node1", "node2"]
+        assert rv.is_verified("Subtask1")
+
     def test_get_part_img_size(self):
         rv = RenderingVerificator()
         rv.res_x = 800
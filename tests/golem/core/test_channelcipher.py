@@ -0,0 +1,96 @@
+import unittest
+
+from golem.core.channelcipher import ChannelDecryptionError, \
+    ChannelHandshake, CHANNEL_MARKER, HEADER_SIZE, TAG_SIZE, is_channel_frame
+
+STATIC_SECRET = b'\x2a' * 32
+
+
+def exchange_keys(static_secret=STATIC_SECRET):
+    alice = ChannelHandshake()
+    bob = ChannelHandshake()
+    alice.remote_key = bob.public_key
+    bob.remote_key = alice.public_key
+    alice.sent = bob.sent = True
+    return alice.create_cipher(static_secret), bob.create_cipher(static_secret)
+
+
+class TestChannelHandshake(unittest.TestCase):
+    def test_completed(self):
+        handshake = ChannelHandshake()
+        assert len(handshake.public_key) == 64
+        assert not handshake.completed
+        handshake.sent = True
+        assert not handshake.completed
+        handshake.remote_key = ChannelHandshake().public_key
+        assert handshake.completed
+
+    def test_keys_are_ephemeral(self):
+        assert ChannelHandshake().public_key != ChannelHandshake().public_key
+
+
+class TestChannelCipher(unittest.TestCase):
+    def setUp(self):
+        self.alice, self.bob = exchange_keys()
+
+    def test_encrypt_decrypt(self):
+        data = b"abcdefghijklm" * 1000
+        frame = self.alice.encrypt(data)
+        assert is_channel_frame(frame)
+        assert len(frame) == len(data) + HEADER_SIZE + TAG_SIZE
+        assert not self.bob.active
+        assert self.bob.decrypt(frame) == data
+        assert self.bob.active
+        assert self.alice.decrypt(self.bob.encrypt(b"")) == b""
+
+        # Every frame uses a new nonce
+        assert self.alice.encrypt(data) != self.alice.encrypt(data)
+
+    def test_direction_keys(self):
+        with self.assertRaises(ChannelDecryptionError):
+            self.alice.decrypt(self.alice.encrypt(b"abc"))
+
+    def test_is_channel_frame(self):
+        assert not is_channel_frame(b"")
+        assert not is_channel_frame(CHANNEL_MARKER)
+        assert not is_channel_frame(b"\x04" * 100)
+        with self.assertRaises(ChannelDecryptionError):
+            self.bob.decrypt(b"\x04" * 100)
+
+    def test_wrong_static_secret(self):
+        alice = ChannelHandshake()
+        eve = ChannelHandshake()
+        alice.remote_key = eve.public_key
+        eve.remote_key = alice.public_key
+        frame = alice.create_cipher(STATIC_SECRET).encrypt(b"secret")
+        with self.assertRaises(ChannelDecryptionError):
+            eve.create_cipher(b'\x00' * 32).decrypt(frame)
+
+    def test_tampered_frame(self):
+        frame = bytearray(self.alice.encrypt(b"abc" * 10))
+        for pos in (len(CHANNEL_MARKER), HEADER_SIZE - 1, HEADER_SIZE, -1):
+            tampered = bytearray(frame)
+            tampered[pos] ^= 0x01
+            with self.assertRaises(ChannelDecryptionError):
+                self.bob.decrypt(bytes(tampered))
+        # Failed attempts don't break the channel
+        assert self.bob.decrypt(bytes(frame)) == b"abc" * 10
+
+    def test_replay(self):
+        first = self.alice.encrypt(b"first")
+        second = self.alice.encrypt(b"second")
+        assert self.bob.decrypt(second) == b"second"
+        with self.assertRaises(ChannelDecryptionError):
+            self.bob.decrypt(first)
+        with self.assertRaises(ChannelDecryptionError):
+            self.bob.decrypt(second)
+
+    def test_replay_from_previous_session(self):
+        recorded = self.alice.encrypt(b"abc")
+        self.bob.decrypt(recorded)
+
+        # Same peers, same static secret, new connection
+        _, bob = exchange_keys()
+        with self.assertRaises(ChannelDecryptionError):
+            bob.decrypt(recorded)
+        assert not bob.active
@@ -0,0 +1,97 @@
+import struct
+import unittest
+
+from golem.core import databuffer
+from golem.core.databuffer import DataBuffer
+
+
+class TestDataBuffer(unittest.TestCase):
+    def test_ulong(self):
+        db = DataBuffer()
+        assert db.append_ulong(7) == struct.pack("!L", 7)
+        with self.assertRaises(AttributeError):
+            db.append_ulong(-1)
+        db.append_ulong(2 ** 32 - 1)
+        assert db.data_size() == 8
+        assert db.peek_ulong() == 7
+        assert db.read_ulong() == 7
+        assert db.read_ulong() == 2 ** 32 - 1
+        with self.assertRaises(ValueError):
+            db.peek_ulong()
+
+    def test_strings(self):
+        db = DataBuffer()
+        db.append_string(b"abc")
+        db.append_string(bytearray(b"def"))
+        assert db.peek_string(2) == b"ab"
+        assert db.read_string(2) == b"ab"
+        assert db.buffered_data == b"cdef"
+        with self.assertRaises(AttributeError):
+            db.peek_string(5)
+        assert db.read_all() == b"cdef"
+        assert db.data_size() == 0
+        assert db.read_all() == b""
+
+    def test_overflow(self):
+        db = DataBuffer()
+        db.append_string(b"x" * 10)
+        db.append_string(b"y" * databuffer.MAX_BUFFER_SIZE,
+                         overflow_prefix=b"p")
+        assert db.data_size() == databuffer.MAX_BUFFER_SIZE + 1
+        assert db.peek_string(2) == b"py"
+
+        db.append_string(b"z", check_size=False)
+        assert db.data_size() == databuffer.MAX_BUFFER_SIZE + 2
+
+    def test_len_prefixed_strings(self):
+        db = DataBuffer()
+        assert db.read_len_prefixed_string() is None
+        frames = [b"first", b"", b"third" * 1000]
+        for frame in frames:
+            db.append_len_prefixed_string(frame)
+        db.append_ulong(100)
+        db.append_string(b"incomplete")
+
+        assert db.read_len_prefixed_string() == frames[0]
+        assert list(db.get_len_prefixed_string()) == frames[1:]
+        assert db.read_len_prefixed_string() is None
+        assert db.data_size() == 4 + len(b"incomplete")
+
+        db.append_string(b"." * 90)
+        assert db.read_len_prefixed_string() == b"incomplete" + b"." * 90
+        assert db.data_size() == 0
+
+    def test_small_chunks(self):
+        frames = [str(i).encode() * (i % 300) for i in range(2000)]
+        source = DataBuffer()
+        for frame in frames:
+            source.append_len_prefixed_string(frame)
+        data = source.read_all()
+
+        db = DataBuffer()
+        received = []
+        for i in range(0, len(data), 7):
+            db.append_string(data[i:i + 7])
+            received.extend(db.get_len_prefixed_string())
+
+        assert received == frames
+        assert db.data_size() == 0
+
+    def test_compaction(self):
+        db = DataBuffer()
+        frame = b"a" * 1024
+        for _ in range(200):
+            db.append_len_prefixed_string(frame)
+        for _ in range(150):
+            assert db.read_len_prefixed_string() == frame
+
+        assert db._offset <= databuffer.COMPACT_THRESHOLD + len(frame) + 4
+        assert db.data_size() == 50 * (len(frame) + 4)
+        assert list(db.get_len_prefixed_string()) == [frame] * 50
+
+    def test_clear_buffer(self):
+        db = DataBuffer()
+        db.append_len_prefixed_string(b"data")
+        db.clear_buffer()
+        assert db.data_size() == 0
+        assert db.buffered_data == b""
@@ -35,12 +35,12 @@ class TestAESFileEncryptor(TestDirFixture):
                                  secret)
 
         self.assertTrue(os.path.exists(self.enc_file_path))
+        with open(self.test_file_path, 'rb') as f:
+            data = f.read()
         with open(self.enc_file_path, 'rb') as f:
             encrypted = f.read()
-            self.assertEqual(
-                len(encrypted) % AESFileEncryptor.block_size, 0,
-                "Incorrect ciphertext size: {}. Should be multiple of {}".format(len(encrypted),
-                                                                                 AESFileEncryptor.block_size))
+        self.assertTrue(encrypted.startswith(AESFileEncryptor.salt_prefix))
+        self.assertNotIn(data[:64], encrypted)
 
     def test_decrypt(self):
         """ Test decryption procedure """
@@ -73,30 +73,54 @@ class TestAESFileEncryptor(TestDirFixture):
                 elif not chunk1 and not chunk2:
                     break
 
-        AESFileEncryptor.decrypt(self.enc_file_path,
-                                 decrypted_path,
-                                 secret + b"0")
+        with self.assertRaises(ValueError):
+            AESFileEncryptor.decrypt(self.enc_file_path,
+                                     decrypted_path,
+                                     secret + b"0")
 
-        decrypted = True
+    def _read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
 
-        if os.path.getsize(self.test_file_path) != os.path.getsize(decrypted_path):
-            decrypted = False
-        else:
+    def test_chunks(self):
+        """ Test files spanning multiple chunks, compressible or not """
+        secret = FileEncryptor.gen_secret(10, 20)
+        decrypted_path = self.test_file_path + ".dec"
 
-            with open(self.test_file_path, 'rb') as f1, \
-                 open(decrypted_path, 'rb') as f2:
+        class SmallChunksEncryptor(AESFileEncryptor):
+            chunk_size = 100
 
-                while True:
-                    chunk1 = f1.read(32)
-                    chunk2 = f2.read(32)
+        for data in [b'', b'x' * 1000, os.urandom(1000), os.urandom(100)]:
+            with open(self.test_file_path, 'wb') as f:
+                f.write(data)
 
-                    if chunk1 != chunk2:
-                        decrypted = False
-                        break
-                    elif not chunk1 and not chunk2:
-                        break
+            SmallChunksEncryptor.encrypt(self.test_file_path,
+                                         self.enc_file_path, secret)
+            SmallChunksEncryptor.decrypt(self.enc_file_path,
+                                         decrypted_path, secret)
+            self.assertEqual(self._read(decrypted_path), data)
+
+    def test_corrupted(self):
+        """ Test decryption of tampered and truncated files """
+        secret = FileEncryptor.gen_secret(10, 20)
+        decrypted_path = self.test_file_path + ".dec"
 
-        self.assertFalse(decrypted)
+        class SmallChunksEncryptor(AESFileEncryptor):
+            chunk_size = 1000
+
+        SmallChunksEncryptor.encrypt(self.test_file_path,
+                                     self.enc_file_path, secret)
+        encrypted = self._read(self.enc_file_path)
+
+        for corrupted in [encrypted[:-1],
+                          encrypted[:1000],
+                          encrypted + b'0',
+                          encrypted[:100] + b'0' + encrypted[101:]]:
+            with open(self.enc_file_path, 'wb') as f:
+                f.write(corrupted)
+            with self.assertRaises(ValueError):
+                SmallChunksEncryptor.decrypt(self.enc_file_path,
+                                             decrypted_path, secret)
 
     def test_get_key_and_iv(self):
         """ Test helper methods: gen_salt and get_key_and_iv """
@@ -0,0 +1,54 @@
+from unittest import TestCase
+
+from mock import patch
+
+from golem.appconfig import MIN_MEMORY_SIZE, MIN_SUBTASK_CPU_CORES
+from golem.core.hardware import compute_slots, partition_cpu_cores
+
+
+class TestPartitionCpuCores(TestCase):
+    def test_partition(self):
+        cores = list(range(10))
+        assert partition_cpu_cores(cores, 1) == [cores]
+        assert partition_cpu_cores(cores, 2) == [cores[:5], cores[5:]]
+        assert partition_cpu_cores(cores, 3) == [cores[:4], cores[4:7],
+                                                 cores[7:]]
+        assert partition_cpu_cores(cores, 20) == [[c] for c in cores]
+        assert partition_cpu_cores(cores, 0) == [cores]
+
+
+@patch('golem.core.hardware.cpu_cores_available',
+       return_value=list(range(1, 32)))
+class TestComputeSlots(TestCase):
+    def test_single_slot(self, _):
+        slots = compute_slots(4, 4 * MIN_MEMORY_SIZE, 1)
+        assert slots == [([1, 2, 3, 4], 4 * MIN_MEMORY_SIZE)]
+
+        # defaults for empty config
+        assert compute_slots(0, 0, 0) == [([1], MIN_MEMORY_SIZE)]
+
+    def test_auto(self, _):
+        slots = compute_slots(31, 64 * MIN_MEMORY_SIZE)
+        assert len(slots) == 31 // MIN_SUBTASK_CPU_CORES
+        self._check_disjoint(slots)
+        assert all(memory == 64 * MIN_MEMORY_SIZE // len(slots)
+                   for _, memory in slots)
+
+    def test_limited(self, _):
+        slots = compute_slots(16, 16 * MIN_MEMORY_SIZE, 2)
+        assert slots == [(list(range(1, 9)), 8 * MIN_MEMORY_SIZE),
+                         (list(range(9, 17)), 8 * MIN_MEMORY_SIZE)]
+
+        # memory limits the number of slots
+        slots = compute_slots(16, 3 * MIN_MEMORY_SIZE, 16)
+        assert len(slots) == 3
+        self._check_disjoint(slots)
+
+        # cores limit the number of slots
+        slots = compute_slots(64, 64 * MIN_MEMORY_SIZE, 64)
+        assert len(slots) == 31
+
+    @staticmethod
+    def _check_disjoint(slots):
+        cores = [core for slot_cores, _ in slots for core in slot_cores]
+        assert len(cores) == len(set(cores))
@@ -0,0 +1,66 @@
+import hashlib
+import os
+import time
+
+from mock import patch
+
+from golem.core.hashcache import FileHashCache
+from golem.tools.testdirfixture import TestDirFixture
+
+
+class TestFileHashCache(TestDirFixture):
+    def setUp(self):
+        super(TestFileHashCache, self).setUp()
+        self.file_path = os.path.join(self.path, 'file')
+        self._write(b'data' * 1000)
+
+    def _write(self, data, age=10):
+        with open(self.file_path, 'wb') as f:
+            f.write(data)
+        mtime = time.time() - age
+        os.utime(self.file_path, (mtime, mtime))
+
+    def test_digest(self):
+        cache = FileHashCache()
+        assert cache.digest(self.file_path) == \
+            hashlib.sha1(b'data' * 1000).digest()
+        assert cache.digest(self.file_path, 'sha256', block_size=7) == \
+            hashlib.sha256(b'data' * 1000).digest()
+
+    def test_cached(self):
+        cache = FileHashCache()
+        digest = cache.digest(self.file_path)
+        with patch.object(FileHashCache, '_compute') as compute:
+            assert cache.digest(self.file_path) == digest
+            assert not compute.called
+
+        self._write(b'other data')
+        assert cache.digest(self.file_path) == \
+            hashlib.sha1(b'other data').digest()
+
+    def test_recently_modified(self):
+        cache = FileHashCache()
+        self._write(b'new data', age=0)
+        cache.digest(self.file_path)
+        with patch.object(FileHashCache, '_compute',
+                          return_value=b'digest') as compute:
+            assert cache.digest(self.file_path) == b'digest'
+            assert compute.called
+
+    def test_journal(self):
+        journal_path = os.path.join(self.path, 'hashes.journal')
+        digest = FileHashCache(journal_path).digest(self.file_path)
+
+        cache = FileHashCache(journal_path)
+        with patch.object(FileHashCache, '_compute') as compute:
+            assert cache.digest(self.file_path) == digest
+            assert not compute.called
+
+        cache.clear()
+        assert not FileHashCache(journal_path)._entries
+
+    def test_journal_removed_files(self):
+        journal_path = os.path.join(self.path, 'hashes.journal')
+        FileHashCache(journal_path).digest(self.file_path)
+        os.remove(self.file_path)
+        assert not FileHashCache(journal_path)._entries
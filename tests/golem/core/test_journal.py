@@ -0,0 +1,117 @@
+import os
+
+import mock
+
+from golem.core.journal import Journal
+from golem.tools.testdirfixture import TestDirFixture
+
+
+class TestJournal(TestDirFixture):
+    def setUp(self):
+        super(TestJournal, self).setUp()
+        self.journal_path = os.path.join(self.path, 'test.journal')
+
+    def test_put_load(self):
+        journal = Journal(self.journal_path)
+        assert journal.load() == {}
+        assert journal.put('a', 1)
+        assert journal.put(('b', 2), [1, 2, 3])
+        assert journal.put('a', 3)
+
+        assert Journal(self.journal_path).load() == {'a': 3,
+                                                     ('b', 2): [1, 2, 3]}
+
+    def test_put_unchanged(self):
+        journal = Journal(self.journal_path)
+        assert journal.put('a', {'x': 1})
+        size = os.path.getsize(self.journal_path)
+        assert not journal.put('a', {'x': 1})
+        assert os.path.getsize(self.journal_path) == size
+
+        # Index of the existing file is read before the first write
+        journal = Journal(self.journal_path)
+        assert not journal.put('a', {'x': 1})
+        assert os.path.getsize(self.journal_path) == size
+        assert journal.put('a', {'x': 2})
+        assert os.path.getsize(self.journal_path) > size
+
+    def test_delete(self):
+        journal = Journal(self.journal_path)
+        journal.put('a', 1)
+        journal.put('b', 2)
+        journal.delete('a')
+        assert journal.keys() == ['b']
+        size = os.path.getsize(self.journal_path)
+        journal.delete('a')
+        assert os.path.getsize(self.journal_path) == size
+
+        assert Journal(self.journal_path).load() == {'b': 2}
+
+    def test_corrupted_tail(self):
+        journal = Journal(self.journal_path)
+        journal.put('a', 1)
+        journal.put('b', 2)
+        size = os.path.getsize(self.journal_path)
+        with open(self.journal_path, 'ab') as f:
+            f.write(b'\x00\x00\x01\x00garbage')
+
+        journal = Journal(self.journal_path)
+        assert journal.load() == {'a': 1, 'b': 2}
+        assert os.path.getsize(self.journal_path) == size
+        journal.put('c', 3)
+        assert Journal(self.journal_path).load() == {'a': 1, 'b': 2, 'c': 3}
+
+    def test_compact(self):
+        journal = Journal(self.journal_path, compact_ratio=2,
+                          min_compact_size=0)
+        for i in range(100):
+            journal.put('a', i)
+            journal.put('b', -i)
+        journal.put('c', 'c')
+        journal.delete('c')
+
+        expected = Journal(os.path.join(self.path, 'expected.journal'))
+        expected.put('a', 99)
+        expected.put('b', -99)
+        expected_size = os.path.getsize(str(expected.path))
+        assert os.path.getsize(self.journal_path) <= 2 * expected_size
+        assert not os.path.exists(self.journal_path + '.tmp')
+        assert Journal(self.journal_path).load() == {'a': 99, 'b': -99}
+
+    def test_truncated_header(self):
+        journal = Journal(self.journal_path)
+        journal.put('a', 1)
+        size = os.path.getsize(self.journal_path)
+        with open(self.journal_path, 'ab') as f:
+            f.write(b'\x00\x00')
+
+        assert Journal(self.journal_path).load() == {'a': 1}
+        assert os.path.getsize(self.journal_path) == size
+
+    def test_unreadable_record(self):
+        journal = Journal(self.journal_path)
+        journal.put('a', 1)
+        journal.put('b', Unpicklable(2))
+        journal.put('c', 3)
+        size = os.path.getsize(self.journal_path)
+
+        with mock.patch.object(Unpicklable, '__setstate__',
+                               side_effect=AttributeError("renamed"),
+                               create=True):
+            journal = Journal(self.journal_path)
+            assert journal.load() == {'a': 1, 'c': 3}
+            assert os.path.getsize(self.journal_path) == size
+
+            # Unreadable record survives compaction
+            journal.put('a', 2)
+            journal.compact()
+            assert journal.load() == {'a': 2, 'c': 3}
+
+        values = Journal(self.journal_path).load()
+        assert values['b'].value == 2
+        assert (values['a'], values['c']) == (2, 3)
+
+
+class Unpicklable(object):
+    def __init__(self, value):
+        self.value = value
@@ -2,10 +2,12 @@ import time
 from os import path
 from random import random, randint
 
-from devp2p.crypto import ECCx
+from devp2p.crypto import ECCx, mk_privkey
+
+from mock import patch
 
 from golem.core.keysauth import KeysAuth, EllipticalKeysAuth, RSAKeysAuth, \
-    get_random, get_random_float, sha2, sha3
+    SignatureVerifier, get_random, get_random_float, privtopub, sha2, sha3
 from golem.core.simpleserializer import CBORSerializer
 from golem.network.transport.message import MessageWantToComputeTask
 from golem.tools.testwithappconfig import TestWithKeysAuth
@@ -179,6 +181,43 @@ class TestEllipticalKeysAuth(TestWithKeysAuth):
         self.assertFalse(ek.verify(sig2, data1))
         self.assertFalse(ek.verify(None, data1))
 
+    def test_verify_memoize_elliptical(self):
+        ek = EllipticalKeysAuth(self.path)
+        verifier = SignatureVerifier(max_keys=1, max_signatures=1)
+        data = b"task header"
+        sig = ek.sign(data)
+
+        with patch('golem.core.keysauth.signature_verifier', verifier), \
+                patch.object(ECCx, 'verify', autospec=True,
+                             side_effect=ECCx.verify) as verify:
+            assert ek.verify(sig, data, memoize=True)
+            assert ek.verify(sig, data, memoize=True)
+            assert verify.call_count == 1
+            assert ek.verify(sig, data)
+            assert verify.call_count == 2
+
+            # Failed verifications are not remembered
+            assert not ek.verify(sig, b"other data", memoize=True)
+            assert not ek.verify(sig, b"other data", memoize=True)
+            assert verify.call_count == 4
+            # Only the most recent signature is kept
+            assert ek.verify(ek.sign(b"other data"), b"other data",
+                             memoize=True)
+            assert ek.verify(sig, data, memoize=True)
+            assert verify.call_count == 6
+
+    def test_signature_verifier_keys(self):
+        key = privtopub(mk_privkey("key"))
+        key2 = privtopub(mk_privkey("key2"))
+        verifier = SignatureVerifier(max_keys=1)
+
+        ecc = verifier.get_ecc(key)
+        assert verifier.get_ecc(key) is ecc
+        assert verifier.get_ecc(key2) is not ecc
+        assert verifier.get_ecc(key) is not ecc
+        with self.assertRaises(AssertionError):
+            verifier.get_ecc(b"wrong key")
+
     def test_save_load_keys(self):
         """ Tests for saving and loading keys """
         from os.path import join
@@ -291,3 +330,14 @@ class TestEllipticalKeysAuth(TestWithKeysAuth):
         self.assertEqual(ek2.decrypt(ek2.encrypt(data3)), data3)
         with self.assertRaises(TypeError):
             ek2.encrypt(None)
+
+    def test_get_ecdh_key(self):
+        ek = EllipticalKeysAuth(self.path, "RANDOMPRIV", "RANDOMPUB")
+        ek2 = EllipticalKeysAuth(self.path, "RANDOMPRIV2", "RANDOMPUB2")
+        self.assertNotEqual(ek.key_id, ek2.key_id)
+        secret = ek.get_ecdh_key(ek2.key_id)
+        self.assertEqual(len(secret), 32)
+        self.assertEqual(secret, ek2.get_ecdh_key(ek.key_id))
+        self.assertEqual(secret, ek.get_ecdh_key(ek2.public_key))
+        ek3 = EllipticalKeysAuth(self.path, "RANDOMPRIV3", "RANDOMPUB3")
+        self.assertNotEqual(secret, ek.get_ecdh_key(ek3.key_id))
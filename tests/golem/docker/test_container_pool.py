@@ -0,0 +1,147 @@
+import os
+import time
+
+from mock import patch
+
+from golem.docker.image import DockerImage
+from golem.docker.job import ContainerPool, DockerJob
+from golem.tools.testdirfixture import TestDirFixture
+
+
+@patch('golem.docker.job.local_client')
+class TestContainerPool(TestDirFixture):
+
+    def _new_container(self, pool, key, container_id):
+        pooled = pool.new_container(key, self.path)
+        pooled.container_id = container_id
+        return pooled
+
+    def test_acquire_release(self, local_client):
+        pool = ContainerPool(max_idle=2)
+        assert pool.acquire('key') is None
+
+        first = self._new_container(pool, 'key', 'first')
+        assert os.path.isdir(first.work_dir)
+        assert os.path.isdir(first.output_dir)
+        pool.release(first)
+        assert pool.acquire('other key') is None
+        assert pool.acquire('key') is first
+        assert pool.acquire('key') is None
+        assert not local_client().remove_container.called
+
+    def test_max_idle(self, local_client):
+        pool = ContainerPool(max_idle=2)
+        containers = [self._new_container(pool, 'key', str(i))
+                      for i in range(3)]
+        for pooled in containers:
+            pool.release(pooled)
+
+        local_client().remove_container.assert_called_once_with(
+            '0', force=True)
+        assert not containers[0].dirs_exist()
+        assert pool.acquire('key') is containers[2]
+        assert pool.acquire('key') is containers[1]
+
+    def test_idle_timeout(self, local_client):
+        pool = ContainerPool(idle_timeout=10)
+        pooled = self._new_container(pool, 'key', 'id')
+        pool.release(pooled)
+        pooled.last_used = time.time() - 20
+
+        assert pool.acquire('key') is None
+        local_client().remove_container.assert_called_once_with(
+            'id', force=True)
+
+    def test_removed_dirs(self, local_client):
+        pool = ContainerPool()
+        pooled = self._new_container(pool, 'key', 'id')
+        pool.release(pooled)
+        os.rmdir(pooled.output_dir)
+
+        assert pool.acquire('key') is None
+        local_client().remove_container.assert_called_once_with(
+            'id', force=True)
+
+    def test_clear(self, local_client):
+        pool = ContainerPool()
+        pool.release(self._new_container(pool, 'key', 'id'))
+        pool.clear()
+        local_client().remove_container.assert_called_once_with(
+            'id', force=True)
+        assert pool.acquire('key') is None
+
+
+@patch('golem.docker.job.local_client')
+class TestPooledDockerJob(TestDirFixture):
+
+    def setUp(self):
+        super(TestPooledDockerJob, self).setUp()
+        self.image = DockerImage("golemfactory/base", tag="1.2")
+        self.resources_dir = os.path.join(self.path, "resources")
+        os.mkdir(self.resources_dir)
+
+    def _create_job(self, pool):
+        subtask_dir = os.path.join(self.path, "tmp", str(time.time()))
+        work_dir = os.path.join(subtask_dir, "work")
+        output_dir = os.path.join(subtask_dir, "output")
+        os.makedirs(work_dir)
+        os.makedirs(output_dir)
+        return DockerJob(self.image, "script", {"param": 1},
+                         self.resources_dir, work_dir, output_dir,
+                         pool=pool)
+
+    def _run_job(self, pool, client, output="out.png"):
+        job = self._create_job(pool)
+
+        def start(container_id):
+            client.inspect_container.return_value = {
+                "State": {"Status": "exited"}}
+            # The script writes its output to the bound dir
+            bound_output = job._get_bound_output_dir()
+            with open(os.path.join(bound_output, output), 'w') as f:
+                f.write(output)
+
+        client.start.side_effect = start
+        client.wait.return_value = 0
+        client.inspect_container.return_value = {
+            "State": {"Status": "created"}}
+
+        with job:
+            job.start()
+            assert job.wait() == 0
+            assert os.listdir(job.output_dir) == [output]
+            job.dump_logs()
+        for file_name in [DockerJob.TASK_SCRIPT, DockerJob.PARAMS_FILE]:
+            assert os.path.isfile(os.path.join(job.work_dir, file_name))
+        return job
+
+    def test_reuse(self, local_client):
+        client = local_client()
+        client.create_container.return_value = {"Id": "container_id"}
+        pool = ContainerPool()
+
+        self._run_job(pool, client)
+        assert client.create_container.call_count == 1
+        assert not client.remove_container.called
+
+        self._run_job(pool, client, output="out2.png")
+        assert client.create_container.call_count == 1
+        assert client.start.call_count == 2
+        assert not client.remove_container.called
+
+    def test_killed(self, local_client):
+        client = local_client()
+        client.create_container.return_value = {"Id": "container_id"}
+        pool = ContainerPool()
+
+        self._run_job(pool, client)
+
+        client.inspect_container.return_value = {
+            "State": {"Status": "running"}}
+        job = self._create_job(pool)
+        with job:
+            assert job.container_id == "container_id"
+            job.kill()
+        client.remove_container.assert_called_once_with(
+            "container_id", force=True)
+        assert pool.acquire(job._get_pool_key()) is None
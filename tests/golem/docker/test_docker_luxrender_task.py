@@ -3,6 +3,7 @@ import logging
 import os
 import shutil
 from os import makedirs, path, remove
+from threading import Event
 
 from mock import Mock
 
@@ -179,14 +180,11 @@ class TestDockerLuxrenderTask(TempDirFixture, DockerTestCase):
         else:
             assert path.isfile(png)
 
-        ##
-        # self.assertFalse(path.isfile(task._LuxTask__get_test_flm()) )
-
-        test_file = task._LuxTask__get_test_flm()
+        test_file = path.join(task.tmp_dir, "test_result.flm")
         shutil.copy(flm, test_file)
 
         self.dirs_to_remove.append(path.dirname(test_file))
-        assert path.isfile(task._LuxTask__get_test_flm())
+        assert path.isfile(test_file)
 
         ## copy to new location
         new_file_dir = path.join(path.dirname(test_file),subtask_id)
@@ -260,6 +258,10 @@ class TestDockerLuxrenderTask(TempDirFixture, DockerTestCase):
         task.computation_finished(ctd.subtask_id, [bad_flm_file, new_preview_file],
                                   result_type=result_types["files"])
 
+        # flm files are checked when they are merged
+        merged = Event()
+        task.flm_merger.when_merged(lambda flm: merged.set())
+        assert merged.wait(60.0)
         self.assertFalse(task.verify_subtask(ctd.subtask_id))
         self.assertEqual(task.num_tasks_received, 1)
 
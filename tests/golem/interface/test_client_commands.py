@@ -393,8 +393,10 @@ class TestTasks(TempDirFixture):
 
         cls.n_tasks = len(cls.tasks)
         cls.n_subtasks = len(cls.subtasks)
-        cls.get_tasks = lambda s, _id: cls.tasks[0] if _id else cls.tasks
-        cls.get_subtasks = lambda s, x: cls.subtasks
+        cls.get_tasks = lambda s, _id, cursor=None, limit=None: \
+            cls.tasks[0] if _id else cls.tasks[:limit]
+        cls.get_subtasks = lambda s, x, cursor=None, limit=None: \
+            cls.subtasks[:limit]
 
     def setUp(self):
         super(TestTasks, self).setUp()
@@ -453,6 +455,8 @@ class TestTasks(TempDirFixture):
                 '745c1d01', '1', '3', 'waiting', '1.00 %'
             ]
 
+            assert len(tasks.show(None, None, limit=1).data[1]) == 1
+
     def test_subtasks(self):
         client = self.client
 
@@ -465,6 +469,9 @@ class TestTasks(TempDirFixture):
                 'node_1', 'subtask_1', '9', 'waiting', '1.00 %'
             ]
 
+            subtasks = tasks.subtasks('745c1d01', None, limit=2)
+            assert len(subtasks.data[1]) == 2
+
     @staticmethod
     @contextmanager
     def _run_context(method):
@@ -678,6 +685,12 @@ class TestSettings(TempDirFixture):
             with self.assertRaises(CommandException):
                 settings.set('num_cores', _cpu_count + 1)
 
+            settings.set('max_concurrent_subtasks', 0)
+            settings.set('max_concurrent_subtasks', _cpu_count)
+
+            with self.assertRaises(CommandException):
+                settings.set('max_concurrent_subtasks', -1)
+
 
 class TestDebug(unittest.TestCase):
 
@@ -0,0 +1,146 @@
+import random
+import time
+from unittest import TestCase
+
+from golem.network.p2p.node import Node
+from golem.network.p2p.peerkeeper import KBucket, PeerKeeper, K_SIZE, \
+    node_id_distance
+
+
+def random_key():
+    return "{:0128x}".format(random.getrandbits(K_SIZE))
+
+
+class TestPeerKeeper(TestCase):
+
+    def setUp(self):
+        random.seed(42)
+        self.peer_keeper = PeerKeeper(random_key())
+
+    def _add_peers(self, num):
+        peers = []
+        for _ in range(num):
+            peer = Node(key=random_key())
+            if self.peer_keeper.add_peer(peer) is None:
+                peers.append(peer)
+        return peers
+
+    def test_add_peer(self):
+        peers = self._add_peers(200)
+        assert len(self.peer_keeper.buckets) > 1
+
+        keeper_peers = [peer for bucket in self.peer_keeper.buckets
+                        for peer in bucket.peers.values()]
+        assert len(keeper_peers) == len(peers)
+        for bucket in self.peer_keeper.buckets:
+            assert len(bucket.peers) <= bucket.k
+            for key_num in bucket.peers:
+                assert bucket.start <= key_num <= bucket.end
+                assert self.peer_keeper.bucket_for_peer(key_num) is bucket
+
+        last = self.peer_keeper.buckets[-1]
+        assert last.start <= self.peer_keeper.key_num <= last.end
+
+        # Buckets cover the whole key space
+        ranges = sorted((b.start, b.end) for b in self.peer_keeper.buckets)
+        assert ranges[0][0] == 0
+        assert ranges[-1][1] == 2 ** K_SIZE - 1
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            assert start == end + 1
+
+    def test_add_self(self):
+        assert self.peer_keeper.add_peer(Node(key=self.peer_keeper.key)) \
+            is None
+        assert not self.peer_keeper.buckets[0].peers
+
+    def test_full_bucket(self):
+        self._add_peers(300)
+        bucket = self.peer_keeper.buckets[0]
+        assert len(bucket.peers) == bucket.k
+
+        # Key from the farthest half of the key space
+        key_num = self.peer_keeper.key_num ^ (1 << (K_SIZE - 1))
+        peer = Node(key="{:0128x}".format(key_num))
+        oldest = next(iter(bucket.peers.values()))
+        assert self.peer_keeper.add_peer(peer) is oldest
+        assert oldest.key in self.peer_keeper.expected_pongs
+
+        self.peer_keeper.pong_received(oldest.key)
+        assert oldest.key not in self.peer_keeper.expected_pongs
+
+    def test_neighbours(self):
+        peers = self._add_peers(500)
+        for _ in range(20):
+            key_num = random.getrandbits(K_SIZE)
+            for alpha in [1, 3, 20]:
+                expected = sorted(peers,
+                                  key=lambda p: node_id_distance(p, key_num))
+                assert self.peer_keeper.neighbours(key_num, alpha) == \
+                    expected[:alpha]
+
+        # Given peer is not its own neighbour
+        peer = peers[0]
+        neighbours = self.peer_keeper.neighbours(int(peer.key, 16))
+        assert len(neighbours) == self.peer_keeper.concurrency
+        assert peer not in neighbours
+
+    def test_remove_old_expected_pongs(self):
+        self._add_peers(300)
+        self.peer_keeper.expected_pongs = {}
+        bucket = self.peer_keeper.buckets[0]
+        oldest = next(iter(bucket.peers.values()))
+        key_num = self.peer_keeper.key_num ^ (1 << (K_SIZE - 1))
+        replacement = Node(key="{:0128x}".format(key_num))
+        self.peer_keeper.add_peer(replacement)
+
+        self.peer_keeper.pong_timeout = -1
+        self.peer_keeper.sync()
+        assert self.peer_keeper.sessions_to_end == [oldest]
+        assert key_num in bucket.peers
+        assert int(oldest.key, 16) not in bucket.peers
+
+    def test_set_last_message_time(self):
+        self._add_peers(100)
+        for bucket in self.peer_keeper.buckets:
+            bucket.last_updated = 0
+        peer = Node(key=random_key())
+        self.peer_keeper.set_last_message_time(peer.key)
+        bucket = self.peer_keeper.bucket_for_peer(int(peer.key, 16))
+        assert time.time() - bucket.last_updated < 10
+
+    def test_sync(self):
+        self._add_peers(100)
+        self.peer_keeper.idle_refresh = -1
+        peers_to_find = self.peer_keeper.sync()
+        assert len(peers_to_find) == len(self.peer_keeper.buckets)
+        for key_num, neighbours in peers_to_find.items():
+            assert self.peer_keeper.bucket_for_peer(key_num) is not None
+            assert neighbours == self.peer_keeper.neighbours(key_num)
+
+
+class TestKBucket(TestCase):
+
+    def test_add_remove(self):
+        bucket = KBucket(0, 2 ** K_SIZE - 1, 2)
+        peers = [Node(key=random_key()) for _ in range(3)]
+        assert bucket.add_peer(peers[0]) is None
+        assert bucket.add_peer(peers[1]) is None
+        assert bucket.add_peer(peers[2]) is peers[0]
+
+        # Peer that has been seen again becomes the newest one
+        assert bucket.add_peer(peers[0]) is None
+        assert bucket.add_peer(peers[2]) is peers[1]
+
+        assert bucket.remove_peer(int(peers[1].key, 16)) is peers[1]
+        assert bucket.remove_peer(int(peers[1].key, 16)) is None
+        assert list(bucket.peers.values()) == [peers[0]]
+
+    def test_split(self):
+        bucket = KBucket(0, 2 ** 8 - 1, 16)
+        for key_num in [1, 127, 128, 255]:
+            bucket.add_peer(Node(key="{:x}".format(key_num)))
+        lower, upper = bucket.split()
+        assert (lower.start, lower.end) == (0, 127)
+        assert (upper.start, upper.end) == (128, 255)
+        assert list(lower.peers) == [1, 127]
+        assert list(upper.peers) == [128, 255]
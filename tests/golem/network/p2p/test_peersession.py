@@ -10,7 +10,8 @@ from golem.network.p2p.node import Node
 from golem.network.p2p.p2pservice import P2PService
 from golem.network.p2p.peersession import (PeerSession, logger, P2P_PROTOCOL_ID,
     PeerSessionInfo)
-from golem.network.transport.message import MessageHello, MessageStopGossip
+from golem.network.transport.message import MessageHello, MessageStopGossip, \
+    MessageGetTasks, MessageTasks, MessageRandVal
 from golem.tools.assertlogs import LogTestCase
 from golem.tools.testwithappconfig import TestWithKeysAuth
 
@@ -47,6 +48,7 @@ class TestPeerSession(TestWithKeysAuth, LogTestCase, testutils.PEP8MixIn):
             'PROTO_ID': P2P_PROTOCOL_ID,
             'RAND_VAL': self.peer_session.rand_val,
             'SOLVE_CHALLENGE': False,
+            'CHANNEL_KEY': self.peer_session._channel_handshake.public_key,
         }
         self.assertEqual(send_mock.call_args[0][1].dict_repr(), expected)
 
@@ -58,9 +60,11 @@ class TestPeerSession(TestWithKeysAuth, LogTestCase, testutils.PEP8MixIn):
         ek2 = EllipticalKeysAuth(self.path, "RANDOMPRIV2", "RANDOMPUB2")
         ps.p2p_service.encrypt = ek.encrypt
         ps.p2p_service.decrypt = ek.decrypt
+        ps.p2p_service.get_ecdh_key = lambda _: None
         ps.key_id = ek2.key_id
         ps2.p2p_service.encrypt = ek2.encrypt
         ps2.p2p_service.decrypt = ek2.decrypt
+        ps2.p2p_service.get_ecdh_key = lambda _: None
         ps2.key_id = ek.key_id
 
         data = b"abcdefghijklm" * 1000
@@ -70,6 +74,70 @@ class TestPeerSession(TestWithKeysAuth, LogTestCase, testutils.PEP8MixIn):
             self.assertEqual(ps2.decrypt(data), data)
         self.assertTrue(any("not encrypted" in log for log in l.output))
 
+        # symmetric channel, once ephemeral keys were exchanged in Hello
+        ps.p2p_service.get_ecdh_key = ek.get_ecdh_key
+        ps2.p2p_service.get_ecdh_key = ek2.get_ecdh_key
+        ps_key, ps2_key = ps._channel_key(), ps2._channel_key()
+        ps._channel_key_sent()
+        ps2._channel_key_received(ps_key)
+        self.assertIsNone(ps2._get_channel())
+        ps2._channel_key_sent()
+        ps._channel_key_received(ps2_key)
+
+        encrypted = ps.encrypt(data)
+        self.assertLess(len(encrypted), len(ek.encrypt(data, ek2.key_id)))
+        # ECIES is accepted until the peer starts using the channel
+        self.assertEqual(ps2.decrypt(ek.encrypt(data, ek2.key_id)), data)
+        self.assertEqual(ps2.decrypt(encrypted), data)
+        self.assertEqual(ps.decrypt(ps2.encrypt(data)), data)
+        with self.assertLogs(logger, level='INFO'):
+            self.assertIsNone(ps2.decrypt(ek.encrypt(data, ek2.key_id)))
+        ps2.conn.close.assert_called_with()
+
+        tampered = bytearray(ps.encrypt(data))
+        tampered[-1] ^= 0xff
+        with self.assertLogs(logger, level='INFO'):
+            self.assertIsNone(ps2.decrypt(bytes(tampered)))
+
+    def test_channel_handshake(self):
+        conn = MagicMock()
+        peer_session = PeerSession(conn)
+        peer_session.p2p_service.get_ecdh_key.return_value = b'\x01' * 32
+        peer_session.verify = lambda *_: True
+        peer_session.p2p_service.enough_peers.return_value = False
+        peer_session.p2p_service.find_peer.return_value = None
+        peer_session.p2p_service.should_solve_challenge = False
+
+        sent = []
+
+        def send_message(msg):
+            sent.append((msg, peer_session._get_channel() is not None))
+            return True
+
+        conn.send_message = send_message
+
+        remote_key = PeerSession(MagicMock())._channel_key()
+        msg = MessageHello(port=1, node_name='node2', client_key_id='deadbeef',
+                           proto_id=P2P_PROTOCOL_ID, channel_key=remote_key)
+        peer_session._react_to_hello(msg)
+
+        # RandVal and Hello are sent before the channel is opened
+        self.assertEqual([(m.TYPE, opened) for m, opened in sent],
+                         [(MessageRandVal.TYPE, False),
+                          (MessageHello.TYPE, False)])
+        self.assertEqual(sent[1][0].channel_key,
+                         peer_session._channel_handshake.public_key)
+        self.assertIsNotNone(peer_session._get_channel())
+        peer_session.p2p_service.get_ecdh_key.assert_called_with('deadbeef')
+
+        # later messages use the channel
+        self.assertNotEqual(peer_session.encrypt(b'data'), b'data')
+        peer_session.p2p_service.encrypt.assert_not_called()
+
+        # a new peer key requires a new key exchange
+        peer_session.key_id = 'other'
+        self.assertIsNone(peer_session._get_channel())
+
     def test_react_to_hello(self):
 
         conn = MagicMock()
@@ -168,6 +236,23 @@ class TestPeerSession(TestWithKeysAuth, LogTestCase, testutils.PEP8MixIn):
         peer_session.key_id = "NEW KEY_ID"
         peer_session._react_to_stop_gossip(MessageStopGossip())
 
+    def test_react_to_get_tasks(self):
+        conn = MagicMock()
+        peer_session = PeerSession(conn)
+        peer_session.send = MagicMock()
+        peer_session.p2p_service.get_tasks_headers.return_value = []
+        peer_session._react_to_get_tasks(
+            MessageGetTasks(known_tasks=[b'digest01']))
+        peer_session.p2p_service.get_tasks_headers.assert_called_with(
+            [b'digest01'])
+        assert not peer_session.send.called
+
+        peer_session.p2p_service.get_tasks_headers.return_value = [{}]
+        peer_session._react_to_get_tasks(MessageGetTasks())
+        msg = peer_session.send.call_args[0][0]
+        assert isinstance(msg, MessageTasks)
+        assert msg.tasks_array == [{}]
+
     def test_verify(self):
         conn = MagicMock()
         peer_session = PeerSession(conn)
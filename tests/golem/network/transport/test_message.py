@@ -217,7 +217,6 @@ class TestMessages(unittest.TestCase, PEP8MixIn):
                 message.MessagePing,
                 message.MessagePong,
                 message.MessageGetPeers,
-                message.MessageGetTasks,
                 message.MessageGetResourcePeers,
                 message.MessageStopGossip,
                 message.MessageBeingMiddlemanAccepted,
@@ -230,6 +229,13 @@ class TestMessages(unittest.TestCase, PEP8MixIn):
             expected = {}
             self.assertEqual(expected, msg.dict_repr())
 
+    def test_message_get_tasks(self):
+        msg = message.MessageGetTasks()
+        self.assertEqual({'KNOWN_TASKS': []}, msg.dict_repr())
+        known_tasks = [b'digest01', b'digest02']
+        msg = message.MessageGetTasks(known_tasks=known_tasks)
+        self.assertEqual({'KNOWN_TASKS': known_tasks}, msg.dict_repr())
+
     def test_list_messages(self):
         for message_class, key in (
                 (message.MessagePeers, 'PEERS'),
@@ -264,7 +270,6 @@ class TestMessages(unittest.TestCase, PEP8MixIn):
                 (message.MessageGetTaskResult, 'subtask_id', 'SUB_TASK_ID'),
                 (message.MessageStartSessionResponse, 'conn_id', 'CONN_ID'),
                 (message.MessageHasResource, 'resource', 'resource'),
-                (message.MessageWantsResource, 'resource', 'resource'),
                 (message.MessagePullResource, 'resource', 'resource'),
                 ):
             value = 'test-{}'.format(uuid.uuid4())
@@ -438,6 +443,19 @@ class TestMessages(unittest.TestCase, PEP8MixIn):
         }
         self.assertEqual(expected, msg.dict_repr())
 
+    def test_message_wants_resource(self):
+        resource = 'test-r-{}'.format(uuid.uuid4())
+        offset = random.randint(0, 2 ** 40)
+        digest = os.urandom(20)
+        msg = message.MessageWantsResource(resource=resource, offset=offset,
+                                           digest=digest)
+        expected = {
+            'resource': resource,
+            'offset': offset,
+            'digest': digest,
+        }
+        self.assertEqual(expected, msg.dict_repr())
+
     def test_message_pull_answer(self):
         resource = 'test-r-{}'.format(uuid.uuid4())
         for has_resource in (True, False):
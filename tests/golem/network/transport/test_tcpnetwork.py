@@ -3,7 +3,8 @@ import os
 import struct
 from unittest import TestCase
 
-from mock import MagicMock
+from mock import MagicMock, patch
+from twisted.internet.defer import Deferred, maybeDeferred
 
 from golem.core.common import config_logging
 from golem.core.keysauth import EllipticalKeysAuth
@@ -16,6 +17,8 @@ from golem.network.transport.tcpnetwork import (DataProducer, DataConsumer,
                                                 EncryptDataProducer,
                                                 DecryptDataConsumer,
                                                 BasicProtocol,
+                                                FILE_HEADER, PARTIAL_FILE_EXT,
+                                                file_prefix_digest,
                                                 logger, SocketAddress)
 from golem.tools.assertlogs import LogTestCase
 from golem.tools.captureoutput import captured_output
@@ -55,8 +58,6 @@ class TestDataProducerAndConsumer(TestWithKeysAuth):
                                  data_producer_cls=DataProducer,
                                  data_consumer_cls=DataConsumer,
                                  session=MagicMock()):
-        producer_progress_value = "Sending progress 100 %"
-        consumer_progress_value = "File data receiving 100 %"
         if buff_size:
             d = data_producer_cls(data, session, buff_size)
         else:
@@ -68,10 +69,8 @@ class TestDataProducerAndConsumer(TestWithKeysAuth):
 
         min_num = len(data) // buff_size
 
-        split = out.getvalue().strip().split("\r")
         self.assertGreaterEqual(session.conn.transport.write.call_count, min_num)
-        self.assertEqual(split[-1], producer_progress_value)
-        self.assertGreaterEqual(len(split), min(min_num, 100))
+        self.assertEqual(out.getvalue().strip(), "")
         self.assertEqual(err.getvalue().strip(), "")
 
         extra_data = {}
@@ -80,13 +79,35 @@ class TestDataProducerAndConsumer(TestWithKeysAuth):
             for chunk in session.conn.transport.write.call_args_list:
                 c.dataReceived(chunk[0][0])
 
-        split = out.getvalue().strip().split("\r")
         self.assertEqual(extra_data["result"], data)
-        self.assertEqual(split[-1], consumer_progress_value)
-        self.assertGreaterEqual(len(split), min(min_num, 100))
+        self.assertEqual(out.getvalue().strip(), "")
         self.assertEqual(err.getvalue().strip(), "")
 
+    def test_split_stream(self):
+        session = MagicMock()
+        data = b"abcdefghijklmn opqrstuvwxyz" * 100
+        p = DataProducer(data, session, 64)
+        while session.conn.transport.unregisterProducer.call_count == 0:
+            p.resumeProducing()
+        stream = b"".join(c[0][0] for c in
+                          session.conn.transport.write.call_args_list)
+
+        extra_data = {}
+        c = DataConsumer(session, extra_data)
+        for i in range(0, len(stream), 7):
+            c.dataReceived(stream[i:i + 7])
+        self.assertEqual(extra_data["result"], data)
+
+    def test_corrupted_chunk(self):
+        session = MagicMock()
+        p = DataProducer(b"abcdefghijklmn opqrstuvwxyz", session, 8)
+        stream = bytearray(p.data)
+        stream[-1] ^= 0xff
+        with self.assertRaises(ValueError):
+            DataConsumer(session, {}).dataReceived(bytes(stream))
+
 
+@patch('golem.network.transport.tcpnetwork.deferToThread', maybeDeferred)
 class TestFileProducerAndConsumer(TestWithKeysAuth):
 
     @classmethod
@@ -139,13 +160,9 @@ class TestFileProducerAndConsumer(TestWithKeysAuth):
 
     def __producer_consumer_test(self, file_list, buff_size=None, file_producer_cls=FileProducer,
                                  file_consumer_cls=FileConsumer, session=MagicMock()):
-        producer_progress_value = "Sending progress 100 %"
-        consumer_progress_value = "File data receiving 100 %"
         consumer_list = ["consumer{}".format(i + 1) for i in
                          range(len(file_list))]
 
-        print('-' * 64)
-
         if buff_size:
             p = file_producer_cls(file_list, session, buff_size)
         else:
@@ -165,11 +182,7 @@ class TestFileProducerAndConsumer(TestWithKeysAuth):
         transport = session.conn.transport
         self.assertGreaterEqual(transport.write.call_count, min_num)
         self.assertGreaterEqual(len(transport.write.call_args_list), min_num)
-
-        split = out.getvalue().strip().split("\r")
-        if len(file_list) > 0:
-            self.assertEqual(split[-1], producer_progress_value)
-            self.assertGreaterEqual(len(split), min(min_num, 100))
+        self.assertEqual(out.getvalue().strip(), "")
         self.assertEqual(err.getvalue().strip(), "")
 
         c = file_consumer_cls(consumer_list, self.path, session)
@@ -183,13 +196,154 @@ class TestFileProducerAndConsumer(TestWithKeysAuth):
             with open(os.path.join(self.path, cons)) as f:
                 cons_data = f.read()
             self.assertEqual(prod_data, cons_data)
+            self.assertFalse(os.path.exists(os.path.join(
+                self.path, cons + PARTIAL_FILE_EXT)))
 
-        split = out.getvalue().strip().split("\r")
-        if len(consumer_list) > 0:
-            self.assertEqual(split[-1], consumer_progress_value)
-            self.assertGreaterEqual(len(split), min(min_num, 100))
+        self.assertEqual(out.getvalue().strip(), "")
         self.assertEqual(err.getvalue().strip(), "")
 
+    @staticmethod
+    def __result(deferred):
+        results = []
+        deferred.addCallback(results.append)
+        return results[0]
+
+    def __send(self, producer, session):
+        while session.conn.transport.unregisterProducer.call_count == 0:
+            producer.resumeProducing()
+        return b"".join(c[0][0] for c in
+                        session.conn.transport.write.call_args_list)
+
+    def test_resume(self):
+        self.ek = EllipticalKeysAuth(self.path)
+        file_list = [self.tmp_file1, self.tmp_file3]
+        consumer_list = ["consumer1", "consumer2"]
+
+        session = self.__make_encrypted_session_mock()
+        stream = self.__send(EncryptFileProducer(file_list, session, 256),
+                             session)
+
+        # Files are sent from the end of the list; connection is dropped
+        # in the middle of the first one
+        c = DecryptFileConsumer(consumer_list, self.path, session,
+                                keep_partial=True)
+        c.dataReceived(stream[:len(stream) // 2])
+        c.close()
+        assert not session.full_data_received.called
+        partial_path = os.path.join(self.path, "consumer2" + PARTIAL_FILE_EXT)
+        assert 0 < os.path.getsize(partial_path) < \
+            os.path.getsize(self.tmp_file3)
+
+        c = DecryptFileConsumer(consumer_list, self.path, session)
+        offsets = c.get_resume_offsets()
+        digests = self.__result(c.get_resume_digests())
+        assert offsets == [0, os.path.getsize(partial_path)]
+        assert digests[0] is None
+
+        session = self.__make_encrypted_session_mock()
+        stream = self.__send(EncryptFileProducer(file_list, session, 256,
+                                                 offsets=offsets,
+                                                 digests=digests),
+                             session)
+        assert len(stream) < os.path.getsize(self.tmp_file3)
+        c.session = session
+        c.dataReceived(stream)
+
+        assert session.full_data_received.called
+        for prod, cons in zip(file_list, consumer_list):
+            with open(prod, 'rb') as f:
+                prod_data = f.read()
+            with open(os.path.join(self.path, cons), 'rb') as f:
+                cons_data = f.read()
+            self.assertEqual(prod_data, cons_data)
+
+    def test_resume_missing_partial_file(self):
+        session = MagicMock()
+        digest = file_prefix_digest(self.tmp_file3, 512)
+        stream = self.__send(FileProducer([self.tmp_file3], session, 256,
+                                          offsets=[512], digests=[digest]),
+                             session)
+        c = FileConsumer(["consumer"], self.path, session)
+        with self.assertRaises(ValueError):
+            c.dataReceived(stream)
+
+    def test_resume_stale_partial_file(self):
+        partial_path = os.path.join(self.path, "consumer" + PARTIAL_FILE_EXT)
+        with open(partial_path, 'wb') as f:
+            f.write(b"\0" * 512)
+
+        session = MagicMock()
+        c = FileConsumer(["consumer"], self.path, session)
+        offsets = c.get_resume_offsets()
+        assert offsets == [512]
+
+        # Prefix is resent unless it's known to be the same
+        producer = FileProducer([self.tmp_file3], MagicMock(), 256,
+                                offsets=offsets)
+        assert FILE_HEADER.unpack_from(producer.data)[1] == 0
+        producer.close()
+        producer = FileProducer([self.tmp_file3], session, 256,
+                                offsets=offsets,
+                                digests=self.__result(c.get_resume_digests()))
+        assert FILE_HEADER.unpack_from(producer.data)[1] == 0
+
+        # Whole file is sent and the stale data is dropped
+        c.dataReceived(self.__send(producer, session))
+        with open(self.tmp_file3, 'rb') as f:
+            expected = f.read()
+        with open(os.path.join(self.path, "consumer"), 'rb') as f:
+            assert f.read() == expected
+
+    def test_resume_check_deferred(self):
+        session = MagicMock()
+        deferred = Deferred()
+        with patch('golem.network.transport.tcpnetwork.deferToThread',
+                   return_value=deferred) as defer_to_thread:
+            producer = FileProducer([self.tmp_file3], session, 256,
+                                    offsets=[512], digests=[b""])
+
+        # Producer starts once the partially received file is checked
+        defer_to_thread.assert_called_once_with(producer._check_offsets)
+        assert not session.conn.transport.registerProducer.called
+        deferred.callback(producer._check_offsets())
+        session.conn.transport.registerProducer.assert_called_once_with(
+            producer, False)
+        assert FILE_HEADER.unpack_from(producer.data)[1] == 0
+
+        # Closed producer is not started
+        session = MagicMock()
+        deferred = Deferred()
+        with patch('golem.network.transport.tcpnetwork.deferToThread',
+                   return_value=deferred):
+            producer = FileProducer([self.tmp_file3], session, 256,
+                                    offsets=[512], digests=[b""])
+        producer.close()
+        deferred.callback(None)
+        assert not session.conn.transport.registerProducer.called
+
+    def test_partial_file_removed(self):
+        session = MagicMock()
+        stream = self.__send(FileProducer([self.tmp_file3], session, 256),
+                             session)
+        partial_path = os.path.join(self.path, "consumer" + PARTIAL_FILE_EXT)
+
+        c = FileConsumer(["consumer"], self.path, session, keep_partial=True)
+        c.dataReceived(stream[:len(stream) // 2])
+        c.close()
+        assert os.path.isfile(partial_path)
+
+        c = FileConsumer(["consumer"], self.path, session)
+        c.dataReceived(stream[:len(stream) // 2])
+        c.close()
+        assert not os.path.exists(partial_path)
+
+    def test_large_file_header(self):
+        session = MagicMock()
+        c = FileConsumer(["consumer"], self.path, session)
+        c.dataReceived(FILE_HEADER.pack(2 ** 33, 0))
+        assert c.file_size == 2 ** 33
+        c.close()
+
 
 class TestBasicProtocol(LogTestCase):
     def test_init(self):
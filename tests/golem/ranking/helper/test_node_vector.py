@@ -0,0 +1,47 @@
+import unittest
+
+import numpy
+
+from golem.ranking.helper.min_max_utility import vec_to_trust, vecs_to_trust
+from golem.ranking.helper.node_vector import NodeVector
+from golem.testutils import PEP8MixIn
+
+
+class TestNodeVector(unittest.TestCase, PEP8MixIn):
+    PEP8_FILES = [
+        'golem/ranking/helper/node_vector.py',
+    ]
+
+    def test_mapping(self):
+        vec = NodeVector((2,), ['a', 'b'], [[1, 2], [3, 4]])
+        assert len(vec) == 2
+        assert 'a' in vec
+        assert 'c' not in vec
+        assert vec['b'] == [3.0, 4.0]
+        assert dict(vec) == {'a': [1.0, 2.0], 'b': [3.0, 4.0]}
+
+        vec['c'] = [5, 6]
+        assert list(vec) == ['a', 'b', 'c']
+        assert vec['c'] == [5.0, 6.0]
+
+    def test_add(self):
+        vec = NodeVector((2, 2))
+        vec.add(['a', 'b', 'a'], numpy.ones((3, 2, 2)))
+        assert vec['a'] == [[2.0, 2.0], [2.0, 2.0]]
+        assert vec['b'] == [[1.0, 1.0], [1.0, 1.0]]
+
+        vec.add(['c', 'b'], numpy.ones((2, 2, 2)))
+        assert vec.node_ids == ['a', 'b', 'c']
+        assert vec['b'] == [[2.0, 2.0], [2.0, 2.0]]
+        assert vec['c'] == [[1.0, 1.0], [1.0, 1.0]]
+
+    def test_update_and_get_values(self):
+        vec = NodeVector((2,), ['a'], [[1, 1]])
+        vec.update(['b', 'a'], [[2, 2], [3, 3]])
+        assert vec.get_values(['a', 'x', 'b'], default=-1).tolist() == \
+            [[3.0, 3.0], [-1.0, -1.0], [2.0, 2.0]]
+
+    def test_vecs_to_trust(self):
+        vecs = [[0.5, 1.0], [0.0, 1.0], [1.0, 0.0], [-3.0, 1.0], [0.3, 0.5]]
+        assert vecs_to_trust(vecs).tolist() == \
+            [vec_to_trust(v) for v in vecs]
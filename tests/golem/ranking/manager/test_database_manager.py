@@ -1,3 +1,6 @@
+from mock import patch
+
+from golem.model import LocalRank, NeighbourLocRank
 from golem.ranking.helper.trust import Trust
 from golem.ranking.manager import database_manager as dm
 from golem.testutils import DatabaseFixture
@@ -251,3 +254,56 @@ class TestDatabaseManager(DatabaseFixture):
         """Should throw exception for WRONG_COMPUTED increase."""
         with self.assertRaises(KeyError):
             Trust.WRONG_COMPUTED.increase('alpha', 0.3)
+
+    def test_write_behind(self):
+        dm.increase_positive_computed('alpha', 0.5)
+        dm.upsert_neighbour_loc_rank('alpha', 'beta', (0.2, 0.3))
+        dm.flush()
+        # Changes are kept in memory until the flush interval passes
+        assert LocalRank.select().count() == 0
+        assert NeighbourLocRank.select().count() == 0
+
+        dm.flush(force=True)
+        assert LocalRank.get(node_id='alpha').positive_computed == 0.5
+        rank = NeighbourLocRank.get(node_id='alpha', about_node_id='beta')
+        assert rank.requesting_trust_value == 0.3
+
+        dm.increase_positive_computed('alpha', 0.25)
+        dm.upsert_neighbour_loc_rank('alpha', 'beta', (0.4, 0.5))
+        dm.flush(force=True)
+        assert LocalRank.select().count() == 1
+        assert LocalRank.get(node_id='alpha').positive_computed == 0.75
+        rank = NeighbourLocRank.get(node_id='alpha', about_node_id='beta')
+        assert rank.requesting_trust_value == 0.5
+
+        # Ranks are read from the database
+        cache = dm.RankCache()
+        assert cache.get_local_rank('alpha').positive_computed == 0.75
+        assert cache.get_neighbour_loc_rank('alpha', 'beta') \
+            .computing_trust_value == 0.4
+        assert cache.get_local_rank('beta') is None
+        assert [r.node_id for r in cache.get_local_rank_for_all()] == \
+            ['alpha']
+
+    def test_lookups_are_cached(self):
+        dm.increase_negative_payment('alpha', 1.0)
+        dm.get_neighbour_loc_rank('alpha', 'beta')
+        with patch.object(LocalRank, 'select') as local_select, \
+                patch.object(NeighbourLocRank, 'select') as neighbour_select:
+            assert dm.get_local_rank('alpha').negative_payment == 1.0
+            assert dm.get_neighbour_loc_rank('alpha', 'beta') is None
+        assert not local_select.called
+        assert not neighbour_select.called
+
+    def test_many_neighbour_ranks(self):
+        # More neighbours than SQLite binds variables in a single query
+        neighbour_ids = ['node{}'.format(i) for i in range(1200)]
+        for neighbour_id in neighbour_ids[::100]:
+            dm.upsert_neighbour_loc_rank(neighbour_id, 'about', (0.1, 0.2))
+        dm.flush(force=True)
+
+        cache = dm.RankCache()
+        ranks = cache.get_neighbour_loc_ranks(neighbour_ids, 'about')
+        assert len(ranks) == len(neighbour_ids)
+        assert [r.node_id for r in ranks if r is not None] == \
+            neighbour_ids[::100]
@@ -1,10 +1,12 @@
 from threading import Thread
 
+import pytest
 from mock import MagicMock
 
 from golem.client import Client
 from golem.ranking.helper.trust import Trust
 from golem.ranking.manager import database_manager as dm
+from golem.ranking.manager import trust_manager as tm
 from golem.ranking.ranking import Ranking
 from golem.tools.assertlogs import LogTestCase
 from golem.tools.testwithdatabase import TestWithDatabase
@@ -221,3 +223,39 @@ class TestRanking(TestWithDatabase, LogTestCase):
         r.client.collect_stopped_peers.return_value = {"MNO"}
         r._Ranking__make_break()
         assert r.global_finished
+
+    def test_neighbours_rank(self):
+        dm.upsert_neighbour_loc_rank("ABC", "XYZ", (0.5, -0.5))
+        dm.upsert_neighbour_loc_rank("DEF", "XYZ", (0.2, 0.4))
+        dm.increase_positive_payment("ABC", 100)
+        dm.increase_positive_computed("DEF", 100)
+
+        def expected(trust_and_weight):
+            sum_trust = sum((w - 1) * t for t, w in trust_and_weight)
+            return sum_trust, sum(w for _, w in trust_and_weight)
+
+        neighbours = ["ABC", "DEF", "GHI", "XYZ"]
+        # Unknown neighbours have unknown trust and weight
+        assert tm.computed_neighbours_rank("XYZ", neighbours) == \
+            pytest.approx(expected([(0.5, 2.0 ** 2.0), (0.2, 1.0),
+                                    (0.0, 1.0)]))
+        assert tm.requested_neighbours_rank("XYZ", neighbours) == \
+            pytest.approx(expected([(-0.5, 1.0), (0.4, 2.0 ** 2.0),
+                                    (0.0, 1.0)]))
+        assert tm.computed_neighbours_rank("XYZ", []) == (0.0, 0.0)
+
+    def test_add_gossip(self):
+        r = Ranking(MagicMock(spec=Client))
+        r.received_gossip = [
+            [["ABC", [[0.2, 0.5], [0.1, 0.5]]],
+             ["ABC", [[0.2, 0.5], [0.1, 0.5]]],
+             ["DEF", [[0.2], [0.1, 0.5]]],
+             ["GHI", "wrong"]],
+            [["DEF", [[-0.2, 0.5], [0.3, 0.5]]]]
+        ]
+        r._Ranking__add_gossip()
+        assert dict(r.working_vec) == {
+            "ABC": [[0.4, 1.0], [0.2, 1.0]],
+            "DEF": [[-0.2, 0.5], [0.3, 0.5]]
+        }
+        assert r.received_gossip == []
@@ -1,8 +1,9 @@
 import os
+import shutil
 import unittest
 import uuid
 
-from mock import patch
+from mock import Mock, patch
 
 from golem.resource.base import resourcesmanager
 from golem.resource.dirmanager import DirManager
@@ -229,6 +230,104 @@ class TestResourceStorage(_Common.ResourceSetUp):
             assert os.path.exists(dst_path)
 
 
+class TestResourceStore(_Common.ResourceSetUp):
+
+    def setUp(self):
+        _Common.ResourceSetUp.setUp(self)
+        self.store = resourcesmanager.ResourceStore(
+            self.dir_manager.get_resource_store_dir)
+        self.resource_hash = uuid.uuid4().hex
+
+    def _bundle(self, task_id):
+        return resourcesmanager.ResourceBundle(
+            self.joined_resources,
+            self.resource_hash,
+            task_id=task_id,
+            path=self.dir_manager.get_task_resource_dir(task_id)
+        )
+
+    def test_put_and_restore(self):
+        resource = self._bundle(self.task_id)
+        new_resource = self._bundle(str(uuid.uuid4()))
+        assert not self.store.restore(new_resource)
+
+        self.store.put(resource)
+        assert self.store.restore(new_resource)
+
+        for (_, path), (_, new_path) in zip(resource.content(),
+                                            new_resource.content()):
+            assert os.path.samefile(path, new_path)
+        assert os.listdir(self.dir_manager.get_resource_store_dir()) == \
+            [self.resource_hash]
+
+        # Stored files are not replaced
+        self.store.put(new_resource)
+        assert os.listdir(self.dir_manager.get_resource_store_dir()) == \
+            [self.resource_hash]
+
+    def test_missing_files(self):
+        resource = resourcesmanager.FileResource(
+            'missing_file', self.resource_hash, task_id=self.task_id,
+            path=os.path.join(self.resources_dir, 'missing_file'))
+        self.store.put(resource)
+        assert not os.listdir(self.dir_manager.get_resource_store_dir())
+
+        self.store.put(self._bundle(self.task_id))
+        new_resource = self._bundle(str(uuid.uuid4()))
+        os.remove(os.path.join(
+            self.store.get_dir(self.resource_hash),
+            self.joined_resources[0]))
+        assert not self.store.restore(new_resource)
+
+    def test_invalid_entries(self):
+        resource = resourcesmanager.ResourceBundle(
+            [os.path.join('..', 'file')], self.resource_hash,
+            task_id=self.task_id, path=self.test_dir)
+        self.store.put(resource)
+        assert not self.store.restore(resource)
+
+        resource = self._bundle(self.task_id)
+        resource.hash = os.path.join('..', 'hash')
+        self.store.put(resource)
+        assert not self.store.restore(resource)
+        assert not os.listdir(self.dir_manager.get_resource_store_dir())
+
+    def test_release(self):
+        other_task_id = str(uuid.uuid4())
+        self.store.put(self._bundle(self.task_id))
+        assert self.store.restore(self._bundle(other_task_id))
+        entry_dir = self.store.get_dir(self.resource_hash)
+
+        paths = [path for _, path in self._bundle(other_task_id).content()]
+        links = [os.stat(path).st_nlink for path in paths]
+
+        self.store.release(self.task_id)
+        assert os.path.isdir(entry_dir)
+
+        # Removing the last task using an entry frees it
+        self.store.release(other_task_id)
+        assert not os.path.exists(entry_dir)
+        assert [os.stat(path).st_nlink + 1 for path in paths] == links
+
+    def test_prune(self):
+        resource = self._bundle(self.task_id)
+        self.store.put(resource)
+        entry_dir = self.store.get_dir(self.resource_hash)
+
+        # Left over from a previous run
+        self.store = resourcesmanager.ResourceStore(
+            self.dir_manager.get_resource_store_dir)
+        self.store.prune(max_age=0)
+        assert os.path.isdir(entry_dir)  # still linked into the task dir
+
+        shutil.rmtree(resource.path)
+        self.store.prune()
+        assert os.path.isdir(entry_dir)  # used recently
+
+        self.store.prune(max_age=0)
+        assert not os.path.exists(entry_dir)
+
+
 class TestAbstractResourceManager(_Common.ResourceSetUp):
 
     def setUp(self):
@@ -357,3 +456,82 @@ class TestAbstractResourceManager(_Common.ResourceSetUp):
             ['resource', '1'],
             [os.path.join('split', 'path'), '4']
         ]
+
+    def test_pull_resource_from_store(self):
+        resource_hash = uuid.uuid4().hex
+        resourcesmanager.TestClient._resources[resource_hash] = \
+            self.test_dir_file
+        entry = ['dir_file.one.two', resource_hash]
+        success, error = Mock(), Mock()
+
+        self.resource_manager.pull_resource(entry, 'task_1', success, error,
+                                            async=False, pin=False)
+        success.assert_called_once_with(entry, 'task_1')
+        del resourcesmanager.TestClient._resources[resource_hash]
+
+        # Files of the same resource are linked from the store
+        self.resource_manager.pull_resource(entry, 'task_2', success, error,
+                                            async=False, pin=False)
+        success.assert_called_with(entry, 'task_2')
+        assert not error.called
+        storage = self.resource_manager.storage
+        assert os.path.samefile(storage.get_path(entry[0], 'task_1'),
+                                storage.get_path(entry[0], 'task_2'))
+
+        self.resource_manager.remove_task('task_1')
+        assert os.listdir(self.dir_manager.get_resource_store_dir())
+        self.resource_manager.remove_task('task_2')
+        assert not os.listdir(self.dir_manager.get_resource_store_dir())
+
+    def test_pull_resource_not_stored(self):
+        resource_hash = uuid.uuid4().hex
+        resourcesmanager.TestClient._resources[resource_hash] = \
+            self.test_dir_file
+        entry = ['dir_file.one.two', resource_hash]
+        success, error = Mock(), Mock()
+
+        self.resource_manager.pull_resource(entry, 'task_1', success, error,
+                                            async=False, pin=False,
+                                            store=False)
+        del resourcesmanager.TestClient._resources[resource_hash]
+
+        success.assert_called_once_with(entry, 'task_1')
+        assert not os.listdir(self.dir_manager.get_resource_store_dir())
+
+    @patch('golem.resource.base.resourcesmanager.time.sleep')
+    def test_pull_resource_retry(self, sleep):
+        from requests.exceptions import Timeout
+
+        resource_hash = uuid.uuid4().hex
+        resourcesmanager.TestClient._resources[resource_hash] = \
+            self.test_dir_file
+        entry = ['dir_file.one.two', resource_hash]
+        success, error = Mock(), Mock()
+        get_file = resourcesmanager.TestClient.get_file
+        failures = [Timeout(), Timeout()]
+
+        def fail_first(client, *args, **kwargs):
+            if failures:
+                raise failures.pop(0)
+            return get_file(client, *args, **kwargs)
+
+        with patch.object(resourcesmanager.TestClient, 'get_file',
+                          fail_first):
+            self.resource_manager.pull_resource(entry, 'task_1',
+                                                success, error,
+                                                async=False, pin=False)
+
+        # Retried with growing delays
+        assert [c[0][0] for c in sleep.call_args_list] == [1.0, 2.0]
+        success.assert_called_once_with(entry, 'task_1')
+        assert not error.called
+        assert self.resource_manager.scheduler.running == 0
+
+        # Other errors aren't retried
+        success.reset_mock()
+        entry = ['dir_file.one.two', uuid.uuid4().hex]
+        self.resource_manager.pull_resource(entry, 'task_2', success, error,
+                                            async=False, pin=False)
+        assert error.called
+        assert not success.called
+        assert sleep.call_count == 2
@@ -0,0 +1,120 @@
+import unittest
+
+from mock import Mock
+
+from golem.resource.base.downloadscheduler import DownloadScheduler
+from golem.testutils import PEP8MixIn
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDownloadScheduler(unittest.TestCase, PEP8MixIn):
+    PEP8_FILES = [
+        'golem/resource/base/downloadscheduler.py',
+    ]
+
+    def setUp(self):
+        self.clock = Clock()
+        self.started = []
+
+    def _start(self, name):
+        return lambda: self.started.append(name)
+
+    def test_concurrency_limit(self):
+        scheduler = DownloadScheduler(2, clock=self.clock)
+        for i in range(4):
+            scheduler.submit('task', self._start(i))
+
+        assert self.started == [0, 1]
+        assert scheduler.running == 2
+        assert scheduler.pending() == 2
+
+        scheduler.finished()
+        assert self.started == [0, 1, 2]
+        assert scheduler.pending('task') == 1
+
+    def test_no_limit(self):
+        scheduler = DownloadScheduler(0, clock=self.clock)
+        for i in range(20):
+            scheduler.submit('task', self._start(i))
+        assert len(self.started) == 20
+        assert not scheduler.pending()
+
+    def test_prioritise(self):
+        scheduler = DownloadScheduler(1, clock=self.clock)
+        scheduler.submit('task_1', self._start('running'))
+        scheduler.submit('task_1', self._start('task_1'))
+        scheduler.submit('task_2', self._start('task_2'))
+        scheduler.submit('task_3', self._start('task_3'))
+
+        scheduler.prioritise('task_3')
+        scheduler.finished()
+        assert self.started == ['running', 'task_3']
+
+        # Other tasks in the order of submission
+        scheduler.finished()
+        scheduler.finished()
+        assert self.started == ['running', 'task_3', 'task_1', 'task_2']
+
+    def test_adapt_concurrency(self):
+        scheduler = DownloadScheduler(2, max_concurrency=3,
+                                      adapt_interval=10, clock=self.clock)
+        for i in range(100):
+            scheduler.submit('task', self._start(i))
+
+        def interval(downloaded):
+            self.clock.now += 10
+            scheduler.finished(downloaded)
+            scheduler.submit('task', self._start('next'))
+
+        # Concurrency grows while the throughput does
+        interval(1000)
+        assert scheduler.concurrency == 3
+        interval(2000)
+        assert scheduler.concurrency == 3
+        # and turns back when it drops
+        interval(1500)
+        assert scheduler.concurrency == 2
+        interval(1800)
+        assert scheduler.concurrency == 1
+        interval(1000)
+        assert scheduler.concurrency == 2
+
+    def test_no_adapting_without_pending_downloads(self):
+        scheduler = DownloadScheduler(2, adapt_interval=10, clock=self.clock)
+        scheduler.submit('task', self._start(0))
+        self.clock.now += 10
+        scheduler.finished(1000)
+        assert scheduler.concurrency == 2
+
+    def test_retry_delay(self):
+        scheduler = DownloadScheduler(retry_delay=1, max_retry_delay=8,
+                                      retry_timeout=30, clock=self.clock)
+        delays = []
+        while True:
+            delay = scheduler.next_retry_delay('hash')
+            if delay is None:
+                break
+            delays.append(delay)
+            self.clock.now += delay
+
+        assert delays == [1, 2, 4, 8, 8]
+
+        # Backoff starts again after giving up
+        assert scheduler.next_retry_delay('hash') == 1
+        # and after a successful download
+        scheduler.clear_retry('hash')
+        assert scheduler.next_retry_delay('hash') == 1
+
+    def test_start_outside_lock(self):
+        scheduler = DownloadScheduler(1, clock=self.clock)
+        start = Mock(side_effect=lambda: scheduler.pending())
+        scheduler.submit('task', start)
+        assert start.called
@@ -57,13 +57,13 @@ class TestDirManager(TestDirFixture):
         task_id = '12345'
         tmp_dir = dm.get_task_temporary_dir(task_id)
         expected_tmp_dir = os.path.join(self.path, task_id, 'tmp')
-        self.assertEqual(os.path.normpath(tmp_dir), expected_tmp_dir)
+        self.assertEqual(os.path.normpath(tmp_dir), expected_tmp_dir)
         self.assertTrue(os.path.isdir(tmp_dir))
         tmp_dir = dm.get_task_temporary_dir(task_id)
         self.assertTrue(os.path.isdir(tmp_dir))
         tmp_dir = dm.get_task_temporary_dir(task_id, create=False)
         self.assertTrue(os.path.isdir(tmp_dir))
-        self.assertEqual(os.path.normpath(tmp_dir), expected_tmp_dir)
+        self.assertEqual(os.path.normpath(tmp_dir), expected_tmp_dir)
         shutil.rmtree(tmp_dir)
         tmp_dir = dm.get_task_temporary_dir(task_id, create=False)
         self.assertFalse(os.path.isdir(tmp_dir))
@@ -75,31 +75,39 @@ class TestDirManager(TestDirFixture):
         task_id = '12345'
         resDir = dm.get_task_resource_dir(task_id)
         expectedResDir = os.path.join(self.path, task_id, 'resources')
-        self.assertEqual(os.path.normpath(resDir), expectedResDir)
+        self.assertEqual(os.path.normpath(resDir), expectedResDir)
         self.assertTrue(os.path.isdir(resDir))
         resDir = dm.get_task_resource_dir(task_id)
         self.assertTrue(os.path.isdir(resDir))
         resDir = dm.get_task_resource_dir(task_id, create=False)
         self.assertTrue(os.path.isdir(resDir))
-        self.assertEqual(os.path.normpath(resDir), expectedResDir)
+        self.assertEqual(os.path.normpath(resDir), expectedResDir)
         shutil.rmtree(resDir)
         resDir = dm.get_task_resource_dir(task_id, create=False)
         self.assertFalse(os.path.isdir(resDir))
         resDir = dm.get_task_resource_dir(task_id, create=True)
         self.assertTrue(os.path.isdir(resDir))
 
+    def testGetResourceStoreDir(self):
+        dm = DirManager(self.path)
+        store_dir = dm.get_resource_store_dir()
+        self.assertEqual(os.path.normpath(store_dir),
+                         os.path.join(self.path, 'resource_store'))
+        self.assertTrue(os.path.isdir(store_dir))
+        self.assertNotEqual(store_dir, dm.get_task_resource_dir('12345'))
+
     def testGetTaskOutputDir(self):
         dm = DirManager(self.path)
         task_id = '12345'
         outDir = dm.get_task_output_dir(task_id)
         expectedResDir = os.path.join(self.path, task_id, 'output')
-        self.assertEqual(os.path.normpath(outDir), expectedResDir)
+        self.assertEqual(os.path.normpath(outDir), expectedResDir)
         self.assertTrue(os.path.isdir(outDir))
         outDir = dm.get_task_output_dir(task_id)
         self.assertTrue(os.path.isdir(outDir))
         outDir = dm.get_task_output_dir(task_id, create=False)
         self.assertTrue(os.path.isdir(outDir))
-        self.assertEqual(os.path.normpath(outDir), expectedResDir)
+        self.assertEqual(os.path.normpath(outDir), expectedResDir)
         shutil.rmtree(outDir)
         outDir = dm.get_task_output_dir(task_id, create=False)
         self.assertFalse(os.path.isdir(outDir))
@@ -34,6 +34,17 @@ class ResourceSessionTestCase(unittest.TestCase, testutils.PEP8MixIn):
         self.instance.encrypt(test_data)
         resource_server.encrypt.assert_called_once_with(test_data, self.instance.key_id)
 
+        # with secret shared with the peer, after the key exchange
+        self.instance.key_id = 'deadbeef'
+        resource_server.get_ecdh_key.return_value = b'\x01' * 32
+        peer = resourcesession.ResourceSession(mock.MagicMock())
+        self.instance._channel_key_received(peer._channel_key())
+        self.instance._channel_key_sent()
+        encrypted = self.instance.encrypt(test_data.encode())
+        resource_server.get_ecdh_key.assert_called_once_with('deadbeef')
+        self.assertEqual(resource_server.encrypt.call_count, 1)
+        self.assertNotEqual(encrypted, test_data.encode())
+
     def test_decryption(self):
         """.decrypt() method from SafeSession interface."""
 
@@ -182,6 +193,7 @@ class ResourceSessionTestCase(unittest.TestCase, testutils.PEP8MixIn):
             'PROTO_ID': 0,
             'RAND_VAL': self.instance.rand_val,
             'SOLVE_CHALLENGE': False,
+            'CHANNEL_KEY': self.instance._channel_handshake.public_key,
         }
 
         self.assertEqual(msg.dict_repr(), expected)
@@ -204,7 +204,8 @@ class DummyTask(Task):
         return computation.check_pow(int(result, 16), input_data,
                                      self.task_params.difficulty)
 
-    def computation_finished(self, subtask_id, task_result, result_type=0):
+    def computation_finished(self, subtask_id, task_result, result_type=0,
+                             verification_finished=None):
         with self._lock:
             if subtask_id in self.assigned_subtasks:
                 node_id = self.assigned_subtasks.pop(subtask_id, None)
@@ -213,6 +214,8 @@ class DummyTask(Task):
         self.subtask_results[subtask_id] = task_result
         if not self.verify_subtask(subtask_id):
             self.subtask_results[subtask_id] = None
+        if verification_finished:
+            verification_finished()
 
     def get_resources(self, resource_header, resource_type=0, tmp_dir=None):
         return self.task_resources
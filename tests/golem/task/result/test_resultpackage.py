@@ -1,10 +1,12 @@
+import io
 import os
 import shutil
+import tarfile
 import uuid
 
 from golem.core.fileencrypt import FileEncryptor
 from golem.resource.dirmanager import DirManager
-from golem.task.result.resultpackage import ZipPackager, EncryptingPackager, EncryptingTaskResultPackager, \
+from golem.task.result.resultpackage import ZipPackager, TarPackager, EncryptingPackager, EncryptingTaskResultPackager, \
     ExtractedPackage
 from golem.task.taskbase import result_types
 from golem.tools.testdirfixture import TestDirFixture
@@ -99,6 +101,36 @@ class TestZipPackager(TestDirFixture):
         shutil.rmtree(out_dir)
 
 
+class TestTarPackager(TestDirFixture):
+
+    def setUp(self):
+        TestDirFixture.setUp(self)
+
+        self.task_id = str(uuid.uuid4())
+        self.dir_manager = DirManager(self.path)
+        MockDirContents.populate(self, self.dir_manager, self.task_id)
+
+    def testCreateExtract(self):
+        tp = TarPackager()
+        path = tp.create(self.out_path, self.files, self.pickle_files)
+        files, out_dir = tp.extract(path)
+
+        self.assertEqual(set(files), set(self.file_list))
+        with open(os.path.join(out_dir, 'dir_file')) as f:
+            self.assertEqual(f.read(), "Dir file contents")
+        shutil.rmtree(out_dir)
+
+    def testExtractInvalidMember(self):
+        for name in ['../evil', '/evil', 'dir/evil']:
+            with tarfile.open(self.out_path, mode='w') as tf:
+                info = tarfile.TarInfo(name)
+                info.size = 4
+                tf.addfile(info, io.BytesIO(b'evil'))
+
+            with self.assertRaises(ValueError):
+                TarPackager().extract(self.out_path)
+
+
 class TestEncryptingPackager(TestDirFixture):
 
     def setUp(self):
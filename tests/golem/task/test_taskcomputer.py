@@ -36,7 +36,8 @@ class TestTaskComputer(TestDirFixture, LogTestCase):
         self.assertIsNone(tc.waiting_for_task)
         tc.last_task_request = 0
         tc.run()
-        task_server.request_task.assert_called_with()
+        task_server.request_task.assert_called_with(
+            num_cores=1, max_memory_size=tc.compute_slots[0][1])
         task_server.request_task = mock.MagicMock()
         task_server.config_desc.accept_tasks = False
         tc2 = TaskComputer("DEF", task_server, use_docker_machine_manager=False)
@@ -80,11 +81,15 @@ class TestTaskComputer(TestDirFixture, LogTestCase):
         tc.task_resource_failure(task_id, 'reason')
         assert not task_server.send_task_failed.called
 
-        tc.task_to_subtask_mapping[task_id] = subtask_id
-        tc.assigned_subtasks[subtask_id] = mock.Mock()
+        tc.assigned_subtasks[subtask_id] = mock.Mock(task_id=task_id)
+        tc.subtask_deltas[subtask_id] = None
+        tc.subtask_slots[subtask_id] = 0
 
         tc.task_resource_failure(task_id, 'reason')
         assert task_server.send_task_failed.called
+        assert subtask_id not in tc.assigned_subtasks
+        assert subtask_id not in tc.subtask_deltas
+        assert tc._get_free_slot() == 0
 
         tc.resource_request_rejected(subtask_id, 'reason')
 
@@ -109,7 +114,7 @@ class TestTaskComputer(TestDirFixture, LogTestCase):
         tc.task_given(ctd)
         self.assertEqual(tc.assigned_subtasks["xxyyzz"], ctd)
         self.assertLessEqual(tc.assigned_subtasks["xxyyzz"].deadline, timeout_to_deadline(10))
-        self.assertEqual(tc.task_to_subtask_mapping["xyz"], "xxyyzz")
+        self.assertIn("xxyyzz", tc.subtask_deltas)
         tc.task_server.request_resource.assert_called_with("xyz",  tc.resource_manager.get_resource_header("xyz"),
                                                            "10.10.10.10", 10203, "key", "owner")
         assert tc.task_resource_collected("xyz")
@@ -150,7 +155,7 @@ class TestTaskComputer(TestDirFixture, LogTestCase):
         tc.task_given(ctd)
         self.assertEqual(tc.assigned_subtasks["aabbcc"], ctd)
         self.assertLessEqual(tc.assigned_subtasks["aabbcc"].deadline, timeout_to_deadline(5))
-        self.assertEqual(tc.task_to_subtask_mapping["xyz"], "aabbcc")
+        self.assertIn("aabbcc", tc.subtask_deltas)
         tc.task_server.request_resource.assert_called_with("xyz",  tc.resource_manager.get_resource_header("xyz"),
                                                            "10.10.10.10", 10203, "key", "owner")
         self.assertTrue(tc.task_resource_collected("xyz"))
@@ -186,6 +191,151 @@ class TestTaskComputer(TestDirFixture, LogTestCase):
         if tt.is_alive():
             tt.join(timeout=5)
 
+    @mock.patch('golem.core.hardware.cpu_cores_available',
+                return_value=list(range(8)))
+    def test_compute_slots(self, _):
+        task_server = mock.MagicMock()
+        task_server.get_task_computer_root.return_value = self.path
+        task_server.config_desc = config_desc()
+        task_server.config_desc.num_cores = 8
+        task_server.config_desc.max_memory_size = 8 * 1024 * 1024
+        task_server.config_desc.max_concurrent_subtasks = 2
+        task_server.config_desc.accept_tasks = True
+        task_server.config_desc.task_request_interval = 0
+        tc = TaskComputer("ABC", task_server, use_docker_machine_manager=False)
+        assert tc.max_assigned_tasks == 2
+        assert [cores for cores, _ in tc.compute_slots] == [[0, 1, 2, 3],
+                                                            [4, 5, 6, 7]]
+
+        task_server.request_task.return_value = None
+        tc.last_task_request = 0
+        tc.run()
+        task_server.request_task.assert_called_with(
+            num_cores=4, max_memory_size=4 * 1024 * 1024)
+
+        # Other subtask may be requested while one is being computed
+        computation = mock.Mock(subtask_id="aabb", start_time=0.0,
+                                end_time=1.0, error=False, error_msg=None,
+                                result=None)
+        tc.current_computations.append(computation)
+        tc.subtask_slots["aabb"] = 0
+        tc.assigned_subtasks["aabb"] = mock.Mock(task_id="xyz")
+        tc.reset()
+        assert tc.counting_task == "xyz"
+        assert tc._get_free_slot() == 1
+        task_server.request_task.reset_mock()
+        tc.last_task_request = 0
+        tc.run()
+        assert task_server.request_task.called
+        computation.check_timeout.assert_called_with()
+
+        # All slots occupied
+        tc.current_computations.append(mock.Mock(subtask_id="ccdd"))
+        tc.subtask_slots["ccdd"] = 1
+        assert tc._get_free_slot() is None
+        task_server.request_task.reset_mock()
+        tc.last_task_request = 0
+        tc.run()
+        assert not task_server.request_task.called
+
+        tc.task_computed(computation)
+        assert tc._get_free_slot() == 0
+        assert not tc.counting_task
+
+    @mock.patch('golem.task.taskcomputer.DockerTaskThread')
+    @mock.patch('golem.core.hardware.cpu_cores_available',
+                return_value=list(range(8)))
+    def test_docker_slot_constraints(self, _, docker_thread):
+        task_server = mock.MagicMock()
+        task_server.get_task_computer_root.return_value = self.path
+        task_server.config_desc = config_desc()
+        task_server.config_desc.num_cores = 8
+        task_server.config_desc.max_memory_size = 8 * 1024 * 1024
+        task_server.config_desc.max_concurrent_subtasks = 2
+        tc = TaskComputer("ABC", task_server, use_docker_machine_manager=False)
+
+        for subtask_id in ["xxyyzz", "aabbcc"]:
+            ctd = ComputeTaskDef()
+            ctd.task_id = "xyz"
+            ctd.subtask_id = subtask_id
+            ctd.docker_images = [mock.Mock()]
+            ctd.deadline = timeout_to_deadline(10)
+            tc.task_given(ctd)
+            assert tc.task_resource_collected("xyz", unpack_delta=False)
+
+        host_configs = [c[1]['host_config']
+                        for c in docker_thread.call_args_list]
+        assert host_configs == [
+            dict(cpuset='0,1,2,3', mem_limit=4 * 1024 * 1024 * 1000),
+            dict(cpuset='4,5,6,7', mem_limit=4 * 1024 * 1024 * 1000)]
+        assert tc.subtask_slots == {"xxyyzz": 0, "aabbcc": 1}
+        assert len(tc.current_computations) == 2
+
+    @mock.patch('golem.task.taskcomputer.DockerTaskThread')
+    @mock.patch('golem.core.hardware.cpu_cores_available',
+                return_value=list(range(8)))
+    def test_subtasks_of_the_same_task(self, _, docker_thread):
+        task_server = mock.MagicMock()
+        task_server.get_task_computer_root.return_value = self.path
+        task_server.config_desc = config_desc()
+        task_server.config_desc.num_cores = 8
+        task_server.config_desc.max_memory_size = 8 * 1024 * 1024
+        task_server.config_desc.max_concurrent_subtasks = 2
+        tc = TaskComputer("ABC", task_server, use_docker_machine_manager=False)
+
+        ctds = []
+        for subtask_id in ["xxyyzz", "aabbcc", "ddeeff"]:
+            ctd = ComputeTaskDef()
+            ctd.task_id = "xyz"
+            ctd.subtask_id = subtask_id
+            ctd.docker_images = [mock.Mock()]
+            ctd.deadline = timeout_to_deadline(10)
+            ctds.append(ctd)
+
+        assert tc.task_given(ctds[0])
+        assert tc.task_given(ctds[1])
+        tc.wait_for_resources("xxyyzz", "delta 1")
+        tc.wait_for_resources("aabbcc", "delta 2")
+        assert tc.subtask_deltas == {"xxyyzz": "delta 1", "aabbcc": "delta 2"}
+
+        # All slots are reserved, third subtask is refused
+        assert not tc.task_given(ctds[2])
+        assert "ddeeff" not in tc.assigned_subtasks
+        task_server.send_task_failed.assert_called_with(
+            "ddeeff", "xyz", "No free computing slot", mock.ANY, mock.ANY,
+            mock.ANY, mock.ANY, "ABC")
+
+        # Both subtasks are started, each one with its own delta
+        assert tc.task_resource_collected("xyz")
+        resource_dir = tc.dir_manager.get_task_resource_dir("xyz")
+        task_server.unpack_delta.assert_has_calls([
+            mock.call(resource_dir, "delta 1", "xyz"),
+            mock.call(resource_dir, "delta 2", "xyz")], any_order=True)
+        assert docker_thread.call_count == 2
+        assert tc.subtask_deltas == {}
+        assert tc.subtask_slots == {"xxyyzz": 0, "aabbcc": 1}
+        assert not tc.task_resource_collected("xyz")
+
+    def test_drop_expired_subtasks(self):
+        task_server = mock.MagicMock()
+        task_server.get_task_computer_root.return_value = self.path
+        task_server.config_desc = config_desc()
+        tc = TaskComputer("ABC", task_server, use_docker_machine_manager=False)
+
+        ctd = ComputeTaskDef()
+        ctd.task_id = "xyz"
+        ctd.subtask_id = "xxyyzz"
+        ctd.deadline = timeout_to_deadline(10)
+        assert tc.task_given(ctd)
+        tc.run()
+        assert "xxyyzz" in tc.assigned_subtasks
+
+        ctd.deadline = timeout_to_deadline(-1)
+        tc.run()
+        assert "xxyyzz" not in tc.assigned_subtasks
+        assert tc._get_free_slot() == 0
+        assert task_server.send_task_failed.called
+
     def test_change_config(self):
         task_server = mock.MagicMock()
         task_server.config_desc = config_desc()
@@ -1,5 +1,6 @@
 from datetime import datetime
 from pathlib import Path
+import pickle
 import random
 import time
 from unittest import TestCase
@@ -162,8 +163,7 @@ class TestTaskHeaderKeeper(LogTestCase):
         assert tk.task_headers.get("xyz") is not None
         assert tk.removed_tasks.get("abc") is not None
         assert tk.removed_tasks.get("xyz") is None
-        assert len(tk.supported_tasks) == 1
-        assert tk.supported_tasks[0] == "xyz"
+        assert tk.supported_tasks == {"xyz"}
 
     def test_task_header_update(self):
         e = Environment()
@@ -187,8 +187,8 @@ class TestTaskHeaderKeeper(LogTestCase):
         assert tk.add_task_header(task_header)
         assert task_id not in tk.supported_tasks
 
-        tk.task_headers = {}
-        tk.supported_tasks = []
+        tk = TaskHeaderKeeper(EnvironmentsManager(), 10)
+        tk.environments_manager.add_environment(e)
 
         task_header["max_price"] = 1
         assert tk.add_task_header(task_header)
@@ -198,6 +198,84 @@ class TestTaskHeaderKeeper(LogTestCase):
         task_header['deadline'] = "WRONG DEADLINE"
         assert not tk.add_task_header(task_header)
 
+    def test_supported_again_after_update(self):
+        e = Environment()
+        e.accept_tasks = True
+        tk = TaskHeaderKeeper(EnvironmentsManager(), 10)
+        tk.environments_manager.add_environment(e)
+
+        task_header = get_dict_task_header()
+        task_header["max_price"] = 1
+        assert tk.add_task_header(task_header)
+        assert not tk.supported_tasks
+        assert tk.get_task() is None
+
+        task_header["max_price"] = 20
+        assert tk.add_task_header(task_header)
+        assert tk.supported_tasks == {task_header["task_id"]}
+        assert tk.get_task().max_price == 20
+
+    def test_get_task_score(self):
+        e = Environment()
+        e.accept_tasks = True
+        trust = {"trusted": 1.0, "distrusted": -1.0}
+        tk = TaskHeaderKeeper(EnvironmentsManager(), 10,
+                              get_requestor_trust=trust.get)
+        tk.environments_manager.add_environment(e)
+
+        for task_id, owner in [("abc", "trusted"), ("xyz", "distrusted")]:
+            task_header = get_dict_task_header()
+            task_header["task_id"] = task_id
+            task_header["task_owner_key_id"] = owner
+            assert tk.add_task_header(task_header)
+
+        # Tasks of distrusted requestors get no score
+        for _ in range(20):
+            assert tk.get_task().task_id == "abc"
+
+        task_header = get_dict_task_header()
+        task_header["task_id"] = "def"
+        task_header["task_owner_key_id"] = "unknown"
+        task_header["max_price"] = 1000
+        assert tk.add_task_header(task_header)
+        best = tk.task_headers["def"]
+        other = tk.task_headers["abc"]
+        assert tk._score(best, 1000) > tk._score(other, 1000)
+
+        score = tk._score(best, 1000)
+        best.resource_size = 1024 ** 3
+        assert tk._score(best, 1000) < score / 2
+
+        e.accept_tasks = False
+        assert tk.get_task() is None
+
+    def test_remove_old_tasks_heap(self):
+        e = Environment()
+        e.accept_tasks = True
+        tk = TaskHeaderKeeper(EnvironmentsManager(), 10,
+                              remove_task_timeout=0)
+        tk.environments_manager.add_environment(e)
+
+        task_header = get_dict_task_header()
+        task_header["deadline"] = timeout_to_deadline(1)
+        assert tk.add_task_header(task_header)
+        # Deadline is extended with an update
+        task_header["deadline"] = timeout_to_deadline(10)
+        assert tk.add_task_header(task_header)
+        assert len(tk._deadlines) == 2
+
+        time.sleep(1.1)
+        tk.remove_old_tasks()
+        assert task_header["task_id"] in tk.task_headers
+        assert len(tk._deadlines) == 1
+
+        tk.remove_task_header(task_header["task_id"])
+        assert task_header["task_id"] in tk.removed_tasks
+        assert not tk.supported_tasks
+        assert not tk._tasks_by_env.get(task_header["environment"])
+        tk.remove_old_tasks()
+        assert not tk.removed_tasks
+
     def test_is_correct(self):
         tk = TaskHeaderKeeper(EnvironmentsManager(), 10)
         th = get_dict_task_header()
@@ -289,6 +367,24 @@ class TestCompTaskKeeper(LogTestCase, PEP8MixIn, TempDirFixture):
         for header in test_headers:
             self.assertIn(header.task_id, ctk.active_tasks)
 
+    def test_persistence_legacy_dump(self):
+        tasks_dir = Path(self.path)
+        header = get_task_header()
+        active_tasks = {header.task_id: CompTaskInfo(header, 10)}
+        subtask_to_task = {"subtask1": header.task_id}
+        legacy_path = tasks_dir / CompTaskKeeper.LEGACY_DUMP_NAME
+        with legacy_path.open('wb') as f:
+            pickle.dump((active_tasks, subtask_to_task), f)
+
+        ctk = CompTaskKeeper(tasks_dir)
+        assert header.task_id in ctk.active_tasks
+        assert ctk.subtask_to_task == subtask_to_task
+        assert not legacy_path.exists()
+
+        ctk = CompTaskKeeper(tasks_dir)
+        assert header.task_id in ctk.active_tasks
+        assert ctk.subtask_to_task == subtask_to_task
+
     @patch('golem.task.taskkeeper.CompTaskKeeper.dump')
     def test_comp_keeper(self, dump_mock):
         ctk = CompTaskKeeper(Path('ignored'))
@@ -1,4 +1,5 @@
 import os
+import pickle
 import random
 import shutil
 import time
@@ -15,7 +16,8 @@ from golem.resource.resource import TaskResourceHeader
 from golem.task.taskbase import Task, TaskHeader, ComputeTaskDef, \
     TaskEventListener
 from golem.task.taskclient import TaskClient
-from golem.task.taskmanager import TaskManager, logger, subtask_priority
+from golem.task.taskmanager import TaskManager, logger, subtask_priority, \
+    TASK_DUMP_INTERVAL
 from golem.task.taskstate import SubtaskStatus, SubtaskState, TaskState, \
     TaskStatus, ComputerState
 from golem.tools.assertlogs import LogTestCase
@@ -44,6 +46,101 @@ class TestTaskManagerWithPersistance(TestDirFixture, LogTestCase):
             TaskManager("ABC", Node(), keys_auth, root_path=self.path, task_persistence=True)
         assert any("RESTORE TASKS" in log for log in l.output)
 
+    def _get_task_manager(self):
+        keys_auth = Mock()
+        keys_auth.sign.return_value = 'sig'
+        tm = TaskManager("ABC", Node(), keys_auth, root_path=self.path,
+                         task_persistence=True)
+        tm.key_id = "KEYID"
+        tm.listen_address = "10.10.10.10"
+        tm.listen_port = 2222
+        return tm
+
+    def _get_task(self, task_id):
+        header = TaskHeader("ABC", task_id, "10.10.10.10", 1023, "abcde",
+                            "DEFAULT")
+        return Task(header, "print 'hello world'")
+
+    def test_dump_and_restore(self):
+        tm = self._get_task_manager()
+        task = self._get_task("xyz")
+        tm.add_new_task(task)
+        subtask_state = SubtaskState()
+        subtask_state.subtask_id = "xxyyzz"
+        tm.tasks_states["xyz"].subtask_states["xxyyzz"] = subtask_state
+        tm.subtask2task_mapping["xxyyzz"] = "xyz"
+        tm.dump_task("xyz")
+
+        journal_size = tm.tasks_journal.path.stat().st_size
+        tm.dump_task("xyz")
+        assert tm.tasks_journal.path.stat().st_size == journal_size
+
+        tm.add_new_task(self._get_task("abc"))
+        tm.delete_task("abc")
+
+        tm2 = self._get_task_manager()
+        assert set(tm2.tasks.keys()) == {"xyz"}
+        assert set(tm2.tasks_states["xyz"].subtask_states.keys()) == \
+            {"xxyyzz"}
+        assert tm2.subtask2task_mapping == {"xxyyzz": "xyz"}
+
+        del tm.tasks_states["xyz"].subtask_states["xxyyzz"]
+        tm.dump_task("xyz")
+        tm3 = self._get_task_manager()
+        assert tm3.tasks_states["xyz"].subtask_states == {}
+
+    def test_dump_subtask(self):
+        tm = self._get_task_manager()
+        task = self._get_task("xyz")
+        tm.add_new_task(task)
+        tm.dump_task("xyz")
+
+        subtask_state = SubtaskState()
+        subtask_state.subtask_id = "xxyyzz"
+        tm.tasks_states["xyz"].subtask_states["xxyyzz"] = subtask_state
+        tm.subtask2task_mapping["xxyyzz"] = "xyz"
+        with patch.object(tm.tasks_journal, 'put',
+                          wraps=tm.tasks_journal.put) as put:
+            tm.dump_task("xyz", "xxyyzz")
+        assert {c[0][0] for c in put.call_args_list} == \
+            {('state', 'xyz'), ('subtask', 'xyz', 'xxyyzz')}
+        assert tm._dumped_subtasks == {"xyz": {"xxyyzz"}}
+        assert tm._dirty_tasks == {"xyz"}
+
+        with patch('golem.task.taskmanager.time.time',
+                   return_value=time.time() + TASK_DUMP_INTERVAL + 1):
+            tm.flush_task_dumps()
+        assert not tm._dirty_tasks
+
+        tm2 = self._get_task_manager()
+        assert tm2._dumped_subtasks == {"xyz": {"xxyyzz"}}
+        tm2.delete_task("xyz")
+        assert tm2.tasks_journal.keys() == []
+
+    def test_flush_tasks(self):
+        tm = self._get_task_manager()
+        task = self._get_task("xyz")
+        tm.add_new_task(task)
+        with patch.object(task, 'flush') as flush:
+            tm.flush_tasks()
+        flush.assert_called_once_with()
+
+    def test_restore_legacy_pickles(self):
+        tm = self._get_task_manager()
+        task = self._get_task("xyz")
+        pickle_path = tm.tasks_dir / "xyz.pickle"
+        with pickle_path.open('wb') as f:
+            pickle.dump((task, TaskState()), f, protocol=2)
+        broken_path = tm.tasks_dir / "broken.pickle"
+        with broken_path.open('wb') as f:
+            f.write(b'broken')
+
+        tm2 = self._get_task_manager()
+        assert set(tm2.tasks.keys()) == {"xyz"}
+        assert not pickle_path.exists()
+        assert not broken_path.exists()
+        assert set(self._get_task_manager().tasks.keys()) == {"xyz"}
+
 
 class TestTaskManager(LogTestCase, TestDirFixtureWithReactor):
     def setUp(self):
@@ -349,6 +446,32 @@ class TestTaskManager(LogTestCase, TestDirFixtureWithReactor):
         assert ctd.subtask_id == "sss4"
         assert self.tm.computed_task_received("sss4", [], 0)
 
+        # Verified asynchronously
+        th.task_id = "task5"
+        t5 = TestTask(th, "print 'Hello world!", ["ttt5"], {'ttt5': True})
+        verifications = []
+
+        def computation_finished(subtask_id, task_result, result_type=0,
+                                 verification_finished=None):
+            t5.finished[subtask_id] = True
+            verifications.append(verification_finished)
+
+        t5.computation_finished = computation_finished
+        self.tm.add_new_task(t5)
+        self.tm.start_task(t5.header.task_id)
+        self.tm.get_next_subtask("DEF", "DEF", "task5", 1000, 10, 5, 10, 2,
+                                 "10.10.10.10")
+        verification_finished = Mock()
+        assert self.tm.computed_task_received("ttt5", [], 0,
+                                              verification_finished)
+        ss = self.tm.tasks_states["task5"].subtask_states["ttt5"]
+        assert ss.subtask_status != SubtaskStatus.finished
+        assert not verification_finished.called
+        verifications[0]()
+        verification_finished.assert_called_once_with()
+        assert ss.subtask_status == SubtaskStatus.finished
+        assert self.tm.tasks_states["task5"].status == TaskStatus.finished
+
     def test_task_result_incoming(self):
         subtask_id = "xxyyzz"
         node_id = 'node'
@@ -462,6 +585,9 @@ class TestTaskManager(LogTestCase, TestDirFixtureWithReactor):
         assert isinstance(self.tm, TaskEventListener)
         self.tm.notify_update_task("xyz")
         self.tm.notice_task_updated.assert_called_with("xyz")
+        self.tm.restart_subtask = Mock()
+        self.tm.notify_restart_subtask("xyz", "xxyyzz")
+        self.tm.restart_subtask.assert_called_with("xxyyzz")
 
     def test_query_task_state(self):
         with self.assertLogs(logger, level="WARNING"):
@@ -553,6 +679,35 @@ class TestTaskManager(LogTestCase, TestDirFixtureWithReactor):
         assert isinstance(all_subtasks, list)
         assert all(isinstance(t, dict) for t in all_subtasks)
 
+    @patch('golem.network.p2p.node.Node.collect_network_info')
+    def test_get_tasks_pagination(self, _):
+        tm = TaskManager("ABC", Node(), Mock(), root_path=self.path)
+        task_id, _ = self.__build_tasks(tm, 4)
+        task_ids = list(tm.tasks.keys())
+        tm.tasks_states[task_ids[2]].status = TaskStatus.computing
+
+        def ids(tasks):
+            return [t['id'] for t in tasks]
+
+        assert ids(tm.get_tasks_dict(limit=2)) == task_ids[:2]
+        assert ids(tm.get_tasks_dict(cursor=task_ids[1])) == task_ids[2:]
+        assert ids(tm.get_tasks_dict(cursor=task_ids[0], limit=2,
+                                     status=TaskStatus.waiting)) == \
+            [task_ids[1], task_ids[3]]
+        assert tm.get_tasks_dict(cursor="unknown") == []
+
+        subtask_ids = list(tm.tasks_states[task_id].subtask_states.keys())
+        subtask_state = tm.tasks_states[task_id].subtask_states[subtask_ids[1]]
+        subtask_state.subtask_status = SubtaskStatus.finished
+
+        def subtasks(cursor=None, limit=None, status=None):
+            return [s['subtask_id'] for s in tm.get_subtasks_dict(
+                task_id, cursor=cursor, limit=limit, status=status)]
+
+        assert subtasks(limit=1) == subtask_ids[:1]
+        assert subtasks(cursor=subtask_ids[0], limit=2) == subtask_ids[1:3]
+        assert subtasks(status=SubtaskStatus.finished) == subtask_ids[1:2]
+
     @patch('golem.network.p2p.node.Node.collect_network_info')
     @patch('apps.blender.task.blenderrendertask.'
            'BlenderTaskTypeInfo.get_preview')
@@ -18,7 +18,8 @@ from golem.network.stun.pystun import FullCone
 from golem.task import tasksession
 from golem.task.taskbase import ComputeTaskDef, TaskHeader
 from golem.task.taskserver import TASK_CONN_TYPES
-from golem.task.taskserver import TaskServer, WaitingTaskResult, logger
+from golem.task.taskserver import TaskServer, WaitingTaskResult, \
+    WaitingVerdict, logger
 from golem.task.tasksession import TaskSession
 from golem.tools.assertlogs import LogTestCase
 from golem.tools.testwithappconfig import TestWithKeysAuth
@@ -265,6 +266,42 @@ class TestTaskServer(TestWithKeysAuth, LogTestCase, testutils.DatabaseFixture):
         saved_task = next(th for th in ts.get_tasks_headers() if th["task_id"] == "xyz_2")
         self.assertEqual(saved_task["signature"], new_header["signature"])
 
+    def test_tasks_digests(self):
+        config = self._get_config_desc()
+        keys_auth = EllipticalKeysAuth(self.path)
+        keys_auth_2 = EllipticalKeysAuth(os.path.join(self.path, "2"))
+
+        self.ts = ts = TaskServer(Node(), config, keys_auth, self.client,
+                                  use_docker_machine_manager=False)
+
+        for task_id in ["xyz", "xyz_2"]:
+            task_header = get_example_task_header()
+            task_header["task_id"] = task_id
+            task_header["task_owner_key_id"] = keys_auth_2.key_id
+            task_header["signature"] = keys_auth_2.sign(
+                TaskHeader.dict_to_binary(task_header))
+            assert ts.add_task_header(task_header)
+
+        digests = ts.get_tasks_digests()
+        assert len(digests) == 2
+        assert ts.get_tasks_headers(digests) == []
+        headers = ts.get_tasks_headers(digests[:1])
+        assert len(headers) == 1
+        assert TaskHeader.from_dict(headers[0]).digest() == digests[1]
+
+        # Known headers are not verified again
+        with patch.object(ts, 'verify_header_sig') as verify:
+            assert ts.add_task_header(headers[0])
+            assert not verify.called
+
+        # Headers removed from the keeper are checked against the cache
+        header = headers[0]
+        ts.remove_task_header(header["task_id"])
+        with patch.object(ts.keys_auth, 'verify',
+                          return_value=True) as verify:
+            assert ts.add_task_header(header)
+            assert verify.call_args[1] == {'memoize': True}
+
     def test_sync(self):
         ccd = self._get_config_desc()
         ts = TaskServer(Node(), ccd, EllipticalKeysAuth(self.path), self.client,
@@ -704,6 +741,57 @@ class TestTaskServer(TestWithKeysAuth, LogTestCase, testutils.DatabaseFixture):
         request_payment_mock.assert_called_once_with(expected_income)
         hello_mock.assert_called_once_with()
 
+    @patch('golem.task.taskserver.TaskServer._add_pending_request')
+    def test_result_verified(self, add_pending_mock):
+        self.ts.task_manager = Mock()
+        self.ts.accept_result = Mock()
+        self.ts.reject_result = Mock()
+        owner = Mock()
+
+        # The session that delivered the result is gone
+        self.ts.task_manager.verify_subtask.return_value = True
+        self.ts.result_verified('xxyyzz', owner)
+        self.ts.accept_result.assert_called_once_with('xxyyzz', owner)
+        verdict, = self.ts.verdicts_to_send
+        assert verdict.accepted
+        add_pending_mock.assert_called_once_with(
+            req_type=TASK_CONN_TYPES['verdict'],
+            task_owner=owner.node_info,
+            port=owner.node_info.prv_port,
+            key_id=None,
+            args={'obj': verdict}
+        )
+
+        # Another session with the provider is used
+        self.ts.verdicts_to_send.clear()
+        session = Mock()
+        self.ts.task_sessions['aabbcc'] = session
+        self.ts.task_manager.verify_subtask.return_value = False
+        self.ts.result_verified('aabbcc', owner)
+        self.ts.reject_result.assert_called_once_with('aabbcc', owner)
+        session.send_result_rejected.assert_called_once_with('aabbcc')
+        assert not self.ts.verdicts_to_send
+
+    @patch('golem.task.taskserver.TaskServer.new_session_prepare')
+    @patch('golem.task.tasksession.TaskSession.send_hello')
+    @patch('golem.task.tasksession.TaskSession.send_result_accepted')
+    def test_connection_for_verdict(self, accepted_mock, hello_mock,
+                                    new_session_mock):
+        session = tasksession.TaskSession(conn=MagicMock())
+        conn_id = str(uuid.uuid4())
+        verdict = WaitingVerdict('xxyyzz', True, Mock())
+        self.ts.verdicts_to_send.add(verdict)
+        self.ts.connection_for_verdict_established(session, conn_id, verdict)
+        new_session_mock.assert_called_once_with(
+            session=session,
+            subtask_id='xxyyzz',
+            key_id=verdict.owner.key_id,
+            conn_id=conn_id
+        )
+        hello_mock.assert_called_once_with()
+        accepted_mock.assert_called_once_with('xxyyzz')
+        assert not self.ts.verdicts_to_send
+
     def test_new_connection(self):
         ccd = self._get_config_desc()
         ts = TaskServer(Node(), ccd, Mock(), self.client,
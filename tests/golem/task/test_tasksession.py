@@ -52,6 +52,7 @@ class TestTaskSession(LogTestCase, testutils.TempDirFixture,
             'PROTO_ID': TASK_PROTOCOL_ID,
             'RAND_VAL': self.task_session.rand_val,
             'SOLVE_CHALLENGE': False,
+            'CHANNEL_KEY': self.task_session._channel_handshake.public_key,
         }
         msg = send_mock.call_args[0][0]
         self.assertEqual(msg.dict_repr(), expected)
@@ -61,6 +62,7 @@ class TestTaskSession(LogTestCase, testutils.TempDirFixture,
         data = "ABC"
 
         ts.key_id = "123"
+        ts.task_server.get_ecdh_key.return_value = None
         ts.encrypt(data)
         ts.task_server.encrypt.assert_called_with(data, "123")
 
@@ -94,6 +96,61 @@ class TestTaskSession(LogTestCase, testutils.TempDirFixture,
         with self.assertLogs(logger, level='WARNING'):
             self.assertEqual(ts.encrypt(data), data)
 
+    def test_encrypt_decrypt_channel(self):
+        ek = EllipticalKeysAuth(self.path, "RANDOMPRIV", "RANDOMPUB")
+        ek2 = EllipticalKeysAuth(self.path, "RANDOMPRIV2", "RANDOMPUB2")
+        ts = TaskSession(Mock())
+        ts.task_server.get_ecdh_key = ek.get_ecdh_key
+        ts.key_id = ek2.key_id
+        ts2 = TaskSession(Mock())
+        ts2.task_server.get_ecdh_key = ek2.get_ecdh_key
+        ts2.key_id = ek.key_id
+
+        data = b"abcdefghijklm" * 100
+        # no channel before the ephemeral keys are exchanged
+        ts.encrypt(data)
+        ts.task_server.encrypt.assert_called_once_with(data, ek2.key_id)
+
+        ts2._channel_key_received(ts._channel_key())
+        ts._channel_key_sent()
+        ts._channel_key_received(ts2._channel_key())
+        ts2._channel_key_sent()
+
+        encrypted = ts.encrypt(data)
+        self.assertNotEqual(encrypted, data)
+        self.assertEqual(ts2.decrypt(encrypted), data)
+        self.assertEqual(ts.decrypt(ts2.encrypt(data)), data)
+        self.assertEqual(ts.task_server.encrypt.call_count, 1)
+        ts2.task_server.decrypt.assert_not_called()
+
+        # replayed frame
+        with self.assertLogs(logger, level='WARNING'):
+            self.assertIsNone(ts2.decrypt(encrypted))
+
+        # frame recorded in a previous session with the same peer
+        ts3 = TaskSession(Mock())
+        ts3.task_server.get_ecdh_key = ek2.get_ecdh_key
+        ts3.key_id = ek.key_id
+        ts3._channel_key_received(TaskSession(Mock())._channel_key())
+        ts3._channel_key_sent()
+        with self.assertLogs(logger, level='WARNING'):
+            self.assertIsNone(ts3.decrypt(encrypted))
+
+    def test_channel_only_after_exchange(self):
+        ts = TaskSession(Mock())
+        ts.key_id = 'deadbeef'
+        ts.task_server.get_ecdh_key.return_value = b'\x01' * 32
+        peer = TaskSession(Mock())
+        peer.key_id = 'deadbeef'
+        peer.task_server.get_ecdh_key.return_value = b'\x01' * 32
+        peer._channel_key_received(ts._channel_key())
+        peer._channel_key_sent()
+
+        # frame sent before this side has announced its key
+        frame = peer.encrypt(b'data')
+        with self.assertLogs(logger, level='WARNING'):
+            self.assertIsNone(ts.decrypt(frame))
+
     def test_request_task(self):
         ts = TaskSession(Mock())
         ts.verified = True
@@ -206,6 +263,15 @@ class TestTaskSession(LogTestCase, testutils.TempDirFixture,
 
         ts._react_to_hello(msg)
         assert ts.send.called
+        self.assertIsNone(ts._get_channel())
+
+        ts.key_id = 0
+        ts.send = Mock()
+        ts.task_server.get_ecdh_key.return_value = b'\x01' * 32
+        msg.channel_key = TaskSession(Mock())._channel_key()
+        ts._react_to_hello(msg)
+        self.assertIsNotNone(ts._get_channel())
+        self.assertIsNotNone(ts.send.call_args_list[0][0][0].channel_key)
 
     def test_result_received(self):
         conn = Mock()
@@ -214,6 +280,14 @@ class TestTaskSession(LogTestCase, testutils.TempDirFixture,
         ts.task_manager = Mock()
         ts.task_manager.verify_subtask.return_value = True
 
+        def computed_task_received(subtask_id, result, result_type,
+                                   verification_finished):
+            verification_finished()
+            return True
+
+        ts.task_manager.computed_task_received.side_effect = \
+            computed_task_received
+
         extra_data = dict(
             # the result is explicitly serialized using cPickle
             result=pickle.dumps({'stdout': 'xyz'}),
@@ -235,10 +309,22 @@ class TestTaskSession(LogTestCase, testutils.TempDirFixture,
 
         ts.result_received(extra_data, decrypt=False)
 
-        assert ts.msgs_to_send
-        assert ts.msgs_to_send[0].__class__ == MessageSubtaskResultAccepted
+        # The verdict is sent by the task server, not this session
+        assert not ts.msgs_to_send
+        ts.task_server.result_verified.assert_called_once_with(
+            'xxyyzz', ts.result_owner)
         assert conn.close.called
 
+        ts.task_server.result_verified.reset_mock()
+        ts.task_manager.computed_task_received.side_effect = None
+        ts.task_manager.computed_task_received.return_value = False
+
+        ts.result_received(extra_data, decrypt=False)
+
+        assert not ts.msgs_to_send
+        ts.task_server.result_verified.assert_called_once_with(
+            'xxyyzz', ts.result_owner)
+
         extra_data.update(dict(
             subtask_id=None,
         ))
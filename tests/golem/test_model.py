@@ -24,6 +24,22 @@ class TestDatabase(TempDirFixture):
         self.assertEqual(db._get_user_version(), db.SCHEMA_VERSION)
         db.db.close()
 
+    def test_create_missing_indexes(self):
+        db = Database(self.path)
+        Payment.create(payee="DEF", subtask="xyz", value=5,
+                       status=PaymentStatus.awaiting)
+        for index in db.db.get_indexes('payment'):
+            if index.sql:  # not an automatic primary key index
+                db.db.execute_sql('DROP INDEX {}'.format(index.name))
+        db.db.close()
+
+        db = Database(self.path)
+        columns = [tuple(index.columns)
+                   for index in db.db.get_indexes('payment')]
+        self.assertIn(('modified_date', 'subtask'), columns)
+        self.assertEqual(Payment.select().count(), 1)
+        db.db.close()
+
 
 class TestPayment(DatabaseFixture):
 
@@ -169,3 +169,40 @@ class TestEthereumIncomesKeeper(testutils.DatabaseFixture, testutils.PEP8MixIn):
             )
             .count()
         )
+
+    def test_batch_payment_logs_read_once(self):
+        transaction_id = get_some_id()
+        block_number = random.randint(0, int(SQLITE3_MAX_INT / 2))
+        self.instance.eth_node.get_logs.return_value = [
+            {
+                'topics': [
+                    EthereumIncomesKeeper.LOG_ID,
+                    get_some_id(),  # sender
+                    self.instance.processor.eth_address(),  # receiver
+                ],
+                'data': hex(30),
+            },
+        ]
+
+        # One transaction pays for three subtasks
+        for _ in range(3):
+            assert self.instance.received(
+                sender_node_id=get_some_id(),
+                task_id=get_some_id(),
+                subtask_id=get_some_id(),
+                transaction_id=transaction_id,
+                block_number=block_number,
+                value=10
+            ) is not None
+        assert self.instance.eth_node.get_logs.call_count == 1
+
+        # The payment is spent, the logs are read again to be sure
+        assert self.instance.received(
+            sender_node_id=get_some_id(),
+            task_id=get_some_id(),
+            subtask_id=get_some_id(),
+            transaction_id=transaction_id,
+            block_number=block_number,
+            value=10
+        ) is None
+        assert self.instance.eth_node.get_logs.call_count == 2
@@ -364,9 +364,14 @@ class PaymentProcessorInternalTest(DatabaseFixture):
         assert inprogress[tx.hash] == [p]
 
         # Check payment status in the Blockchain
-        self.client.get_transaction_receipt.return_value = None
+        receipts = {}
+        self.client.get_transaction_receipts.side_effect = \
+            lambda hashes: {h: receipts.get(h) for h in hashes}
+        self.client.get_block_number.return_value = 8213
         self.client.call.return_value = hex(balance_gnt - gnt_value)
         self.pp.monitor_progress()
+        self.client.get_transaction_receipts.assert_called_once_with(
+            ['0x' + encode_hex(tx.hash)])
         assert len(inprogress) == 1
         assert tx.hash in inprogress
         assert inprogress[tx.hash] == [p]
@@ -376,15 +381,18 @@ class PaymentProcessorInternalTest(DatabaseFixture):
         assert self.pp._eth_reserved() == PaymentProcessor.SINGLE_PAYMENT_ETH_COST
         assert self.pp._eth_available() == balance_eth - PaymentProcessor.SINGLE_PAYMENT_ETH_COST
 
+        # Receipts are checked once per block
+        receipt = {'blockNumber': 8214, 'blockHash': '0x' + 64*'f', 'gasUsed': 55001}
+        receipts['0x' + encode_hex(tx.hash)] = receipt
         self.pp.monitor_progress()
+        assert self.client.get_transaction_receipts.call_count == 1
         assert len(inprogress) == 1
         assert self.pp._gnt_reserved() == 0
         assert self.pp._gnt_available() == balance_gnt - gnt_value
         assert self.pp._eth_reserved() == PaymentProcessor.SINGLE_PAYMENT_ETH_COST
         assert self.pp._eth_available() == balance_eth - PaymentProcessor.SINGLE_PAYMENT_ETH_COST
 
-        receipt = {'blockNumber': 8214, 'blockHash': '0x' + 64*'f', 'gasUsed': 55001}
-        self.client.get_transaction_receipt.return_value = receipt
+        self.client.get_block_number.return_value = 8214
         self.pp.monitor_progress()
         assert len(inprogress) == 0
         assert p.status == PaymentStatus.confirmed
@@ -392,6 +400,42 @@ class PaymentProcessorInternalTest(DatabaseFixture):
         assert p.details['block_hash'] == 64*'f'
         assert p.details['fee'] == 55001 * self.pp.GAS_PRICE
         assert self.pp._gnt_reserved() == 0
+        p = Payment.get(subtask="p1")
+        assert p.status == PaymentStatus.confirmed
+        assert p.details['fee'] == 55001 * self.pp.GAS_PRICE
+
+        # Nothing is checked without transactions in progress
+        self.client.get_block_number.return_value = 8215
+        self.pp.monitor_progress()
+        assert self.client.get_transaction_receipts.call_count == 2
+
+    def test_monitor_progress_many_transactions(self):
+        a1 = urandom(20)
+        payments = [Payment.create(subtask="p{}".format(i), payee=a1,
+                                   value=10 ** 15, status=PaymentStatus.sent,
+                                   details={'tx': encode_hex(urandom(32))})
+                    for i in range(6)]
+        pp = PaymentProcessor(self.client, self.privkey)
+        pp._loopingCall.clock = Clock()
+        assert len(pp._inprogress) == 6
+
+        mined = set(p.details['tx'] for p in payments[:4])
+        receipt = {'blockNumber': 8214, 'blockHash': '0x' + 64 * 'f',
+                   'gasUsed': 55001}
+        self.client.get_block_number.return_value = 8214
+        self.client.get_transaction_receipts.side_effect = \
+            lambda hashes: {h: receipt if h[2:] in mined else None
+                            for h in hashes}
+
+        with patch('golem.ethereum.paymentprocessor.dispatcher') as disp:
+            pp.monitor_progress()
+
+        assert self.client.get_transaction_receipts.call_count == 1
+        assert len(pp._inprogress) == 2
+        assert disp.send.call_count == 2 * 4
+        statuses = [Payment.get(subtask=p.subtask).status for p in payments]
+        assert statuses == [PaymentStatus.confirmed] * 4 + \
+            [PaymentStatus.sent] * 2
 
 
 class PaymentProcessorFunctionalTest(DatabaseFixture):
@@ -3,6 +3,8 @@ import random
 import sys
 import time
 
+from mock import patch
+
 from golem.model import db
 from golem.model import ExpectedIncome
 from golem.model import Income
@@ -124,3 +126,80 @@ class TestIncomesKeeper(TestWithDatabase, PEP8MixIn):
         with db.atomic():
             # Match
             self.assertEqual(ExpectedIncome.select().count(), 0)
+
+    def test_run_once_many(self):
+        old_date = datetime.datetime.now() - datetime.timedelta(hours=1)
+        expected_incomes = []
+        for i in range(6):
+            expected_income = self.incomes_keeper.expect(
+                sender_node_id='sender',
+                p2p_node=Node(),
+                task_id='task',
+                subtask_id='subtask{}'.format(i),
+                value=i + 1
+            )
+            expected_incomes.append(expected_income)
+            if i % 2:
+                self.incomes_keeper.received(
+                    sender_node_id='sender',
+                    task_id='task',
+                    subtask_id='subtask{}'.format(i),
+                    transaction_id='tx',
+                    block_number=1,
+                    value=i + 1
+                )
+        ExpectedIncome.update(modified_date=old_date).execute()
+
+        with patch('golem.transactions.incomeskeeper.dispatcher') as disp:
+            self.incomes_keeper.run_once()
+
+        remaining = ExpectedIncome.select().order_by(ExpectedIncome.id)
+        assert [e.subtask for e in remaining] == \
+            ['subtask0', 'subtask2', 'subtask4']
+        assert all(e.modified_date > old_date for e in remaining)
+        assert sorted(c[1]['expected_income'].subtask
+                      for c in disp.send.call_args_list) == \
+            ['subtask0', 'subtask2', 'subtask4']
+
+    def test_get_list_of_all_incomes(self):
+        created_date = datetime.datetime.now()
+        for i in range(5):
+            self.incomes_keeper.expect(
+                sender_node_id='sender',
+                p2p_node=Node(),
+                task_id='task{}'.format(i % 2),
+                subtask_id='subtask{}'.format(i),
+                value=i + 1
+            )
+            if i in (1, 2):
+                self.incomes_keeper.received(
+                    sender_node_id='sender',
+                    task_id='task{}'.format(i % 2),
+                    subtask_id='subtask{}'.format(i),
+                    transaction_id='tx',
+                    block_number=1,
+                    value=i + 1
+                )
+        # The same date, the newest are the ones added later
+        ExpectedIncome.update(created_date=created_date).execute()
+
+        def subtasks(incomes):
+            return [e.subtask for e in incomes]
+
+        incomes = self.incomes_keeper.get_list_of_all_incomes()
+        assert subtasks(incomes) == \
+            ['subtask4', 'subtask3', 'subtask2', 'subtask1', 'subtask0']
+
+        first = list(self.incomes_keeper.get_list_of_all_incomes(limit=2))
+        assert subtasks(first) == ['subtask4', 'subtask3']
+        second = self.incomes_keeper.get_list_of_all_incomes(
+            cursor=first[-1].id, limit=2)
+        assert subtasks(second) == ['subtask2', 'subtask1']
+
+        assert subtasks(self.incomes_keeper.get_list_of_all_incomes(
+            task='task1')) == ['subtask3', 'subtask1']
+        assert subtasks(self.incomes_keeper.get_list_of_all_incomes(
+            confirmed=True)) == ['subtask2', 'subtask1']
+        assert subtasks(self.incomes_keeper.get_list_of_all_incomes(
+            cursor=first[-1].id, confirmed=False)) == ['subtask0']
+        assert not self.incomes_keeper.get_list_of_all_incomes(cursor=-1)
@@ -1,11 +1,12 @@
 from copy import deepcopy
+from datetime import datetime
 
 from peewee import IntegrityError
 from os import urandom
 
 from golem.network.p2p.node import Node
 from golem.core.keysauth import EllipticalKeysAuth
-from golem.model import PaymentStatus
+from golem.model import Payment, PaymentStatus
 from golem.testutils import TempDirFixture
 from golem.tools.testwithdatabase import TestWithDatabase
 from golem.tools.assertlogs import LogTestCase
@@ -151,6 +152,31 @@ class TestPaymentsKeeper(TestWithDatabase):
         assert pk.get_payment("xxyyzz") == 2023
         assert pk.get_payment("not existing") == 0
 
+    def test_pagination(self):
+        pk = PaymentsKeeper()
+        ai = EthAccountInfo("DEF", 20400, "10.0.0.1", "1", "i", urandom(20))
+        for i in range(5):
+            pk.finished_subtasks(PaymentInfo("xyz", "sub{}".format(i), i, ai))
+        # The same modification date, the ordering falls back to subtask ids
+        Payment.update(modified_date=datetime.now()).execute()
+        pk.db.change_state("sub1", PaymentStatus.sent)
+
+        def subtasks(payments):
+            return [p["subtask"] for p in payments]
+
+        assert subtasks(pk.get_list_of_all_payments()) == \
+            ["sub1", "sub4", "sub3", "sub2", "sub0"]
+        first = pk.get_list_of_all_payments(limit=2)
+        assert subtasks(first) == ["sub1", "sub4"]
+        assert subtasks(pk.get_list_of_all_payments(
+            cursor=first[-1]["subtask"], limit=2)) == ["sub3", "sub2"]
+        assert subtasks(pk.get_list_of_all_payments(
+            status=PaymentStatus.awaiting.name, cursor="sub3")) == \
+            ["sub2", "sub0"]
+        assert subtasks(pk.get_list_of_all_payments(
+            status=PaymentStatus.sent.name)) == ["sub1"]
+        assert pk.get_list_of_all_payments(cursor="not existing") == []
+
 
 class TestAccountInfo(TempDirFixture):
     def test_comparison(self):